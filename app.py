@@ -1,23 +1,41 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file, Response
 import os
+import threading
+import time
 from datetime import datetime
+from functools import wraps
 import pandas as pd
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-import calendar
 from datetime import timedelta
 from collections import Counter
 
 # Importar infraestructura
-from src.infrastructure.mysql_connection import MySQLConnection
+from src.infrastructure.mysql_connection import MySQLConnection, release_thread_connections
+from src.infrastructure.metrics import metricas
+from src.infrastructure.scan_dedup import VentanaDuplicados
+from src.infrastructure.write_behind import EscrituraDiferidaTracking
+from src.infrastructure.employee_cache import CacheEmpleados
+from src.infrastructure.qr_index import IndiceQR
+from src.infrastructure.qr_filter import FiltroQRValidos
+from src.infrastructure.daily_summary import ResumenDiarioEmpresa
+from src.infrastructure.date_ranges import rango_mes
+from src.infrastructure.report_cache import CacheResultadosReportes
+from src.infrastructure.admin_queries import (
+    consulta_marcaciones_incompletas, consulta_registros_asistencia, consulta_top_turno
+)
+from src.infrastructure.today_board import TableroHoy, fila_como_dict
+from src.infrastructure.scan_feed import DifusorEscaneos
+from src.infrastructure.excel_export import ExportadorExcelMensual, MIMETYPE_XLSX, cabecera_descarga
+from src.infrastructure.report_artifacts import CacheArtefactos, programar_pregeneracion
+from src.infrastructure.bulk_export import ExportadorMasivo, meses_entre
 from src.infrastructure.repositories_mysql import (
     EmpresaRepositoryMySQL,
     EmpleadoRepositoryMySQL,
     AsistenciaRepositoryMySQL,
     HorarioEstandarRepositoryMySQL,
     EscaneoTrackingRepositoryMySQL,
+    RegistroEscaneoRepositoryMySQL,
+    ReporteSemanalRepositoryMySQL,
+    CierreMensualRepositoryMySQL,
     AdministradorRepository
 )
 
@@ -25,7 +43,9 @@ from src.infrastructure.repositories_mysql import (
 from src.use_cases.register_employee import RegisterEmployeeUseCase
 from src.use_cases.mark_attendance import MarkAttendanceUseCase
 from src.use_cases.list_companies import ListCompaniesUseCase
-from src.use_cases.get_report import GetReportUseCase, minutos_a_hhmm
+from src.use_cases.get_report import GetReportUseCase
+from src.use_cases.close_month import CloseMonthUseCase
+from src.use_cases.weekly_report import WeeklyReportUseCase, rango_semana
 
 # Importar QR generator
 from src.infrastructure.qr_generator import QRGenerator
@@ -37,20 +57,86 @@ app.secret_key = os.getenv('SECRET_KEY') or 'clave-secreta-temporal-desarrollo-c
 db_connection = MySQLConnection()
 # Inicializar repositorios
 empresa_repo = EmpresaRepositoryMySQL(db_connection)
-empleado_repo = EmpleadoRepositoryMySQL(db_connection)
+# Caché de empleados activos para las búsquedas del escaneo (EMPLOYEE_CACHE_TTL=0 la desactiva)
+cache_empleados = CacheEmpleados.desde_entorno()
+indice_qr = IndiceQR.desde_entorno()
+empleado_repo = EmpleadoRepositoryMySQL(db_connection, cache_empleados, indice_qr)
 asistencia_repo = AsistenciaRepositoryMySQL(db_connection)
 horario_repo = HorarioEstandarRepositoryMySQL(db_connection)
-escaneo_repo = EscaneoTrackingRepositoryMySQL(db_connection)
+# Ventana anti-duplicado en memoria delante de ESCANEOS_TRACKING (SCAN_DEDUP_BACKEND=local|shared)
+ventana_duplicados = VentanaDuplicados.desde_entorno()
+# Inserts de ESCANEOS_TRACKING en lotes desde un hilo aparte (TRACKING_WRITE_BEHIND=0 lo desactiva;
+# con varios workers requiere SCAN_DEDUP_BACKEND=shared)
+tracking_write_behind = EscrituraDiferidaTracking.desde_entorno(db_connection, ventana_duplicados)
+escaneo_repo = EscaneoTrackingRepositoryMySQL(db_connection, ventana_duplicados, tracking_write_behind)
+registro_escaneo_repo = RegistroEscaneoRepositoryMySQL(db_connection, ventana_duplicados)
 
 # Inicializar use cases
 register_employee_use_case = RegisterEmployeeUseCase(empleado_repo)
-mark_attendance_use_case = MarkAttendanceUseCase(empleado_repo, asistencia_repo, horario_repo, escaneo_repo)
+# SCAN_MODE=procedure resuelve cada escaneo en un solo viaje a la BD (sp_registrar_escaneo)
+filtro_qr = FiltroQRValidos.desde_entorno(indice_qr)
+mark_attendance_use_case = MarkAttendanceUseCase(empleado_repo, asistencia_repo, horario_repo, escaneo_repo,
+                                                 registro_escaneo_repo, filtro_qr=filtro_qr)
+# Agregado diario por empresa del reporte semanal, recalculado al cambiar una marcación
+resumen_diario = ResumenDiarioEmpresa.desde_entorno(db_connection)
+mark_attendance_use_case.agregar_oyente(resumen_diario.al_registrar_asistencia)
 list_companies_use_case = ListCompaniesUseCase(empresa_repo,)
-get_report_use_case = GetReportUseCase(empleado_repo, asistencia_repo, empresa_repo)
+# Meses cerrados: reportes y export leen la foto del cierre en lugar de ASISTENCIA
+cierre_repo = CierreMensualRepositoryMySQL(db_connection)
+close_month_use_case = CloseMonthUseCase(empleado_repo, asistencia_repo, cierre_repo)
+get_report_use_case = GetReportUseCase(empleado_repo, asistencia_repo, empresa_repo, cierre_repo)
+reporte_semanal_repo = ReporteSemanalRepositoryMySQL(db_connection, resumen_diario)
+weekly_report_use_case = WeeklyReportUseCase(reporte_semanal_repo)
+
+def _empresa_de_empleado(empleado_id):
+    # También de inactivos: sus asistencias se siguen editando y saliendo en los reportes
+    return empleado_repo.get_empresa_id(empleado_id)
+
+# Respuestas de los reportes JSON, invalidadas por (empresa, mes) al cambiar ASISTENCIA
+# (REPORT_CACHE_MAX_MB=0 la desactiva)
+cache_reportes = CacheResultadosReportes.desde_entorno(_empresa_de_empleado)
+if cache_reportes is not None:
+    mark_attendance_use_case.agregar_oyente(cache_reportes.al_registrar_asistencia)
+# Marcaciones de hoy en memoria (conteos y filas del día sin ir a la BD); TODAY_BOARD=0 lo desactiva
+tablero_hoy = TableroHoy.desde_entorno(asistencia_repo)
+if tablero_hoy is not None:
+    mark_attendance_use_case.agregar_oyente(tablero_hoy.al_registrar_asistencia)
+    threading.Thread(target=tablero_hoy.sembrar, name="sembrar-tablero-hoy", daemon=True).start()
+# Escaneos en vivo para los paneles (SSE y long-poll); SCAN_FEED=0 lo desactiva
+difusor_escaneos = DifusorEscaneos.desde_entorno(_empresa_de_empleado)
+if difusor_escaneos is not None:
+    mark_attendance_use_case.agregar_oyente(difusor_escaneos.al_registrar_asistencia)
+# Excel mensual con caché local de artefactos versionados (REPORT_ARTIFACTS_MAX_MB=0 la desactiva)
+# y pregeneración del mes anterior a principio de mes (REPORT_PREGENERATE=0 la desactiva)
+artefactos_reportes = CacheArtefactos.desde_entorno()
+exportador_excel = ExportadorExcelMensual(empresa_repo, empleado_repo, asistencia_repo, artefactos_reportes,
+                                          cierre_repo)
+programador_reportes = (programar_pregeneracion(exportador_excel.pregenerar_mes_anterior)
+                        if artefactos_reportes is not None else None)
+# Export masivo (un Excel por empresa y mes) en un pool de procesos (BULK_EXPORT_WORKERS)
+exportador_masivo = ExportadorMasivo.desde_entorno()
 
 # Inicializar QR generator
 qr_generator = QRGenerator()
 
+@app.before_request
+def iniciar_metricas_request():
+    metricas.iniciar_peticion()
+
+@app.after_request
+def registrar_metricas_request(response):
+    """Latencia y viajes a la BD por ruta (la regla de Flask, no la URL, para acotar etiquetas)"""
+    ruta = request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+    metricas.finalizar_peticion(ruta, request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def devolver_conexiones_al_pool(exception=None):
+    """Devuelve al pool las conexiones que una ruta no cerró (p. ej. por una excepción)"""
+    liberadas = release_thread_connections()
+    if liberadas:
+        print(f"⚠️ {liberadas} conexión(es) devueltas al pool al finalizar {request.path}")
+
 def obtener_nombre_mes(numero_mes):
     """Obtiene el nombre del mes por su número"""
     meses = [
@@ -59,6 +145,92 @@ def obtener_nombre_mes(numero_mes):
     ]
     return meses[numero_mes] if 1 <= numero_mes <= 12 else ''
 
+def _marcacion_modificada(empleado_id, fecha):
+    """Una edición del admin cambió la asistencia del empleado ese día"""
+    resumen_diario.marcar_empleado(empleado_id, fecha)
+    if cache_reportes is not None:
+        cache_reportes.invalidar_empleado(empleado_id, fecha)
+    if tablero_hoy is not None:
+        tablero_hoy.recargar_empleado(empleado_id, fecha)
+
+def _empleado_modificado(empleado_id, *empresa_ids):
+    """Cambió un empleado (alta, nombre, empresa, estado, baja): su fila de hoy y los reportes de su empresa"""
+    if tablero_hoy is not None:
+        tablero_hoy.recargar_empleado(empleado_id)
+    if cache_reportes is not None:
+        for empresa_id in set(empresa_ids):
+            cache_reportes.invalidar(empresa_id)
+
+def reporte_cacheado(alcance, requiere_admin=False):
+    """
+    Sirve la respuesta JSON de la ruta desde cache_reportes. `alcance(**kwargs)` da
+    (empresa_id, fecha_inicio, fecha_fin) del request ya normalizados: con la ruta forman la clave
+    y el alcance que invalidan las escrituras. Si el request no es válido para `alcance` se llama a
+    la ruta sin caché (que responda su error); solo se guardan respuestas 200.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            # La sesión se revisa antes de buscar: lo guardado no vuelve a pasar por la ruta
+            if cache_reportes is None or (requiere_admin and not session.get('admin_logged_in')):
+                return vista(*args, **kwargs)
+            try:
+                empresa_id, inicio, fin = alcance(**kwargs)
+            except (ValueError, TypeError, LookupError):
+                return vista(*args, **kwargs)
+
+            clave = (request.endpoint, tuple(sorted(kwargs.items())), empresa_id, str(inicio), str(fin))
+            calculada = []
+
+            def calcular():
+                respuesta = app.make_response(vista(*args, **kwargs))
+                calculada.append(respuesta)
+                return respuesta.get_data() if respuesta.status_code == 200 and respuesta.is_json else None
+
+            cuerpo = cache_reportes.obtener_o_calcular(clave, empresa_id, inicio, fin, calcular)
+            if calculada:
+                calculada[0].headers['X-Cache'] = 'MISS'
+                return calculada[0]
+            return Response(cuerpo, mimetype='application/json', headers={'X-Cache': 'HIT'})
+        return envoltura
+    return decorador
+
+def _mes_del_request():
+    """(primer día, último día) de mes/anio del request (por defecto, el mes actual)"""
+    mes = request.args.get('mes', type=int, default=datetime.now().month)
+    anio = request.args.get('anio', type=int, default=datetime.now().year)
+    inicio, siguiente = rango_mes(anio, mes)
+    return inicio, (datetime.strptime(siguiente, '%Y-%m-%d') - timedelta(days=1)).date()
+
+def _alcance_reporte_mensual():
+    empresa_id = request.args.get('empresa_id', type=int)
+    if not empresa_id:
+        raise ValueError("empresa_id requerido")
+    return (empresa_id, *_mes_del_request())
+
+def _alcance_reporte_empleado(empleado_id):
+    empresa_id = _empresa_de_empleado(empleado_id)
+    if empresa_id is None:
+        raise LookupError(f"empleado {empleado_id} no encontrado")
+    return (empresa_id, *_mes_del_request())
+
+def _alcance_semanal():
+    """fecha_inicio/fecha_fin o la semana desplazada, como _reporte_semanal_desde_request"""
+    fecha_inicio = request.args.get('fecha_inicio')
+    fecha_fin = request.args.get('fecha_fin')
+    if fecha_inicio and fecha_fin:
+        inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    else:
+        inicio, fin = rango_semana(request.args.get('semana', type=int, default=0))
+    return request.args.get('empresa_id', type=int), inicio, fin
+
+def _alcance_fechas():
+    """Rutas que exigen fecha_inicio y fecha_fin"""
+    if not request.args.get('fecha_inicio') or not request.args.get('fecha_fin'):
+        raise ValueError("fechas requeridas")
+    return _alcance_semanal()
+
 # Rutas principales
 @app.route('/')
 def index():
@@ -119,6 +291,7 @@ def admin_add_employee():
                 telefono=telefono,
                 correo=correo
             )
+            _empleado_modificado(empleado.id, empresa_id)
             
             empresa = empresa_repo.get_by_id(empresa_id)
             if empresa:
@@ -170,6 +343,7 @@ def edit_employee(empleado_id):
     
     if request.method == 'POST':
         try:
+            empresa_anterior = empleado.empresa_id
             empleado.nombre = request.form['nombre']
             empleado.empresa_id = int(request.form['empresa_id'])
             empleado.dni = request.form['dni']
@@ -177,6 +351,11 @@ def edit_employee(empleado_id):
             empleado.correo = request.form.get('correo', '')
             
             empleado_repo.update(empleado)
+            empleado_repo.invalidar_cache(empleado_id)
+            if empleado.empresa_id != empresa_anterior:
+                resumen_diario.marcar_todas_las_fechas(empleado_id, empresa_anterior)
+                resumen_diario.marcar_todas_las_fechas(empleado_id, empleado.empresa_id)
+            _empleado_modificado(empleado_id, empresa_anterior, empleado.empresa_id)
             flash('Empleado actualizado con éxito', 'success')
             return redirect(url_for('admin_list_employees'))
             
@@ -198,6 +377,9 @@ def toggle_employee(empleado_id):
         
         empleado.activo = not empleado.activo
         empleado_repo.update(empleado)
+        empleado_repo.invalidar_cache(empleado_id)
+        resumen_diario.marcar_todas_las_fechas(empleado_id, empleado.empresa_id)
+        _empleado_modificado(empleado_id, empleado.empresa_id)
         
         estado = "activado" if empleado.activo else "desactivado"
         return jsonify({
@@ -221,7 +403,10 @@ def delete_employee(empleado_id):
         
         nombre_empleado = empleado.nombre
         
+        # Antes del DELETE: después ya no quedan sus fechas de asistencia
+        resumen_diario.marcar_todas_las_fechas(empleado_id, empleado.empresa_id)
         empleado_repo.delete(empleado_id)
+        _empleado_modificado(empleado_id, empleado.empresa_id)
         
         return jsonify({
             'success': True, 
@@ -283,6 +468,82 @@ def api_scan_qr():
             "data": None
         })
 
+# Una conexión SSE se cierra a los SCAN_FEED_STREAM_SECONDS (el navegador reconecta solo con
+# Last-Event-ID) y manda un latido cada SCAN_FEED_HEARTBEAT_SECONDS para detectar desconexiones
+DURACION_STREAM_ESCANEOS = float(os.getenv('SCAN_FEED_STREAM_SECONDS', '300'))
+LATIDO_STREAM_ESCANEOS = float(os.getenv('SCAN_FEED_HEARTBEAT_SECONDS', '15'))
+MAX_ESPERA_LONG_POLL = 30.0
+
+@app.route('/api/scan-feed/stream')
+def api_scan_feed_stream():
+    """Server-Sent Events con cada escaneo registrado (evento "escaneo"), filtrable por empresa_id"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if difusor_escaneos is None:
+        return jsonify({"error": "Feed de escaneos desactivado"}), 404
+    empresa_id = request.args.get('empresa_id', type=int)
+    desde_id = request.headers.get('Last-Event-ID', type=int)
+    if desde_id is None:
+        desde_id = difusor_escaneos.ultimo_id()
+    if not difusor_escaneos.reservar():
+        return jsonify({"error": "Demasiadas conexiones al feed; use /api/scan-feed"}), 503
+    liberado = []
+
+    def liberar():
+        # Una sola vez: lo llaman el fin del generador y el cierre de la respuesta
+        if not liberado:
+            liberado.append(True)
+            difusor_escaneos.liberar()
+
+    def generar():
+        try:
+            ultimo_id = desde_id
+            yield f"retry: 3000\nid: {ultimo_id}\n\n"
+            fin = time.monotonic() + DURACION_STREAM_ESCANEOS
+            while time.monotonic() < fin:
+                eventos, ultimo_id, perdidos = difusor_escaneos.esperar(
+                    ultimo_id, empresa_id, min(LATIDO_STREAM_ESCANEOS, max(0.0, fin - time.monotonic())))
+                if perdidos:
+                    yield f"event: perdidos\nid: {ultimo_id}\ndata: {{}}\n\n"
+                for id_evento, datos in eventos:
+                    yield f"event: escaneo\nid: {id_evento}\ndata: {datos}\n\n"
+                if not eventos and not perdidos:
+                    # Latido: también avanza el Last-Event-ID por los escaneos de otras empresas
+                    yield f": ping\nid: {ultimo_id}\n\n"
+        finally:
+            liberar()
+
+    respuesta = Response(generar(), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Si la respuesta se cierra antes de empezar a iterar, el finally del generador nunca corre
+    respuesta.call_on_close(liberar)
+    return respuesta
+
+@app.route('/api/scan-feed')
+def api_scan_feed():
+    """
+    Long-poll: escaneos posteriores a `desde` (sin él, desde ahora) de empresa_id, esperando hasta
+    `timeout` segundos. Sin lugar libre responde enseguida con lo que haya.
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if difusor_escaneos is None:
+        return jsonify({"error": "Feed de escaneos desactivado"}), 404
+    empresa_id = request.args.get('empresa_id', type=int)
+    desde_id = request.args.get('desde', type=int)
+    timeout = min(max(request.args.get('timeout', type=float, default=25.0), 0.0), MAX_ESPERA_LONG_POLL)
+
+    reservado = timeout > 0 and difusor_escaneos.reservar()
+    try:
+        eventos, ultimo_id, perdidos = difusor_escaneos.esperar(desde_id, empresa_id, timeout if reservado else 0)
+    finally:
+        if reservado:
+            difusor_escaneos.liberar()
+    # Los eventos ya vienen serializados: se arma el JSON sin decodificarlos
+    cuerpo = (f'{{"ultimo_id": {ultimo_id}, "perdidos": {"true" if perdidos else "false"}, '
+              f'"eventos": [{", ".join(datos for _, datos in eventos)}]}}')
+    return Response(cuerpo, mimetype='application/json')
+
 @app.route('/reports')
 def reports():
      if not session.get('admin_logged_in'):
@@ -293,6 +554,7 @@ def reports():
      return render_template('report.html', empresas=empresas)
 
 @app.route('/api/reports/monthly')
+@reporte_cacheado(_alcance_reporte_mensual)
 def api_monthly_report():
     try:
         empresa_id = request.args.get('empresa_id', type=int)
@@ -309,6 +571,7 @@ def api_monthly_report():
         return jsonify({"error": f"Error generando reporte: {str(e)}"}), 500
 
 @app.route('/api/reports/employee/<int:empleado_id>')
+@reporte_cacheado(_alcance_reporte_empleado)
 def api_employee_report(empleado_id):
     try:    
         mes = request.args.get('mes', type=int, default=datetime.now().month)
@@ -349,6 +612,102 @@ def api_get_empleados():
         return jsonify({"error": str(e)}), 500
     
 
+MAX_DIAS_ASISTENCIAS = 62
+
+def _rango_asistencias_desde_request():
+    """(empresa_id, inicio, fin) de /api/asistencias: fecha, o fecha_inicio y fecha_fin; ValueError si no es válido"""
+    empresa_id = request.args.get('empresa_id', type=int)
+    if not empresa_id:
+        raise ValueError("empresa_id requerido")
+    fecha = request.args.get('fecha')
+    fecha_inicio = request.args.get('fecha_inicio') or fecha
+    fecha_fin = request.args.get('fecha_fin') or fecha
+    if not fecha_inicio or not fecha_fin:
+        raise ValueError("fecha (o fecha_inicio y fecha_fin) requerida")
+    try:
+        inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError("Fechas en formato YYYY-MM-DD")
+    if fin < inicio or (fin - inicio).days >= MAX_DIAS_ASISTENCIAS:
+        raise ValueError(f"Rango de fechas inválido (máximo {MAX_DIAS_ASISTENCIAS} días)")
+    return empresa_id, inicio, fin
+
+def _asistencias_de_hoy_desde_tablero(empresa_id, inicio, fin):
+    """Registros de /api/asistencias si el rango es solo hoy y hay tablero; None para ir a la BD"""
+    if tablero_hoy is None or inicio != fin:
+        return None
+    try:
+        if inicio != tablero_hoy.fecha():
+            return None
+        filas = tablero_hoy.filas(empresa_id, solo_con_asistencia=True)
+    except RuntimeError:
+        return None
+    fecha = inicio.strftime('%Y-%m-%d')
+    return [
+        {
+            "empleado_id": fila["empleado_id"],
+            "nombre": fila["nombre"],
+            "fecha": fecha,
+            "entrada_manana_real": fila["entrada_manana_real"],
+            "salida_manana_real": fila["salida_manana_real"],
+            "entrada_tarde_real": fila["entrada_tarde_real"],
+            "salida_tarde_real": fila["salida_tarde_real"]
+        }
+        for fila in map(fila_como_dict, filas)
+    ]
+
+@app.route('/api/asistencias')
+@reporte_cacheado(_rango_asistencias_desde_request, requiere_admin=True)
+def api_get_asistencias_empresa():
+    """
+    Marcaciones de los empleados activos de una empresa en una fecha (o rango) en una sola
+    consulta, para no pedir /api/asistencias/<empleado_id> empleado por empleado
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    try:
+        empresa_id, inicio, fin = _rango_asistencias_desde_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        registros = _asistencias_de_hoy_desde_tablero(empresa_id, inicio, fin)
+        if registros is not None:
+            return jsonify({
+                "empresa_id": empresa_id,
+                "fecha_inicio": inicio.strftime('%Y-%m-%d'),
+                "fecha_fin": fin.strftime('%Y-%m-%d'),
+                "registros": registros
+            })
+
+        nombres = {empleado.id: empleado.nombre for empleado in empleado_repo.get_by_empresa_id(empresa_id)}
+        registros = []
+        for empleado_id, fecha, entrada_m, salida_m, entrada_t, salida_t in asistencia_repo.get_horas_reales(
+                empresa_id, inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')):
+            if empleado_id not in nombres:
+                continue
+            registros.append({
+                "empleado_id": empleado_id,
+                "nombre": nombres[empleado_id],
+                "fecha": fecha,
+                "entrada_manana_real": str(entrada_m) if entrada_m else None,
+                "salida_manana_real": str(salida_m) if salida_m else None,
+                "entrada_tarde_real": str(entrada_t) if entrada_t else None,
+                "salida_tarde_real": str(salida_t) if salida_t else None
+            })
+        registros.sort(key=lambda r: (r["nombre"], r["fecha"]))
+        return jsonify({
+            "empresa_id": empresa_id,
+            "fecha_inicio": inicio.strftime('%Y-%m-%d'),
+            "fecha_fin": fin.strftime('%Y-%m-%d'),
+            "registros": registros
+        })
+
+    except Exception as e:
+        print(f"Error en api_get_asistencias_empresa: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/asistencias/<int:empleado_id>')
 def api_get_asistencia_empleado(empleado_id):
     """Obtiene asistencia de un empleado en una fecha específica"""
@@ -375,9 +734,6 @@ def api_get_asistencia_empleado(empleado_id):
         print(f"Error en api_get_asistencia_empleado: {e}")
         return jsonify({"error": str(e)}), 500
 
-# Asegúrate de tener este import arriba (normalmente ya lo tienes en app.py)
-from types import SimpleNamespace 
-
 @app.route('/api/reports/export/excel')
 def export_report_excel():
     try:
@@ -389,242 +745,27 @@ def export_report_excel():
             flash('Empresa ID requerido', 'error')
             return redirect(url_for('reports'))
         
-        # 1. Obtener empleados y rango de fechas
-        empleados = empleado_repo.get_by_empresa_id(empresa_id)
-        _, last_day = calendar.monthrange(anio, mes)
-        
-        # 2. CONEXIÓN RÁPIDA (BATCH)
-        from src.infrastructure.mysql_connection import get_connection
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Traemos todo de una vez
-        query_batch = """
-            SELECT 
-                a.empleado_id, 
-                DATE(a.fecha) as fecha_dia,
-                a.entrada_manana_real, 
-                a.salida_manana_real, 
-                a.entrada_tarde_real, 
-                a.salida_tarde_real
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE e.empresa_id = %s 
-              AND YEAR(a.fecha) = %s 
-              AND MONTH(a.fecha) = %s
-        """
-        cursor.execute(query_batch, (empresa_id, anio, mes))
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # 3. PROCESAMIENTO Y CACHÉ
-        asistencia_cache = {}
-        
-        def convertir_tiempo(valor):
-            if isinstance(valor, timedelta):
-                return (datetime.min + valor).time()
-            return valor
-
-        for row in rows:
-            emp_id, fecha_dt, ent_m, sal_m, ent_t, sal_t = row
-            key = (emp_id, str(fecha_dt))
-            
-            asistencia_obj = SimpleNamespace(
-                entrada_manana_real=convertir_tiempo(ent_m),
-                salida_manana_real=convertir_tiempo(sal_m),
-                entrada_tarde_real=convertir_tiempo(ent_t),
-                salida_tarde_real=convertir_tiempo(sal_t)
-            )
-            asistencia_cache[key] = asistencia_obj
-
-        # 4. GENERACIÓN DEL EXCEL
-        output = BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte Diario"
-        
-        # Estilos Generales
-        header_font = Font(bold=True)
-        header_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-        alignment_center = Alignment(horizontal="center", vertical="center")
-        thin_border = Border(
-            left=Side(style='thin'), right=Side(style='thin'),
-            top=Side(style='thin'), bottom=Side(style='thin')
-        )
-
-        # coores para dfeciar 
-        # Color Rojo suave para Feriados
-        feriado_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid") 
-        # Color Naranja/Amarillo suave para Domingos
-        domingo_fill = PatternFill(start_color="0070C0", end_color="0070C0", fill_type="solid") 
-
-        # LISTA DE FERIADOS PERÚ 2026 (Sector Privado)
-        lista_feriados = [
-            f"{anio}-01-01", # Año Nuevo
-            f"{anio}-04-02", # Jueves Santo
-            f"{anio}-04-03", # Viernes Santo
-            f"{anio}-05-01", # Día del Trabajo
-            f"{anio}-06-07", # Batalla de Arica y Día de la Bandera
-            f"{anio}-06-29", # San Pedro y San Pablo
-            f"{anio}-07-23", # Día de la Fuerza Aérea del Perú
-            f"{anio}-07-28", # Fiestas Patrias
-            f"{anio}-07-29", # Fiestas Patrias
-            f"{anio}-08-06", # Batalla de Junín
-            f"{anio}-08-30", # Santa Rosa de Lima
-            f"{anio}-10-08", # Combate de Angamos
-            f"{anio}-11-01", # Día de Todos los Santos
-            f"{anio}-12-08", # Inmaculada Concepción
-            f"{anio}-12-09", # Batalla de Ayacucho
-            f"{anio}-12-25", # Navidad
-        ]
-        
-        fila_actual = 1
-        
-        for empleado in empleados:
-            ws.merge_cells(start_row=fila_actual, start_column=1, end_row=fila_actual, end_column=10)
-            titulo_cell = ws.cell(row=fila_actual, column=1, value=f"EMPLEADO: {empleado.nombre.upper()}")
-            titulo_cell.font = Font(bold=True, size=14)
-            titulo_cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            titulo_cell.alignment = Alignment(horizontal="center", vertical="center")
-            fila_actual += 1
-            
-            headers = ['DIA', 'ENTRADA_MANANA', 'SALIDA_MANANA', 'TOTAL_MANANA', 
-                      'ENTRADA_TARDE', 'SALIDA_TARDE', 'TOTAL_TARDE', 'TOTAL_DIA', 'HORAS_NORMALES', 'HORAS_EXTRAS']
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=fila_actual, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = alignment_center
-                cell.border = thin_border
-            fila_actual += 1
-            
-            total_manana_minutos = 0
-            total_tarde_minutos = 0
-            total_horas_extras_mes = 0
-            
-            dias_del_mes = calendar.monthrange(anio, mes)[1]
-            
-            for dia in range(1, dias_del_mes + 1):
-                fecha_str = f"{anio}-{mes:02d}-{dia:02d}"
-                fecha_dt = datetime(anio, mes, dia)
-                
-                # DETECTAR SI ES DOMINGO O FERIADO
-                es_domingo = (fecha_dt.weekday() == 6)
-                es_feriado = (fecha_str in lista_feriados)
-                
-                # Buscamos en el caché
-                asistencia = asistencia_cache.get((empleado.id, fecha_str))
-                
-                if asistencia:
-                    total_manana = ""
-                    if asistencia.entrada_manana_real and asistencia.salida_manana_real:
-                        minutos_manana = int((asistencia.salida_manana_real.hour * 60 + asistencia.salida_manana_real.minute) - 
-                                           (asistencia.entrada_manana_real.hour * 60 + asistencia.entrada_manana_real.minute))
-                        total_manana = minutos_a_hhmm(max(0, minutos_manana))
-                        h, m = map(int, total_manana.split(":"))
-                        total_manana_minutos += h * 60 + m
-                    
-                    total_tarde = ""
-                    if asistencia.entrada_tarde_real and asistencia.salida_tarde_real:
-                        minutos_tarde = int((asistencia.salida_tarde_real.hour * 60 + asistencia.salida_tarde_real.minute) - 
-                                          (asistencia.entrada_tarde_real.hour * 60 + asistencia.entrada_tarde_real.minute))
-                        total_tarde = minutos_a_hhmm(max(0, minutos_tarde))
-                        h, m = map(int, total_tarde.split(":"))
-                        total_tarde_minutos += h * 60 + m
-                    
-                    total_dia_minutos = 0
-                    if total_manana:
-                        h, m = map(int, total_manana.split(":"))
-                        total_dia_minutos += h * 60 + m
-                    if total_tarde:
-                        h, m = map(int, total_tarde.split(":"))
-                        total_dia_minutos += h * 60 + m
-                    total_dia = minutos_a_hhmm(total_dia_minutos)
-                    
-                    minutos_normales_dia = min(total_dia_minutos, 8 * 60)
-                    minutos_extras_dia = max(0, total_dia_minutos - (8 * 60))
-                    
-                    total_horas_extras_mes += minutos_extras_dia
-                    
-                    horas_normales_dia = minutos_a_hhmm(minutos_normales_dia)
-                    horas_extras_dia = minutos_a_hhmm(minutos_extras_dia)
-                    
-                    valores = [
-                        dia,
-                        str(asistencia.entrada_manana_real) if asistencia.entrada_manana_real else "",
-                        str(asistencia.salida_manana_real) if asistencia.salida_manana_real else "",
-                        total_manana,
-                        str(asistencia.entrada_tarde_real) if asistencia.entrada_tarde_real else "",
-                        str(asistencia.salida_tarde_real) if asistencia.salida_tarde_real else "",
-                        total_tarde,
-                        total_dia,
-                        horas_normales_dia,
-                        horas_extras_dia
-                    ]
-                else:
-                    valores = [dia, "", "", "", "", "", "", "", "", ""]
-                
-                # PINTAR CELDAS
-                for col, valor in enumerate(valores, 1):
-                    cell = ws.cell(row=fila_actual, column=col, value=valor)
-                    cell.border = thin_border
-                    
-                    if col == 1:
-                        cell.alignment = Alignment(horizontal="center")
-                    
-                    # 🔥 LÓGICA DE COLORES ACTUALIZADA 🔥
-                    if es_feriado:
-                        # Prioridad 1: Feriado (Rojo)
-                        cell.fill = feriado_fill
-                    elif es_domingo:
-                        # Prioridad 2: Domingo (Naranja/Amarillo)
-                        cell.fill = domingo_fill
-
-                fila_actual += 1
-            
-            # Totales finales (Igual que siempre)
-            total_manana_mes = minutos_a_hhmm(total_manana_minutos)
-            total_tarde_mes = minutos_a_hhmm(total_tarde_minutos)
-            total_dia_mes = minutos_a_hhmm(total_manana_minutos + total_tarde_minutos)
-
-            total_minutos_mes = total_manana_minutos + total_tarde_minutos
-            minutos_normales_mes = total_minutos_mes - total_horas_extras_mes
-            minutos_extras_mes = total_horas_extras_mes
-
-            horas_normales_mes = minutos_a_hhmm(minutos_normales_mes)
-            horas_extras_mes = minutos_a_hhmm(minutos_extras_mes)
-            
-            valores_totales = [
-                "TOTAL MES", "", "", total_manana_mes, "", "", total_tarde_mes,
-                total_dia_mes, horas_normales_mes, horas_extras_mes
-            ]
-            for col, valor in enumerate(valores_totales, 1):
-                cell = ws.cell(row=fila_actual, column=col, value=valor)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-                cell.border = thin_border
-                if col == 1:
-                    cell.alignment = Alignment(horizontal="center")
-            fila_actual += 2
-        
-        # Ajuste de ancho de columnas
-        column_widths = [8, 15, 15, 15, 15, 15, 15, 15, 15, 15]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-        
-        wb.save(output)
-        output.seek(0)
-        
-        nombre_empresa = empresa_repo.get_by_id(empresa_id).nombre.replace(' ', '_') if empresa_repo.get_by_id(empresa_id) else 'empresa'
-        nombre_archivo = f"reporte_diario_{nombre_empresa}_{mes}_{anio}.xlsx"
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=nombre_archivo
-        )
+        # Una consulta liviana da la versión de los datos del mes: es el ETag y la clave del artefacto
+        solicitud = exportador_excel.preparar(empresa_id, anio, mes)
+        if solicitud.etag in request.if_none_match:
+            respuesta = Response(status=304)
+        else:
+            ruta = exportador_excel.en_cache(solicitud)
+            if ruta:
+                respuesta = send_file(ruta, mimetype=MIMETYPE_XLSX, as_attachment=True,
+                                      download_name=solicitud.nombre_archivo, conditional=True)
+            else:
+                # Las filas se escriben ahora (a un temporal, con estilos compartidos); el .xlsx se
+                # comprime y se envía al cliente por partes mientras se guarda en la caché
+                respuesta = Response(
+                    exportador_excel.generar(solicitud),
+                    mimetype=MIMETYPE_XLSX,
+                    headers={'Content-Disposition': cabecera_descarga(solicitud.nombre_archivo)}
+                )
+        respuesta.set_etag(solicitud.etag)
+        # El navegador puede guardarlo, pero revalida siempre (responde 304 si no cambió)
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
         
     except Exception as e:
         print(f"ERROR CRÍTICO EXPORT EXCEL: {str(e)}")
@@ -633,6 +774,133 @@ def export_report_excel():
         flash(f'Error generando reporte Excel: {str(e)}', 'error')
         return redirect(url_for('reports'))
 
+@app.route('/api/reports/export/bulk')
+def export_reports_bulk():
+    """
+    ZIP con un Excel por empresa y mes (cierre de planilla). Parámetros: empresa_id (repetible;
+    sin él, todas), desde / hasta (YYYY-MM) y lote (id opcional para consultar el progreso).
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    try:
+        empresas = {empresa.id: empresa for empresa in empresa_repo.get_all()}
+        empresa_ids = request.args.getlist('empresa_id', type=int) or sorted(empresas)
+        desconocidas = [empresa_id for empresa_id in empresa_ids if empresa_id not in empresas]
+        if desconocidas:
+            return jsonify({"error": f"Empresas no encontradas: {desconocidas}"}), 400
+
+        desde = request.args.get('desde') or datetime.now().strftime('%Y-%m')
+        hasta = request.args.get('hasta') or desde
+        try:
+            meses = meses_entre(desde, hasta)
+        except ValueError:
+            return jsonify({"error": "Rango de meses inválido (desde / hasta en formato YYYY-MM)"}), 400
+
+        trabajos = [(empresa_id, anio, mes) for anio, mes in meses for empresa_id in empresa_ids]
+        if len(trabajos) > exportador_masivo.max_libros:
+            return jsonify({"error": f"Demasiados reportes en un pedido ({len(trabajos)}); "
+                                     f"máximo {exportador_masivo.max_libros}"}), 400
+        try:
+            lote = exportador_masivo.crear_lote(len(trabajos), request.args.get('lote'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return Response(
+            exportador_masivo.transmitir(lote, trabajos),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': cabecera_descarga(f"reportes_{desde}_a_{hasta}.zip"),
+                'X-Export-Id': lote.id,
+            }
+        )
+    except Exception as e:
+        print(f"Error en export_reports_bulk: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reports/export/bulk/<lote_id>')
+def export_reports_bulk_progress(lote_id):
+    """Avance de un export masivo: libros completados, fallidos y estado"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    progreso = exportador_masivo.progreso(lote_id)
+    if progreso is None:
+        return jsonify({"error": "Lote no encontrado"}), 404
+    return jsonify(progreso)
+
+def _periodo_cierre_desde_request():
+    """(empresa_id, anio, mes) del JSON de cierre / reapertura; ValueError si falta o no es válido"""
+    data = request.get_json(silent=True) or {}
+    try:
+        empresa_id, anio, mes = int(data['empresa_id']), int(data['anio']), int(data['mes'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("empresa_id, anio y mes requeridos")
+    if not 1 <= mes <= 12:
+        raise ValueError(f"mes inválido: {mes}")
+    if empresa_repo.get_by_id(empresa_id) is None:
+        raise ValueError(f"Empresa {empresa_id} no encontrada")
+    return empresa_id, anio, mes
+
+def _mes_cierre_modificado(empresa_id, anio, mes):
+    """El mes cambió de fuente (foto del cierre / ASISTENCIA): reportes en caché y Excel del mes"""
+    if cache_reportes is not None:
+        cache_reportes.invalidar(empresa_id, f"{anio}-{mes:02d}-01")
+
+    def pregenerar():
+        try:
+            exportador_excel.pregenerar_empresa(empresa_id, anio, mes)
+        except Exception as e:
+            print(f"❌ Error pregenerando el Excel de {mes:02d}/{anio} (empresa {empresa_id}): {e}")
+
+    threading.Thread(target=pregenerar, name="pregenerar-cierre", daemon=True).start()
+
+@app.route('/api/reports/close-month', methods=['POST'])
+def api_close_month():
+    """Cierra (o vuelve a cerrar, reconstruyendo la foto) un mes terminado de una empresa"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    try:
+        empresa_id, anio, mes = _periodo_cierre_desde_request()
+        cierre = close_month_use_case.cerrar(empresa_id, anio, mes, session.get('admin_nombre'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error en api_close_month: {e}")
+        return jsonify({"error": str(e)}), 500
+    _mes_cierre_modificado(empresa_id, anio, mes)
+    print(f"🔒 Mes {mes:02d}/{anio} cerrado (empresa {empresa_id}): {cierre['empleados']} empleados")
+    return jsonify(cierre)
+
+@app.route('/api/reports/reopen-month', methods=['POST'])
+def api_reopen_month():
+    """Reabre un mes cerrado: sus reportes vuelven a leer ASISTENCIA hasta que se cierre de nuevo"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    try:
+        empresa_id, anio, mes = _periodo_cierre_desde_request()
+        if not close_month_use_case.reabrir(empresa_id, anio, mes):
+            return jsonify({"error": f"El mes {mes:02d}/{anio} no está cerrado"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error en api_reopen_month: {e}")
+        return jsonify({"error": str(e)}), 500
+    _mes_cierre_modificado(empresa_id, anio, mes)
+    print(f"🔓 Mes {mes:02d}/{anio} reabierto (empresa {empresa_id})")
+    return jsonify({"empresa_id": empresa_id, "anio": anio, "mes": mes, "cerrado": False})
+
+@app.route('/api/reports/closed-months')
+def api_closed_months():
+    """Meses cerrados de una empresa"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    empresa_id = request.args.get('empresa_id', type=int)
+    if not empresa_id:
+        return jsonify({"error": "empresa_id requerido"}), 400
+    try:
+        return jsonify(close_month_use_case.meses_cerrados(empresa_id))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/admin/generate_qr/<int:empleado_id>')
 def generate_employee_qr(empleado_id):
     if not session.get('admin_logged_in'):
@@ -660,6 +928,162 @@ def generate_employee_qr(empleado_id):
     
     return redirect(url_for('admin_list_employees'))
 
+@app.route('/admin/db-pool-stats')
+def admin_db_pool_stats():
+    """Estado del pool de conexiones MySQL (uso, desbordes y esperas)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(db_connection.get_pool_stats())
+
+@app.route('/metrics')
+def metrics_prometheus():
+    """Métricas en formato de texto de Prometheus (Bearer METRICS_TOKEN o sesión de admin)"""
+    token = os.getenv('METRICS_TOKEN')
+    autorizado = session.get('admin_logged_in') or (
+        token and request.headers.get('Authorization') == f"Bearer {token}"
+    )
+    if not autorizado:
+        return jsonify({"error": "No autorizado"}), 401
+    return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Vista JSON de las métricas: percentiles por ruta y sentencias más costosas"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(metricas.get_stats())
+
+
+@app.route('/admin/db-statement-stats')
+def admin_db_statement_stats():
+    """Ejecuciones y tiempo acumulado por sentencia preparada"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(db_connection.get_statement_stats())
+
+
+@app.route('/admin/scan-dedup-stats')
+def admin_scan_dedup_stats():
+    """Aciertos de la ventana anti-duplicado y lecturas a ESCANEOS_TRACKING evitadas"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(ventana_duplicados.get_stats())
+
+@app.route('/admin/tracking-write-behind-stats')
+def admin_tracking_write_behind_stats():
+    """Estado del buffer de escritura diferida de ESCANEOS_TRACKING"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if tracking_write_behind is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(tracking_write_behind.get_stats(), enabled=True))
+
+@app.route('/admin/employee-cache-stats')
+def admin_employee_cache_stats():
+    """Hit ratio y memoria de la caché de empleados"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if cache_empleados is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(cache_empleados.get_stats(), enabled=True))
+
+
+@app.route('/admin/qr-index-stats')
+def admin_qr_index_stats():
+    """Generación y tamaño del índice QR compartido"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(indice_qr.get_stats())
+
+
+@app.route('/admin/qr-filter-stats')
+def admin_qr_filter_stats():
+    """Escaneos rechazados por el filtro de códigos válidos"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if filtro_qr is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(filtro_qr.get_stats(), enabled=True))
+
+
+@app.route('/admin/daily-summary-stats')
+def admin_daily_summary_stats():
+    """Claves pendientes y recálculos del agregado diario del reporte semanal"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    return jsonify(resumen_diario.get_stats())
+
+@app.route('/admin/report-artifacts-stats')
+def admin_report_artifacts_stats():
+    """Aciertos, tamaño y expulsiones de la caché de Excel generados"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if artefactos_reportes is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(artefactos_reportes.get_stats(), enabled=True))
+
+@app.route('/admin/report-cache-stats')
+def admin_report_cache_stats():
+    """Aciertos, invalidaciones y tamaño de la caché de reportes JSON"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if cache_reportes is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(cache_reportes.get_stats(), enabled=True))
+
+@app.route('/api/today-board')
+def api_today_board():
+    """Conteos y filas de hoy (de una empresa o de todas) desde el tablero en memoria"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if tablero_hoy is None:
+        return jsonify({"error": "Tablero del día desactivado"}), 404
+    empresa_id = request.args.get('empresa_id', type=int)
+    try:
+        fecha = tablero_hoy.fecha()
+        respuesta = {
+            "fecha": fecha.strftime('%Y-%m-%d'),
+            "empresa_id": empresa_id,
+            "conteos": tablero_hoy.conteos(empresa_id)
+        }
+        if request.args.get('filas', '1') != '0':
+            respuesta["filas"] = [fila_como_dict(fila) for fila in tablero_hoy.filas(empresa_id)]
+        return jsonify(respuesta)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route('/admin/today-board-check', methods=['GET', 'POST'])
+def admin_today_board_check():
+    """Compara el tablero del día con ASISTENCIA; con POST además lo repara"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if tablero_hoy is None:
+        return jsonify({"error": "Tablero del día desactivado"}), 404
+    try:
+        return jsonify(tablero_hoy.verificar(reparar=request.method == 'POST'))
+    except Exception as e:
+        print(f"❌ Error verificando el tablero del día: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/admin/today-board-stats')
+def admin_today_board_stats():
+    """Siembras, actualizaciones y tamaño del tablero del día"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if tablero_hoy is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(tablero_hoy.get_stats(), enabled=True))
+
+@app.route('/admin/scan-feed-stats')
+def admin_scan_feed_stats():
+    """Eventos publicados y entregados y conexiones en espera del feed de escaneos"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+    if difusor_escaneos is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(difusor_escaneos.get_stats(), enabled=True))
+
 @app.errorhandler(404)
 def not_found(error):
     return render_template('error.html', error_message="Página no encontrada"), 404
@@ -685,101 +1109,49 @@ def admin_weekly_report():
     empresas = list_companies_use_case.execute()
     return render_template('weekly_report.html', empresas=empresas)
 
+def _reporte_semanal_desde_request():
+    """Motor semanal para el rango del request: fecha_inicio/fecha_fin o la semana desplazada"""
+    empresa_id = request.args.get('empresa_id', type=int)
+    fecha_inicio = request.args.get('fecha_inicio')
+    fecha_fin = request.args.get('fecha_fin')
+
+    if fecha_inicio and fecha_fin:
+        inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+        fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+    else:
+        inicio, fin = rango_semana(request.args.get('semana', type=int, default=0))
+
+    return weekly_report_use_case.execute(inicio, fin, empresa_id)
+
+@app.route('/api/weekly-report/bundle')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
+def api_weekly_report_bundle():
+    """Todos los widgets del dashboard semanal en una sola llamada (cada fuente se lee una vez)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "No autorizado"}), 401
+
+    try:
+        return jsonify(_reporte_semanal_desde_request().bundle())
+
+    except Exception as e:
+        import traceback
+        print(f"❌ Error en bundle: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/weekly-report/daily-attendance')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_daily_attendance():
-    """Asistencia diaria - MODIFICADO"""
+    """Asistencia diaria (vista del motor semanal)"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
+    if not request.args.get('fecha_inicio') or not request.args.get('fecha_fin'):
+        return jsonify({"error": "Fechas requeridas"}), 400
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            return jsonify({"error": "Fechas requeridas"}), 400
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        dias_labels = []
-        asistencias_data = []
-        tardanzas_data = []
-        faltas_data = []
-        
-        # Total empleados
-        if empresa_id:
-            cursor.execute("SELECT COUNT(*) FROM EMPLEADOS WHERE empresa_id = %s AND activo = TRUE", (empresa_id,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM EMPLEADOS WHERE activo = TRUE")
-        total_empleados = cursor.fetchone()[0]
-        
-        # Iterar días
-        fecha_actual = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-        fecha_final = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-        
-        while fecha_actual <= fecha_final:
-            if fecha_actual > datetime.now().date():
-                break
-            
-            dia_str = fecha_actual.strftime('%Y-%m-%d')
-            
-            dias_semana_es = {
-                'Monday': 'Lun', 'Tuesday': 'Mar', 'Wednesday': 'Mié',
-                'Thursday': 'Jue', 'Friday': 'Vie', 'Saturday': 'Sáb', 'Sunday': 'Dom'
-            }
-            dia_nombre = dias_semana_es.get(fecha_actual.strftime('%A'), fecha_actual.strftime('%A')[:3])
-            dias_labels.append(f"{dia_nombre} {fecha_actual.day}")
-            
-            empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-            params = [dia_str]
-            if empresa_id:
-                params.append(empresa_id)
-            
-            # Asistencias (empleados únicos)
-            cursor.execute(f"""
-                SELECT COUNT(DISTINCT a.empleado_id)
-                FROM ASISTENCIA a
-                JOIN EMPLEADOS e ON a.empleado_id = e.id
-                WHERE a.fecha = %s
-                  AND (a.entrada_manana_real IS NOT NULL OR a.entrada_tarde_real IS NOT NULL)
-                  {empresa_filter}
-            """, params)
-            asistencias = cursor.fetchone()[0]
-            asistencias_data.append(asistencias)
-            
-            # 🔥 Tardanzas (contar turnos con tardanza)
-            cursor.execute(f"""
-                SELECT 
-                    (COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL 
-                                AND TIME(a.entrada_manana_real) > '06:50:59' THEN 1 END) +
-                     COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL 
-                                AND TIME(a.entrada_tarde_real) > '14:50:59' THEN 1 END))
-                FROM ASISTENCIA a
-                JOIN EMPLEADOS e ON a.empleado_id = e.id
-                WHERE a.fecha = %s
-                  {empresa_filter}
-            """, params)
-            tardanzas = cursor.fetchone()[0] or 0
-            tardanzas_data.append(tardanzas)
-            
-            faltas = total_empleados - asistencias
-            faltas_data.append(faltas)
-            
-            fecha_actual += timedelta(days=1)
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "dias": dias_labels,
-            "asistencias": asistencias_data,
-            "tardanzas": tardanzas_data,
-            "faltas": faltas_data
-        })
-        
+        return jsonify(_reporte_semanal_desde_request().daily_attendance())
+
     except Exception as e:
         import traceback
         print(f"❌ Error en daily-attendance: {e}")
@@ -787,124 +1159,17 @@ def api_weekly_report_daily_attendance():
         return jsonify({"error": str(e)}), 500
 #HOLIIIIIIIII
 @app.route('/api/weekly-report/daily-attendance-details')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_daily_attendance_details():
     """Detalles de asistencia diaria CON NOMBRES para tooltips"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
 
-    try:
-        from src.infrastructure.mysql_connection import get_connection
-
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
+    if not request.args.get('fecha_inicio') or not request.args.get('fecha_fin'):
+        return jsonify({"error": "Fechas requeridas"}), 400
 
-        if not fecha_inicio or not fecha_fin:
-            return jsonify({"error": "Fechas requeridas"}), 400
-
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-
-        # Total empleados activos
-        if empresa_id:
-            cursor.execute("SELECT id, nombre FROM EMPLEADOS WHERE empresa_id = %s AND activo = TRUE", (empresa_id,))
-        else:
-            cursor.execute("SELECT id, nombre FROM EMPLEADOS WHERE activo = TRUE")
-
-        todos_empleados = {row[0]: row[1] for row in cursor.fetchall()}
-
-        resultado = {}
-
-        # Iterar días
-        fecha_actual = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-        fecha_final = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-
-        while fecha_actual <= fecha_final:
-            if fecha_actual > datetime.now().date():
-                break
-
-            dia_str = fecha_actual.strftime('%Y-%m-%d')
-
-            params = [dia_str]
-            if empresa_id:
-                params.append(empresa_id)
-
-            # 🔥 Obtener TODOS los registros del día con nombres
-            cursor.execute(f"""
-                SELECT 
-                    e.id,
-                    e.nombre,
-                    TIME(a.entrada_manana_real) as entrada_manana,
-                    TIME(a.entrada_tarde_real) as entrada_tarde
-                FROM EMPLEADOS e
-                LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id AND a.fecha = %s
-                WHERE e.activo = TRUE {empresa_filter}
-                ORDER BY e.nombre
-            """, params)
-
-            registros = cursor.fetchall()
-
-            puntuales = []
-            tardes_manana = []
-            tardes_tarde = []
-            faltas = []
-
-            for empleado_id, nombre, entrada_manana, entrada_tarde in registros:
-                # Si NO tiene ningún registro
-                if entrada_manana is None and entrada_tarde is None:
-                    faltas.append(nombre)
-                    continue
-
-                # 🕕 Verificar mañana
-                if entrada_manana:
-                    # Convertir timedelta a time si es necesario
-                    if isinstance(entrada_manana, timedelta):
-                        entrada_manana = (datetime.min + entrada_manana).time()
-
-                    hora_manana = entrada_manana.strftime('%H:%M:%S')
-                    if entrada_manana <= datetime.strptime('06:50:59', '%H:%M:%S').time():
-                        puntuales.append(f"{nombre} (M)")
-                    else:
-                        tardes_manana.append(f"{nombre} ({hora_manana})")
-
-                # 🌇 Verificar tarde
-                if entrada_tarde:
-                    if isinstance(entrada_tarde, timedelta):
-                        entrada_tarde = (datetime.min + entrada_tarde).time()
-
-                    hora_tarde = entrada_tarde.strftime('%H:%M:%S')
-                    if entrada_tarde <= datetime.strptime('14:50:59', '%H:%M:%S').time():
-                        if f"{nombre} (M)" not in puntuales:
-                            puntuales.append(f"{nombre} (T)")
-                    else:
-                        tardes_tarde.append(f"{nombre} ({hora_tarde})")
-
-            # 🗓️ Etiqueta del día (Lun, Mar, Mié, etc.)
-            dias_semana_es = {
-                'Monday': 'Lun', 'Tuesday': 'Mar', 'Wednesday': 'Mié',
-                'Thursday': 'Jue', 'Friday': 'Vie', 'Saturday': 'Sáb', 'Sunday': 'Dom'
-            }
-            dia_nombre = dias_semana_es.get(fecha_actual.strftime('%A'), fecha_actual.strftime('%A')[:3])
-            label = f"{dia_nombre} {fecha_actual.day}"
-
-            resultado[label] = {
-                "puntuales": puntuales,
-                "tardes_manana": tardes_manana,
-                "tardes_tarde": tardes_tarde,
-                "faltas": faltas,
-                "total_asistencias": len(todos_empleados) - len(faltas),
-                "total_tardanzas": len(tardes_manana) + len(tardes_tarde),
-                "total_faltas": len(faltas)
-            }
-
-            fecha_actual += timedelta(days=1)
-
-        cursor.close()
-        conn.close()
-
-        return jsonify(resultado)
+    try:
+        return jsonify(_reporte_semanal_desde_request().daily_attendance_details())
 
     except Exception as e:
         import traceback
@@ -920,73 +1185,18 @@ def api_weekly_report_daily_attendance_details():
 # ========================================
 
 @app.route('/api/weekly-report/frequent-hours')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_frequent_hours():
-    """Horas frecuentes - MEJORADO: hora exacta más común"""
+    """Horas frecuentes: hora exacta más común"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
+    if not request.args.get('fecha_inicio') or not request.args.get('fecha_fin'):
+        return jsonify({"error": "Fechas requeridas"}), 400
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            return jsonify({"error": "Fechas requeridas"}), 400
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
-        
-        # 🔥 Hora mañana exacta (HH:MM)
-        cursor.execute(f"""
-            SELECT TIME_FORMAT(a.entrada_manana_real, '%H:%i') as hora, COUNT(*) as freq
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              AND a.entrada_manana_real IS NOT NULL
-              {empresa_filter}
-            GROUP BY hora
-            ORDER BY freq DESC
-            LIMIT 1
-        """, params)
-        
-        result_manana = cursor.fetchone()
-        hora_frecuente_manana = result_manana[0] if result_manana else "N/A"
-        frecuencia_manana = result_manana[1] if result_manana else 0
-        
-        # 🔥 Hora tarde exacta (HH:MM)
-        cursor.execute(f"""
-            SELECT TIME_FORMAT(a.entrada_tarde_real, '%H:%i') as hora, COUNT(*) as freq
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              AND a.entrada_tarde_real IS NOT NULL
-              {empresa_filter}
-            GROUP BY hora
-            ORDER BY freq DESC
-            LIMIT 1
-        """, params)
-        
-        result_tarde = cursor.fetchone()
-        hora_frecuente_tarde = result_tarde[0] if result_tarde else "N/A"
-        frecuencia_tarde = result_tarde[1] if result_tarde else 0
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "hora_frecuente_manana": hora_frecuente_manana,
-            "frecuencia_manana": frecuencia_manana,
-            "hora_frecuente_tarde": hora_frecuente_tarde,
-            "frecuencia_tarde": frecuencia_tarde
-        })
-        
+        return jsonify(_reporte_semanal_desde_request().frequent_hours())
+
     except Exception as e:
         import traceback
         print(f"❌ Error en frequent-hours: {e}")
@@ -994,6 +1204,7 @@ def api_weekly_report_frequent_hours():
         return jsonify({"error": str(e)}), 500
     
 @app.route('/api/weekly-report/top-punctual-morning')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_top_punctual_morning():
     """Top puntuales turno mañana - BASADO EN HORA REAL"""
     if not session.get('admin_logged_in'):
@@ -1010,35 +1221,10 @@ def api_weekly_report_top_punctual_morning():
             return jsonify({"error": "Fechas requeridas"}), 400
         
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
+        cursor = conn.cursor_preparado()
         
-        # Hora real <= 06:50:59
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                COUNT(CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL 
-                         AND TIME(a.entrada_manana_real) <= '06:50:59'
-                    THEN 1 
-                END) as puntualidades,
-                COUNT(CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL 
-                    THEN 1 
-                END) as total_ingresos
-            FROM EMPLEADOS e
-            LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING puntualidades > 0
-            ORDER BY puntualidades DESC, total_ingresos DESC
-            LIMIT 5
-        """, params)
+        # Sin retraso según el horario de la empresa (minutos guardados al marcar)
+        cursor.execute(*consulta_top_turno('manana', False, fecha_inicio, fecha_fin, empresa_id))
         
         result = []
         for row in cursor.fetchall():
@@ -1060,6 +1246,7 @@ def api_weekly_report_top_punctual_morning():
 
 
 @app.route('/api/weekly-report/top-punctual-afternoon')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_top_punctual_afternoon():
     """Top puntuales turno tarde - BASADO EN HORA REAL"""
     if not session.get('admin_logged_in'):
@@ -1076,35 +1263,10 @@ def api_weekly_report_top_punctual_afternoon():
             return jsonify({"error": "Fechas requeridas"}), 400
         
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
+        cursor = conn.cursor_preparado()
         
-        #  Hora real <= 14:50:59
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                COUNT(CASE 
-                    WHEN a.entrada_tarde_real IS NOT NULL 
-                         AND TIME(a.entrada_tarde_real) <= '14:50:59'
-                    THEN 1 
-                END) as puntualidades,
-                COUNT(CASE 
-                    WHEN a.entrada_tarde_real IS NOT NULL 
-                    THEN 1 
-                END) as total_ingresos
-            FROM EMPLEADOS e
-            LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING puntualidades > 0
-            ORDER BY puntualidades DESC, total_ingresos DESC
-            LIMIT 5
-        """, params)
+        # Sin retraso según el horario de la empresa (minutos guardados al marcar)
+        cursor.execute(*consulta_top_turno('tarde', False, fecha_inicio, fecha_fin, empresa_id))
         
         result = []
         for row in cursor.fetchall():
@@ -1126,6 +1288,7 @@ def api_weekly_report_top_punctual_afternoon():
 
 
 @app.route('/api/weekly-report/top-late-morning')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_top_late_morning():
     """Top tardones turno mañana - BASADO EN HORA REAL"""
     if not session.get('admin_logged_in'):
@@ -1142,35 +1305,10 @@ def api_weekly_report_top_late_morning():
             return jsonify({"error": "Fechas requeridas"}), 400
         
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
+        cursor = conn.cursor_preparado()
         
-        #  Hora real > 06:50:59
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                COUNT(CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL 
-                         AND TIME(a.entrada_manana_real) > '06:50:59'
-                    THEN 1 
-                END) as tardanzas,
-                COUNT(CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL 
-                    THEN 1 
-                END) as total_ingresos
-            FROM EMPLEADOS e
-            INNER JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING tardanzas > 0
-            ORDER BY tardanzas DESC, total_ingresos DESC
-            LIMIT 5
-        """, params)
+        # Con minutos de retraso según el horario de la empresa
+        cursor.execute(*consulta_top_turno('manana', True, fecha_inicio, fecha_fin, empresa_id))
         
         result = []
         for row in cursor.fetchall():
@@ -1192,6 +1330,7 @@ def api_weekly_report_top_late_morning():
 
 
 @app.route('/api/weekly-report/top-late-afternoon')
+@reporte_cacheado(_alcance_fechas, requiere_admin=True)
 def api_weekly_report_top_late_afternoon():
     """Top tardones turno tarde - BASADO EN HORA REAL"""
     if not session.get('admin_logged_in'):
@@ -1208,35 +1347,10 @@ def api_weekly_report_top_late_afternoon():
             return jsonify({"error": "Fechas requeridas"}), 400
         
         conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
+        cursor = conn.cursor_preparado()
         
-        # 🔥 Hora real > 14:50:59
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                COUNT(CASE 
-                    WHEN a.entrada_tarde_real IS NOT NULL 
-                         AND TIME(a.entrada_tarde_real) > '14:50:59'
-                    THEN 1 
-                END) as tardanzas,
-                COUNT(CASE 
-                    WHEN a.entrada_tarde_real IS NOT NULL 
-                    THEN 1 
-                END) as total_ingresos
-            FROM EMPLEADOS e
-            INNER JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING tardanzas > 0
-            ORDER BY tardanzas DESC, total_ingresos DESC
-            LIMIT 5
-        """, params)
+        # Con minutos de retraso según el horario de la empresa
+        cursor.execute(*consulta_top_turno('tarde', True, fecha_inicio, fecha_fin, empresa_id))
         
         result = []
         for row in cursor.fetchall():
@@ -1263,135 +1377,15 @@ def api_weekly_report_top_late_afternoon():
 # ========================================
 
 @app.route('/api/weekly-report/summary')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
 def api_weekly_report_summary():
-    """Resumen general - VERSIÓN MEJORADA con desglose de tardanzas"""
+    """Resumen general con desglose de tardanzas"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            semana_offset = request.args.get('semana', type=int, default=0)
-            hoy = datetime.now().date()
-            inicio_semana = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
-            fin_semana = inicio_semana + timedelta(days=6)
-            fecha_inicio = inicio_semana.strftime('%Y-%m-%d')
-            fecha_fin = fin_semana.strftime('%Y-%m-%d')
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
-        
-        # Total empleados activos
-        if empresa_id:
-            cursor.execute("SELECT COUNT(*) FROM EMPLEADOS WHERE empresa_id = %s AND activo = TRUE", (empresa_id,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM EMPLEADOS WHERE activo = TRUE")
-        total_empleados = cursor.fetchone()[0]
-        
-        # Contar turnos para puntualidad y asistencia
-        cursor.execute(f"""
-            SELECT 
-                (COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL THEN 1 END) + 
-                 COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL THEN 1 END)) as registros_totales,
-                
-                (COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL 
-                            AND TIME(a.entrada_manana_real) <= '06:50:59' THEN 1 END) +
-                 COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL 
-                            AND TIME(a.entrada_tarde_real) <= '14:50:59' THEN 1 END)) as registros_puntuales
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              AND e.activo = TRUE
-              {empresa_filter}
-        """, params)
-        
-        result = cursor.fetchone()
-        registros_totales = result[0] or 0
-        registros_puntuales = result[1] or 0
-        
-        promedio_puntualidad = int((registros_puntuales / registros_totales * 100)) if registros_totales > 0 else 0
-        
-        # Calcular días del período
-        fecha_inicio_dt = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-        fecha_fin_dt = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-        dias_periodo = (fecha_fin_dt - fecha_inicio_dt).days + 1
-        dias_transcurridos = min(dias_periodo, (datetime.now().date() - fecha_inicio_dt).days + 1)
-        if dias_transcurridos < 1:
-            dias_transcurridos = 1
-        
-        # Turnos esperados
-        turnos_esperados = total_empleados * dias_transcurridos * 2
-        porcentaje_asistencia = int((registros_totales / turnos_esperados * 100)) if turnos_esperados > 0 else 0
-        
-        # 🔥 TARDANZAS CON DESGLOSE POR TURNO
-        cursor.execute(f"""
-            SELECT 
-                COUNT(CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL 
-                         AND TIME(a.entrada_manana_real) > '06:50:59'
-                    THEN 1 
-                END) as tardanzas_manana,
-                COUNT(CASE 
-                    WHEN a.entrada_tarde_real IS NOT NULL 
-                         AND TIME(a.entrada_tarde_real) > '14:50:59'
-                    THEN 1 
-                END) as tardanzas_tarde
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              AND e.activo = TRUE
-              {empresa_filter}
-        """, params)
-        
-        result_tardanzas = cursor.fetchone()
-        tardanzas_manana = result_tardanzas[0] or 0
-        tardanzas_tarde = result_tardanzas[1] or 0
-        total_tardanzas = tardanzas_manana + tardanzas_tarde
-        
-        # Total faltas
-        total_faltas = turnos_esperados - registros_totales
-        
-        # Horas extras
-        cursor.execute(f"""
-            SELECT SUM(a.horas_extras)
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              {empresa_filter}
-        """, params)
-        horas_extras = cursor.fetchone()[0] or 0
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "periodo": {
-                "inicio": fecha_inicio,
-                "fin": fecha_fin,
-                "inicio_formato": datetime.strptime(fecha_inicio, '%Y-%m-%d').strftime('%d/%m/%Y'),
-                "fin_formato": datetime.strptime(fecha_fin, '%Y-%m-%d').strftime('%d/%m/%Y')
-            },
-            "total_empleados": total_empleados,
-            "promedio_puntualidad": promedio_puntualidad,
-            "porcentaje_asistencia": porcentaje_asistencia,
-            "total_tardanzas": total_tardanzas,  # 🎯 Total general
-            "tardanzas_manana": tardanzas_manana,  # 📊 Desglose
-            "tardanzas_tarde": tardanzas_tarde,     # 📊 Desglose
-            "total_faltas": total_faltas,
-            "horas_extras": round(horas_extras, 2),
-            "dias_periodo": dias_periodo
-        })
-        
+        return jsonify(_reporte_semanal_desde_request().summary())
+
     except Exception as e:
         import traceback
         print(f"❌ Error en summary: {e}")
@@ -1400,244 +1394,49 @@ def api_weekly_report_summary():
 
 
 @app.route('/api/weekly-report/worst-days')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
 def api_weekly_report_worst_days():
     """Días con menor asistencia"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        semana_offset = request.args.get('semana', type=int, default=0)
-        
-        hoy = datetime.now().date()
-        inicio_semana = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
-        fin_semana = inicio_semana + timedelta(days=6)
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [inicio_semana.strftime('%Y-%m-%d'), fin_semana.strftime('%Y-%m-%d')]
-        if empresa_id:
-            params.append(empresa_id)
-        
-        cursor.execute(f"""
-            SELECT 
-                a.fecha,
-                COUNT(DISTINCT a.empleado_id) as total_asistencias,
-                DAYNAME(a.fecha) as dia_semana
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            WHERE a.fecha BETWEEN %s AND %s
-              AND (a.entrada_manana_real IS NOT NULL OR a.entrada_tarde_real IS NOT NULL)
-              {empresa_filter}
-            GROUP BY a.fecha
-            ORDER BY total_asistencias ASC
-            LIMIT 3
-        """, params)
-        
-        peores_dias = []
-        for row in cursor.fetchall():
-            fecha = row[0]
-            asistencias = row[1]
-            dia_semana = row[2]
-            
-            dias_traduccion = {
-                'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
-                'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-            }
-            dia_es = dias_traduccion.get(dia_semana, dia_semana)
-            
-            peores_dias.append({
-                "fecha": fecha.strftime('%d/%m/%Y'),
-                "dia": dia_es,
-                "asistencias": asistencias
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(peores_dias)
-        
+        return jsonify(_reporte_semanal_desde_request().worst_days())
+
     except Exception as e:
         import traceback
-        print(f"Error en worst days: {e}")
+        print(f"❌ Error en worst days: {e}")
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/weekly-report/companies-comparison')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
 def api_weekly_report_companies_comparison():
     """Comparación entre empresas"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        semana_offset = request.args.get('semana', type=int, default=0)
-        
-        hoy = datetime.now().date()
-        inicio_semana = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
-        fin_semana = inicio_semana + timedelta(days=6)
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Si hay empresa seleccionada, solo mostrar esa
-        if empresa_id:
-            cursor.execute("""
-                SELECT 
-                    emp.id,
-                    emp.nombre,
-                    COUNT(DISTINCT e.id) as total_empleados,
-                    COUNT(DISTINCT CASE WHEN a.fecha BETWEEN %s AND %s 
-                                        AND (a.entrada_manana_real IS NOT NULL OR a.entrada_tarde_real IS NOT NULL)
-                                        THEN CONCAT(a.empleado_id, '-', a.fecha) END) as asistencias_semana
-                FROM EMPRESAS emp
-                LEFT JOIN EMPLEADOS e ON emp.id = e.empresa_id AND e.activo = TRUE
-                LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id
-                WHERE emp.id = %s
-                GROUP BY emp.id, emp.nombre
-            """, (inicio_semana.strftime('%Y-%m-%d'), fin_semana.strftime('%Y-%m-%d'), empresa_id))
-        else:
-            cursor.execute("""
-                SELECT 
-                    emp.id,
-                    emp.nombre,
-                    COUNT(DISTINCT e.id) as total_empleados,
-                    COUNT(DISTINCT CASE WHEN a.fecha BETWEEN %s AND %s 
-                                        AND (a.entrada_manana_real IS NOT NULL OR a.entrada_tarde_real IS NOT NULL)
-                                        THEN CONCAT(a.empleado_id, '-', a.fecha) END) as asistencias_semana
-                FROM EMPRESAS emp
-                LEFT JOIN EMPLEADOS e ON emp.id = e.empresa_id AND e.activo = TRUE
-                LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id
-                GROUP BY emp.id, emp.nombre
-                ORDER BY emp.nombre
-            """, (inicio_semana.strftime('%Y-%m-%d'), fin_semana.strftime('%Y-%m-%d')))
-        
-        empresas_data = []
-        dias_transcurridos = min(7, (datetime.now().date() - inicio_semana).days + 1)
-        if dias_transcurridos < 1:
-            dias_transcurridos = 1
-        
-        for row in cursor.fetchall():
-            nombre = row[1]
-            total_empleados = row[2] or 0
-            asistencias = row[3] or 0
-            
-            asistencias_esperadas = total_empleados * dias_transcurridos
-            porcentaje = int((asistencias / asistencias_esperadas * 100)) if asistencias_esperadas > 0 else 0
-            
-            if total_empleados > 0:
-                empresas_data.append({
-                    "nombre": nombre,
-                    "total_empleados": total_empleados,
-                    "porcentaje_asistencia": porcentaje
-                })
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(empresas_data)
-        
+        return jsonify(_reporte_semanal_desde_request().companies_comparison())
+
     except Exception as e:
         import traceback
-        print(f"Error en companies comparison: {e}")
+        print(f"❌ Error en companies comparison: {e}")
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/weekly-report/top-punctual')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
 def api_weekly_report_top_punctual():
     """Top 5 MÁS PUNTUALES - Solo 100% puntuales (0 tardanzas)"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            semana_offset = request.args.get('semana', type=int, default=0)
-            hoy = datetime.now().date()
-            inicio_semana = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
-            fin_semana = inicio_semana + timedelta(days=6)
-            fecha_inicio = inicio_semana.strftime('%Y-%m-%d')
-            fecha_fin = fin_semana.strftime('%Y-%m-%d')
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
-        
-        # 🔥 SOLO empleados con 0 tardanzas
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                (
-                    COUNT(CASE 
-                        WHEN a.entrada_manana_real IS NOT NULL 
-                             AND TIME(a.entrada_manana_real) <= '06:50:59'
-                        THEN 1 
-                    END) +
-                    COUNT(CASE 
-                        WHEN a.entrada_tarde_real IS NOT NULL 
-                             AND TIME(a.entrada_tarde_real) <= '14:50:59'
-                        THEN 1 
-                    END)
-                ) as turnos_puntuales,
-                (
-                    COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL THEN 1 END) +
-                    COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL THEN 1 END)
-                ) as total_turnos,
-                (
-                    COUNT(CASE 
-                        WHEN a.entrada_manana_real IS NOT NULL 
-                             AND TIME(a.entrada_manana_real) > '06:50:59'
-                        THEN 1 
-                    END) +
-                    COUNT(CASE 
-                        WHEN a.entrada_tarde_real IS NOT NULL 
-                             AND TIME(a.entrada_tarde_real) > '14:50:59'
-                        THEN 1 
-                    END)
-                ) as tardanzas
-            FROM EMPLEADOS e
-            LEFT JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING turnos_puntuales > 0 
-                AND tardanzas = 0 
-                AND total_turnos = turnos_puntuales  -- 🎯 100% puntual
-            ORDER BY turnos_puntuales DESC, total_turnos DESC
-            LIMIT 5
-        """, params)
-        
-        top_puntuales = []
-        for row in cursor.fetchall():
-            top_puntuales.append({
-                "nombre": row[0],
-                "turnos_puntuales": row[1],
-                "total_turnos": row[2],
-                "perfecto": True
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(top_puntuales)
-        
+        return jsonify(_reporte_semanal_desde_request().top_punctual())
+
     except Exception as e:
         import traceback
         print(f"❌ Error en top punctual: {e}")
@@ -1646,76 +1445,15 @@ def api_weekly_report_top_punctual():
 
 
 @app.route('/api/weekly-report/top-late')
+@reporte_cacheado(_alcance_semanal, requiere_admin=True)
 def api_weekly_report_top_late():
     """Top 5 MÁS TARDONES - Empleados con al menos 1 tardanza"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "No autorizado"}), 401
-    
+
     try:
-        from src.infrastructure.mysql_connection import get_connection
-        
-        empresa_id = request.args.get('empresa_id', type=int)
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        
-        if not fecha_inicio or not fecha_fin:
-            semana_offset = request.args.get('semana', type=int, default=0)
-            hoy = datetime.now().date()
-            inicio_semana = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
-            fin_semana = inicio_semana + timedelta(days=6)
-            fecha_inicio = inicio_semana.strftime('%Y-%m-%d')
-            fecha_fin = fin_semana.strftime('%Y-%m-%d')
-        
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
-        params = [fecha_inicio, fecha_fin]
-        if empresa_id:
-            params.append(empresa_id)
-        
-        cursor.execute(f"""
-            SELECT 
-                e.nombre,
-                (
-                    COUNT(CASE 
-                        WHEN a.entrada_manana_real IS NOT NULL 
-                             AND TIME(a.entrada_manana_real) > '06:50:59'
-                        THEN 1 
-                    END) +
-                    COUNT(CASE 
-                        WHEN a.entrada_tarde_real IS NOT NULL 
-                             AND TIME(a.entrada_tarde_real) > '14:50:59'
-                        THEN 1 
-                    END)
-                ) as tardanzas,
-                (
-                    COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL THEN 1 END) +
-                    COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL THEN 1 END)
-                ) as total_turnos
-            FROM EMPLEADOS e
-            INNER JOIN ASISTENCIA a ON e.id = a.empleado_id 
-                AND a.fecha BETWEEN %s AND %s
-            WHERE e.activo = TRUE {empresa_filter}
-            GROUP BY e.id, e.nombre
-            HAVING tardanzas > 0  -- 🎯 Al menos 1 tardanza
-            ORDER BY tardanzas DESC, total_turnos DESC
-            LIMIT 5
-        """, params)
-        
-        top_tardes = []
-        for row in cursor.fetchall():
-            top_tardes.append({
-                "nombre": row[0],
-                "tardanzas": row[1],
-                "total_turnos": row[2]
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(top_tardes)
-        
+        return jsonify(_reporte_semanal_desde_request().top_late())
+
     except Exception as e:
         import traceback
         print(f"❌ Error en top late: {e}")
@@ -1751,42 +1489,8 @@ def api_incomplete_markings():
         conn = get_connection()
         cursor = conn.cursor()
         
-        empresa_filter = "AND emp.id = %s" if empresa_id else ""
-        params = [anio, mes]
-        if empresa_id:
-            params.append(empresa_id)
-        
         # Buscar registros donde hay entrada pero no salida
-        cursor.execute(f"""
-            SELECT 
-                a.id,
-                a.empleado_id,
-                e.nombre as empleado_nombre,
-                emp.nombre as empresa_nombre,
-                a.fecha,
-                a.entrada_manana_real,
-                a.salida_manana_real,
-                a.entrada_tarde_real,
-                a.salida_tarde_real,
-                CASE 
-                    WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL THEN 'mañana'
-                    WHEN a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 'tarde'
-                    WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL 
-                         AND a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 'ambos'
-                END as turno_incompleto
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            JOIN EMPRESAS emp ON e.empresa_id = emp.id
-            WHERE YEAR(a.fecha) = %s 
-              AND MONTH(a.fecha) = %s
-              AND e.activo = TRUE
-              AND (
-                  (a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL) OR
-                  (a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL)
-              )
-              {empresa_filter}
-            ORDER BY a.fecha DESC, e.nombre ASC
-        """, params)
+        cursor.execute(*consulta_marcaciones_incompletas(anio, mes, empresa_id))
         
         registros = []
         for row in cursor.fetchall():
@@ -1864,7 +1568,7 @@ def api_add_exit_time():
         
         # Obtener la fecha y hora de entrada del registro
         cursor.execute("""
-            SELECT fecha, entrada_manana_real, entrada_tarde_real 
+            SELECT fecha, entrada_manana_real, entrada_tarde_real, empleado_id 
             FROM ASISTENCIA 
             WHERE id = %s
         """, (asistencia_id,))
@@ -1878,6 +1582,7 @@ def api_add_exit_time():
         fecha = result[0]
         entrada_manana = result[1]
         entrada_tarde = result[2]
+        empleado_id = result[3]
         
         # Validar que exista la entrada correspondiente
         if turno == 'mañana' and not entrada_manana:
@@ -1941,6 +1646,7 @@ def api_add_exit_time():
         conn.commit()
         cursor.close()
         conn.close()
+        _marcacion_modificada(empleado_id, fecha)
         
         return jsonify({
             "success": True, 
@@ -1974,11 +1680,16 @@ def api_delete_incomplete_marking():
         conn = get_connection()
         cursor = conn.cursor()
         
+        cursor.execute("SELECT empleado_id, fecha FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
+        registro = cursor.fetchone()
+        
         cursor.execute("DELETE FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
         conn.commit()
         
         cursor.close()
         conn.close()
+        if registro:
+            _marcacion_modificada(registro[0], registro[1])
         
         return jsonify({
             "success": True, 
@@ -2024,35 +1735,7 @@ def api_attendance_records():
         conn = get_connection()
         cursor = conn.cursor()
         
-        # Query simplificado - Solo las horas de entrada y salida
-        query = """
-            SELECT 
-                a.id as asistencia_id,
-                a.empleado_id,
-                e.nombre as empleado_nombre,
-                emp.nombre as empresa_nombre,
-                a.fecha,
-                a.entrada_manana_real,
-                a.salida_manana_real,
-                a.entrada_tarde_real,
-                a.salida_tarde_real
-            FROM ASISTENCIA a
-            JOIN EMPLEADOS e ON a.empleado_id = e.id
-            JOIN EMPRESAS emp ON e.empresa_id = emp.id
-            WHERE YEAR(a.fecha) = %s 
-              AND MONTH(a.fecha) = %s
-              AND emp.id = %s
-        """
-        
-        params = [anio, mes, empresa_id]
-        
-        if empleado_id:
-            query += " AND e.id = %s"
-            params.append(empleado_id)
-        
-        query += " ORDER BY a.fecha DESC, e.nombre ASC"
-        
-        cursor.execute(query, params)
+        cursor.execute(*consulta_registros_asistencia(empresa_id, anio, mes, empleado_id))
         
         registros = []
         dias_traduccion = {
@@ -2138,7 +1821,7 @@ def api_update_attendance_record():
         cursor = conn.cursor()
         
         # Obtener la fecha del registro
-        cursor.execute("SELECT fecha FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
+        cursor.execute("SELECT fecha, empleado_id FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
         result = cursor.fetchone()
         
         if not result:
@@ -2168,6 +1851,8 @@ def api_update_attendance_record():
         conn.commit()
         cursor.close()
         conn.close()
+        asistencia_repo.recalcular_tardanzas(asistencia_id)
+        _marcacion_modificada(result[1], fecha)
         
         return jsonify({
             "success": True, 
@@ -2200,8 +1885,9 @@ def api_delete_attendance_record():
         cursor = conn.cursor()
         
         # Verificar que existe
-        cursor.execute("SELECT id FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT id, empleado_id, fecha FROM ASISTENCIA WHERE id = %s", (asistencia_id,))
+        registro = cursor.fetchone()
+        if not registro:
             cursor.close()
             conn.close()
             return jsonify({"success": False, "message": "Registro no encontrado"}), 404
@@ -2212,6 +1898,7 @@ def api_delete_attendance_record():
         
         cursor.close()
         conn.close()
+        _marcacion_modificada(registro[1], registro[2])
         
         return jsonify({
             "success": True, 
@@ -0,0 +1,221 @@
+"""
+Benchmark del motor columnar de estadísticas (src/use_cases/attendance_stats.py).
+
+Compara, para 1k, 10k y 100k días-empleado sintéticos, el cálculo anterior (un recorrido en
+Python por empleado, con ramas por fila) contra calcular_estadisticas (una pasada vectorizada
+para toda la empresa), y verifica que ambos den exactamente el mismo resultado.
+
+- columnar_entities_ms: partiendo de entidades Asistencia (reporte de detalle del empleado)
+- legacy_ms: decodificar las filas de SELECT_ASISTENCIA en entidades + el recorrido anterior,
+  que es lo que hacía el reporte mensual
+- columnar_rows_ms: partiendo de las filas enteras de get_filas_estadisticas (lo que usa ahora
+  el reporte mensual: ni entidades ni DECIMAL que decodificar)
+
+Uso:
+    python benchmarks/bench_attendance_stats.py
+    python benchmarks/bench_attendance_stats.py --sizes 1000 10000 100000 --repeat 5
+"""
+import argparse
+import calendar
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.domain.entities import Asistencia
+from src.domain.repositories import ESTADOS_DIA
+from src.infrastructure.row_mapping import decodificar_asistencia
+from src.use_cases.attendance_stats import ColumnasAsistencia, calcular_estadisticas, contar_dias_laborables
+
+
+def estadisticas_legado(asistencias: list) -> dict:
+    """Copia de GetReportUseCase._calcular_estadisticas_empleado antes del motor columnar"""
+    total_horas_normales = 0
+    total_horas_extras = 0
+    faltas = 0
+    asistencias_completas = 0
+    asistencias_incompletas = 0
+    turnos_manana = 0
+    turnos_tarde = 0
+    faltas_manana = 0
+    faltas_tarde = 0
+    retardos_manana = 0
+    retardos_tarde = 0
+
+    for asistencia in asistencias:
+        if asistencia.estado_dia == "FALTA":
+            faltas += 1
+            faltas_manana += 1
+            faltas_tarde += 1
+        elif asistencia.estado_dia == "COMPLETO":
+            asistencias_completas += 1
+            total_horas_normales += asistencia.horas_normales
+            total_horas_extras += asistencia.horas_extras
+            turnos_manana += 1
+            turnos_tarde += 1
+            if asistencia.tardanza_manana:
+                retardos_manana += 1
+            if asistencia.tardanza_tarde:
+                retardos_tarde += 1
+        elif asistencia.estado_dia == "INCOMPLETO":
+            asistencias_incompletas += 1
+            total_horas_normales += asistencia.horas_normales
+            total_horas_extras += asistencia.horas_extras
+            if asistencia.asistio_manana:
+                turnos_manana += 1
+                if asistencia.tardanza_manana:
+                    retardos_manana += 1
+            else:
+                faltas_manana += 1
+            if asistencia.asistio_tarde:
+                turnos_tarde += 1
+                if asistencia.tardanza_tarde:
+                    retardos_tarde += 1
+            else:
+                faltas_tarde += 1
+
+    total_dias = len(asistencias)
+    porcentaje_asistencia = 0
+    if total_dias > 0:
+        dias_con_asistencia = asistencias_completas + asistencias_incompletas
+        porcentaje_asistencia = round((dias_con_asistencia / total_dias) * 100, 2)
+
+    return {
+        "horas_normales": round(total_horas_normales, 2),
+        "horas_extras": round(total_horas_extras, 2),
+        "faltas": faltas,
+        "retardos_manana": retardos_manana,
+        "retardos_tarde": retardos_tarde,
+        "asistencias_completas": asistencias_completas,
+        "asistencias_incompletas": asistencias_incompletas,
+        "porcentaje_asistencia": porcentaje_asistencia,
+        "turnos_manana": turnos_manana,
+        "turnos_tarde": turnos_tarde,
+        "faltas_manana": faltas_manana,
+        "faltas_tarde": faltas_tarde
+    }
+
+
+def generar(dias_empleado: int, rng: random.Random) -> tuple:
+    """Asistencias de un mes (26 días laborables) para los empleados necesarios"""
+    dias = [d for d in range(1, 32) if date(2025, 3, d).weekday() < 6]
+    empleados = list(range(1, dias_empleado // len(dias) + 2))
+    asistencias = []
+    for empleado_id in empleados:
+        for dia in dias:
+            if len(asistencias) >= dias_empleado:
+                break
+            estado = rng.choices(("COMPLETO", "INCOMPLETO", "FALTA"), (0.8, 0.12, 0.08))[0]
+            a = Asistencia(None, empleado_id, f"2025-03-{dia:02d}", estado_dia=estado)
+            if estado != "FALTA":
+                a.asistio_manana = estado == "COMPLETO" or rng.random() < 0.6
+                a.asistio_tarde = estado == "COMPLETO" or not a.asistio_manana
+                a.tardanza_manana = a.asistio_manana and rng.random() < 0.15
+                a.tardanza_tarde = a.asistio_tarde and rng.random() < 0.1
+                a.horas_normales = 8.0 if estado == "COMPLETO" else 4.0
+                a.horas_extras = rng.choice((0.0, 0.0, 0.0, 0.25, 0.5, 1.5))
+                a.total_horas_trabajadas = a.horas_normales + a.horas_extras
+            else:
+                a.horas_normales = 0.0
+            asistencias.append(a)
+    return asistencias, empleados
+
+
+def legado(asistencias: list, empleados: list) -> dict:
+    por_empleado = {e: [] for e in empleados}
+    for a in asistencias:
+        por_empleado[a.empleado_id].append(a)
+    return {e: estadisticas_legado(por_empleado[e]) for e in empleados}
+
+
+def columnar(asistencias: list, empleados: list) -> dict:
+    return calcular_estadisticas(ColumnasAsistencia.desde_asistencias(asistencias), empleados)
+
+
+def _tiempo(valor):
+    return timedelta(hours=valor.hour, minutes=valor.minute) if valor else None
+
+
+def filas_select_asistencia(asistencias: list) -> list:
+    """Simula las filas de SELECT_ASISTENCIA en MySQL (TIME -> timedelta, DECIMAL -> Decimal)"""
+    return [
+        (a.id, a.empleado_id, date(2025, 3, int(a.fecha[-2:])),
+         _tiempo(a.entrada_manana_real), _tiempo(a.salida_manana_real),
+         _tiempo(a.entrada_tarde_real), _tiempo(a.salida_tarde_real),
+         Decimal(f"{a.total_horas_trabajadas:.2f}"), Decimal(f"{a.horas_normales:.2f}"),
+         Decimal(f"{a.horas_extras:.2f}"), a.estado_dia,
+         int(a.asistio_manana), int(a.asistio_tarde), int(a.tardanza_manana), int(a.tardanza_tarde),
+         a.minutos_tardanza_manana, a.minutos_tardanza_tarde, None, None)
+        for a in asistencias
+    ]
+
+
+def filas_estadisticas(asistencias: list) -> list:
+    """Simula las filas de get_filas_estadisticas en MySQL (FIELD() y centésimas ya enteras)"""
+    codigos = {estado: i + 1 for i, estado in enumerate(ESTADOS_DIA)}
+    return [
+        (a.empleado_id, codigos.get(a.estado_dia, 0),
+         round(a.horas_normales * 100), round(a.horas_extras * 100),
+         int(a.asistio_manana), int(a.asistio_tarde), int(a.tardanza_manana), int(a.tardanza_tarde))
+        for a in asistencias
+    ]
+
+
+def medir(funcion, repeticiones: int) -> float:
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    resultados = []
+    for n in args.sizes:
+        asistencias, empleados = generar(n, rng)
+        filas = filas_select_asistencia(asistencias)
+        numericas = filas_estadisticas(asistencias)
+        esperado = legado(asistencias, empleados)
+        if esperado != columnar(asistencias, empleados):
+            raise SystemExit(f"❌ Resultados distintos (entidades) con {n} días-empleado")
+        if esperado != calcular_estadisticas(ColumnasAsistencia.desde_filas(numericas), empleados):
+            raise SystemExit(f"❌ Resultados distintos (filas) con {n} días-empleado")
+
+        t_legado = medir(lambda: legado([decodificar_asistencia(f) for f in filas], empleados), args.repeat)
+        t_entidades = medir(lambda: columnar(asistencias, empleados), args.repeat)
+        t_filas = medir(lambda: calcular_estadisticas(ColumnasAsistencia.desde_filas(numericas), empleados),
+                        args.repeat)
+        columnas = ColumnasAsistencia.desde_filas(numericas)
+        t_solo_calculo = medir(lambda: calcular_estadisticas(columnas, empleados), args.repeat)
+        resultados.append({
+            "employee_days": len(asistencias),
+            "employees": len(empleados),
+            "legacy_ms": round(t_legado * 1000, 2),
+            "columnar_entities_ms": round(t_entidades * 1000, 2),
+            "columnar_rows_ms": round(t_filas * 1000, 2),
+            "columnar_compute_only_ms": round(t_solo_calculo * 1000, 2),
+            "speedup_rows_vs_legacy": round(t_legado / t_filas, 2),
+        })
+
+    legado_dias = sum(1 for d in range(1, calendar.monthrange(2025, 3)[1] + 1) if date(2025, 3, d).weekday() < 6)
+    assert contar_dias_laborables("2025-03-01", "2025-03-31") == legado_dias
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
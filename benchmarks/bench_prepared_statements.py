@@ -0,0 +1,139 @@
+"""
+Benchmark de sentencias preparadas vs protocolo de texto en las consultas del escaneo.
+
+Ejecuta cada consulta del camino de /api/scan (empleado por id y por QR, asistencia del día y
+el chequeo anti-duplicado) N veces por la misma conexión, primero como texto y luego preparada
+con la caché de sentencias del pool. Por cada modo reporta la latencia p50/p95 y los contadores
+de la sesión en el servidor (Com_stmt_execute, Com_stmt_reset, ...), que muestran los viajes
+reales: mysql-connector 8.2 manda COM_STMT_RESET antes de cada execute preparado.
+
+Necesita una BD MySQL con datos (usa las variables DB_* del entorno).
+
+Uso:
+    python benchmarks/bench_prepared_statements.py
+    python benchmarks/bench_prepared_statements.py --repeticiones 2000 --output resultado.json
+
+DB_PREPARED_CACHE_SIZE queda en 0 salvo que el p50 preparado gane al de texto en todas las consultas.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.infrastructure.mysql_connection import CacheSentencias, MySQLConnection  # noqa: E402
+from src.infrastructure.row_mapping import SELECT_ASISTENCIA, SELECT_EMPLEADO  # noqa: E402
+
+CONSULTAS = {
+    "empleado_por_id": f"{SELECT_EMPLEADO} WHERE id = %s AND activo = TRUE",
+    "empleado_por_qr": f"{SELECT_EMPLEADO} WHERE codigo_qr_unico = %s AND activo = TRUE",
+    "asistencia_del_dia": f"{SELECT_ASISTENCIA} WHERE empleado_id = %s AND fecha = %s",
+    "escaneo_reciente": """
+        SELECT COUNT(*) as count FROM ESCANEOS_TRACKING
+        WHERE codigo_qr = %s
+        AND timestamp_escaneo >= DATE_SUB(NOW(), INTERVAL %s SECOND)
+    """,
+}
+
+# Contadores de sesión que distinguen los comandos del protocolo
+CONTADORES = ("Com_select", "Com_stmt_prepare", "Com_stmt_execute", "Com_stmt_reset",
+              "Com_stmt_close", "Questions")
+
+
+def contadores_sesion(raw) -> dict:
+    cursor = raw.cursor()
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN (%s)" % ", ".join(["%s"] * len(CONTADORES)),
+                   CONTADORES)
+    valores = {nombre: int(valor) for nombre, valor in cursor.fetchall()}
+    cursor.close()
+    return valores
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def medir(raw, ejecutar, repeticiones: int) -> dict:
+    ejecutar()  # calentamiento (el preparado paga aquí su COM_STMT_PREPARE)
+    antes = contadores_sesion(raw)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ejecutar()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    despues = contadores_sesion(raw)
+    # La propia consulta de contadores suma un Com_select y una Question
+    delta = {nombre: despues.get(nombre, 0) - antes.get(nombre, 0) for nombre in CONTADORES}
+    delta["Com_select"] -= 1
+    delta["Questions"] -= 1
+    return {
+        "p50_ms": round(percentil(tiempos, 0.50), 3),
+        "p95_ms": round(percentil(tiempos, 0.95), 3),
+        "total_ms": round(sum(tiempos), 1),
+        "comandos_por_ejecucion": {nombre: round(valor / repeticiones, 2) for nombre, valor in delta.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=500)
+    parser.add_argument("--output", help="Archivo JSON con el resultado")
+    args = parser.parse_args()
+
+    db = MySQLConnection()
+    raw = db._crear_conexion()
+    if raw is None:
+        sys.exit("Sin conexión a MySQL (revise DB_HOST/DB_USER/DB_PASSWORD)")
+
+    cursor = raw.cursor()
+    cursor.execute("SELECT id, codigo_qr_unico FROM EMPLEADOS WHERE activo = TRUE ORDER BY id LIMIT 1")
+    fila = cursor.fetchone()
+    cursor.close()
+    if fila is None:
+        sys.exit("No hay empleados activos para medir")
+    empleado_id, codigo_qr = fila
+    parametros = {
+        "empleado_por_id": (empleado_id,),
+        "empleado_por_qr": (codigo_qr,),
+        "asistencia_del_dia": (empleado_id, date.today().isoformat()),
+        "escaneo_reciente": (codigo_qr, 10),
+    }
+
+    cache = CacheSentencias(raw, capacidad=len(CONSULTAS))
+    resultado = {"repeticiones": args.repeticiones, "consultas": {}}
+    for nombre, sql in CONSULTAS.items():
+        params = parametros[nombre]
+
+        def texto():
+            cursor = raw.cursor()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            cursor.close()
+
+        def preparada():
+            cache.ejecutar(sql, params).fetchall()
+
+        medicion_texto = medir(raw, texto, args.repeticiones)
+        medicion_preparada = medir(raw, preparada, args.repeticiones)
+        resultado["consultas"][nombre] = {
+            "texto": medicion_texto,
+            "preparada": medicion_preparada,
+            "ganancia_p50_ms": round(medicion_texto["p50_ms"] - medicion_preparada["p50_ms"], 3),
+        }
+    cache.drenar()
+    raw.close()
+
+    resultado["preparadas_ganan"] = all(c["ganancia_p50_ms"] > 0 for c in resultado["consultas"].values())
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(salida)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(salida)
+
+
+if __name__ == "__main__":
+    main()
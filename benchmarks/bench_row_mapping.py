@@ -0,0 +1,178 @@
+"""
+Benchmark del mapeo fila -> Asistencia: antes (cursor dict + entidad con __dict__)
+vs ahora (cursor de tuplas + decodificador posicional + entidad con __slots__).
+
+Uso:
+    python benchmarks/bench_row_mapping.py                 # filas sintéticas
+    python benchmarks/bench_row_mapping.py --rows 50000
+    python benchmarks/bench_row_mapping.py --mysql --empleado-id 3 --desde 2025-01-01 --hasta 2025-12-31 --fecha 2025-06-02
+
+Reporta filas/seg y bytes/fila (tracemalloc) para get_by_empleado_and_periodo y get_by_fecha.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.domain.repositories import convertir_a_time  # noqa: E402
+from src.infrastructure.repositories_mysql import AsistenciaRepositoryMySQL  # noqa: E402
+from src.infrastructure.row_mapping import COLUMNAS_ASISTENCIA  # noqa: E402
+
+
+class _AsistenciaAnterior:
+    """Copia de la entidad Asistencia antes de __slots__ (un __dict__ por instancia)"""
+
+    def __init__(self, id=None, empleado_id=None, fecha="", entrada_manana_real=None,
+                 salida_manana_real=None, entrada_tarde_real=None, salida_tarde_real=None,
+                 total_horas_trabajadas=0.0, horas_normales=8.0, horas_extras=0.0,
+                 estado_dia="INCOMPLETO"):
+        self.id = id
+        self.empleado_id = empleado_id
+        self.fecha = fecha
+        self.entrada_manana_real = entrada_manana_real
+        self.salida_manana_real = salida_manana_real
+        self.entrada_tarde_real = entrada_tarde_real
+        self.salida_tarde_real = salida_tarde_real
+        self.total_horas_trabajadas = total_horas_trabajadas
+        self.horas_normales = horas_normales
+        self.horas_extras = horas_extras
+        self.estado_dia = estado_dia
+        self.asistio_manana = False
+        self.asistio_tarde = False
+        self.tardanza_manana = False
+        self.tardanza_tarde = False
+        self.created_at = None
+        self.updated_at = None
+
+
+def _mapear_anterior(results):
+    """Mapeo campo a campo desde filas dict, como lo hacía repositories_mysql"""
+    asistencias = []
+    for row in results:
+        asistencia = _AsistenciaAnterior(
+            id=row['id'],
+            empleado_id=row['empleado_id'],
+            fecha=str(row['fecha']),
+            entrada_manana_real=convertir_a_time(row['entrada_manana_real']),
+            salida_manana_real=convertir_a_time(row['salida_manana_real']),
+            entrada_tarde_real=convertir_a_time(row['entrada_tarde_real']),
+            salida_tarde_real=convertir_a_time(row['salida_tarde_real']),
+            total_horas_trabajadas=float(row['total_horas_trabajadas'] or 0),
+            horas_normales=float(row['horas_normales'] or 8),
+            horas_extras=float(row['horas_extras'] or 0),
+            estado_dia=row['estado_dia']
+        )
+        asistencia.asistio_manana = bool(row.get('asistio_manana', 0))
+        asistencia.asistio_tarde = bool(row.get('asistio_tarde', 0))
+        asistencia.tardanza_manana = bool(row.get('tardanza_manana', 0))
+        asistencia.tardanza_tarde = bool(row.get('tardanza_tarde', 0))
+        asistencia.created_at = row.get('created_at')
+        asistencia.updated_at = row.get('updated_at')
+        asistencias.append(asistencia)
+    return asistencias
+
+
+def _filas_sinteticas(n: int) -> list:
+    """Tuplas con los tipos que devuelve mysql-connector (TIME -> timedelta, DECIMAL -> float aquí)"""
+    base = date(2025, 1, 1)
+    creado = datetime(2025, 1, 1, 7, 0)
+    filas = []
+    for i in range(n):
+        filas.append((
+            i + 1, (i % 500) + 1, base + timedelta(days=i % 365),
+            timedelta(hours=6, minutes=45 + i % 10), timedelta(hours=12, minutes=50),
+            timedelta(hours=14, minutes=48 + i % 5), timedelta(hours=18, minutes=55),
+            8.5, 8.0, 0.5, 'COMPLETO', 1, 1, i % 7 == 0, 0, (i % 7 == 0) * 4, 0, creado, creado,
+        ))
+    return filas
+
+
+class _DBSintetica:
+    """Imita a MySQLConnection: con dictionary=True el conector arma un dict por fila"""
+
+    def __init__(self, filas: list):
+        self.filas = filas
+
+    def execute_query(self, query, params=None, preparada=False):
+        return [dict(zip(COLUMNAS_ASISTENCIA, fila)) for fila in self.filas]
+
+    def execute_query_tuplas(self, query, params=None, preparada=False):
+        return list(self.filas)
+
+
+def _medir(funcion, repeticiones: int) -> dict:
+    mejor = None
+    filas = 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        filas = len(resultado)
+        mejor = duracion if mejor is None else min(mejor, duracion)
+        del resultado
+
+    tracemalloc.start()
+    resultado = funcion()
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+
+    return {
+        "rows": filas,
+        "rows_per_sec": round(filas / mejor) if mejor else 0,
+        "bytes_per_row": round(memoria / filas, 1) if filas else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mysql', action='store_true', help="usar la BD configurada en el entorno")
+    parser.add_argument('--empleado-id', type=int, default=1)
+    parser.add_argument('--desde', default='2025-01-01')
+    parser.add_argument('--hasta', default='2025-12-31')
+    parser.add_argument('--fecha', default=date.today().isoformat())
+    args = parser.parse_args()
+
+    if args.mysql:
+        from src.infrastructure.mysql_connection import MySQLConnection
+        db = MySQLConnection()
+    else:
+        db = _DBSintetica(_filas_sinteticas(args.rows))
+    repo = AsistenciaRepositoryMySQL(db)
+
+    consultas = {
+        "get_by_empleado_and_periodo": (
+            lambda: _mapear_anterior(db.execute_query(
+                "SELECT * FROM ASISTENCIA WHERE empleado_id = %s AND fecha BETWEEN %s AND %s ORDER BY fecha",
+                (args.empleado_id, args.desde, args.hasta)) or []),
+            lambda: repo.get_by_empleado_and_periodo(args.empleado_id, args.desde, args.hasta),
+        ),
+        "get_by_fecha": (
+            lambda: _mapear_anterior(db.execute_query(
+                "SELECT * FROM ASISTENCIA WHERE fecha = %s ORDER BY empleado_id", (args.fecha,)) or []),
+            lambda: repo.get_by_fecha(args.fecha),
+        ),
+    }
+
+    reporte = {"mode": "mysql" if args.mysql else "synthetic"}
+    for nombre, (antes, ahora) in consultas.items():
+        medido_antes = _medir(antes, args.repeat)
+        medido_ahora = _medir(ahora, args.repeat)
+        reporte[nombre] = {
+            "before": medido_antes,
+            "after": medido_ahora,
+            "speedup": round(medido_ahora["rows_per_sec"] / medido_antes["rows_per_sec"], 2)
+            if medido_antes["rows_per_sec"] else None,
+        }
+    print(json.dumps(reporte, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Prueba de carga determinista de /api/scan para el pico del cambio de turno.
+
+Reproduce una ráfaga de escaneos (llegadas distribuidas en una ventana, relecturas duplicadas
+y códigos desconocidos) a través del test client de Flask y MarkAttendanceUseCase, con un reloj
+simulado en lugar de datetime.now(America/Lima). Por defecto usa repositorios en memoria;
+con --mysql usa la BD configurada en el entorno y empleados reales.
+
+Uso:
+    python benchmarks/bench_scan_burst.py
+    python benchmarks/bench_scan_burst.py --employees 500 --minutes 10 --duplicates 0.2 --unknown 0.05
+    python benchmarks/bench_scan_burst.py --mysql --employees 200 --output resultado.json
+
+Salida (JSON): latencia p50/p95/p99, throughput y viajes a la BD por escaneo.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ZONA_LIMA = pytz.timezone("America/Lima")
+
+
+class RelojSimulado:
+    """Reemplaza a datetime.now(America/Lima): devuelve la hora fijada por la ráfaga"""
+
+    def __init__(self, inicio: datetime):
+        self.ahora = inicio
+
+    def __call__(self) -> datetime:
+        return self.ahora
+
+
+def generar_rafaga(codigos: list, minutos: float, duplicados: float, desconocidos: float,
+                   inicio: datetime, rng: random.Random) -> list:
+    """Lista ordenada de (momento, código, tipo) con tipo en llegada|duplicado|desconocido"""
+    ventana = minutos * 60
+    eventos = []
+    for codigo in codigos:
+        llegada = inicio + timedelta(seconds=rng.uniform(0, ventana))
+        eventos.append((llegada, codigo, "llegada"))
+        if rng.random() < duplicados:
+            # El QR queda frente a la cámara: relectura dentro de la ventana anti-duplicado
+            eventos.append((llegada + timedelta(seconds=rng.uniform(0.5, 8)), codigo, "duplicado"))
+    total_desconocidos = round(len(eventos) * desconocidos / (1 - desconocidos)) if desconocidos < 1 else 0
+    for _ in range(total_desconocidos):
+        # Etiquetas de productos (EAN-13) y QRs viejos con formato parecido al real
+        if rng.random() < 0.5:
+            codigo = "".join(str(rng.randrange(10)) for _ in range(13))
+        else:
+            codigo = f"EMP_{rng.randrange(1, 50)}_{rng.randrange(10**9, 10**10)}_{rng.randrange(1000, 9999)}"
+        eventos.append((inicio + timedelta(seconds=rng.uniform(0, ventana)), codigo, "desconocido"))
+    eventos.sort(key=lambda e: e[0])
+    return eventos
+
+
+def preparar_memoria(args, reloj: RelojSimulado, rng: random.Random):
+    from src.domain.entities import Empresa, Empleado
+    from src.infrastructure.repositories_memory import (
+        ContadorViajes, EmpresaRepositoryMemoria, EmpleadoRepositoryMemoria,
+        AsistenciaRepositoryMemoria, HorarioEstandarRepositoryMemoria, EscaneoTrackingRepositoryMemoria,
+    )
+    from src.infrastructure.qr_index import IndiceQR
+    from src.infrastructure.qr_filter import FiltroQRValidos
+    from src.use_cases.mark_attendance import MarkAttendanceUseCase
+
+    contador = ContadorViajes()
+    empresas = EmpresaRepositoryMemoria(contador)
+    empleados = EmpleadoRepositoryMemoria(contador)
+    empresa = empresas.create(Empresa(nombre="Empresa Benchmark", codigo_empresa="BENCH"))
+    codigos = []
+    for i in range(args.employees):
+        # Mismo formato que RegisterEmployeeUseCase: EMP_<empresa>_<timestamp>_<aleatorio>
+        codigo = f"EMP_{empresa.id}_{1700000000 + i}_{rng.randrange(1000, 9999)}"
+        empleados.create(Empleado(empresa_id=empresa.id, nombre=f"Empleado {i + 1:04d}",
+                                  dni=f"{40000000 + i}", codigo_qr_unico=codigo))
+        codigos.append(codigo)
+
+    filtro = None
+    if not args.no_filter:
+        indice = IndiceQR(os.path.join(tempfile.mkdtemp(prefix="bench_qr_"), "qr_index.bin"),
+                          proveedor=empleados.listar_para_indice_qr)
+        filtro = FiltroQRValidos(indice)
+        filtro.puede_existir("")  # construye índice y filtro antes de medir
+
+    caso = MarkAttendanceUseCase(
+        empleados,
+        AsistenciaRepositoryMemoria(contador, reloj, empleados),
+        HorarioEstandarRepositoryMemoria(contador),
+        EscaneoTrackingRepositoryMemoria(contador, reloj),
+        filtro_qr=filtro,
+        reloj=reloj,
+    )
+    contador.viajes = 0
+    return caso, codigos, lambda: contador.viajes
+
+
+def preparar_mysql(args, reloj: RelojSimulado, rng: random.Random):
+    import app as aplicacion
+    from src.infrastructure.metrics import metricas
+
+    empleados = aplicacion.empleado_repo.get_all()
+    if not empleados:
+        raise SystemExit("No hay empleados activos en la BD configurada")
+    empleados = rng.sample(empleados, min(args.employees, len(empleados)))
+    caso = aplicacion.mark_attendance_use_case
+    caso.reloj = reloj
+
+    def viajes():
+        for ruta in metricas.get_stats()["routes"]:
+            if ruta["route"] == "/api/scan":
+                return ruta["avg_db_round_trips"] * ruta["count"]
+        return 0
+
+    return caso, [e.codigo_qr_unico for e in empleados], viajes
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100.0 * len(ordenados) + 0.5)) - 1))
+    return round(ordenados[indice], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--minutes', type=float, default=10)
+    parser.add_argument('--duplicates', type=float, default=0.2, help="fracción de relecturas duplicadas")
+    parser.add_argument('--unknown', type=float, default=0.05, help="fracción de códigos desconocidos")
+    parser.add_argument('--start', default="06:40", help="hora de inicio de la ráfaga (Lima)")
+    parser.add_argument('--date', default="2025-03-03")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-filter', action='store_true', help="sin filtro Bloom de códigos válidos (modo memoria)")
+    parser.add_argument('--mysql', action='store_true', help="usar la BD configurada en el entorno")
+    parser.add_argument('--output', help="archivo donde guardar el JSON además de imprimirlo")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    inicio = ZONA_LIMA.localize(datetime.strptime(f"{args.date} {args.start}", "%Y-%m-%d %H:%M"))
+    reloj = RelojSimulado(inicio)
+
+    if args.mysql:
+        caso, codigos, viajes = preparar_mysql(args, reloj, rng)
+    else:
+        caso, codigos, viajes = preparar_memoria(args, reloj, rng)
+
+    import app as aplicacion
+    aplicacion.mark_attendance_use_case = caso
+    aplicacion.app.config['TESTING'] = True
+    cliente = aplicacion.app.test_client()
+
+    eventos = generar_rafaga(codigos, args.minutes, args.duplicates, args.unknown, inicio, rng)
+    viajes_iniciales = viajes()
+
+    latencias = []
+    por_tipo = Counter()
+    por_estado = Counter()
+    inicio_reloj = time.perf_counter()
+    for momento, codigo, tipo in eventos:
+        reloj.ahora = momento
+        t0 = time.perf_counter()
+        respuesta = cliente.post('/api/scan', json={"codigo_qr": codigo})
+        latencias.append((time.perf_counter() - t0) * 1000)
+        por_tipo[tipo] += 1
+        por_estado[(respuesta.get_json() or {}).get("status", "sin_respuesta")] += 1
+    duracion = time.perf_counter() - inicio_reloj
+
+    total = len(eventos)
+    resultado = {
+        "mode": "mysql" if args.mysql else "memory",
+        "config": {
+            "employees": len(codigos),
+            "minutes": args.minutes,
+            "duplicates": args.duplicates,
+            "unknown": args.unknown,
+            "start": inicio.isoformat(),
+            "seed": args.seed,
+            "qr_filter": not args.no_filter if not args.mysql else caso.filtro_qr is not None,
+            "scan_mode": caso.modo_escaneo,
+        },
+        "scans": total,
+        "by_kind": dict(por_tipo),
+        "by_status": dict(por_estado),
+        "latency_ms": {
+            "p50": percentil(latencias, 50),
+            "p95": percentil(latencias, 95),
+            "p99": percentil(latencias, 99),
+            "max": round(max(latencias), 3) if latencias else 0.0,
+            "mean": round(sum(latencias) / total, 3) if total else 0.0,
+        },
+        "throughput_scans_per_sec": round(total / duracion, 1) if duracion else 0.0,
+        "offered_scans_per_sec": round(total / (args.minutes * 60), 2),
+        "db_round_trips_per_scan": round((viajes() - viajes_iniciales) / total, 3) if total else 0.0,
+    }
+
+    salida = json.dumps(resultado, indent=2)
+    print(salida)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(salida + "\n")
+
+
+if __name__ == '__main__':
+    main()
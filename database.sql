@@ -1,5 +1,8 @@
 USE sistema_asistencia_qr;
 
+-- Esquema base para instalaciones nuevas. Los cambios posteriores van en migrations/ y se
+-- aplican en cada deploy con: python -m src.infrastructure.migrations
+
 -- Tabla EMPRESAS
 CREATE TABLE empresas (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -21,7 +24,9 @@ CREATE TABLE empleados (
     codigo_qr_unico VARCHAR(100) UNIQUE NOT NULL,
     activo BOOLEAN DEFAULT TRUE,
     fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (empresa_id) REFERENCES empresas(id)
+    FOREIGN KEY (empresa_id) REFERENCES empresas(id),
+    INDEX idx_empleados_empresa_activo (empresa_id, activo),
+    INDEX idx_empleados_dni (dni)
 );
 
 -- Tabla ASISTENCIA
@@ -41,10 +46,27 @@ CREATE TABLE asistencia (
     asistio_tarde BOOLEAN DEFAULT FALSE,
     tardanza_manana BOOLEAN DEFAULT FALSE,
     tardanza_tarde BOOLEAN DEFAULT FALSE,
+    -- Minutos de retraso según HORARIOS_ESTANDAR de la empresa (tardanza_* = minutos > 0)
+    minutos_tardanza_manana SMALLINT UNSIGNED NOT NULL DEFAULT 0,
+    minutos_tardanza_tarde SMALLINT UNSIGNED NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (empleado_id) REFERENCES empleados(id),
-    UNIQUE(empleado_id, fecha)
+    UNIQUE(empleado_id, fecha),
+    INDEX idx_asistencia_fecha_empleado (fecha, empleado_id),
+    INDEX idx_asistencia_fecha_tardanzas (fecha, minutos_tardanza_manana, minutos_tardanza_tarde)
+);
+
+-- Tabla HORARIOS_ESTANDAR (horas de entrada contra las que se calculan las tardanzas)
+CREATE TABLE horarios_estandar (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    empresa_id INT NOT NULL,
+    entrada_manana TIME NOT NULL DEFAULT '06:50:00',
+    salida_manana TIME NOT NULL DEFAULT '12:50:00',
+    entrada_tarde TIME NOT NULL DEFAULT '14:50:00',
+    salida_tarde TIME NOT NULL DEFAULT '18:50:00',
+    FOREIGN KEY (empresa_id) REFERENCES empresas(id),
+    UNIQUE(empresa_id)
 );
 
 -- Tabla ALERTAS_ENVIADAS
@@ -92,4 +114,289 @@ CREATE TABLE config_alertas (
     mensaje_correo_admin TEXT,
     activo BOOLEAN DEFAULT TRUE,
     FOREIGN KEY (empresa_id) REFERENCES empresas(id)
-);
\ No newline at end of file
+);
+
+-- Tabla RESUMEN_DIARIO_EMPRESA (agregado del reporte semanal, empleados activos)
+-- La mantiene src/infrastructure/daily_summary.py; backfill:
+--   python -m src.infrastructure.daily_summary --desde 2025-01-01
+CREATE TABLE resumen_diario_empresa (
+    empresa_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    empleados_presentes INT NOT NULL DEFAULT 0,
+    marcas_manana INT NOT NULL DEFAULT 0,
+    marcas_tarde INT NOT NULL DEFAULT 0,
+    tardanzas_manana INT NOT NULL DEFAULT 0,
+    tardanzas_tarde INT NOT NULL DEFAULT 0,
+    horas_extras DECIMAL(10,2) NOT NULL DEFAULT 0,
+    turnos_incompletos INT NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (empresa_id, fecha),
+    INDEX idx_resumen_fecha (fecha)
+);
+
+-- Cierre de planilla por empresa y mes: foto del resumen mensual y de los minutos por día
+-- (src/use_cases/close_month.py); los reportes del mes cerrado la leen en lugar de ASISTENCIA
+CREATE TABLE cierres_mensuales (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    cerrado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    cerrado_por VARCHAR(100) NULL,
+    PRIMARY KEY (empresa_id, anio, mes),
+    FOREIGN KEY (empresa_id) REFERENCES empresas(id)
+);
+
+CREATE TABLE resumen_mensual_empleado (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    empleado_id INT NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    dni VARCHAR(20),
+    horas_normales DECIMAL(10,2) NOT NULL DEFAULT 0,
+    horas_extras DECIMAL(10,2) NOT NULL DEFAULT 0,
+    faltas INT NOT NULL DEFAULT 0,
+    retardos_manana INT NOT NULL DEFAULT 0,
+    retardos_tarde INT NOT NULL DEFAULT 0,
+    asistencias_completas INT NOT NULL DEFAULT 0,
+    asistencias_incompletas INT NOT NULL DEFAULT 0,
+    porcentaje_asistencia DECIMAL(5,2) NOT NULL DEFAULT 0,
+    turnos_manana INT NOT NULL DEFAULT 0,
+    turnos_tarde INT NOT NULL DEFAULT 0,
+    faltas_manana INT NOT NULL DEFAULT 0,
+    faltas_tarde INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (empresa_id, anio, mes, empleado_id)
+);
+
+CREATE TABLE minutos_diarios_empleado (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    empleado_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    entrada_manana TIME NULL,
+    salida_manana TIME NULL,
+    entrada_tarde TIME NULL,
+    salida_tarde TIME NULL,
+    minutos_manana SMALLINT UNSIGNED NULL,
+    minutos_tarde SMALLINT UNSIGNED NULL,
+    PRIMARY KEY (empresa_id, anio, mes, empleado_id, fecha)
+);
+
+-- Procedimiento de escaneo en un solo viaje a la BD (SCAN_MODE=procedure)
+-- Hace el anti-duplicado, el tracking, la búsqueda del empleado y el upsert de la marcación
+-- con la misma lógica que MarkAttendanceUseCase; la hora la envía la app. Las horas de entrada
+-- esperadas salen de HORARIOS_ESTANDAR (los parámetros son el horario por defecto).
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS sp_registrar_escaneo $$
+CREATE PROCEDURE sp_registrar_escaneo(
+    IN p_codigo_qr VARCHAR(100),
+    IN p_ip_address VARCHAR(45),
+    IN p_fecha DATE,
+    IN p_hora TIME,
+    IN p_segundos_duplicado INT,
+    IN p_hora_limite_manana TIME,
+    IN p_minutos_minimos_estadia INT,
+    IN p_entrada_manana_esperada TIME,
+    IN p_entrada_tarde_esperada TIME
+)
+proc: BEGIN
+    DECLARE v_empleado_id INT DEFAULT NULL;
+    DECLARE v_nombre VARCHAR(100) DEFAULT NULL;
+    DECLARE v_empresa_id INT DEFAULT NULL;
+    DECLARE v_token VARCHAR(100) DEFAULT NULL;
+    DECLARE v_sin_fila TINYINT DEFAULT 0;
+    DECLARE v_asistencia_id INT DEFAULT NULL;
+    DECLARE v_em TIME DEFAULT NULL;
+    DECLARE v_sm TIME DEFAULT NULL;
+    DECLARE v_et TIME DEFAULT NULL;
+    DECLARE v_st TIME DEFAULT NULL;
+    DECLARE v_total_horas DECIMAL(5,2) DEFAULT 0;
+    DECLARE v_horas_normales DECIMAL(5,2) DEFAULT 8;
+    DECLARE v_horas_extras DECIMAL(5,2) DEFAULT 0;
+    DECLARE v_estado VARCHAR(20) DEFAULT 'INCOMPLETO';
+    DECLARE v_asistio_m TINYINT DEFAULT 0;
+    DECLARE v_asistio_t TINYINT DEFAULT 0;
+    DECLARE v_tard_m TINYINT DEFAULT 0;
+    DECLARE v_tard_t TINYINT DEFAULT 0;
+    DECLARE v_esperada_m TIME DEFAULT NULL;
+    DECLARE v_esperada_t TIME DEFAULT NULL;
+    DECLARE v_min_tard_m INT DEFAULT 0;
+    DECLARE v_min_tard_t INT DEFAULT 0;
+    DECLARE v_accion VARCHAR(20) DEFAULT NULL;
+    DECLARE v_minutos INT DEFAULT 0;
+    DECLARE v_total INT DEFAULT 0;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_sin_fila = 1;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    -- 1. Empleado por código único o, para QRs EMP_<empresa>_<id>_<ts>, por id
+    SELECT id, nombre, empresa_id INTO v_empleado_id, v_nombre, v_empresa_id
+    FROM EMPLEADOS WHERE codigo_qr_unico = p_codigo_qr AND activo = TRUE LIMIT 1;
+
+    IF v_empleado_id IS NULL AND p_codigo_qr LIKE 'EMP\_%'
+       AND LENGTH(p_codigo_qr) - LENGTH(REPLACE(p_codigo_qr, '_', '')) >= 2 THEN
+        SET v_token = SUBSTRING_INDEX(SUBSTRING_INDEX(p_codigo_qr, '_', 3), '_', -1);
+        IF v_token REGEXP '^[0-9]+$' THEN
+            SET v_sin_fila = 0;
+            SELECT id, nombre, empresa_id INTO v_empleado_id, v_nombre, v_empresa_id
+            FROM EMPLEADOS WHERE id = CAST(v_token AS UNSIGNED) AND activo = TRUE LIMIT 1;
+        END IF;
+    END IF;
+
+    -- 2. Escaneos del mismo empleado en fila: el bloqueo de su fila en EMPLEADOS hace atómicos
+    --    el anti-duplicado y el tracking, y evita que dos primeras marcaciones del día choquen
+    --    en el gap lock de ASISTENCIA (deadlock 1213)
+    START TRANSACTION;
+
+    IF v_empleado_id IS NOT NULL THEN
+        SELECT id INTO v_empleado_id FROM EMPLEADOS WHERE id = v_empleado_id FOR UPDATE;
+    END IF;
+
+    -- 3. Anti-duplicado
+    IF EXISTS (
+        SELECT 1 FROM ESCANEOS_TRACKING
+        WHERE codigo_qr = p_codigo_qr
+          AND timestamp_escaneo >= DATE_SUB(NOW(), INTERVAL p_segundos_duplicado SECOND)
+    ) THEN
+        COMMIT;
+        SELECT 'duplicado' AS resultado;
+        LEAVE proc;
+    END IF;
+
+    -- 4. Tracking
+    INSERT INTO ESCANEOS_TRACKING (codigo_qr, ip_address) VALUES (p_codigo_qr, p_ip_address);
+
+    IF v_empleado_id IS NULL THEN
+        COMMIT;
+        SELECT 'no_encontrado' AS resultado;
+        LEAVE proc;
+    END IF;
+
+    -- Horario de la empresa
+    SET v_sin_fila = 0;
+    SELECT entrada_manana, entrada_tarde INTO v_esperada_m, v_esperada_t
+    FROM HORARIOS_ESTANDAR WHERE empresa_id = v_empresa_id LIMIT 1;
+    SET v_esperada_m = COALESCE(v_esperada_m, p_entrada_manana_esperada);
+    SET v_esperada_t = COALESCE(v_esperada_t, p_entrada_tarde_esperada);
+
+    -- 5. Marcación del día (bloqueada hasta el COMMIT)
+    SET v_sin_fila = 0;
+    SELECT id, entrada_manana_real, salida_manana_real, entrada_tarde_real, salida_tarde_real,
+           total_horas_trabajadas, horas_normales, horas_extras, estado_dia,
+           asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde,
+           minutos_tardanza_manana, minutos_tardanza_tarde
+    INTO v_asistencia_id, v_em, v_sm, v_et, v_st,
+         v_total_horas, v_horas_normales, v_horas_extras, v_estado,
+         v_asistio_m, v_asistio_t, v_tard_m, v_tard_t,
+         v_min_tard_m, v_min_tard_t
+    FROM ASISTENCIA
+    WHERE empleado_id = v_empleado_id AND fecha = p_fecha
+    FOR UPDATE;
+
+    IF p_hora < p_hora_limite_manana THEN
+        IF v_em IS NULL THEN
+            SET v_em = p_hora, v_accion = 'entrada_manana';
+        ELSEIF v_sm IS NULL THEN
+            SET v_minutos = GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(p_hora, v_em)) / 60, 0));
+            IF v_minutos < p_minutos_minimos_estadia THEN
+                SET v_accion = 'espera';
+            ELSE
+                SET v_sm = p_hora, v_accion = 'salida_manana';
+            END IF;
+        ELSE
+            SET v_accion = 'manana_completo';
+        END IF;
+    ELSE
+        IF v_et IS NULL THEN
+            SET v_et = p_hora, v_accion = 'entrada_tarde';
+        ELSEIF v_st IS NULL THEN
+            SET v_minutos = GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(p_hora, v_et)) / 60, 0));
+            IF v_minutos < p_minutos_minimos_estadia THEN
+                SET v_accion = 'espera';
+            ELSE
+                SET v_st = p_hora, v_accion = 'salida_tarde';
+            END IF;
+        ELSE
+            SET v_accion = 'registro_completo';
+        END IF;
+    END IF;
+
+    IF v_accion IN ('entrada_manana', 'salida_manana', 'entrada_tarde', 'salida_tarde') THEN
+        SET v_asistio_m = (v_em IS NOT NULL AND v_sm IS NOT NULL);
+        SET v_asistio_t = (v_et IS NOT NULL AND v_st IS NOT NULL);
+
+        SET v_total = 0;
+        IF v_asistio_m THEN
+            SET v_total = v_total + GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(v_sm, v_em)) / 60, 0));
+        END IF;
+        IF v_asistio_t THEN
+            SET v_total = v_total + GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(v_st, v_et)) / 60, 0));
+        END IF;
+
+        SET v_total_horas = ROUND(v_total / 60, 2);
+        IF v_total > 480 THEN
+            SET v_horas_extras = ROUND((v_total - 480) / 60, 2), v_horas_normales = 8;
+        ELSE
+            SET v_horas_normales = ROUND(v_total / 60, 2), v_horas_extras = 0;
+        END IF;
+
+        SET v_estado = CASE
+            WHEN v_asistio_m AND v_asistio_t THEN 'COMPLETO'
+            WHEN v_asistio_m OR v_asistio_t THEN 'INCOMPLETO'
+            ELSE 'FALTA'
+        END;
+        -- Minutos completos de retraso (misma fórmula que minutos_tardanza() en Python)
+        SET v_min_tard_m = IF(v_em IS NULL, 0,
+            GREATEST(0, FLOOR((TIME_TO_SEC(v_em) - TIME_TO_SEC(v_esperada_m)) / 60)));
+        SET v_min_tard_t = IF(v_et IS NULL, 0,
+            GREATEST(0, FLOOR((TIME_TO_SEC(v_et) - TIME_TO_SEC(v_esperada_t)) / 60)));
+        SET v_tard_m = v_min_tard_m > 0;
+        SET v_tard_t = v_min_tard_t > 0;
+
+        INSERT INTO ASISTENCIA
+            (empleado_id, fecha, entrada_manana_real, salida_manana_real,
+             entrada_tarde_real, salida_tarde_real, total_horas_trabajadas,
+             horas_normales, horas_extras, estado_dia,
+             asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde,
+             minutos_tardanza_manana, minutos_tardanza_tarde)
+        VALUES
+            (v_empleado_id, p_fecha, v_em, v_sm, v_et, v_st, v_total_horas,
+             v_horas_normales, v_horas_extras, v_estado,
+             v_asistio_m, v_asistio_t, v_tard_m, v_tard_t,
+             v_min_tard_m, v_min_tard_t)
+        ON DUPLICATE KEY UPDATE
+            entrada_manana_real = VALUES(entrada_manana_real),
+            salida_manana_real = VALUES(salida_manana_real),
+            entrada_tarde_real = VALUES(entrada_tarde_real),
+            salida_tarde_real = VALUES(salida_tarde_real),
+            total_horas_trabajadas = VALUES(total_horas_trabajadas),
+            horas_normales = VALUES(horas_normales),
+            horas_extras = VALUES(horas_extras),
+            estado_dia = VALUES(estado_dia),
+            asistio_manana = VALUES(asistio_manana),
+            asistio_tarde = VALUES(asistio_tarde),
+            tardanza_manana = VALUES(tardanza_manana),
+            tardanza_tarde = VALUES(tardanza_tarde),
+            minutos_tardanza_manana = VALUES(minutos_tardanza_manana),
+            minutos_tardanza_tarde = VALUES(minutos_tardanza_tarde);
+    END IF;
+
+    COMMIT;
+
+    SELECT 'ok' AS resultado, v_accion AS accion, v_minutos AS minutos,
+           v_empleado_id AS empleado_id, v_empresa_id AS empresa_id, v_nombre AS nombre,
+           v_em AS entrada_manana_real, v_sm AS salida_manana_real,
+           v_et AS entrada_tarde_real, v_st AS salida_tarde_real,
+           v_total_horas AS total_horas_trabajadas, v_horas_normales AS horas_normales,
+           v_horas_extras AS horas_extras, v_estado AS estado_dia,
+           v_asistio_m AS asistio_manana, v_asistio_t AS asistio_tarde,
+           v_tard_m AS tardanza_manana, v_tard_t AS tardanza_tarde,
+           v_min_tard_m AS minutos_tardanza_manana, v_min_tard_t AS minutos_tardanza_tarde;
+END $$
+
+DELIMITER ;
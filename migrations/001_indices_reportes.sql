@@ -0,0 +1,6 @@
+-- Índices para los filtros de reportes y del escaneo.
+-- Los reportes filtran por rango semiabierto (a.fecha >= inicio AND a.fecha < fin), que puede
+-- usar idx_asistencia_fecha_empleado; los listados por empresa usan idx_empleados_empresa_activo.
+CREATE INDEX idx_empleados_empresa_activo ON EMPLEADOS (empresa_id, activo);
+CREATE INDEX idx_empleados_dni ON EMPLEADOS (dni);
+CREATE INDEX idx_asistencia_fecha_empleado ON ASISTENCIA (fecha, empleado_id);
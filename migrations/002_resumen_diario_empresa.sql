@@ -0,0 +1,17 @@
+-- Agregado diario por empresa del reporte semanal (src/infrastructure/daily_summary.py).
+-- Tras aplicarla, rellenar el histórico con:
+--   python -m src.infrastructure.daily_summary --desde 2025-01-01
+CREATE TABLE IF NOT EXISTS RESUMEN_DIARIO_EMPRESA (
+    empresa_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    empleados_presentes INT NOT NULL DEFAULT 0,
+    marcas_manana INT NOT NULL DEFAULT 0,
+    marcas_tarde INT NOT NULL DEFAULT 0,
+    tardanzas_manana INT NOT NULL DEFAULT 0,
+    tardanzas_tarde INT NOT NULL DEFAULT 0,
+    horas_extras DECIMAL(10,2) NOT NULL DEFAULT 0,
+    turnos_incompletos INT NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (empresa_id, fecha),
+    INDEX idx_resumen_fecha (fecha)
+);
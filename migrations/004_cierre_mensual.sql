@@ -0,0 +1,51 @@
+-- Cierre de planilla por empresa y mes (src/use_cases/close_month.py). Al cerrar se congela el
+-- resumen mensual de cada empleado (campos de calcular_estadisticas) y los minutos por día del
+-- Excel; los reportes del mes leen estas tablas en lugar de ASISTENCIA hasta que se reabra.
+-- Sin FK a EMPLEADOS: la foto sobrevive a bajas y cambios de empresa.
+CREATE TABLE IF NOT EXISTS CIERRES_MENSUALES (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    cerrado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    cerrado_por VARCHAR(100) NULL,
+    PRIMARY KEY (empresa_id, anio, mes),
+    FOREIGN KEY (empresa_id) REFERENCES EMPRESAS(id)
+);
+
+CREATE TABLE IF NOT EXISTS RESUMEN_MENSUAL_EMPLEADO (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    empleado_id INT NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    dni VARCHAR(20),
+    horas_normales DECIMAL(10,2) NOT NULL DEFAULT 0,
+    horas_extras DECIMAL(10,2) NOT NULL DEFAULT 0,
+    faltas INT NOT NULL DEFAULT 0,
+    retardos_manana INT NOT NULL DEFAULT 0,
+    retardos_tarde INT NOT NULL DEFAULT 0,
+    asistencias_completas INT NOT NULL DEFAULT 0,
+    asistencias_incompletas INT NOT NULL DEFAULT 0,
+    porcentaje_asistencia DECIMAL(5,2) NOT NULL DEFAULT 0,
+    turnos_manana INT NOT NULL DEFAULT 0,
+    turnos_tarde INT NOT NULL DEFAULT 0,
+    faltas_manana INT NOT NULL DEFAULT 0,
+    faltas_tarde INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (empresa_id, anio, mes, empleado_id)
+);
+
+-- minutos_* NULL = turno sin entrada o sin salida
+CREATE TABLE IF NOT EXISTS MINUTOS_DIARIOS_EMPLEADO (
+    empresa_id INT NOT NULL,
+    anio SMALLINT NOT NULL,
+    mes TINYINT NOT NULL,
+    empleado_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    entrada_manana TIME NULL,
+    salida_manana TIME NULL,
+    entrada_tarde TIME NULL,
+    salida_tarde TIME NULL,
+    minutos_manana SMALLINT UNSIGNED NULL,
+    minutos_tarde SMALLINT UNSIGNED NULL,
+    PRIMARY KEY (empresa_id, anio, mes, empleado_id, fecha)
+);
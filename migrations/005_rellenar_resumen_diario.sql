@@ -0,0 +1,29 @@
+-- Rellena RESUMEN_DIARIO_EMPRESA con el histórico de ASISTENCIA: la 002 crea la tabla vacía y el
+-- reporte semanal de fechas anteriores salía en cero. Mismo agregado que _SELECT_AGREGADO de
+-- src/infrastructure/daily_summary.py (va después de la 003 porque usa minutos_tardanza_*).
+-- Re-aplicarla recalcula las filas existentes con los mismos valores.
+INSERT INTO RESUMEN_DIARIO_EMPRESA
+    (empresa_id, fecha, empleados_presentes, marcas_manana, marcas_tarde,
+     tardanzas_manana, tardanzas_tarde, horas_extras, turnos_incompletos)
+SELECT e.empresa_id, a.fecha,
+       COUNT(DISTINCT CASE WHEN a.entrada_manana_real IS NOT NULL
+                             OR a.entrada_tarde_real IS NOT NULL THEN a.empleado_id END),
+       COUNT(a.entrada_manana_real),
+       COUNT(a.entrada_tarde_real),
+       COUNT(CASE WHEN a.minutos_tardanza_manana > 0 THEN 1 END),
+       COUNT(CASE WHEN a.minutos_tardanza_tarde > 0 THEN 1 END),
+       COALESCE(SUM(a.horas_extras), 0),
+       COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL THEN 1 END) +
+       COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 1 END)
+FROM ASISTENCIA a
+JOIN EMPLEADOS e ON e.id = a.empleado_id
+WHERE e.activo = TRUE
+GROUP BY e.empresa_id, a.fecha
+ON DUPLICATE KEY UPDATE
+    empleados_presentes = VALUES(empleados_presentes),
+    marcas_manana = VALUES(marcas_manana),
+    marcas_tarde = VALUES(marcas_tarde),
+    tardanzas_manana = VALUES(tardanzas_manana),
+    tardanzas_tarde = VALUES(tardanzas_tarde),
+    horas_extras = VALUES(horas_extras),
+    turnos_incompletos = VALUES(turnos_incompletos);
@@ -0,0 +1,219 @@
+-- sp_registrar_escaneo sin deadlocks entre escaneos simultáneos del mismo empleado.
+-- Antes, el anti-duplicado y el INSERT del tracking corrían fuera de la transacción y la
+-- primera marcación del día tomaba un gap lock en ASISTENCIA (SELECT ... FOR UPDATE sin fila):
+-- dos escaneos a la vez pasaban el anti-duplicado y sus INSERT se bloqueaban entre sí (1213).
+-- Ahora todo va en una transacción que empieza bloqueando la fila del empleado en EMPLEADOS.
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS sp_registrar_escaneo $$
+CREATE PROCEDURE sp_registrar_escaneo(
+    IN p_codigo_qr VARCHAR(100),
+    IN p_ip_address VARCHAR(45),
+    IN p_fecha DATE,
+    IN p_hora TIME,
+    IN p_segundos_duplicado INT,
+    IN p_hora_limite_manana TIME,
+    IN p_minutos_minimos_estadia INT,
+    IN p_entrada_manana_esperada TIME,
+    IN p_entrada_tarde_esperada TIME
+)
+proc: BEGIN
+    DECLARE v_empleado_id INT DEFAULT NULL;
+    DECLARE v_nombre VARCHAR(100) DEFAULT NULL;
+    DECLARE v_empresa_id INT DEFAULT NULL;
+    DECLARE v_token VARCHAR(100) DEFAULT NULL;
+    DECLARE v_sin_fila TINYINT DEFAULT 0;
+    DECLARE v_asistencia_id INT DEFAULT NULL;
+    DECLARE v_em TIME DEFAULT NULL;
+    DECLARE v_sm TIME DEFAULT NULL;
+    DECLARE v_et TIME DEFAULT NULL;
+    DECLARE v_st TIME DEFAULT NULL;
+    DECLARE v_total_horas DECIMAL(5,2) DEFAULT 0;
+    DECLARE v_horas_normales DECIMAL(5,2) DEFAULT 8;
+    DECLARE v_horas_extras DECIMAL(5,2) DEFAULT 0;
+    DECLARE v_estado VARCHAR(20) DEFAULT 'INCOMPLETO';
+    DECLARE v_asistio_m TINYINT DEFAULT 0;
+    DECLARE v_asistio_t TINYINT DEFAULT 0;
+    DECLARE v_tard_m TINYINT DEFAULT 0;
+    DECLARE v_tard_t TINYINT DEFAULT 0;
+    DECLARE v_esperada_m TIME DEFAULT NULL;
+    DECLARE v_esperada_t TIME DEFAULT NULL;
+    DECLARE v_min_tard_m INT DEFAULT 0;
+    DECLARE v_min_tard_t INT DEFAULT 0;
+    DECLARE v_accion VARCHAR(20) DEFAULT NULL;
+    DECLARE v_minutos INT DEFAULT 0;
+    DECLARE v_total INT DEFAULT 0;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_sin_fila = 1;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    -- 1. Empleado por código único o, para QRs EMP_<empresa>_<id>_<ts>, por id
+    SELECT id, nombre, empresa_id INTO v_empleado_id, v_nombre, v_empresa_id
+    FROM EMPLEADOS WHERE codigo_qr_unico = p_codigo_qr AND activo = TRUE LIMIT 1;
+
+    IF v_empleado_id IS NULL AND p_codigo_qr LIKE 'EMP\_%'
+       AND LENGTH(p_codigo_qr) - LENGTH(REPLACE(p_codigo_qr, '_', '')) >= 2 THEN
+        SET v_token = SUBSTRING_INDEX(SUBSTRING_INDEX(p_codigo_qr, '_', 3), '_', -1);
+        IF v_token REGEXP '^[0-9]+$' THEN
+            SET v_sin_fila = 0;
+            SELECT id, nombre, empresa_id INTO v_empleado_id, v_nombre, v_empresa_id
+            FROM EMPLEADOS WHERE id = CAST(v_token AS UNSIGNED) AND activo = TRUE LIMIT 1;
+        END IF;
+    END IF;
+
+    -- 2. Escaneos del mismo empleado en fila: el bloqueo de su fila en EMPLEADOS hace atómicos
+    --    el anti-duplicado y el tracking, y evita que dos primeras marcaciones del día choquen
+    --    en el gap lock de ASISTENCIA (deadlock 1213)
+    START TRANSACTION;
+
+    IF v_empleado_id IS NOT NULL THEN
+        SELECT id INTO v_empleado_id FROM EMPLEADOS WHERE id = v_empleado_id FOR UPDATE;
+    END IF;
+
+    -- 3. Anti-duplicado
+    IF EXISTS (
+        SELECT 1 FROM ESCANEOS_TRACKING
+        WHERE codigo_qr = p_codigo_qr
+          AND timestamp_escaneo >= DATE_SUB(NOW(), INTERVAL p_segundos_duplicado SECOND)
+    ) THEN
+        COMMIT;
+        SELECT 'duplicado' AS resultado;
+        LEAVE proc;
+    END IF;
+
+    -- 4. Tracking
+    INSERT INTO ESCANEOS_TRACKING (codigo_qr, ip_address) VALUES (p_codigo_qr, p_ip_address);
+
+    IF v_empleado_id IS NULL THEN
+        COMMIT;
+        SELECT 'no_encontrado' AS resultado;
+        LEAVE proc;
+    END IF;
+
+    -- Horario de la empresa
+    SET v_sin_fila = 0;
+    SELECT entrada_manana, entrada_tarde INTO v_esperada_m, v_esperada_t
+    FROM HORARIOS_ESTANDAR WHERE empresa_id = v_empresa_id LIMIT 1;
+    SET v_esperada_m = COALESCE(v_esperada_m, p_entrada_manana_esperada);
+    SET v_esperada_t = COALESCE(v_esperada_t, p_entrada_tarde_esperada);
+
+    -- 5. Marcación del día (bloqueada hasta el COMMIT)
+    SET v_sin_fila = 0;
+    SELECT id, entrada_manana_real, salida_manana_real, entrada_tarde_real, salida_tarde_real,
+           total_horas_trabajadas, horas_normales, horas_extras, estado_dia,
+           asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde,
+           minutos_tardanza_manana, minutos_tardanza_tarde
+    INTO v_asistencia_id, v_em, v_sm, v_et, v_st,
+         v_total_horas, v_horas_normales, v_horas_extras, v_estado,
+         v_asistio_m, v_asistio_t, v_tard_m, v_tard_t,
+         v_min_tard_m, v_min_tard_t
+    FROM ASISTENCIA
+    WHERE empleado_id = v_empleado_id AND fecha = p_fecha
+    FOR UPDATE;
+
+    IF p_hora < p_hora_limite_manana THEN
+        IF v_em IS NULL THEN
+            SET v_em = p_hora, v_accion = 'entrada_manana';
+        ELSEIF v_sm IS NULL THEN
+            SET v_minutos = GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(p_hora, v_em)) / 60, 0));
+            IF v_minutos < p_minutos_minimos_estadia THEN
+                SET v_accion = 'espera';
+            ELSE
+                SET v_sm = p_hora, v_accion = 'salida_manana';
+            END IF;
+        ELSE
+            SET v_accion = 'manana_completo';
+        END IF;
+    ELSE
+        IF v_et IS NULL THEN
+            SET v_et = p_hora, v_accion = 'entrada_tarde';
+        ELSEIF v_st IS NULL THEN
+            SET v_minutos = GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(p_hora, v_et)) / 60, 0));
+            IF v_minutos < p_minutos_minimos_estadia THEN
+                SET v_accion = 'espera';
+            ELSE
+                SET v_st = p_hora, v_accion = 'salida_tarde';
+            END IF;
+        ELSE
+            SET v_accion = 'registro_completo';
+        END IF;
+    END IF;
+
+    IF v_accion IN ('entrada_manana', 'salida_manana', 'entrada_tarde', 'salida_tarde') THEN
+        SET v_asistio_m = (v_em IS NOT NULL AND v_sm IS NOT NULL);
+        SET v_asistio_t = (v_et IS NOT NULL AND v_st IS NOT NULL);
+
+        SET v_total = 0;
+        IF v_asistio_m THEN
+            SET v_total = v_total + GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(v_sm, v_em)) / 60, 0));
+        END IF;
+        IF v_asistio_t THEN
+            SET v_total = v_total + GREATEST(0, TRUNCATE(TIME_TO_SEC(TIMEDIFF(v_st, v_et)) / 60, 0));
+        END IF;
+
+        SET v_total_horas = ROUND(v_total / 60, 2);
+        IF v_total > 480 THEN
+            SET v_horas_extras = ROUND((v_total - 480) / 60, 2), v_horas_normales = 8;
+        ELSE
+            SET v_horas_normales = ROUND(v_total / 60, 2), v_horas_extras = 0;
+        END IF;
+
+        SET v_estado = CASE
+            WHEN v_asistio_m AND v_asistio_t THEN 'COMPLETO'
+            WHEN v_asistio_m OR v_asistio_t THEN 'INCOMPLETO'
+            ELSE 'FALTA'
+        END;
+        -- Minutos completos de retraso (misma fórmula que minutos_tardanza() en Python)
+        SET v_min_tard_m = IF(v_em IS NULL, 0,
+            GREATEST(0, FLOOR((TIME_TO_SEC(v_em) - TIME_TO_SEC(v_esperada_m)) / 60)));
+        SET v_min_tard_t = IF(v_et IS NULL, 0,
+            GREATEST(0, FLOOR((TIME_TO_SEC(v_et) - TIME_TO_SEC(v_esperada_t)) / 60)));
+        SET v_tard_m = v_min_tard_m > 0;
+        SET v_tard_t = v_min_tard_t > 0;
+
+        INSERT INTO ASISTENCIA
+            (empleado_id, fecha, entrada_manana_real, salida_manana_real,
+             entrada_tarde_real, salida_tarde_real, total_horas_trabajadas,
+             horas_normales, horas_extras, estado_dia,
+             asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde,
+             minutos_tardanza_manana, minutos_tardanza_tarde)
+        VALUES
+            (v_empleado_id, p_fecha, v_em, v_sm, v_et, v_st, v_total_horas,
+             v_horas_normales, v_horas_extras, v_estado,
+             v_asistio_m, v_asistio_t, v_tard_m, v_tard_t,
+             v_min_tard_m, v_min_tard_t)
+        ON DUPLICATE KEY UPDATE
+            entrada_manana_real = VALUES(entrada_manana_real),
+            salida_manana_real = VALUES(salida_manana_real),
+            entrada_tarde_real = VALUES(entrada_tarde_real),
+            salida_tarde_real = VALUES(salida_tarde_real),
+            total_horas_trabajadas = VALUES(total_horas_trabajadas),
+            horas_normales = VALUES(horas_normales),
+            horas_extras = VALUES(horas_extras),
+            estado_dia = VALUES(estado_dia),
+            asistio_manana = VALUES(asistio_manana),
+            asistio_tarde = VALUES(asistio_tarde),
+            tardanza_manana = VALUES(tardanza_manana),
+            tardanza_tarde = VALUES(tardanza_tarde),
+            minutos_tardanza_manana = VALUES(minutos_tardanza_manana),
+            minutos_tardanza_tarde = VALUES(minutos_tardanza_tarde);
+    END IF;
+
+    COMMIT;
+
+    SELECT 'ok' AS resultado, v_accion AS accion, v_minutos AS minutos,
+           v_empleado_id AS empleado_id, v_empresa_id AS empresa_id, v_nombre AS nombre,
+           v_em AS entrada_manana_real, v_sm AS salida_manana_real,
+           v_et AS entrada_tarde_real, v_st AS salida_tarde_real,
+           v_total_horas AS total_horas_trabajadas, v_horas_normales AS horas_normales,
+           v_horas_extras AS horas_extras, v_estado AS estado_dia,
+           v_asistio_m AS asistio_manana, v_asistio_t AS asistio_tarde,
+           v_tard_m AS tardanza_manana, v_tard_t AS tardanza_tarde,
+           v_min_tard_m AS minutos_tardanza_manana, v_min_tard_t AS minutos_tardanza_tarde;
+END $$
+
+
+DELIMITER ;
@@ -2,6 +2,8 @@ from datetime import datetime, time
 from typing import Optional
 
 class Empresa:
+    __slots__ = ('id', 'nombre', 'codigo_empresa', 'created_at', 'updated_at')
+
     def __init__(self, id: int = None, nombre: str = "", codigo_empresa: str = ""):
         self.id = id
         self.nombre = nombre
@@ -10,6 +12,9 @@ class Empresa:
         self.updated_at: Optional[datetime] = None
 
 class Empleado:
+    __slots__ = ('id', 'empresa_id', 'nombre', 'dni', 'codigo_qr_unico', 'telefono',
+                 'correo', 'activo', 'fecha_registro')
+
     def __init__(self, id: int = None, empresa_id: int = None, nombre: str = "", 
                  dni: str = "", codigo_qr_unico: str = "", telefono: str = "", 
                  correo: str = "", activo: bool = True):
@@ -24,6 +29,8 @@ class Empleado:
         self.fecha_registro: Optional[datetime] = None
 
 class HorarioEstandar:
+    __slots__ = ('id', 'empresa_id', 'entrada_manana', 'salida_manana', 'entrada_tarde', 'salida_tarde')
+
     def __init__(self, id: int = None, empresa_id: int = None,
                  entrada_manana: time = time(6, 50),
                  salida_manana: time = time(12, 50),
@@ -40,6 +47,13 @@ from datetime import datetime, time
 from typing import Optional
 
 class Asistencia:
+    # Sin __dict__ por instancia: los reportes mensuales cargan miles de filas
+    __slots__ = ('id', 'empleado_id', 'fecha', 'entrada_manana_real', 'salida_manana_real',
+                 'entrada_tarde_real', 'salida_tarde_real', 'total_horas_trabajadas',
+                 'horas_normales', 'horas_extras', 'estado_dia', 'asistio_manana', 'asistio_tarde',
+                 'tardanza_manana', 'tardanza_tarde', 'minutos_tardanza_manana', 'minutos_tardanza_tarde',
+                 'created_at', 'updated_at')
+
     def __init__(self, id: int = None, empleado_id: int = None, fecha: str = "",
                  entrada_manana_real: time = None, salida_manana_real: time = None,
                  entrada_tarde_real: time = None, salida_tarde_real: time = None,
@@ -62,12 +76,18 @@ class Asistencia:
         self.asistio_tarde: bool = False
         self.tardanza_manana: bool = False
         self.tardanza_tarde: bool = False
+        # Minutos de retraso según el horario de la empresa (tardanza_* = minutos > 0)
+        self.minutos_tardanza_manana: int = 0
+        self.minutos_tardanza_tarde: int = 0
         
         # Campos de auditoría
         self.created_at: Optional[datetime] = None
         self.updated_at: Optional[datetime] = None
 
 class Administrador:
+    __slots__ = ('id', 'empresa_id', 'nombre', 'usuario', 'password_hash', 'telefono',
+                 'correo', 'rol', 'activo', 'created_at')
+
     def __init__(self, id: int = None, empresa_id: int = None, nombre: str = "",
                  usuario: str = "", password_hash: str = "", telefono: str = "",
                  correo: str = "", rol: str = "ADMIN_EMPRESA", activo: bool = True):
@@ -83,6 +103,9 @@ class Administrador:
         self.created_at: Optional[datetime] = None
 
 class ConfigAlertas:
+    __slots__ = ('id', 'empresa_id', 'numero_faltas_para_alerta', 'mensaje_whatsapp_falta',
+                 'mensaje_whatsapp_admin', 'activo')
+
     def __init__(self, id: int = None, empresa_id: int = None,
                  numero_faltas_para_alerta: int = 4,
                  mensaje_whatsapp_falta: str = "",
@@ -95,6 +118,8 @@ class ConfigAlertas:
         self.activo = activo
 
 class EscaneoTracking:
+    __slots__ = ('id', 'codigo_qr', 'ip_address', 'timestamp_escaneo')
+
     def __init__(self, id: int = None, codigo_qr: str = "", ip_address: str = ""):
         self.id = id
         self.codigo_qr = codigo_qr
@@ -1,7 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from .entities import *
-from datetime import timedelta, time
+from datetime import datetime, timedelta, time
+
+# Código numérico de estado_dia en las filas de estadísticas: posición + 1 (0 = otro valor),
+# igual que FIELD(estado_dia, 'FALTA', 'COMPLETO', 'INCOMPLETO') en MySQL
+ESTADOS_DIA = ('FALTA', 'COMPLETO', 'INCOMPLETO')
+
+# Estadísticas mensuales por empleado (las de calcular_estadisticas), en el orden de las columnas
+# de RESUMEN_MENSUAL_EMPLEADO
+CAMPOS_ESTADISTICAS = ('horas_normales', 'horas_extras', 'faltas', 'retardos_manana', 'retardos_tarde',
+                       'asistencias_completas', 'asistencias_incompletas', 'porcentaje_asistencia',
+                       'turnos_manana', 'turnos_tarde', 'faltas_manana', 'faltas_tarde')
 
 
 def convertir_a_time(valor) -> Optional[time]:
@@ -32,6 +42,19 @@ def convertir_a_time(valor) -> Optional[time]:
     return None
 
 
+def minutos_tardanza(entrada: Optional[time], esperada: time) -> int:
+    """
+    Minutos completos de retraso respecto a la hora esperada (0 si llegó a tiempo o no marcó).
+    Misma fórmula que la BD (FLOOR((TIME_TO_SEC(real) - TIME_TO_SEC(esperada)) / 60)); los
+    microsegundos se redondean como al guardarse en una columna TIME.
+    """
+    if entrada is None:
+        return 0
+    segundos = entrada.hour * 3600 + entrada.minute * 60 + entrada.second + (entrada.microsecond >= 500000)
+    diferencia = segundos - (esperada.hour * 3600 + esperada.minute * 60 + esperada.second)
+    return max(0, diferencia // 60)
+
+
 class EmpresaRepository(ABC):
     @abstractmethod
     def get_all(self) -> List[Empresa]:
@@ -68,6 +91,11 @@ class EmpleadoRepository(ABC):
     def get_by_empresa_id(self, empresa_id: int) -> List[Empleado]:
         pass
     
+    @abstractmethod
+    def get_empresa_id(self, id: int) -> Optional[int]:
+        """Empresa del empleado aunque esté inactivo (None si no existe)"""
+        pass
+    
     @abstractmethod
     def get_by_codigo_qr(self, codigo_qr: str) -> Optional[Empleado]:
         pass
@@ -99,6 +127,47 @@ class AsistenciaRepository(ABC):
     def get_by_empleado_and_periodo(self, empleado_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
         pass
     
+    @abstractmethod
+    def get_by_empresa_and_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
+        """Asistencias de los empleados activos de una empresa en el periodo, ordenadas por empleado y fecha"""
+        pass
+    
+    @abstractmethod
+    def get_filas_estadisticas(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        """
+        Igual que get_by_empresa_and_periodo pero solo con números, listo para el motor columnar:
+        (empleado_id, estado (ver ESTADOS_DIA), centésimas de horas_normales, centésimas de
+         horas_extras, asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde), todo entero
+        """
+        pass
+    
+    @abstractmethod
+    def get_horas_reales(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        """
+        Solo las cuatro marcaciones de cada asistencia de la empresa en el periodo (para el Excel):
+        (empleado_id, fecha 'YYYY-MM-DD', entrada_manana, salida_manana, entrada_tarde, salida_tarde)
+        con las horas como time o None
+        """
+        pass
+    
+    @abstractmethod
+    def get_version_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> Tuple[Optional[datetime], int]:
+        """
+        (último updated_at, cantidad de filas) de las asistencias de la empresa en el periodo:
+        cambia con cualquier alta, edición o borrado, así que sirve de versión de esos datos
+        """
+        pass
+    
+    @abstractmethod
+    def get_tablero_dia(self, fecha: str, empleado_id: Optional[int] = None) -> List[tuple]:
+        """
+        Empleados activos (todas las empresas, o solo `empleado_id`) con su asistencia de `fecha`:
+        (empleado_id, empresa_id, nombre, tiene asistencia, entrada_manana, salida_manana,
+         entrada_tarde, salida_tarde, minutos_tardanza_manana, minutos_tardanza_tarde);
+        sin asistencia ese día las horas van en None y los minutos en 0
+        """
+        pass
+    
     @abstractmethod
     def create(self, asistencia: Asistencia) -> Asistencia:
         pass
@@ -123,6 +192,48 @@ class AsistenciaRepository(ABC):
         pass
 
 
+class CierreMensualRepository(ABC):
+    """Foto de un mes cerrado de una empresa, que reemplaza a ASISTENCIA en los reportes de ese mes"""
+
+    @abstractmethod
+    def get_cierre(self, empresa_id: int, anio: int, mes: int) -> Optional[datetime]:
+        """Cuándo se cerró el mes (None = mes abierto)"""
+        pass
+
+    @abstractmethod
+    def get_meses_cerrados(self, empresa_id: int) -> List[Tuple[int, int, datetime]]:
+        """[(anio, mes, cerrado_en)] de la empresa, del más reciente al más antiguo"""
+        pass
+
+    @abstractmethod
+    def get_resumenes(self, empresa_id: int, anio: int, mes: int) -> List[dict]:
+        """
+        Un dict por empleado ({"empleado_id", "nombre", "dni"} más CAMPOS_ESTADISTICAS) tal como
+        quedaron al cerrar, ordenados por nombre
+        """
+        pass
+
+    @abstractmethod
+    def get_minutos_diarios(self, empresa_id: int, anio: int, mes: int) -> List[tuple]:
+        """
+        (empleado_id, fecha 'YYYY-MM-DD', entrada_manana, salida_manana, entrada_tarde, salida_tarde,
+         minutos_manana, minutos_tarde) de cada día con marcaciones; minutos None si el turno quedó
+        incompleto
+        """
+        pass
+
+    @abstractmethod
+    def guardar_cierre(self, empresa_id: int, anio: int, mes: int, resumenes: List[dict],
+                       minutos_diarios: List[tuple], cerrado_por: Optional[str] = None) -> bool:
+        """Reemplaza la foto del mes en una sola transacción (cerrar otra vez la reconstruye)"""
+        pass
+
+    @abstractmethod
+    def reabrir(self, empresa_id: int, anio: int, mes: int) -> bool:
+        """Borra la foto: los reportes del mes vuelven a leer ASISTENCIA"""
+        pass
+
+
 class HorarioEstandarRepository(ABC):
     @abstractmethod
     def get_by_empresa_id(self, empresa_id: int) -> Optional[HorarioEstandar]:
@@ -144,4 +255,45 @@ class EscaneoTrackingRepository(ABC):
     
     @abstractmethod
     def existe_registro_reciente(self, codigo_qr: str, segundos: int) -> bool:
-        pass
\ No newline at end of file
+        pass
+
+
+class RegistroEscaneoRepository(ABC):
+    @abstractmethod
+    def registrar_escaneo(self, codigo_qr: str, ip_address: str, fecha: str, hora_actual: time,
+                          segundos_duplicado: int, hora_limite_manana: time,
+                          minutos_minimos_estadia: int, entrada_manana_esperada: time,
+                          entrada_tarde_esperada: time) -> Optional[dict]:
+        """
+        Registra un escaneo completo (anti-duplicado, tracking, empleado y marcación)
+        en una sola operación del lado del servidor
+        """
+        pass
+
+
+class ReporteSemanalRepository(ABC):
+    """Lecturas del dashboard semanal (solo empleados activos)"""
+
+    @abstractmethod
+    def get_empleados_activos(self, empresa_id: Optional[int] = None) -> List[tuple]:
+        """(id, nombre, empresa_id) ordenados por nombre"""
+        pass
+
+    @abstractmethod
+    def get_marcaciones(self, fecha_inicio: str, fecha_fin: str, empresa_id: Optional[int] = None) -> List[tuple]:
+        """
+        (empleado_id, fecha 'YYYY-MM-DD', entrada_manana_real, entrada_tarde_real,
+        minutos_tardanza_manana, minutos_tardanza_tarde) con horas como time
+        """
+        pass
+
+    @abstractmethod
+    def get_resumen_por_dia(self, fecha_inicio: str, fecha_fin: str, empresa_id: Optional[int] = None) -> Dict[str, dict]:
+        """Totales diarios del agregado RESUMEN_DIARIO_EMPRESA por fecha 'YYYY-MM-DD'"""
+        pass
+
+    @abstractmethod
+    def get_presentes_por_empresa(self, fecha_inicio: str, fecha_fin: str,
+                                  empresa_id: Optional[int] = None) -> List[tuple]:
+        """(empresa_id, nombre, empleados activos, días-empleado presentes)"""
+        pass
@@ -0,0 +1,123 @@
+"""
+SQL de las rutas de administración que consultan ASISTENCIA directo (sin repositorio).
+
+Cada función devuelve (sql, params) listos para el cursor; las rutas de app.py y el chequeo de
+planes (tests/test_explain_plans.py) usan las mismas, así un cambio en una consulta también se
+revisa con EXPLAIN.
+"""
+from typing import List, Optional, Tuple
+
+from .date_ranges import rango_mes, rango_semiabierto
+
+# Columnas de asistencia por turno en los tops del reporte semanal
+_COLUMNAS_TURNO = {
+    'manana': ('a.entrada_manana_real', 'a.minutos_tardanza_manana'),
+    'tarde': ('a.entrada_tarde_real', 'a.minutos_tardanza_tarde'),
+}
+
+
+def consulta_marcaciones_incompletas(anio: int, mes: int, empresa_id: Optional[int] = None) -> Tuple[str, List]:
+    """Asistencias del mes con entrada y sin salida en algún turno (api_incomplete_markings)"""
+    empresa_filter = "AND emp.id = %s" if empresa_id else ""
+    params = list(rango_mes(anio, mes))
+    if empresa_id:
+        params.append(empresa_id)
+    sql = f"""
+        SELECT
+            a.id,
+            a.empleado_id,
+            e.nombre as empleado_nombre,
+            emp.nombre as empresa_nombre,
+            a.fecha,
+            a.entrada_manana_real,
+            a.salida_manana_real,
+            a.entrada_tarde_real,
+            a.salida_tarde_real,
+            CASE
+                WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL THEN 'mañana'
+                WHEN a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 'tarde'
+                WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL
+                     AND a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 'ambos'
+            END as turno_incompleto
+        FROM ASISTENCIA a
+        JOIN EMPLEADOS e ON a.empleado_id = e.id
+        JOIN EMPRESAS emp ON e.empresa_id = emp.id
+        WHERE a.fecha >= %s AND a.fecha < %s
+          AND e.activo = TRUE
+          AND (
+              (a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL) OR
+              (a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL)
+          )
+          {empresa_filter}
+        ORDER BY a.fecha DESC, e.nombre ASC
+    """
+    return sql, params
+
+
+def consulta_registros_asistencia(empresa_id: int, anio: int, mes: int,
+                                  empleado_id: Optional[int] = None) -> Tuple[str, List]:
+    """Marcaciones del mes de una empresa (o de un empleado) para api_attendance_records"""
+    # Query simplificado - Solo las horas de entrada y salida
+    sql = """
+        SELECT
+            a.id as asistencia_id,
+            a.empleado_id,
+            e.nombre as empleado_nombre,
+            emp.nombre as empresa_nombre,
+            a.fecha,
+            a.entrada_manana_real,
+            a.salida_manana_real,
+            a.entrada_tarde_real,
+            a.salida_tarde_real
+        FROM ASISTENCIA a
+        JOIN EMPLEADOS e ON a.empleado_id = e.id
+        JOIN EMPRESAS emp ON e.empresa_id = emp.id
+        WHERE a.fecha >= %s AND a.fecha < %s
+          AND emp.id = %s
+    """
+    params = [*rango_mes(anio, mes), empresa_id]
+    if empleado_id:
+        sql += " AND e.id = %s"
+        params.append(empleado_id)
+    sql += " ORDER BY a.fecha DESC, e.nombre ASC"
+    return sql, params
+
+
+def consulta_top_turno(turno: str, tardanzas: bool, fecha_inicio: str, fecha_fin: str,
+                       empresa_id: Optional[int] = None) -> Tuple[str, List]:
+    """
+    Top 5 del turno ('manana' o 'tarde') en el periodo: los más puntuales (sin retraso según el
+    horario de la empresa, minutos guardados al marcar) o, con tardanzas=True, los que más llegan
+    tarde. Columnas: nombre, puntualidades|tardanzas, total_ingresos.
+    """
+    entrada, minutos = _COLUMNAS_TURNO[turno]
+    if tardanzas:
+        alias, condicion, join = "tardanzas", f"{minutos} > 0", "INNER JOIN"
+    else:
+        alias, condicion, join = "puntualidades", f"{minutos} = 0", "LEFT JOIN"
+    empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
+    params = list(rango_semiabierto(fecha_inicio, fecha_fin))
+    if empresa_id:
+        params.append(empresa_id)
+    sql = f"""
+        SELECT
+            e.nombre,
+            COUNT(CASE
+                WHEN {entrada} IS NOT NULL
+                     AND {condicion}
+                THEN 1
+            END) as {alias},
+            COUNT(CASE
+                WHEN {entrada} IS NOT NULL
+                THEN 1
+            END) as total_ingresos
+        FROM EMPLEADOS e
+        {join} ASISTENCIA a ON e.id = a.empleado_id
+            AND a.fecha >= %s AND a.fecha < %s
+        WHERE e.activo = TRUE {empresa_filter}
+        GROUP BY e.id, e.nombre
+        HAVING {alias} > 0
+        ORDER BY {alias} DESC, total_ingresos DESC
+        LIMIT 5
+    """
+    return sql, params
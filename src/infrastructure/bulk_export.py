@@ -0,0 +1,252 @@
+"""
+Export masivo del cierre de planilla: un Excel por (empresa, mes) en un pool de procesos.
+
+Cada libro lo arma ExportadorExcelMensual (el mismo del export individual, con la misma caché de
+artefactos) dentro de un proceso del pool, que tiene sus propias conexiones a MySQL. El proceso
+web solo va metiendo en un ZIP los libros a medida que terminan y entrega el ZIP en streaming.
+El progreso de cada lote queda consultable por su id (en memoria de este proceso).
+"""
+import atexit
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
+
+from .excel_export import ExportadorExcelMensual
+from .mysql_connection import MySQLConnection
+from .report_artifacts import CacheArtefactos
+from .repositories_mysql import (
+    AsistenciaRepositoryMySQL, CierreMensualRepositoryMySQL, EmpleadoRepositoryMySQL, EmpresaRepositoryMySQL
+)
+
+TAMANO_TROZO = 64 * 1024
+_PATRON_LOTE = re.compile(r'^[\w\-]{1,64}$')
+
+# Estado de cada proceso del pool (lo arma _iniciar_proceso)
+_exportador = None
+
+
+def _iniciar_proceso():
+    global _exportador
+    db = MySQLConnection()
+    _exportador = ExportadorExcelMensual(
+        EmpresaRepositoryMySQL(db), EmpleadoRepositoryMySQL(db), AsistenciaRepositoryMySQL(db),
+        CacheArtefactos.desde_entorno(), CierreMensualRepositoryMySQL(db)
+    )
+
+
+def _generar_libro(empresa_id: int, anio: int, mes: int, directorio: str) -> Tuple[str, str]:
+    """Corre en el pool: deja el libro en `directorio` y devuelve (ruta, nombre de descarga)"""
+    solicitud = _exportador.preparar(empresa_id, anio, mes)
+    destino = os.path.join(directorio, f"{empresa_id}-{anio}-{mes:02d}.xlsx")
+    ruta = _exportador.en_cache(solicitud)
+    if ruta is not None:
+        shutil.copyfile(ruta, destino)
+    else:
+        with open(destino, 'wb') as archivo:
+            for trozo in _exportador.generar(solicitud):
+                archivo.write(trozo)
+    return destino, solicitud.nombre_archivo
+
+
+def meses_entre(desde: str, hasta: str) -> List[Tuple[int, int]]:
+    """'YYYY-MM' a 'YYYY-MM' inclusivo -> [(anio, mes)]; ValueError si el rango no es válido"""
+    anio, mes = (int(parte) for parte in desde.split('-'))
+    anio_fin, mes_fin = (int(parte) for parte in hasta.split('-'))
+    if not (1 <= mes <= 12 and 1 <= mes_fin <= 12) or (anio, mes) > (anio_fin, mes_fin):
+        raise ValueError(f"rango de meses inválido: {desde} a {hasta}")
+    meses = []
+    while (anio, mes) <= (anio_fin, mes_fin):
+        meses.append((anio, mes))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+class LoteExportacion:
+    __slots__ = ("id", "total", "completados", "errores", "estado", "iniciado", "terminado", "_lock")
+
+    def __init__(self, id: str, total: int):
+        self.id = id
+        self.total = total
+        self.completados = 0
+        self.errores = []
+        self.estado = 'en_curso'
+        self.iniciado = time.time()
+        self.terminado = None
+        self._lock = threading.Lock()
+
+    def completar(self):
+        with self._lock:
+            self.completados += 1
+
+    def fallar(self, empresa_id: int, anio: int, mes: int, error: Exception):
+        with self._lock:
+            self.errores.append(f"empresa {empresa_id} {anio}-{mes:02d}: {error}")
+
+    def terminar(self, estado: str):
+        with self._lock:
+            self.estado = estado
+            self.terminado = time.time()
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            procesados = self.completados + len(self.errores)
+            fin = self.terminado or time.time()
+            return {
+                "id": self.id,
+                "status": self.estado,
+                "total": self.total,
+                "completed": self.completados,
+                "failed": len(self.errores),
+                "percent": round(100.0 * procesados / self.total, 1) if self.total else 100.0,
+                "elapsed_s": round(fin - self.iniciado, 2),
+                "errors": list(self.errores),
+            }
+
+
+class _BufferZip:
+    """Destino sin seek del ZipFile: acumula lo escrito hasta que el generador lo vacía"""
+
+    def __init__(self):
+        self._datos = bytearray()
+
+    def write(self, datos) -> int:
+        self._datos += datos
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    @property
+    def pendiente(self) -> bool:
+        return bool(self._datos)
+
+    def vaciar(self) -> bytes:
+        datos = bytes(self._datos)
+        self._datos.clear()
+        return datos
+
+
+class ExportadorMasivo:
+    def __init__(self, procesos: int = 1, metodo_inicio: str = 'spawn', max_libros: int = 240,
+                 max_lotes: int = 50):
+        self.procesos = max(1, procesos)
+        self.metodo_inicio = metodo_inicio
+        self.max_libros = max_libros
+        self.max_lotes = max_lotes
+        self._executor = None
+        self._lock = threading.Lock()
+        self._lotes = OrderedDict()  # id -> LoteExportacion (los últimos max_lotes)
+        atexit.register(self.cerrar)
+
+    @classmethod
+    def desde_entorno(cls) -> "ExportadorMasivo":
+        """
+        BULK_EXPORT_WORKERS (por defecto, los CPU de la máquina), BULK_EXPORT_START_METHOD
+        (spawn: el hijo no hereda los hilos de la app) y BULK_EXPORT_MAX_BOOKS por pedido
+        """
+        return cls(
+            procesos=int(os.getenv('BULK_EXPORT_WORKERS', str(os.cpu_count() or 1))),
+            metodo_inicio=os.getenv('BULK_EXPORT_START_METHOD', 'spawn'),
+            max_libros=int(os.getenv('BULK_EXPORT_MAX_BOOKS', '240')),
+        )
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Se crea con el primer lote y se reutiliza (arrancar procesos cuesta más que un libro)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context(self.metodo_inicio),
+                    initializer=_iniciar_proceso,
+                )
+            return self._executor
+
+    def _descartar_pool(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def crear_lote(self, total: int, lote_id: Optional[str] = None) -> LoteExportacion:
+        if lote_id is not None and not _PATRON_LOTE.match(lote_id):
+            raise ValueError("id de lote inválido")
+        with self._lock:
+            if lote_id is None or lote_id in self._lotes:
+                lote_id = uuid.uuid4().hex
+            lote = LoteExportacion(lote_id, total)
+            self._lotes[lote_id] = lote
+            while len(self._lotes) > self.max_lotes:
+                self._lotes.popitem(last=False)
+        return lote
+
+    def progreso(self, lote_id: str) -> Optional[dict]:
+        with self._lock:
+            lote = self._lotes.get(lote_id)
+        return lote.como_dict() if lote else None
+
+    def transmitir(self, lote: LoteExportacion, trabajos: List[Tuple[int, int, int]]) -> Iterator[bytes]:
+        """
+        Reparte los (empresa_id, anio, mes) en el pool y va entregando el ZIP: cada libro entra
+        en cuanto termina (en orden de llegada), y los que fallan se listan en ERRORES.txt
+        """
+        directorio = tempfile.mkdtemp(prefix='export-lote-')
+        salida = _BufferZip()
+        executor = self._pool()
+        futuros = {}
+        terminado = False
+        try:
+            for empresa_id, anio, mes in trabajos:
+                futuros[executor.submit(_generar_libro, empresa_id, anio, mes, directorio)] = (empresa_id, anio, mes)
+            # Los .xlsx ya vienen comprimidos: nivel 1 para no gastar CPU en el proceso web
+            with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=1) as zf:
+                for futuro in as_completed(futuros):
+                    empresa_id, anio, mes = futuros[futuro]
+                    try:
+                        ruta, nombre = futuro.result()
+                    except BrokenProcessPool:
+                        self._descartar_pool(executor)
+                        raise
+                    except Exception as e:
+                        lote.fallar(empresa_id, anio, mes, e)
+                        continue
+                    with open(ruta, 'rb') as origen, zf.open(f"{anio}-{mes:02d}/{nombre}", 'w') as destino:
+                        while True:
+                            trozo = origen.read(TAMANO_TROZO)
+                            if not trozo:
+                                break
+                            destino.write(trozo)
+                            if salida.pendiente:
+                                yield salida.vaciar()
+                    os.remove(ruta)
+                    lote.completar()
+                    if salida.pendiente:
+                        yield salida.vaciar()
+                if lote.errores:
+                    zf.writestr("ERRORES.txt", "\n".join(lote.errores) + "\n")
+            # Cola del ZIP (directorio central)
+            yield salida.vaciar()
+            terminado = True
+            lote.terminar('completado' if not lote.errores else 'completado_con_errores')
+        finally:
+            if not terminado:
+                # Cliente desconectado o pool caído: no se sigue generando para nadie
+                for futuro in futuros:
+                    futuro.cancel()
+                lote.terminar('cancelado')
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def cerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,332 @@
+"""
+Agregado diario por empresa (RESUMEN_DIARIO_EMPRESA) para el dashboard semanal.
+
+Cada fila resume un (empresa_id, fecha) de empleados activos: presentes, marcas de entrada por
+turno, tardanzas por turno, horas extras y turnos incompletos. Cuando una marcación cambia
+(escaneo o edición del admin) se marca la clave como pendiente; un hilo en segundo plano
+recalcula solo esas claves (DELETE + INSERT ... SELECT en una transacción), agrupando las
+marcaciones que llegan en ráfaga. Las lecturas llaman antes a sincronizar() para ver lo propio.
+
+El histórico lo carga la migración 005_rellenar_resumen_diario.sql (mismo agregado). Reconstrucción
+de un rango (p. ej. tras editar ASISTENCIA por SQL):
+    python -m src.infrastructure.daily_summary --desde 2025-01-01 --hasta 2025-12-31 [--empresa 3]
+"""
+import argparse
+import atexit
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from .mysql_connection import MySQLConnection
+from .date_ranges import rango_semiabierto
+
+CREAR_TABLA = """
+    CREATE TABLE IF NOT EXISTS RESUMEN_DIARIO_EMPRESA (
+        empresa_id INT NOT NULL,
+        fecha DATE NOT NULL,
+        empleados_presentes INT NOT NULL DEFAULT 0,
+        marcas_manana INT NOT NULL DEFAULT 0,
+        marcas_tarde INT NOT NULL DEFAULT 0,
+        tardanzas_manana INT NOT NULL DEFAULT 0,
+        tardanzas_tarde INT NOT NULL DEFAULT 0,
+        horas_extras DECIMAL(10,2) NOT NULL DEFAULT 0,
+        turnos_incompletos INT NOT NULL DEFAULT 0,
+        actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (empresa_id, fecha),
+        INDEX idx_resumen_fecha (fecha)
+    )
+"""
+
+_COLUMNAS = """
+    (empresa_id, fecha, empleados_presentes, marcas_manana, marcas_tarde,
+     tardanzas_manana, tardanzas_tarde, horas_extras, turnos_incompletos)
+"""
+
+# Tardanza = minutos de retraso guardados (horario de la empresa), sin TIME() por fila
+_SELECT_AGREGADO = """
+    SELECT e.empresa_id, a.fecha,
+           COUNT(DISTINCT CASE WHEN a.entrada_manana_real IS NOT NULL
+                                 OR a.entrada_tarde_real IS NOT NULL THEN a.empleado_id END),
+           COUNT(a.entrada_manana_real),
+           COUNT(a.entrada_tarde_real),
+           COUNT(CASE WHEN a.minutos_tardanza_manana > 0 THEN 1 END),
+           COUNT(CASE WHEN a.minutos_tardanza_tarde > 0 THEN 1 END),
+           COALESCE(SUM(a.horas_extras), 0),
+           COUNT(CASE WHEN a.entrada_manana_real IS NOT NULL AND a.salida_manana_real IS NULL THEN 1 END) +
+           COUNT(CASE WHEN a.entrada_tarde_real IS NOT NULL AND a.salida_tarde_real IS NULL THEN 1 END)
+    FROM ASISTENCIA a
+    JOIN EMPLEADOS e ON e.id = a.empleado_id
+    WHERE e.activo = TRUE
+"""
+
+Fecha = Union[str, date]
+
+
+def _fecha(valor: Fecha) -> str:
+    return valor.strftime('%Y-%m-%d') if hasattr(valor, 'strftime') else str(valor)[:10]
+
+
+class ResumenDiarioEmpresa:
+    """Mantiene RESUMEN_DIARIO_EMPRESA al día recalculando solo los (empresa, fecha) tocados"""
+
+    def __init__(self, db_connection: MySQLConnection, intervalo_segundos: float = 2.0):
+        self.db = db_connection
+        # 0 = recalcular en el mismo request (sin hilo)
+        self.intervalo_segundos = intervalo_segundos
+        self._lock = threading.Lock()
+        self._lock_recalculo = threading.Lock()
+        self._pendientes: Set[Tuple[int, str]] = set()
+        # Marcaciones cuyo empleado no trae empresa (p. ej. sp_registrar_escaneo antiguo)
+        self._pendientes_empleado: Set[Tuple[int, str]] = set()
+        self._hay_pendientes = threading.Event()
+        self._detener = threading.Event()
+        self._stats = {
+            "marked": 0,
+            "refreshes": 0,
+            "keys_refreshed": 0,
+            "refresh_errors": 0,
+            "rebuilds": 0,
+            "last_refresh_ms": 0.0,
+        }
+        self._hilo = None
+        if intervalo_segundos > 0:
+            self._hilo = threading.Thread(target=self._ejecutar, name="daily-summary-refresh", daemon=True)
+            self._hilo.start()
+            atexit.register(self.cerrar)
+
+    @classmethod
+    def desde_entorno(cls, db_connection: MySQLConnection) -> "ResumenDiarioEmpresa":
+        """DAILY_SUMMARY_REFRESH_SECONDS=0 recalcula en el mismo request en lugar de en segundo plano"""
+        return cls(db_connection, intervalo_segundos=float(os.getenv('DAILY_SUMMARY_REFRESH_SECONDS', '2.0')))
+
+    # --- Marcado de cambios ---
+
+    def marcar(self, empresa_id: int, fecha: Fecha):
+        self._agregar(self._pendientes, (int(empresa_id), _fecha(fecha)))
+
+    def marcar_empleado(self, empleado_id: int, fecha: Fecha, empresa_id: Optional[int] = None):
+        """Cambió la marcación de un empleado ese día; si no se sabe la empresa se resuelve al recalcular"""
+        if empresa_id:
+            self.marcar(empresa_id, fecha)
+        else:
+            self._agregar(self._pendientes_empleado, (int(empleado_id), _fecha(fecha)))
+
+    def marcar_todas_las_fechas(self, empleado_id: int, empresa_id: int):
+        """
+        Todos los días con marcación del empleado (al activarlo/desactivarlo, moverlo de empresa o
+        eliminarlo). Las fechas se leen ya, antes de que un DELETE las borre.
+        """
+        filas = self.db.execute_query_tuplas(
+            "SELECT fecha FROM ASISTENCIA WHERE empleado_id = %s", (empleado_id,)
+        ) or []
+        with self._lock:
+            self._pendientes.update((int(empresa_id), _fecha(fecha)) for (fecha,) in filas)
+            self._stats["marked"] += len(filas)
+        if self._hilo is None:
+            self.sincronizar()
+        else:
+            self._hay_pendientes.set()
+
+    def al_registrar_asistencia(self, empleado, asistencia):
+        """Oyente para MarkAttendanceUseCase.agregar_oyente"""
+        self.marcar_empleado(empleado.id, asistencia.fecha, getattr(empleado, 'empresa_id', None))
+
+    def _agregar(self, conjunto: set, clave: tuple):
+        with self._lock:
+            conjunto.add(clave)
+            self._stats["marked"] += 1
+        if self._hilo is None:
+            self.sincronizar()
+        else:
+            self._hay_pendientes.set()
+
+    # --- Recalculo ---
+
+    def sincronizar(self) -> int:
+        """Recalcula ya todas las claves pendientes; devuelve cuántas se recalcularon"""
+        with self._lock_recalculo:
+            with self._lock:
+                pendientes, self._pendientes = self._pendientes, set()
+                por_empleado, self._pendientes_empleado = self._pendientes_empleado, set()
+                self._hay_pendientes.clear()
+            if not pendientes and not por_empleado:
+                return 0
+
+            inicio = time.perf_counter()
+            try:
+                pendientes |= self._resolver_empleados(por_empleado)
+                ok = self._recalcular(pendientes)
+            except Exception as e:
+                print(f"❌ Error resolviendo claves del resumen diario: {e}")
+                ok = False
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+
+            with self._lock:
+                self._stats["last_refresh_ms"] = duracion_ms
+                if ok:
+                    self._stats["refreshes"] += 1
+                    self._stats["keys_refreshed"] += len(pendientes)
+                else:
+                    # Se reintentan en el próximo ciclo
+                    self._stats["refresh_errors"] += 1
+                    self._pendientes |= pendientes
+                    self._pendientes_empleado |= por_empleado
+            if not ok and self._hilo is not None:
+                self._hay_pendientes.set()
+            return len(pendientes) if ok else 0
+
+    def reconstruir(self, fecha_inicio: Fecha, fecha_fin: Fecha, empresa_id: Optional[int] = None) -> bool:
+        """Backfill: recalcula todo el rango (de una empresa o de todas)"""
+        self.db.execute_update(CREAR_TABLA)
+        filtro = "AND empresa_id = %s" if empresa_id else ""
+        filtro_a = "AND e.empresa_id = %s" if empresa_id else ""
+        params = list(rango_semiabierto(fecha_inicio, fecha_fin)) + ([empresa_id] if empresa_id else [])
+        ok = self.db.execute_transaction([
+            (f"DELETE FROM RESUMEN_DIARIO_EMPRESA WHERE fecha >= %s AND fecha < %s {filtro}", params),
+            (f"""
+                INSERT INTO RESUMEN_DIARIO_EMPRESA {_COLUMNAS}
+                {_SELECT_AGREGADO}
+                  AND a.fecha >= %s AND a.fecha < %s {filtro_a}
+                GROUP BY e.empresa_id, a.fecha
+            """, params),
+        ])
+        if ok:
+            with self._lock:
+                self._stats["rebuilds"] += 1
+        return ok
+
+    def _resolver_empleados(self, por_empleado: Set[Tuple[int, str]]) -> Set[Tuple[int, str]]:
+        """(empleado_id, fecha) -> (empresa_id, fecha) con una sola consulta"""
+        if not por_empleado:
+            return set()
+        ids = sorted({empleado_id for empleado_id, _ in por_empleado})
+        marcadores = ", ".join(["%s"] * len(ids))
+        filas = self.db.execute_query_tuplas(
+            f"SELECT id, empresa_id FROM EMPLEADOS WHERE id IN ({marcadores})", tuple(ids)
+        )
+        if filas is None:
+            raise RuntimeError("no se pudo consultar EMPLEADOS")
+        empresa_de = dict(filas)
+        return {(empresa_de[empleado_id], fecha) for empleado_id, fecha in por_empleado if empleado_id in empresa_de}
+
+    def _recalcular(self, claves: Set[Tuple[int, str]]) -> bool:
+        if not claves:
+            return True
+        fechas_por_empresa: Dict[int, List[str]] = {}
+        for empresa_id, fecha in claves:
+            fechas_por_empresa.setdefault(empresa_id, []).append(fecha)
+
+        sentencias = []
+        for empresa_id, fechas in fechas_por_empresa.items():
+            marcadores = ", ".join(["%s"] * len(fechas))
+            params = [empresa_id] + sorted(fechas)
+            sentencias.append((
+                f"DELETE FROM RESUMEN_DIARIO_EMPRESA WHERE empresa_id = %s AND fecha IN ({marcadores})",
+                params
+            ))
+            sentencias.append((f"""
+                INSERT INTO RESUMEN_DIARIO_EMPRESA {_COLUMNAS}
+                {_SELECT_AGREGADO}
+                  AND e.empresa_id = %s AND a.fecha IN ({marcadores})
+                GROUP BY e.empresa_id, a.fecha
+            """, params))
+        return self.db.execute_transaction(sentencias)
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            self._hay_pendientes.wait()
+            # Junta las marcaciones de la ráfaga antes de recalcular
+            if self._detener.wait(self.intervalo_segundos):
+                break
+            self.sincronizar()
+
+    def cerrar(self):
+        if self._detener.is_set():
+            return
+        self._detener.set()
+        self._hay_pendientes.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5.0)
+        self.sincronizar()
+
+    # --- Lectura ---
+
+    def por_dia(self, fecha_inicio: Fecha, fecha_fin: Fecha, empresa_id: Optional[int] = None) -> Dict[str, dict]:
+        """Totales por fecha del rango (sumando empresas si no se filtra); solo días con filas"""
+        self.sincronizar()
+        filtro = "AND empresa_id = %s" if empresa_id else ""
+        params = list(rango_semiabierto(fecha_inicio, fecha_fin)) + ([empresa_id] if empresa_id else [])
+        filas = self.db.execute_query_tuplas(f"""
+            SELECT fecha, SUM(empleados_presentes), SUM(marcas_manana), SUM(marcas_tarde),
+                   SUM(tardanzas_manana), SUM(tardanzas_tarde), SUM(horas_extras),
+                   SUM(turnos_incompletos)
+            FROM RESUMEN_DIARIO_EMPRESA
+            WHERE fecha >= %s AND fecha < %s {filtro}
+            GROUP BY fecha
+            ORDER BY fecha
+        """, tuple(params), preparada=True)
+        if filas is None:
+            raise RuntimeError("no se pudo leer RESUMEN_DIARIO_EMPRESA")
+        return {
+            _fecha(fecha): {
+                "empleados_presentes": int(presentes or 0),
+                "marcas_manana": int(marcas_m or 0),
+                "marcas_tarde": int(marcas_t or 0),
+                "tardanzas_manana": int(tard_m or 0),
+                "tardanzas_tarde": int(tard_t or 0),
+                "horas_extras": float(extras or 0),
+                "turnos_incompletos": int(incompletos or 0),
+            }
+            for fecha, presentes, marcas_m, marcas_t, tard_m, tard_t, extras, incompletos in filas
+        }
+
+    def presentes_por_empresa(self, fecha_inicio: Fecha, fecha_fin: Fecha,
+                              empresa_id: Optional[int] = None) -> List[tuple]:
+        """(empresa_id, nombre, empleados activos, días-empleado presentes) por empresa"""
+        self.sincronizar()
+        filtro = "WHERE emp.id = %s" if empresa_id else ""
+        params = list(rango_semiabierto(fecha_inicio, fecha_fin)) + ([empresa_id] if empresa_id else [])
+        filas = self.db.execute_query_tuplas(f"""
+            SELECT emp.id, emp.nombre,
+                   (SELECT COUNT(*) FROM EMPLEADOS e WHERE e.empresa_id = emp.id AND e.activo = TRUE),
+                   COALESCE(SUM(r.empleados_presentes), 0)
+            FROM EMPRESAS emp
+            LEFT JOIN RESUMEN_DIARIO_EMPRESA r
+                   ON r.empresa_id = emp.id AND r.fecha >= %s AND r.fecha < %s
+            {filtro}
+            GROUP BY emp.id, emp.nombre
+            ORDER BY emp.nombre
+        """, tuple(params), preparada=True)
+        if filas is None:
+            raise RuntimeError("no se pudo leer RESUMEN_DIARIO_EMPRESA")
+        return filas
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_keys"] = len(self._pendientes)
+            stats["pending_employee_keys"] = len(self._pendientes_empleado)
+        stats["refresh_interval_seconds"] = self.intervalo_segundos
+        stats["last_refresh_ms"] = round(stats["last_refresh_ms"], 2)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye RESUMEN_DIARIO_EMPRESA para un rango de fechas")
+    parser.add_argument('--desde', required=True, help="YYYY-MM-DD")
+    parser.add_argument('--hasta', default=datetime.now().strftime('%Y-%m-%d'), help="YYYY-MM-DD (por defecto hoy)")
+    parser.add_argument('--empresa', type=int, help="solo esta empresa")
+    args = parser.parse_args()
+
+    resumen = ResumenDiarioEmpresa(MySQLConnection(), intervalo_segundos=0)
+    inicio = time.perf_counter()
+    if resumen.reconstruir(args.desde, args.hasta, args.empresa):
+        print(f"✅ Resumen diario reconstruido ({args.desde} a {args.hasta}) en {time.perf_counter() - inicio:.2f}s")
+    else:
+        raise SystemExit("❌ No se pudo reconstruir el resumen diario")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Rangos de fechas semiabiertos para los filtros SQL sobre ASISTENCIA.fecha.
+
+`a.fecha >= %s AND a.fecha < %s` usa el índice de fecha; YEAR()/MONTH() sobre la columna no
+(obligan a recorrer la tabla). Los llamadores siguen trabajando con el fin inclusivo.
+"""
+from datetime import date, datetime, timedelta
+from typing import Tuple, Union
+
+Fecha = Union[str, date, datetime]
+
+
+def a_date(valor: Fecha) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+
+def rango_semiabierto(fecha_inicio: Fecha, fecha_fin: Fecha) -> Tuple[str, str]:
+    """[fecha_inicio, fecha_fin] inclusivo -> ('YYYY-MM-DD' inicio, 'YYYY-MM-DD' día siguiente al fin)"""
+    inicio = a_date(fecha_inicio)
+    fin_exclusivo = a_date(fecha_fin) + timedelta(days=1)
+    return inicio.strftime('%Y-%m-%d'), fin_exclusivo.strftime('%Y-%m-%d')
+
+
+def rango_mes(anio: int, mes: int) -> Tuple[str, str]:
+    """Primer día del mes y primer día del mes siguiente"""
+    inicio = date(anio, mes, 1)
+    siguiente = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+    return inicio.strftime('%Y-%m-%d'), siguiente.strftime('%Y-%m-%d')
@@ -0,0 +1,118 @@
+import copy
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.domain.entities import Empleado
+
+
+class CacheEmpleados:
+    """
+    Caché read-through de empleados activos, indexada por id y por codigo_qr_unico.
+    Cada entrada vive `ttl_segundos`; al superar `max_entradas` se expulsa la menos usada (LRU).
+    Devuelve copias para que quien edite el objeto no altere la caché.
+    """
+
+    def __init__(self, ttl_segundos: float = 300.0, max_entradas: int = 2000,
+                 reloj: Callable[[], float] = time.monotonic):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._reloj = reloj
+        self._por_id = OrderedDict()  # id -> (empleado, expira)
+        self._id_por_codigo = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["CacheEmpleados"]:
+        """EMPLOYEE_CACHE_TTL (segundos, 0 desactiva) y EMPLOYEE_CACHE_MAX"""
+        ttl = float(os.getenv('EMPLOYEE_CACHE_TTL', '300'))
+        if ttl <= 0:
+            return None
+        return cls(ttl_segundos=ttl, max_entradas=int(os.getenv('EMPLOYEE_CACHE_MAX', '2000')))
+
+    def get_por_id(self, empleado_id: int) -> Optional[Empleado]:
+        with self._lock:
+            return self._leer(empleado_id)
+
+    def get_por_codigo(self, codigo_qr: str) -> Optional[Empleado]:
+        with self._lock:
+            empleado_id = self._id_por_codigo.get(codigo_qr)
+            if empleado_id is None:
+                self._stats["misses"] += 1
+                return None
+            return self._leer(empleado_id)
+
+    def guardar(self, empleado: Empleado):
+        if empleado is None or empleado.id is None or not empleado.activo:
+            return
+        with self._lock:
+            self._quitar(empleado.id)
+            self._por_id[empleado.id] = (copy.copy(empleado), self._reloj() + self.ttl_segundos)
+            if empleado.codigo_qr_unico:
+                self._id_por_codigo[empleado.codigo_qr_unico] = empleado.id
+            while len(self._por_id) > self.max_entradas:
+                viejo_id, _ = next(iter(self._por_id.items()))
+                self._quitar(viejo_id)
+                self._stats["evictions"] += 1
+
+    def invalidar(self, empleado_id: int = None, codigo_qr: str = None):
+        with self._lock:
+            if codigo_qr is not None and empleado_id is None:
+                empleado_id = self._id_por_codigo.get(codigo_qr)
+            if empleado_id is not None and self._quitar(empleado_id):
+                self._stats["invalidations"] += 1
+
+    def invalidar_todo(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._por_id)
+            self._por_id.clear()
+            self._id_por_codigo.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._por_id)
+            stats["memory_bytes"] = self._estimar_memoria()
+        consultas = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        stats["ttl_seconds"] = self.ttl_segundos
+        stats["max_entries"] = self.max_entradas
+        return stats
+
+    def _leer(self, empleado_id: int) -> Optional[Empleado]:
+        entrada = self._por_id.get(empleado_id)
+        if entrada is None:
+            self._stats["misses"] += 1
+            return None
+        empleado, expira = entrada
+        if expira <= self._reloj():
+            self._quitar(empleado_id)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._por_id.move_to_end(empleado_id)
+        self._stats["hits"] += 1
+        return copy.copy(empleado)
+
+    def _quitar(self, empleado_id: int) -> bool:
+        entrada = self._por_id.pop(empleado_id, None)
+        if entrada is None:
+            return False
+        codigo = entrada[0].codigo_qr_unico
+        if codigo and self._id_por_codigo.get(codigo) == empleado_id:
+            del self._id_por_codigo[codigo]
+        return True
+
+    def _estimar_memoria(self) -> int:
+        """Tamaño aproximado en bytes de las entradas y los índices"""
+        total = sys.getsizeof(self._por_id) + sys.getsizeof(self._id_por_codigo)
+        for empleado, _ in self._por_id.values():
+            total += sys.getsizeof(empleado)
+            # Empleado usa __slots__: los valores se recorren por slot (no hay __dict__)
+            total += sum(sys.getsizeof(getattr(empleado, slot, None)) for slot in Empleado.__slots__)
+        total += sum(sys.getsizeof(codigo) for codigo in self._id_por_codigo)
+        return total
@@ -0,0 +1,411 @@
+"""
+Reporte diario mensual en Excel (una tabla por empleado), generado en streaming.
+
+La hoja se escribe en modo write-only de openpyxl: cada fila va directo a un archivo temporal en
+lugar de quedar en memoria como celdas, y todas las celdas comparten unos pocos estilos con nombre
+(en vez de crear Font/PatternFill/Alignment por celda). Los totales se llevan en minutos enteros y
+solo se formatean a H:MM al escribir. Al guardar, el .xlsx (un zip) se entrega en trozos a medida
+que se comprime, sin armar el archivo completo en un BytesIO.
+"""
+import calendar
+import hashlib
+import queue
+import threading
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import pytz
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import DEFAULT_FONT, Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from src.domain.entities import Empleado
+from src.domain.repositories import (
+    AsistenciaRepository, CierreMensualRepository, EmpleadoRepository, EmpresaRepository
+)
+from src.use_cases.attendance_stats import minutos_por_dia
+from src.use_cases.get_report import minutos_a_hhmm
+
+from .report_artifacts import CacheArtefactos
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ENCABEZADOS = ('DIA', 'ENTRADA_MANANA', 'SALIDA_MANANA', 'TOTAL_MANANA', 'ENTRADA_TARDE',
+               'SALIDA_TARDE', 'TOTAL_TARDE', 'TOTAL_DIA', 'HORAS_NORMALES', 'HORAS_EXTRAS')
+ANCHOS_COLUMNA = (8, 15, 15, 15, 15, 15, 15, 15, 15, 15)
+JORNADA_MINUTOS = 8 * 60
+
+# Feriados Perú (sector privado), como (mes, día)
+FERIADOS = (
+    (1, 1),    # Año Nuevo
+    (4, 2),    # Jueves Santo
+    (4, 3),    # Viernes Santo
+    (5, 1),    # Día del Trabajo
+    (6, 7),    # Batalla de Arica y Día de la Bandera
+    (6, 29),   # San Pedro y San Pablo
+    (7, 23),   # Día de la Fuerza Aérea del Perú
+    (7, 28),   # Fiestas Patrias
+    (7, 29),   # Fiestas Patrias
+    (8, 6),    # Batalla de Junín
+    (8, 30),   # Santa Rosa de Lima
+    (10, 8),   # Combate de Angamos
+    (11, 1),   # Día de Todos los Santos
+    (12, 8),   # Inmaculada Concepción
+    (12, 9),   # Batalla de Ayacucho
+    (12, 25),  # Navidad
+)
+
+# Tipos de día (colores de fila)
+NORMAL, FERIADO, DOMINGO = 'normal', 'feriado', 'domingo'
+
+TAMANO_TROZO = 64 * 1024
+TROZOS_EN_COLA = 8
+_FIN = object()
+
+
+def _relleno(color: str) -> PatternFill:
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+_BORDE = Border(left=Side(style='thin'), right=Side(style='thin'),
+                top=Side(style='thin'), bottom=Side(style='thin'))
+_RELLENOS_DIA = {NORMAL: None, FERIADO: _relleno("FF0000"), DOMINGO: _relleno("0070C0")}
+
+
+def _estilo(nombre: str, font=DEFAULT_FONT, fill=None, alignment=None, border=None) -> NamedStyle:
+    # NamedStyle trae un Font() vacío: sin fuente explícita se usa la de una celda sin estilo
+    estilo = NamedStyle(name=nombre, font=font)
+    if fill is not None:
+        estilo.fill = fill
+    if alignment is not None:
+        estilo.alignment = alignment
+    if border is not None:
+        estilo.border = border
+    return estilo
+
+
+def registrar_estilos(wb: Workbook) -> Dict[object, str]:
+    """Registra en el libro los estilos del reporte; devuelve clave -> nombre del estilo"""
+    estilos = {
+        'titulo': _estilo('reporte_titulo', Font(bold=True, size=14), _relleno("CCCCCC"),
+                          Alignment(horizontal="center", vertical="center")),
+        'encabezado': _estilo('reporte_encabezado', Font(bold=True), _relleno("FFFF00"),
+                              Alignment(horizontal="center", vertical="center"), _BORDE),
+        'total': _estilo('reporte_total', Font(bold=True), _relleno("DDDDDD"), border=_BORDE),
+        'total_dia': _estilo('reporte_total_dia', Font(bold=True), _relleno("DDDDDD"),
+                             Alignment(horizontal="center"), _BORDE),
+    }
+    # Celdas de día: por tipo de día y si es la columna DIA (centrada)
+    for tipo, relleno in _RELLENOS_DIA.items():
+        estilos[(tipo, False)] = _estilo(f'reporte_{tipo}', fill=relleno, border=_BORDE)
+        estilos[(tipo, True)] = _estilo(f'reporte_{tipo}_dia', fill=relleno,
+                                        alignment=Alignment(horizontal="center"), border=_BORDE)
+    nombres = {}
+    for clave, estilo in estilos.items():
+        wb.add_named_style(estilo)
+        nombres[clave] = estilo.name
+    return nombres
+
+
+def tipos_de_dia(anio: int, mes: int) -> List[Tuple[int, str]]:
+    """[(día, NORMAL|FERIADO|DOMINGO)] del mes; el feriado tiene prioridad sobre el domingo"""
+    feriados = {dia for m, dia in FERIADOS if m == mes}
+    tipos = []
+    for dia in range(1, calendar.monthrange(anio, mes)[1] + 1):
+        if dia in feriados:
+            tipos.append((dia, FERIADO))
+        elif date(anio, mes, dia).weekday() == 6:
+            tipos.append((dia, DOMINGO))
+        else:
+            tipos.append((dia, NORMAL))
+    return tipos
+
+
+def _texto_hora(hora) -> str:
+    return str(hora) if hora else ""
+
+
+def _texto_minutos(minutos: Optional[int]) -> str:
+    return "" if minutos is None else minutos_a_hhmm(minutos)
+
+
+class ReporteExcelMensual:
+    """
+    Arma el libro del reporte diario de un mes a partir de los empleados y de los minutos por día
+    (formato de CierreMensualRepository.get_minutos_diarios; minutos_por_dia los saca de
+    get_horas_reales). Ya leídos: la hoja se escribe sin tocar la BD.
+    """
+
+    def __init__(self, anio: int, mes: int, empleados: Iterable[Empleado], minutos_diarios: Iterable[tuple]):
+        self.anio = anio
+        self.mes = mes
+        self.empleados = empleados
+        self._dias = {(fila[0], fila[1]): fila[2:] for fila in minutos_diarios}
+
+    def _celda(self, ws, valor, estilo: str) -> WriteOnlyCell:
+        celda = WriteOnlyCell(ws, value=valor)
+        celda.style = estilo
+        return celda
+
+    def _fila(self, ws, valores: Iterable, estilo: str, estilo_primera: str) -> list:
+        celdas = []
+        for i, valor in enumerate(valores):
+            celdas.append(self._celda(ws, valor, estilo_primera if i == 0 else estilo))
+        return celdas
+
+    def construir(self) -> Workbook:
+        wb = Workbook(write_only=True)
+        estilos = registrar_estilos(wb)
+        ws = wb.create_sheet("Reporte Diario")
+        # En write-only las columnas deben definirse antes de la primera fila
+        for i, ancho in enumerate(ANCHOS_COLUMNA):
+            ws.column_dimensions[get_column_letter(i + 1)].width = ancho
+
+        dias = tipos_de_dia(self.anio, self.mes)
+        ultima_columna = get_column_letter(len(ENCABEZADOS))
+        fila = 1
+        for empleado in self.empleados:
+            ws.merged_cells.add(f"A{fila}:{ultima_columna}{fila}")
+            ws.append([self._celda(ws, f"EMPLEADO: {empleado.nombre.upper()}", estilos['titulo'])])
+            ws.append(self._fila(ws, ENCABEZADOS, estilos['encabezado'], estilos['encabezado']))
+            fila += 2
+
+            total_manana = total_tarde = total_extras = 0
+            for dia, tipo in dias:
+                horas = self._dias.get((empleado.id, f"{self.anio}-{self.mes:02d}-{dia:02d}"))
+                if horas:
+                    entrada_m, salida_m, entrada_t, salida_t, minutos_manana, minutos_tarde = horas
+                    minutos_dia = (minutos_manana or 0) + (minutos_tarde or 0)
+                    extras_dia = max(0, minutos_dia - JORNADA_MINUTOS)
+                    total_manana += minutos_manana or 0
+                    total_tarde += minutos_tarde or 0
+                    total_extras += extras_dia
+                    valores = (
+                        dia,
+                        _texto_hora(entrada_m), _texto_hora(salida_m), _texto_minutos(minutos_manana),
+                        _texto_hora(entrada_t), _texto_hora(salida_t), _texto_minutos(minutos_tarde),
+                        minutos_a_hhmm(minutos_dia),
+                        minutos_a_hhmm(min(minutos_dia, JORNADA_MINUTOS)),
+                        minutos_a_hhmm(extras_dia),
+                    )
+                else:
+                    valores = (dia,) + ("",) * (len(ENCABEZADOS) - 1)
+                ws.append(self._fila(ws, valores, estilos[(tipo, False)], estilos[(tipo, True)]))
+                fila += 1
+
+            total_mes = total_manana + total_tarde
+            valores_totales = (
+                "TOTAL MES", "", "", minutos_a_hhmm(total_manana), "", "", minutos_a_hhmm(total_tarde),
+                minutos_a_hhmm(total_mes), minutos_a_hhmm(total_mes - total_extras),
+                minutos_a_hhmm(total_extras),
+            )
+            ws.append(self._fila(ws, valores_totales, estilos['total'], estilos['total_dia']))
+            # Fila en blanco entre empleados
+            ws.append([])
+            fila += 2
+        return wb
+
+
+class _SalidaEnTrozos:
+    """
+    Archivo de solo escritura (sin seek: zipfile escribe entonces en un solo pase) que junta
+    lo escrito en trozos y los pasa por una cola acotada al generador de la respuesta.
+    """
+
+    def __init__(self, cola: queue.Queue, cancelado: threading.Event, tamano: int):
+        self._cola = cola
+        self._cancelado = cancelado
+        self._tamano = tamano
+        self._buffer = bytearray()
+        self._abortada = False
+
+    def _entregar(self, elemento):
+        while True:
+            if self._cancelado.is_set():
+                self._abortada = True
+                raise ConnectionAbortedError("descarga cancelada por el cliente")
+            try:
+                self._cola.put(elemento, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, datos) -> int:
+        if self._abortada:
+            # El zip abortado intenta cerrarse al destruirse: se descarta sin volver a fallar
+            return len(datos)
+        self._buffer += datos
+        if len(self._buffer) >= self._tamano:
+            self._entregar(bytes(self._buffer))
+            self._buffer.clear()
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def terminar(self):
+        if self._buffer:
+            self._entregar(bytes(self._buffer))
+            self._buffer.clear()
+        self._entregar(_FIN)
+
+
+def transmitir_libro(wb: Workbook, tamano_trozo: int = TAMANO_TROZO) -> Iterator[bytes]:
+    """Guarda el libro desde un hilo aparte y va entregando los bytes del .xlsx en trozos"""
+    cola = queue.Queue(maxsize=TROZOS_EN_COLA)
+    cancelado = threading.Event()
+    salida = _SalidaEnTrozos(cola, cancelado, tamano_trozo)
+
+    def guardar():
+        try:
+            wb.save(salida)
+            salida.terminar()
+        except ConnectionAbortedError:
+            pass
+        except Exception as e:
+            try:
+                salida._entregar(e)
+            except ConnectionAbortedError:
+                pass
+
+    hilo = threading.Thread(target=guardar, name="excel-export", daemon=True)
+    hilo.start()
+    try:
+        while True:
+            trozo = cola.get()
+            if trozo is _FIN:
+                return
+            if isinstance(trozo, Exception):
+                raise trozo
+            yield trozo
+    finally:
+        # Si el cliente corta la descarga el hilo deja de escribir en vez de quedar bloqueado
+        cancelado.set()
+
+
+def cabecera_descarga(nombre_archivo: str) -> str:
+    """Content-Disposition de adjunto (con filename* si el nombre no es ASCII, como send_file)"""
+    try:
+        nombre_archivo.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', nombre_archivo).encode('ascii', 'ignore').decode('ascii')
+        return f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quote(nombre_archivo, safe='!#$&+^`|~')}"
+    return f"attachment; filename=\"{nombre_archivo}\""
+
+
+# Subir al cambiar el contenido o el formato del libro: deja obsoletos los artefactos guardados
+VERSION_FORMATO = 1
+EXTENSION = '.xlsx'
+
+
+class SolicitudExcel:
+    """Lo que hace falta para responder un export (y su ETag) antes de leer las marcaciones"""
+    __slots__ = ("empresa_id", "anio", "mes", "empleados", "nombre_archivo", "etag", "cerrado")
+
+    def __init__(self, empresa_id: int, anio: int, mes: int, empleados: List[Empleado],
+                 nombre_archivo: str, etag: str, cerrado: bool = False):
+        self.empresa_id = empresa_id
+        self.anio = anio
+        self.mes = mes
+        self.empleados = empleados
+        self.nombre_archivo = nombre_archivo
+        self.etag = etag
+        self.cerrado = cerrado
+
+    @property
+    def clave(self) -> str:
+        return f"excel_mensual-{self.empresa_id}-{self.anio}-{self.mes:02d}"
+
+
+def periodo_mes(anio: int, mes: int) -> Tuple[str, str]:
+    """Primer y último día del mes (inclusivo), como los piden los repositorios"""
+    return f"{anio}-{mes:02d}-01", f"{anio}-{mes:02d}-{calendar.monthrange(anio, mes)[1]:02d}"
+
+
+class ExportadorExcelMensual:
+    """
+    Export mensual de una empresa con caché de artefactos opcional. La versión de los datos
+    (último updated_at y cantidad de filas de ASISTENCIA del mes, más la lista de empleados)
+    es a la vez el ETag y parte del nombre del artefacto. En un mes cerrado los empleados y los
+    minutos salen de la foto del cierre, y la versión es la fecha del cierre.
+    """
+
+    def __init__(self, empresa_repository: EmpresaRepository, empleado_repository: EmpleadoRepository,
+                 asistencia_repository: AsistenciaRepository, artefactos: Optional[CacheArtefactos] = None,
+                 cierre_repository: Optional[CierreMensualRepository] = None):
+        self.empresa_repository = empresa_repository
+        self.empleado_repository = empleado_repository
+        self.asistencia_repository = asistencia_repository
+        self.artefactos = artefactos
+        self.cierre_repository = cierre_repository
+
+    def preparar(self, empresa_id: int, anio: int, mes: int) -> SolicitudExcel:
+        empresa = self.empresa_repository.get_by_id(empresa_id)
+        cerrado_en = (self.cierre_repository.get_cierre(empresa_id, anio, mes)
+                      if self.cierre_repository is not None else None)
+        if cerrado_en is not None:
+            empleados = [Empleado(r["empleado_id"], empresa_id, r["nombre"], r["dni"])
+                         for r in self.cierre_repository.get_resumenes(empresa_id, anio, mes)]
+            version = f"cierre|{cerrado_en}"
+        else:
+            empleados = self.empleado_repository.get_by_empresa_id(empresa_id)
+            ultima, cantidad = self.asistencia_repository.get_version_periodo(empresa_id, *periodo_mes(anio, mes))
+            version = f"{ultima}|{cantidad}"
+
+        huella = hashlib.sha1()
+        huella.update(f"{VERSION_FORMATO}|{empresa_id}|{anio}|{mes}|{version}".encode('utf-8'))
+        for empleado in empleados:
+            huella.update(f"|{empleado.id}:{empleado.nombre}".encode('utf-8'))
+
+        nombre_empresa = empresa.nombre.replace(' ', '_') if empresa else 'empresa'
+        return SolicitudExcel(empresa_id, anio, mes, empleados,
+                              f"reporte_diario_{nombre_empresa}_{mes}_{anio}{EXTENSION}",
+                              huella.hexdigest()[:20], cerrado=cerrado_en is not None)
+
+    def en_cache(self, solicitud: SolicitudExcel) -> Optional[str]:
+        if self.artefactos is None:
+            return None
+        return self.artefactos.buscar(solicitud.clave, solicitud.etag, EXTENSION)
+
+    def generar(self, solicitud: SolicitudExcel) -> Iterator[bytes]:
+        """Lee las marcaciones, arma el libro y devuelve sus bytes en trozos (copiándolos a la caché)"""
+        if solicitud.cerrado:
+            minutos_diarios = self.cierre_repository.get_minutos_diarios(
+                solicitud.empresa_id, solicitud.anio, solicitud.mes)
+        else:
+            minutos_diarios = minutos_por_dia(self.asistencia_repository.get_horas_reales(
+                solicitud.empresa_id, *periodo_mes(solicitud.anio, solicitud.mes)))
+        wb = ReporteExcelMensual(solicitud.anio, solicitud.mes, solicitud.empleados, minutos_diarios).construir()
+        trozos = transmitir_libro(wb)
+        if self.artefactos is None:
+            return trozos
+        return self.artefactos.guardar_mientras(solicitud.clave, solicitud.etag, EXTENSION, trozos)
+
+    def pregenerar_empresa(self, empresa_id: int, anio: int, mes: int) -> bool:
+        """Deja en caché el libro del mes de la empresa; True si hubo que generarlo"""
+        if self.artefactos is None:
+            return False
+        solicitud = self.preparar(empresa_id, anio, mes)
+        if self.en_cache(solicitud) is not None:
+            return False
+        for _ in self.generar(solicitud):
+            pass
+        return True
+
+    def pregenerar(self, anio: int, mes: int) -> int:
+        """Deja en caché el mes de todas las empresas; devuelve cuántos libros se generaron"""
+        if self.artefactos is None:
+            return 0
+        return sum(self.pregenerar_empresa(empresa.id, anio, mes) for empresa in self.empresa_repository.get_all())
+
+    def pregenerar_mes_anterior(self):
+        hoy = datetime.now(pytz.timezone("America/Lima")).date()
+        anterior = hoy.replace(day=1) - timedelta(days=1)
+        try:
+            generados = self.pregenerar(anterior.year, anterior.month)
+            print(f"📦 Excel de {anterior.month:02d}/{anterior.year} pregenerados: {generados}")
+        except Exception as e:
+            print(f"❌ Error pregenerando los Excel de {anterior.month:02d}/{anterior.year}: {e}")
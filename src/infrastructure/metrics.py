@@ -0,0 +1,323 @@
+import bisect
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+
+BUCKETS_RUTA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BUCKETS_VIAJES = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+_RE_CADENA = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_MAX_NORMALIZADAS = 2000
+
+
+class Histograma:
+    """Histograma acumulado al estilo Prometheus (buckets fijos, suma y conteo)"""
+
+    __slots__ = ('buckets', 'conteos', 'suma', 'total')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Cota superior del bucket donde cae el percentil p (0-100)"""
+        if not self.total:
+            return None
+        objetivo = self.total * p / 100.0
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class _MetricaSQL:
+    __slots__ = ('histograma', 'filas', 'errores')
+
+    def __init__(self):
+        self.histograma = Histograma(BUCKETS_SQL)
+        self.filas = 0
+        self.errores = 0
+
+
+class RegistroMetricas:
+    """
+    Métricas del proceso: latencia por ruta, tiempo y filas por sentencia SQL normalizada
+    y viajes a la BD por request. Cada worker de gunicorn tiene su propio registro.
+    """
+
+    def __init__(self, habilitado: bool = True):
+        self.habilitado = habilitado
+        self._lock = threading.Lock()
+        self._rutas = {}       # (ruta, método) -> Histograma de latencia
+        self._estados = {}     # (ruta, método, estado) -> conteo
+        self._viajes = {}      # (ruta, método) -> Histograma de viajes a la BD
+        self._sql = {}         # sql normalizado -> _MetricaSQL
+        self._normalizadas = {}
+        self._peticion = threading.local()
+        self._inicio = time.time()
+
+    # --- Requests ---
+
+    def iniciar_peticion(self):
+        if self.habilitado:
+            self._peticion.inicio = time.perf_counter()
+            self._peticion.viajes = 0
+
+    def finalizar_peticion(self, ruta: str, metodo: str, estado: int):
+        inicio = getattr(self._peticion, 'inicio', None)
+        if not self.habilitado or inicio is None:
+            return
+        duracion = time.perf_counter() - inicio
+        viajes = self._peticion.viajes
+        self._peticion.inicio = None
+        clave = (ruta, metodo)
+        with self._lock:
+            histograma = self._rutas.get(clave)
+            if histograma is None:
+                histograma = self._rutas[clave] = Histograma(BUCKETS_RUTA)
+                self._viajes[clave] = Histograma(BUCKETS_VIAJES)
+            histograma.observar(duracion)
+            self._viajes[clave].observar(viajes)
+            clave_estado = (ruta, metodo, estado)
+            self._estados[clave_estado] = self._estados.get(clave_estado, 0) + 1
+
+    # --- SQL ---
+
+    def observar_sql(self, sql: str, segundos: float, filas: int = 0, viajes: int = 1, error: bool = False):
+        """
+        Registra una ejecución que costó `viajes` idas y vueltas a la BD (una preparada del conector
+        8.2 cuesta 2 o 3), o con viajes=0 el tiempo/filas de leer su resultado
+        """
+        if not self.habilitado:
+            return
+        normalizado = self.normalizar_sql(sql)
+        if viajes and getattr(self._peticion, 'inicio', None) is not None:
+            self._peticion.viajes += viajes
+        with self._lock:
+            metrica = self._sql.get(normalizado)
+            if metrica is None:
+                metrica = self._sql[normalizado] = _MetricaSQL()
+            if viajes:
+                metrica.histograma.observar(segundos)
+            else:
+                # La lectura de filas suma al tiempo de la última ejecución sin contar otra
+                metrica.histograma.suma += segundos
+            metrica.filas += filas
+            if error:
+                metrica.errores += 1
+
+    def normalizar_sql(self, sql) -> str:
+        """Texto de la sentencia sin literales ni espacios repetidos (memoizado)"""
+        normalizado = self._normalizadas.get(sql)
+        if normalizado is None:
+            texto = sql.decode('utf-8', 'replace') if isinstance(sql, (bytes, bytearray)) else str(sql)
+            texto = " ".join(texto.split())
+            texto = _RE_CADENA.sub("?", texto)
+            texto = _RE_NUMERO.sub("?", texto)
+            normalizado = _RE_LISTA.sub("(?, ...)", texto)
+            if len(self._normalizadas) < _MAX_NORMALIZADAS:
+                self._normalizadas[sql] = normalizado
+        return normalizado
+
+    # --- Exportación ---
+
+    def exportar_prometheus(self) -> str:
+        lineas = []
+        with self._lock:
+            rutas = {k: self._copiar(h) for k, h in self._rutas.items()}
+            viajes = {k: self._copiar(h) for k, h in self._viajes.items()}
+            estados = dict(self._estados)
+            sql = {k: (self._copiar(m.histograma), m.filas, m.errores) for k, m in self._sql.items()}
+
+        lineas.append("# HELP http_request_duration_seconds Latencia de los requests por ruta")
+        lineas.append("# TYPE http_request_duration_seconds histogram")
+        for (ruta, metodo), h in sorted(rutas.items()):
+            self._lineas_histograma(lineas, "http_request_duration_seconds", {"route": ruta, "method": metodo}, h)
+
+        lineas.append("# HELP http_requests_total Requests por ruta y código de estado")
+        lineas.append("# TYPE http_requests_total counter")
+        for (ruta, metodo, estado), conteo in sorted(estados.items()):
+            lineas.append(f"http_requests_total{self._etiquetas({'route': ruta, 'method': metodo, 'status': str(estado)})} {conteo}")
+
+        lineas.append("# HELP http_request_db_round_trips Viajes a la BD por request")
+        lineas.append("# TYPE http_request_db_round_trips histogram")
+        for (ruta, metodo), h in sorted(viajes.items()):
+            self._lineas_histograma(lineas, "http_request_db_round_trips", {"route": ruta, "method": metodo}, h)
+
+        lineas.append("# HELP db_statement_duration_seconds Tiempo por sentencia SQL normalizada")
+        lineas.append("# TYPE db_statement_duration_seconds histogram")
+        for sentencia, (h, _, _) in sorted(sql.items()):
+            self._lineas_histograma(lineas, "db_statement_duration_seconds", {"statement": sentencia}, h)
+
+        lineas.append("# HELP db_statement_rows_total Filas devueltas por sentencia SQL normalizada")
+        lineas.append("# TYPE db_statement_rows_total counter")
+        for sentencia, (_, filas, _) in sorted(sql.items()):
+            lineas.append(f"db_statement_rows_total{self._etiquetas({'statement': sentencia})} {filas}")
+
+        lineas.append("# HELP db_statement_errors_total Errores por sentencia SQL normalizada")
+        lineas.append("# TYPE db_statement_errors_total counter")
+        for sentencia, (_, _, errores) in sorted(sql.items()):
+            lineas.append(f"db_statement_errors_total{self._etiquetas({'statement': sentencia})} {errores}")
+
+        lineas.append("# HELP process_metrics_start_time_seconds Inicio del registro de métricas")
+        lineas.append("# TYPE process_metrics_start_time_seconds gauge")
+        lineas.append(f"process_metrics_start_time_seconds {self._inicio:.3f}")
+        return "\n".join(lineas) + "\n"
+
+    def get_stats(self, limite_sql: int = 50) -> dict:
+        """Vista JSON: percentiles por ruta y las sentencias que más tiempo consumen"""
+        with self._lock:
+            rutas = {k: (self._copiar(h), self._copiar(self._viajes[k])) for k, h in self._rutas.items()}
+            sql = {k: (self._copiar(m.histograma), m.filas, m.errores) for k, m in self._sql.items()}
+
+        resumen_rutas = []
+        for (ruta, metodo), (h, v) in rutas.items():
+            resumen_rutas.append({
+                "route": ruta,
+                "method": metodo,
+                "count": h.total,
+                "avg_ms": round(h.suma / h.total * 1000, 2) if h.total else 0.0,
+                "p50_ms_le": self._ms(h.percentil(50)),
+                "p95_ms_le": self._ms(h.percentil(95)),
+                "p99_ms_le": self._ms(h.percentil(99)),
+                "avg_db_round_trips": round(v.suma / v.total, 2) if v.total else 0.0,
+            })
+        resumen_rutas.sort(key=lambda r: r["count"], reverse=True)
+
+        resumen_sql = []
+        for sentencia, (h, filas, errores) in sql.items():
+            resumen_sql.append({
+                "statement": sentencia,
+                "executions": h.total,
+                "total_ms": round(h.suma * 1000, 2),
+                "avg_ms": round(h.suma / h.total * 1000, 3) if h.total else 0.0,
+                "p95_ms_le": self._ms(h.percentil(95)),
+                "rows": filas,
+                "avg_rows": round(filas / h.total, 1) if h.total else 0.0,
+                "errors": errores,
+            })
+        resumen_sql.sort(key=lambda r: r["total_ms"], reverse=True)
+
+        return {
+            "enabled": self.habilitado,
+            "since": self._inicio,
+            "routes": resumen_rutas,
+            "statements": resumen_sql[:limite_sql],
+        }
+
+    @staticmethod
+    def _copiar(h: Histograma) -> Histograma:
+        copia = Histograma(h.buckets)
+        copia.conteos = list(h.conteos)
+        copia.suma = h.suma
+        copia.total = h.total
+        return copia
+
+    @staticmethod
+    def _ms(valor: Optional[float]):
+        if valor is None:
+            return None
+        if valor == float('inf'):
+            return "+Inf"
+        return round(valor * 1000, 2)
+
+    @staticmethod
+    def _etiquetas(etiquetas: dict) -> str:
+        partes = []
+        for nombre, valor in etiquetas.items():
+            valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            partes.append(f'{nombre}="{valor}"')
+        return "{" + ",".join(partes) + "}"
+
+    def _lineas_histograma(self, lineas: list, nombre: str, etiquetas: dict, h: Histograma):
+        acumulado = 0
+        for limite, conteo in zip(h.buckets, h.conteos):
+            acumulado += conteo
+            lineas.append(f"{nombre}_bucket{self._etiquetas(dict(etiquetas, le=repr(float(limite))))} {acumulado}")
+        lineas.append(f"{nombre}_bucket{self._etiquetas(dict(etiquetas, le='+Inf'))} {h.total}")
+        lineas.append(f"{nombre}_sum{self._etiquetas(etiquetas)} {h.suma:.6f}")
+        lineas.append(f"{nombre}_count{self._etiquetas(etiquetas)} {h.total}")
+
+
+class CursorInstrumentado:
+    """Envuelve un cursor de mysql.connector y reporta cada execute y las filas leídas"""
+
+    def __init__(self, cursor, registro: RegistroMetricas):
+        self._cursor = cursor
+        self._registro = registro
+        self._sql = None
+        # Los cursores preparados del conector (MySQLCursorPrepared) tienen _prepared
+        self._preparado = hasattr(cursor, '_prepared')
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _viajes(self, operation) -> int:
+        """
+        Comandos con respuesta que manda un execute: el preparado del conector 8.2 envía
+        COM_STMT_RESET antes de cada COM_STMT_EXECUTE, y COM_STMT_PREPARE si cambia la sentencia
+        """
+        if not self._preparado:
+            return 1
+        return 2 if operation is getattr(self._cursor, '_executed', None) else 3
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        self._sql = operation
+        viajes = self._viajes(operation)
+        inicio = time.perf_counter()
+        try:
+            resultado = self._cursor.execute(operation, params, *args, **kwargs)
+        except Exception:
+            self._registro.observar_sql(operation, time.perf_counter() - inicio, viajes=viajes, error=True)
+            raise
+        self._registro.observar_sql(operation, time.perf_counter() - inicio, viajes=viajes)
+        return resultado
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._sql = operation
+        inicio = time.perf_counter()
+        try:
+            resultado = self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        except Exception:
+            self._registro.observar_sql(operation, time.perf_counter() - inicio, error=True)
+            raise
+        self._registro.observar_sql(operation, time.perf_counter() - inicio)
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone, lambda fila: 0 if fila is None else 1)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._leer(lambda: self._cursor.fetchmany(*args, **kwargs), len)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall, len)
+
+    def _leer(self, leer, contar):
+        inicio = time.perf_counter()
+        filas = leer()
+        if self._sql is not None:
+            self._registro.observar_sql(self._sql, time.perf_counter() - inicio, filas=contar(filas), viajes=0)
+        return filas
+
+
+# Registro del proceso (METRICS_ENABLED=0 lo apaga)
+metricas = RegistroMetricas(habilitado=os.getenv('METRICS_ENABLED', '1') != '0')
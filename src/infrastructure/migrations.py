@@ -0,0 +1,205 @@
+"""
+Migraciones versionadas del esquema (carpeta migrations/ en la raíz del repo).
+
+Cada archivo NNN_descripcion.sql se aplica una sola vez, en orden, y queda registrado en
+SCHEMA_MIGRATIONS. Las sentencias se separan por ';' (o por el delimitador de DELIMITER, para
+procedimientos). Son idempotentes: los errores de "ya existe" / "no existe" de una re-aplicación
+(índice o columna duplicada, tabla existente, DROP de algo ausente) se ignoran, así una base creada
+con database.sql puede registrar las migraciones que ya trae.
+
+Se ejecutan en el deploy (release_command de fly.toml):
+    python -m src.infrastructure.migrations            # aplica las pendientes
+    python -m src.infrastructure.migrations --estado   # solo lista aplicadas / pendientes
+"""
+import argparse
+import hashlib
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+from mysql.connector import Error
+
+from .mysql_connection import MySQLConnection
+
+DIRECTORIO_MIGRACIONES = os.getenv(
+    'MIGRATIONS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'migrations')
+)
+
+# ER_TABLE_EXISTS_ERROR, ER_DUP_FIELDNAME, ER_DUP_KEYNAME, ER_CANT_DROP_FIELD_OR_KEY
+ERRORES_IDEMPOTENTES = {1050, 1060, 1061, 1091}
+
+# Evita que dos máquinas apliquen migraciones a la vez
+NOMBRE_LOCK = 'schema_migrations'
+ESPERA_LOCK_SEGUNDOS = 60
+
+CREAR_TABLA = """
+    CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+        version VARCHAR(20) PRIMARY KEY,
+        nombre VARCHAR(200) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        duracion_ms INT NOT NULL DEFAULT 0,
+        aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_PATRON_ARCHIVO = re.compile(r'^(\d+)_([\w\-]+)\.sql$')
+
+
+def separar_sentencias(sql: str) -> List[str]:
+    """Divide un script en sentencias respetando DELIMITER (como el cliente mysql)"""
+    sentencias = []
+    delimitador = ';'
+    actual = []
+    for linea in sql.splitlines():
+        limpia = linea.strip()
+        if not actual and (not limpia or limpia.startswith('--')):
+            continue
+        if limpia.upper().startswith('DELIMITER '):
+            delimitador = limpia.split(None, 1)[1]
+            continue
+        if limpia.endswith(delimitador):
+            actual.append(linea.rstrip()[:-len(delimitador)])
+            sentencia = "\n".join(actual).strip()
+            if sentencia:
+                sentencias.append(sentencia)
+            actual = []
+        else:
+            actual.append(linea)
+    resto = "\n".join(actual).strip()
+    if resto:
+        sentencias.append(resto)
+    return sentencias
+
+
+class Migracion:
+    __slots__ = ("version", "nombre", "ruta", "sql", "checksum")
+
+    def __init__(self, version: str, nombre: str, ruta: str, sql: str):
+        self.version = version
+        self.nombre = nombre
+        self.ruta = ruta
+        self.sql = sql
+        self.checksum = hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+
+def cargar_migraciones(directorio: str = DIRECTORIO_MIGRACIONES) -> List[Migracion]:
+    migraciones = []
+    for archivo in sorted(os.listdir(directorio)):
+        coincidencia = _PATRON_ARCHIVO.match(archivo)
+        if not coincidencia:
+            continue
+        ruta = os.path.join(directorio, archivo)
+        with open(ruta, encoding='utf-8') as f:
+            migraciones.append(Migracion(coincidencia.group(1), coincidencia.group(2), ruta, f.read()))
+    versiones = [m.version for m in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError(f"Versiones de migración repetidas en {directorio}: {versiones}")
+    return migraciones
+
+
+class EjecutorMigraciones:
+    def __init__(self, db: MySQLConnection, directorio: str = DIRECTORIO_MIGRACIONES):
+        self.db = db
+        self.directorio = directorio
+
+    def _aplicadas(self, cursor) -> dict:
+        cursor.execute("SELECT version, checksum FROM SCHEMA_MIGRATIONS")
+        return {version: checksum for version, checksum in cursor.fetchall()}
+
+    def estado(self) -> Tuple[List[Migracion], List[Migracion], List[Migracion]]:
+        """(aplicadas, pendientes, modificadas después de aplicarse)"""
+        conn = self.db.get_connection()
+        if conn is None:
+            raise RuntimeError("sin conexión a MySQL")
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CREAR_TABLA)
+            aplicadas = self._aplicadas(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+        migraciones = cargar_migraciones(self.directorio)
+        hechas = [m for m in migraciones if m.version in aplicadas]
+        pendientes = [m for m in migraciones if m.version not in aplicadas]
+        modificadas = [m for m in hechas if aplicadas[m.version] != m.checksum]
+        return hechas, pendientes, modificadas
+
+    def _ejecutar(self, cursor, migracion: Migracion):
+        for sentencia in separar_sentencias(migracion.sql):
+            try:
+                cursor.execute(sentencia)
+                if cursor.with_rows:
+                    cursor.fetchall()
+            except Error as e:
+                if e.errno not in ERRORES_IDEMPOTENTES:
+                    raise
+                print(f"   ↪️  ya aplicado, se omite ({e.errno}): {sentencia.splitlines()[0][:80]}")
+
+    def aplicar(self, hasta: Optional[str] = None) -> List[str]:
+        """Aplica en orden las pendientes (hasta la versión indicada); devuelve las versiones aplicadas"""
+        conn = self.db.get_connection()
+        if conn is None:
+            raise RuntimeError("sin conexión a MySQL")
+        aplicadas_ahora = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (NOMBRE_LOCK, ESPERA_LOCK_SEGUNDOS))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError(f"otra instancia está migrando (lock {NOMBRE_LOCK})")
+            try:
+                cursor.execute(CREAR_TABLA)
+                # Se relee con el lock tomado por si otra instancia acaba de migrar
+                aplicadas = self._aplicadas(cursor)
+                for migracion in cargar_migraciones(self.directorio):
+                    if hasta is not None and int(migracion.version) > int(hasta):
+                        break
+                    if migracion.version in aplicadas:
+                        if aplicadas[migracion.version] != migracion.checksum:
+                            print(f"⚠️ La migración {migracion.version} cambió después de aplicarse; no se re-ejecuta")
+                        continue
+                    print(f"🔧 Aplicando {migracion.version}_{migracion.nombre}")
+                    inicio = time.perf_counter()
+                    self._ejecutar(cursor, migracion)
+                    duracion_ms = int((time.perf_counter() - inicio) * 1000)
+                    cursor.execute(
+                        "INSERT INTO SCHEMA_MIGRATIONS (version, nombre, checksum, duracion_ms) VALUES (%s, %s, %s, %s)",
+                        (migracion.version, migracion.nombre, migracion.checksum, duracion_ms)
+                    )
+                    aplicadas_ahora.append(migracion.version)
+                    print(f"✅ {migracion.version}_{migracion.nombre} ({duracion_ms} ms)")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (NOMBRE_LOCK,))
+                cursor.fetchall()
+                cursor.close()
+        finally:
+            conn.close()
+        return aplicadas_ahora
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica las migraciones pendientes de migrations/")
+    parser.add_argument('--estado', action='store_true', help="solo muestra aplicadas y pendientes")
+    parser.add_argument('--hasta', help="aplica hasta esta versión (inclusive)")
+    parser.add_argument('--directorio', default=DIRECTORIO_MIGRACIONES)
+    args = parser.parse_args()
+
+    ejecutor = EjecutorMigraciones(MySQLConnection(), args.directorio)
+    try:
+        if args.estado:
+            hechas, pendientes, modificadas = ejecutor.estado()
+            for m in hechas:
+                marca = "⚠️ modificada" if m in modificadas else "✅"
+                print(f"{marca} {m.version}_{m.nombre}")
+            for m in pendientes:
+                print(f"⏳ {m.version}_{m.nombre}")
+            return
+        aplicadas = ejecutor.aplicar(args.hasta)
+    except (Error, RuntimeError, ValueError) as e:
+        raise SystemExit(f"❌ Migración fallida: {e}")
+    print(f"✅ {len(aplicadas)} migración(es) aplicada(s)" if aplicadas else "✅ Esquema al día")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,462 @@
 import mysql.connector
 from mysql.connector import Error
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from typing import Optional
 
+from .metrics import CursorInstrumentado, metricas
+
+
+# InnoDB revirtió la transacción para romper un deadlock; se puede repetir entera
+ER_LOCK_DEADLOCK = 1213
+
+
+class PooledConnection:
+    """
+    Envoltura de una conexión prestada por el pool.
+    Se comporta como la conexión de mysql.connector, pero close() la devuelve al pool
+    en lugar de cerrar el socket.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw):
+        self._pool = pool
+        self._raw = raw
+        self._checked_out_at = time.monotonic()
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise Error("La conexión ya fue devuelta al pool")
+        return getattr(raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def closed(self) -> bool:
+        return self._raw is None
+
+    def cursor(self, *args, **kwargs):
+        """Cursor de la conexión real, instrumentado para las métricas de SQL"""
+        if self._raw is None:
+            raise Error("La conexión ya fue devuelta al pool")
+        cursor = self._raw.cursor(*args, **kwargs)
+        return CursorInstrumentado(cursor, metricas) if metricas.habilitado else cursor
+
+    def ejecutar_preparada(self, query: str, params=None):
+        """
+        Ejecuta query con una sentencia preparada que queda cacheada en esta conexión.
+        Devuelve el cursor ya ejecutado para leer filas; no hay que cerrarlo.
+        """
+        if self._raw is None:
+            raise Error("La conexión ya fue devuelta al pool")
+        return self._pool.sentencias_de(self._raw).ejecutar(query, params)
+
+    def cursor_preparado(self):
+        """
+        Cursor compatible con conn.cursor() cuyas sentencias se preparan una vez por conexión
+        (con DB_PREPARED_CACHE_SIZE=0, un cursor normal)
+        """
+        if self._pool.max_sentencias <= 0:
+            return self.cursor()
+        return CursorPreparado(self)
+
+    def close(self):
+        """Devuelve la conexión al pool (idempotente)"""
+        raw = self._raw
+        if raw is None:
+            return
+        self._raw = None
+        self._pool.checkin(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class EstadisticasSentencias:
+    """Ejecuciones y tiempo acumulado por sentencia preparada (todas las conexiones del proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_sentencia = {}  # sql normalizado -> [ejecuciones, total_ms, preparaciones, errores]
+        self._globales = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def registrar(self, sql: str, duracion_ms: float, preparada: bool, error: bool = False):
+        with self._lock:
+            fila = self._por_sentencia.get(sql)
+            if fila is None:
+                fila = self._por_sentencia[sql] = [0, 0.0, 0, 0]
+            fila[0] += 1
+            fila[1] += duracion_ms
+            if preparada:
+                fila[2] += 1
+                self._globales["misses"] += 1
+            else:
+                self._globales["hits"] += 1
+            if error:
+                fila[3] += 1
+
+    def registrar_expulsion(self):
+        with self._lock:
+            self._globales["evictions"] += 1
+
+    def get_stats(self, limite: int = 50) -> dict:
+        with self._lock:
+            filas = [(sql, list(valores)) for sql, valores in self._por_sentencia.items()]
+            stats = dict(self._globales)
+        filas.sort(key=lambda item: item[1][1], reverse=True)
+        consultas = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        stats["statements"] = [
+            {
+                "sql": sql,
+                "executions": ejecuciones,
+                "total_ms": round(total_ms, 2),
+                "avg_ms": round(total_ms / ejecuciones, 3) if ejecuciones else 0.0,
+                "prepares": preparaciones,
+                "errors": errores,
+            }
+            for sql, (ejecuciones, total_ms, preparaciones, errores) in filas[:limite]
+        ]
+        return stats
+
+
+_estadisticas_sentencias = EstadisticasSentencias()
+
+
+class CacheSentencias:
+    """
+    LRU de sentencias preparadas de una conexión (el servidor las guarda por sesión).
+    Cada sentencia vive en su propio cursor preparado; al expulsarla se cierra el cursor
+    y el servidor libera el statement. Con capacidad <= 0 no se cachea: el cursor se cierra
+    en la siguiente ejecución (o al drenar), una vez leídas sus filas.
+    """
+
+    def __init__(self, raw, capacidad: int):
+        self._raw = raw
+        self.capacidad = capacidad
+        self._cursores = OrderedDict()  # sql -> (cursor, sql original, sql normalizado)
+        self._activo = None
+        self._sin_cache = None  # cursor de la última ejecución sin caché, a cerrar
+
+    def __len__(self) -> int:
+        return len(self._cursores)
+
+    def ejecutar(self, query: str, params=None):
+        self.drenar()
+        entrada = self._cursores.get(query)
+        nueva = entrada is None
+        if self.capacidad <= 0:
+            entrada = (self._raw.cursor(prepared=True), query, " ".join(query.split()))
+            self._sin_cache = entrada[0]
+        elif nueva:
+            entrada = (self._raw.cursor(prepared=True), query, " ".join(query.split()))
+            self._cursores[query] = entrada
+            while len(self._cursores) > self.capacidad:
+                _, (viejo, _, _) = self._cursores.popitem(last=False)
+                self._cerrar_cursor(viejo)
+                _estadisticas_sentencias.registrar_expulsion()
+        else:
+            self._cursores.move_to_end(query)
+
+        cursor, sql, normalizado = entrada
+        # El conector 8.2 manda COM_STMT_RESET antes de cada execute (y PREPARE la primera vez)
+        viajes = 3 if nueva else 2
+        inicio = time.perf_counter()
+        try:
+            # El conector solo reutiliza el statement si recibe el mismo objeto str
+            cursor.execute(sql, tuple(params or ()))
+        except Error:
+            self._cursores.pop(query, None)
+            self._cerrar_cursor(cursor)
+            duracion = time.perf_counter() - inicio
+            _estadisticas_sentencias.registrar(normalizado, duracion * 1000, nueva, error=True)
+            metricas.observar_sql(sql, duracion, viajes=viajes, error=True)
+            raise
+        duracion = time.perf_counter() - inicio
+        _estadisticas_sentencias.registrar(normalizado, duracion * 1000, nueva)
+        metricas.observar_sql(sql, duracion, viajes=viajes)
+        self._activo = cursor
+        return cursor
+
+    def drenar(self):
+        """Lee las filas que quedaron sin leer del último cursor (si no, la conexión queda bloqueada)"""
+        activo, self._activo = self._activo, None
+        if activo is not None and self._raw.unread_result:
+            activo.fetchall()
+        sin_cache, self._sin_cache = self._sin_cache, None
+        if sin_cache is not None:
+            self._cerrar_cursor(sin_cache)
+
+    @staticmethod
+    def _cerrar_cursor(cursor):
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+class CursorPreparado:
+    """Fachada tipo cursor sobre CacheSentencias: execute/fetchone/fetchall/close"""
+
+    def __init__(self, conexion: PooledConnection):
+        self._conexion = conexion
+        self._cursor = None
+        self._query = None
+
+    def execute(self, query: str, params=None):
+        self._query = query
+        self._cursor = self._conexion.ejecutar_preparada(query, params)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        metricas.observar_sql(self._query, 0.0, filas=0 if fila is None else 1, viajes=0)
+        return fila
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        metricas.observar_sql(self._query, 0.0, filas=len(filas), viajes=0)
+        return filas
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def column_names(self):
+        return self._cursor.column_names
+
+    def close(self):
+        """El cursor preparado sigue en la caché de la conexión; solo se descartan filas pendientes"""
+        if self._cursor is not None and not self._conexion.closed and self._conexion.unread_result:
+            self._cursor.fetchall()
+        self._cursor = None
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones acotado y thread-safe.
+    Mantiene hasta pool_size conexiones abiertas en reposo y permite max_overflow
+    conexiones extra en picos; si se alcanza el máximo, espera hasta timeout segundos.
+    """
+
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 5,
+                 timeout: float = 10.0, recycle_ping: float = 30.0, max_sentencias: int = 32):
+        self._creator = creator
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.recycle_ping = recycle_ping
+        # Sentencias preparadas cacheadas por conexión (LRU de max_sentencias)
+        self.max_sentencias = max_sentencias
+        self._sentencias = {}  # id(raw) -> CacheSentencias
+        self._idle = deque()  # (raw, devuelta_en)
+        self._cond = threading.Condition()
+        self._abiertas = 0
+        self._prestadas = 0
+        self._stats = {
+            "checkouts": 0,
+            "checkins": 0,
+            "created": 0,
+            "overflow_created": 0,
+            "discarded": 0,
+            "reset_failures": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "timeouts": 0,
+        }
+
+    @property
+    def max_connections(self) -> int:
+        return self.pool_size + self.max_overflow
+
+    def checkout(self) -> Optional[PooledConnection]:
+        inicio_espera = None
+        while True:
+            candidata = None
+            with self._cond:
+                while not self._idle and self._abiertas >= self.max_connections:
+                    if inicio_espera is None:
+                        inicio_espera = time.monotonic()
+                        self._stats["waits"] += 1
+                    restante = self.timeout - (time.monotonic() - inicio_espera)
+                    if restante <= 0:
+                        self._stats["timeouts"] += 1
+                        self._registrar_espera(inicio_espera)
+                        print(f"⚠️ Pool MySQL agotado: {self._prestadas} conexiones en uso")
+                        return None
+                    self._cond.wait(restante)
+
+                if self._idle:
+                    candidata = self._idle.pop()
+                else:
+                    # Reservamos el cupo y creamos la conexión fuera del lock
+                    self._abiertas += 1
+                    if self._abiertas > self.pool_size:
+                        self._stats["overflow_created"] += 1
+                self._prestadas += 1
+
+            if candidata is not None:
+                raw, devuelta_en = candidata
+                if self._es_utilizable(raw, devuelta_en):
+                    break
+                with self._cond:
+                    self._prestadas -= 1
+                    self._abiertas -= 1
+                    self._stats["discarded"] += 1
+                    self._cond.notify()
+                self._cerrar(raw)
+                continue
+
+            try:
+                raw = self._creator()
+            except Exception as e:
+                print(f"Error creando conexión del pool: {e}")
+                raw = None
+            if raw is None:
+                with self._cond:
+                    self._prestadas -= 1
+                    self._abiertas -= 1
+                    self._cond.notify()
+                return None
+            with self._cond:
+                self._stats["created"] += 1
+            break
+
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._registrar_espera(inicio_espera)
+        return PooledConnection(self, raw)
+
+    def checkin(self, raw):
+        reutilizable = self._reset(raw)
+        with self._cond:
+            self._prestadas -= 1
+            self._stats["checkins"] += 1
+            if reutilizable and len(self._idle) < self.pool_size:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            else:
+                self._abiertas -= 1
+                self._stats["discarded"] += 1
+            self._cond.notify()
+        if raw is not None:
+            self._cerrar(raw)
+
+    def dispose(self):
+        """Cierra todas las conexiones en reposo"""
+        with self._cond:
+            conexiones = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._abiertas -= len(conexiones)
+            self._cond.notify_all()
+        for raw in conexiones:
+            self._cerrar(raw)
+
+    def sentencias_de(self, raw) -> CacheSentencias:
+        cache = self._sentencias.get(id(raw))
+        if cache is None:
+            cache = self._sentencias[id(raw)] = CacheSentencias(raw, self.max_sentencias)
+        return cache
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._abiertas,
+                "in_use": self._prestadas,
+                "idle": len(self._idle),
+                "overflow_in_use": max(0, self._abiertas - self.pool_size),
+                "prepared_statements_open": sum(len(c) for c in list(self._sentencias.values())),
+            })
+        stats["wait_time_ms"] = round(stats["wait_time_ms"], 2)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 2)
+        return stats
+
+    def _registrar_espera(self, inicio_espera: Optional[float]):
+        if inicio_espera is None:
+            return
+        espera_ms = (time.monotonic() - inicio_espera) * 1000
+        self._stats["wait_time_ms"] += espera_ms
+        if espera_ms > self._stats["max_wait_ms"]:
+            self._stats["max_wait_ms"] = espera_ms
+
+    def _es_utilizable(self, raw, devuelta_en: float) -> bool:
+        # Solo hacemos ping si la conexión estuvo inactiva un buen rato
+        if time.monotonic() - devuelta_en < self.recycle_ping:
+            return True
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def _reset(self, raw) -> bool:
+        """Deja la conexión limpia para el siguiente préstamo"""
+        try:
+            cache = self._sentencias.get(id(raw))
+            if cache is not None:
+                cache.drenar()
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+            if not raw.autocommit:
+                raw.autocommit = True
+            return True
+        except Exception as e:
+            self._stats["reset_failures"] += 1
+            print(f"⚠️ Conexión descartada al devolverla al pool: {e}")
+            return False
+
+    def _cerrar(self, raw):
+        # Las sentencias preparadas mueren con la sesión
+        self._sentencias.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+# Un pool por destino (host, puerto, base, usuario) compartido por todas las instancias
+_pools = {}
+_pools_lock = threading.Lock()
+# Conexiones prestadas con get_connection() por cada hilo (un request por hilo)
+_leases = threading.local()
+# Pools heredados del padre en un proceso hijo: se retienen para que el GC no los cierre
+_pools_heredados = []
+
+
+def _reiniciar_tras_fork():
+    """
+    En el hijo de un fork (pool de procesos, gunicorn --preload) los sockets del pool son del
+    padre: se abandonan sin cerrarlos (cerrarlos le cortaría la sesión al padre) y el hijo
+    abre sus propias conexiones.
+    """
+    global _pools_lock, _leases
+    _pools_heredados.extend(_pools.values())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+    _leases = threading.local()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+
 class MySQLConnection:
     def __init__(self):
         # Configuración para AWS RDS
@@ -12,11 +466,36 @@ class MySQLConnection:
         self.database = os.getenv('DB_NAME', 'sistema_asistencia_qr')
         self.user = os.getenv('DB_USER', 'admin')
         self.password = os.getenv('DB_PASSWORD', 'Vikyvaleria.24')
-        self.connection = None
-    
-    def connect(self) -> Optional[mysql.connector.MySQLConnection]:
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.max_overflow = int(os.getenv('DB_POOL_MAX_OVERFLOW', '5'))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+        # Sentencias preparadas cacheadas por conexión (0 desactiva y todo va como texto).
+        # Apagadas por defecto: mysql-connector 8.2 manda COM_STMT_RESET antes de cada execute,
+        # así que cada consulta preparada cuesta 2 viajes; activarlas solo si
+        # benchmarks/bench_prepared_statements.py muestra una ganancia contra esta BD.
+        self.max_sentencias = int(os.getenv('DB_PREPARED_CACHE_SIZE', '0'))
+
+    @property
+    def pool(self) -> ConnectionPool:
+        clave = (self.host, str(self.port), self.database, self.user)
+        pool = _pools.get(clave)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(clave)
+                if pool is None:
+                    pool = ConnectionPool(
+                        self._crear_conexion,
+                        pool_size=self.pool_size,
+                        max_overflow=self.max_overflow,
+                        timeout=self.pool_timeout,
+                        max_sentencias=self.max_sentencias
+                    )
+                    _pools[clave] = pool
+        return pool
+
+    def _crear_conexion(self):
         try:
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=self.host,
                 port=self.port,
                 database=self.database,
@@ -29,79 +508,214 @@ class MySQLConnection:
                 auth_plugin='mysql_native_password',
                 init_command="SET time_zone = '-05:00'"
             )
-            if self.connection.is_connected():
-                cursor = self.connection.cursor()
+            if connection.is_connected():
+                cursor = connection.cursor()
                 cursor.execute("SET time_zone = 'America/Lima'")
                 cursor.close()
                 print(f"Conexión exitosa a MySQL en AWS RDS - Base de datos: {self.database}")
-                return self.connection
+                return connection
         except Error as e:
             print(f"Error al conectar a MySQL en AWS RDS: {e}")
             print(f"Credenciales usadas - Host: {self.host}:{self.port}, User: {self.user}, DB: {self.database}")
-            return None
-    
+        return None
+
+    def connect(self) -> Optional[PooledConnection]:
+        return self.get_connection()
+
     def disconnect(self):
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("Conexión a MySQL (AWS RDS) cerrada")
-    
-    def get_connection(self) -> Optional[mysql.connector.MySQLConnection]:
-        if not self.connection or not self.connection.is_connected():
-            return self.connect()
-        return self.connection
-    
-    def execute_query(self, query: str, params: tuple = None) -> Optional[list]:
-        connection = self.get_connection()
-        if not connection:
-            return None
-        
-        try:
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            result = cursor.fetchall()
-            cursor.close()
-            return result
-        except Error as e:
-            print(f"Error ejecutando query en AWS: {e}")
-            return None
-    
-    def execute_update(self, query: str, params: tuple = None) -> bool:
-        connection = self.get_connection()
-        if not connection:
-            return False
-        
+        self.pool.dispose()
+        print("Conexiones en reposo del pool MySQL (AWS RDS) cerradas")
+
+    def get_connection(self) -> Optional[PooledConnection]:
+        """
+        Presta una conexión del pool. El llamador debe devolverla con conn.close();
+        las que queden sin devolver se liberan al final del request (release_thread_connections).
+        """
+        conn = self.pool.checkout()
+        if conn is not None:
+            leases = [c for c in getattr(_leases, 'items', ()) if not c.closed]
+            leases.append(conn)
+            _leases.items = leases
+        return conn
+
+    def release_thread_connections(self) -> int:
+        """Devuelve al pool las conexiones que el hilo actual olvidó cerrar"""
+        liberadas = 0
+        for conn in getattr(_leases, 'items', ()):
+            if not conn.closed:
+                conn.close()
+                liberadas += 1
+        _leases.items = []
+        return liberadas
+
+    def get_pool_stats(self) -> dict:
+        return self.pool.get_stats()
+
+    def get_statement_stats(self, limite: int = 50) -> dict:
+        """Ejecuciones y tiempo acumulado de las sentencias preparadas, de la más costosa a la menos"""
+        stats = _estadisticas_sentencias.get_stats(limite)
+        stats["cache_size_per_connection"] = self.max_sentencias
+        return stats
+
+    def _cursor(self, connection, preparada: bool, **kwargs):
+        if preparada and self.max_sentencias > 0:
+            return connection.cursor_preparado()
+        return connection.cursor(**kwargs)
+
+    @contextmanager
+    def _prestar(self):
+        conn = self.pool.checkout()
         try:
-            cursor = connection.cursor()
-            cursor.execute(query, params or ())
-            connection.commit()
-            cursor.close()
+            yield conn
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def execute_query(self, query: str, params: tuple = None, preparada: bool = False) -> Optional[list]:
+        with self._prestar() as connection:
+            if not connection:
+                return None
+
+            try:
+                cursor = self._cursor(connection, preparada, dictionary=True)
+                cursor.execute(query, params or ())
+                result = cursor.fetchall()
+                if isinstance(cursor, CursorPreparado):
+                    columnas = cursor.column_names
+                    result = [dict(zip(columnas, fila)) for fila in result]
+                cursor.close()
+                return result
+            except Error as e:
+                print(f"Error ejecutando query en AWS: {e}")
+                return None
+
+    def execute_query_tuplas(self, query: str, params: tuple = None, preparada: bool = False) -> Optional[list]:
+        """Como execute_query pero cada fila es una tupla en el orden del SELECT (sin dict por fila)"""
+        with self._prestar() as connection:
+            if not connection:
+                return None
+
+            try:
+                cursor = self._cursor(connection, preparada)
+                cursor.execute(query, params or ())
+                result = cursor.fetchall()
+                cursor.close()
+                return result
+            except Error as e:
+                print(f"Error ejecutando query en AWS: {e}")
+                return None
+
+    def execute_update(self, query: str, params: tuple = None, preparada: bool = False) -> bool:
+        with self._prestar() as connection:
+            if not connection:
+                return False
+
+            try:
+                cursor = self._cursor(connection, preparada)
+                cursor.execute(query, params or ())
+                connection.commit()
+                cursor.close()
+                return True
+            except Error as e:
+                print(f"Error ejecutando update en AWS: {e}")
+                connection.rollback()
+                return False
+
+    def execute_insert(self, query: str, params: tuple = None, preparada: bool = False) -> Optional[int]:
+        with self._prestar() as connection:
+            if not connection:
+                return None
+
+            try:
+                cursor = self._cursor(connection, preparada)
+                cursor.execute(query, params or ())
+                connection.commit()
+                last_id = cursor.lastrowid
+                cursor.close()
+                return last_id
+            except Error as e:
+                print(f"Error ejecutando insert en AWS: {e}")
+                connection.rollback()
+                return None
+
+
+    def execute_many(self, query: str, params_list: list) -> bool:
+        """Inserta varias filas con un solo INSERT multi-fila (executemany)"""
+        if not params_list:
             return True
-        except Error as e:
-            print(f"Error ejecutando update en AWS: {e}")
-            connection.rollback()
-            return False
-    
-    def execute_insert(self, query: str, params: tuple = None) -> Optional[int]:
-        connection = self.get_connection()
-        if not connection:
-            return None
-        
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query, params or ())
-            connection.commit()
-            last_id = cursor.lastrowid
-            cursor.close()
-            return last_id
-        except Error as e:
-            print(f"Error ejecutando insert en AWS: {e}")
-            connection.rollback()
-            return None
+        with self._prestar() as connection:
+            if not connection:
+                return False
+
+            try:
+                cursor = connection.cursor()
+                cursor.executemany(query, params_list)
+                connection.commit()
+                cursor.close()
+                return True
+            except Error as e:
+                print(f"Error ejecutando executemany en AWS: {e}")
+                connection.rollback()
+                return False
+
+    def execute_transaction(self, sentencias: list) -> bool:
+        """Ejecuta [(query, params), ...] en una sola transacción: todas o ninguna"""
+        with self._prestar() as connection:
+            if not connection:
+                return False
+
+            try:
+                connection.start_transaction()
+                cursor = connection.cursor()
+                for query, params in sentencias:
+                    cursor.execute(query, params or ())
+                connection.commit()
+                cursor.close()
+                return True
+            except Error as e:
+                print(f"Error ejecutando transacción en AWS: {e}")
+                connection.rollback()
+                return False
+
+    def execute_procedure(self, procedure: str, params: tuple = (), reintentos_deadlock: int = 0) -> Optional[list]:
+        """
+        Ejecuta CALL procedure(...) en un solo viaje a la BD y devuelve
+        las filas del último result set como diccionarios.
+        Si InnoDB lo elige como víctima de un deadlock (1213, transacción ya revertida),
+        lo repite hasta reintentos_deadlock veces.
+        """
+        placeholders = ", ".join(["%s"] * len(params))
+        query = f"CALL {procedure}({placeholders})"
+        for intento in range(reintentos_deadlock + 1):
+            with self._prestar() as connection:
+                if not connection:
+                    return None
+
+                try:
+                    cursor = connection.cursor(dictionary=True)
+                    result = []
+                    for resultado in cursor.execute(query, params, multi=True):
+                        if resultado.with_rows:
+                            result = resultado.fetchall()
+                    cursor.close()
+                    return result
+                except Error as e:
+                    if e.errno == ER_LOCK_DEADLOCK and intento < reintentos_deadlock:
+                        print(f"⚠️ Deadlock en {procedure}, reintento {intento + 1}/{reintentos_deadlock}")
+                        time.sleep(0.01 * (intento + 1))
+                        continue
+                    print(f"Error ejecutando procedimiento {procedure} en AWS: {e}")
+                    return None
 
 
 # Instancia global y función helper
 _db_instance = MySQLConnection()
 
-def get_connection() -> Optional[mysql.connector.MySQLConnection]:
-    """Devuelve una conexión activa a la BD en AWS"""
-    return _db_instance.get_connection()
\ No newline at end of file
+def get_connection() -> Optional[PooledConnection]:
+    """Presta una conexión del pool a la BD en AWS; conn.close() la devuelve al pool"""
+    return _db_instance.get_connection()
+
+
+def release_thread_connections() -> int:
+    """Devuelve al pool las conexiones prestadas con get_connection() que quedaron abiertas"""
+    return _db_instance.release_thread_connections()
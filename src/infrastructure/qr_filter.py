@@ -0,0 +1,131 @@
+import math
+import os
+import threading
+from typing import Iterable, Optional
+
+from .qr_index import IndiceQR, claves_qr, hash_clave
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom sobre hashes de 64 bits ya calculados.
+    Las k posiciones salen por doble hashing de las dos mitades del hash.
+    Sin falsos negativos; falsos positivos con probabilidad ~tasa_falsos_positivos.
+    """
+
+    def __init__(self, capacidad: int, tasa_falsos_positivos: float = 0.001):
+        capacidad = max(capacidad, 64)
+        self.bits = max(64, int(math.ceil(-capacidad * math.log(tasa_falsos_positivos) / (math.log(2) ** 2))))
+        self.funciones = max(1, int(round(self.bits / capacidad * math.log(2))))
+        self._arreglo = bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def desde_hashes(cls, hashes: Iterable[int], tasa_falsos_positivos: float = 0.001) -> "FiltroBloom":
+        hashes = list(hashes)
+        filtro = cls(len(hashes), tasa_falsos_positivos)
+        for h in hashes:
+            filtro.agregar_hash(h)
+        return filtro
+
+    def _posiciones(self, h: int):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        for i in range(self.funciones):
+            yield (h1 + i * h2) % self.bits
+
+    def agregar_hash(self, h: int):
+        for posicion in self._posiciones(h):
+            self._arreglo[posicion >> 3] |= 1 << (posicion & 7)
+
+    def contiene_hash(self, h: int) -> bool:
+        return all(self._arreglo[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(h))
+
+    @property
+    def tamano_bytes(self) -> int:
+        return len(self._arreglo)
+
+
+class FiltroQRValidos:
+    """
+    Descarta en microsegundos los textos que no pueden ser QR de un empleado activo
+    (etiquetas de productos, códigos viejos), antes de tocar la BD.
+    El filtro se arma con las claves del índice QR y se rehace cuando cambia su generación.
+    Si el índice no está disponible, o su generación tiene más de `max_antiguedad` segundos
+    (empleados creados en otra máquina o por SQL, reconstrucción fallida), deja pasar todo
+    y la BD decide, como antes.
+    """
+
+    def __init__(self, indice: IndiceQR, tasa_falsos_positivos: float = 0.001,
+                 auditar_rechazos: bool = False, max_antiguedad: float = 180.0):
+        self.indice = indice
+        self.tasa_falsos_positivos = tasa_falsos_positivos
+        self.max_antiguedad = max_antiguedad
+        # Con auditoría el rechazo igual se anota en ESCANEOS_TRACKING
+        self.auditar_rechazos = auditar_rechazos
+        self._filtro: Optional[FiltroBloom] = None
+        self._generacion = None
+        self._lock = threading.Lock()
+        self._stats = {"checks": 0, "rejected": 0, "passed": 0, "unavailable": 0, "stale": 0, "rebuilds": 0}
+
+    @classmethod
+    def desde_entorno(cls, indice: IndiceQR) -> Optional["FiltroQRValidos"]:
+        """
+        SCAN_QR_FILTER=0 lo desactiva; SCAN_AUDIT_REJECTED=1 guarda el tracking de los rechazos;
+        SCAN_QR_FILTER_MAX_AGE segundos de antigüedad del índice hasta los que se confía en un rechazo
+        """
+        if os.getenv('SCAN_QR_FILTER', '1') == '0':
+            return None
+        return cls(
+            indice,
+            tasa_falsos_positivos=float(os.getenv('SCAN_QR_FILTER_FP_RATE', '0.001')),
+            auditar_rechazos=os.getenv('SCAN_AUDIT_REJECTED', '0') == '1',
+            max_antiguedad=float(os.getenv('SCAN_QR_FILTER_MAX_AGE', '180')),
+        )
+
+    def puede_existir(self, codigo_qr: str) -> bool:
+        """False solo si es seguro que el código no corresponde a ningún empleado activo"""
+        filtro = self._filtro_actual()
+        if filtro is None:
+            self._contar("unavailable")
+            return True
+        self._contar("checks")
+        if any(filtro.contiene_hash(hash_clave(clave)) for clave in claves_qr(codigo_qr)):
+            self._contar("passed")
+            return True
+        antiguedad = self.indice.antiguedad_segundos()
+        if antiguedad is None or antiguedad > self.max_antiguedad or self.indice.reconstruccion_pendiente:
+            # El código puede ser de un empleado que el índice todavía no tiene
+            self._contar("stale")
+            return True
+        self._contar("rejected")
+        return False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            filtro = self._filtro
+            stats["generation"] = self._generacion
+        stats["bits"] = filtro.bits if filtro else 0
+        stats["hash_functions"] = filtro.funciones if filtro else 0
+        stats["bytes"] = filtro.tamano_bytes if filtro else 0
+        stats["target_fp_rate"] = self.tasa_falsos_positivos
+        stats["max_index_age_seconds"] = self.max_antiguedad
+        stats["audit_rejected"] = self.auditar_rechazos
+        stats["rejection_ratio"] = round(stats["rejected"] / stats["checks"], 4) if stats["checks"] else 0.0
+        return stats
+
+    def _filtro_actual(self) -> Optional[FiltroBloom]:
+        if not self.indice.disponible:
+            return None
+        generacion = self.indice.generacion
+        if generacion == self._generacion:
+            return self._filtro
+        filtro = FiltroBloom.desde_hashes(self.indice.iter_hashes(solo_activos=True), self.tasa_falsos_positivos)
+        with self._lock:
+            self._filtro, self._generacion = filtro, generacion
+            self._stats["rebuilds"] += 1
+        return filtro
+
+    def _contar(self, clave: str):
+        with self._lock:
+            self._stats[clave] += 1
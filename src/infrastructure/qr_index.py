@@ -0,0 +1,277 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+EntradaIndiceQR = namedtuple('EntradaIndiceQR', ['empleado_id', 'empresa_id', 'activo'])
+
+# Cabecera: magic, versión, cantidad de registros, generación
+_CABECERA = struct.Struct('<8sIIQ')
+# Registro: hash de la clave, empleado_id, empresa_id, activo (ordenados por hash)
+_REGISTRO = struct.Struct('<QiiB3x')
+_MAGIC = b'QRIDX001'
+_VERSION = 1
+
+
+def claves_qr(codigo_qr: str) -> List[str]:
+    """
+    Claves con las que se puede encontrar a un empleado a partir del texto leído:
+    el codigo_qr_unico exacto y, para los QRs EMP_<empresa>_<id>_<ts> que genera
+    QRGenerator.generate_employee_qr, la clave EMP#<id> (misma regla que MarkAttendanceUseCase)
+    """
+    claves = [codigo_qr]
+    if codigo_qr.startswith("EMP_"):
+        parts = codigo_qr.split("_")
+        if len(parts) >= 3:
+            try:
+                claves.append(f"EMP#{int(parts[2])}")
+            except ValueError:
+                pass
+    return claves
+
+
+def hash_clave(clave: str) -> int:
+    return int.from_bytes(hashlib.blake2b(clave.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def construir_indice(path: str, empleados: Iterable[tuple]) -> int:
+    """
+    Escribe el índice a partir de filas (empleado_id, empresa_id, codigo_qr_unico, activo).
+    Se escribe en un archivo temporal y se renombra, así los lectores nunca ven un archivo a medias.
+    Devuelve la generación escrita.
+    """
+    registros = {}
+    for empleado_id, empresa_id, codigo_qr_unico, activo in empleados:
+        valor = (int(empleado_id), int(empresa_id or 0), 1 if activo else 0)
+        if codigo_qr_unico:
+            registros[hash_clave(codigo_qr_unico)] = valor
+        registros.setdefault(hash_clave(f"EMP#{int(empleado_id)}"), valor)
+
+    generacion = time.time_ns()
+    directorio = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directorio, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.qr_index_', dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_CABECERA.pack(_MAGIC, _VERSION, len(registros), generacion))
+            for h in sorted(registros):
+                empleado_id, empresa_id, activo = registros[h]
+                f.write(_REGISTRO.pack(h, empleado_id, empresa_id, activo))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return generacion
+
+
+class IndiceQR:
+    """
+    Índice codigo QR -> (empleado_id, empresa_id, activo) en un archivo que cada worker
+    mapea en memoria de solo lectura. Cuando otro proceso lo reconstruye (write + rename),
+    los lectores detectan el archivo nuevo con un stat cada `intervalo_revision` segundos
+    y remapean sin reiniciar. Con proveedor, el índice también se reconstruye cuando tiene más de
+    `max_antiguedad` segundos (cambios hechos en otra máquina o por SQL) o cuando falló la última
+    reconstrucción, a lo sumo una vez cada `reintento_segundos`.
+    """
+
+    def __init__(self, path: str, proveedor: Optional[Callable[[], Iterable[tuple]]] = None,
+                 intervalo_revision: float = 1.0, reintento_segundos: float = 60.0,
+                 max_antiguedad: float = 60.0):
+        self.path = path
+        self.proveedor = proveedor
+        self.intervalo_revision = intervalo_revision
+        self.reintento_segundos = reintento_segundos
+        self.max_antiguedad = max_antiguedad
+        self._mm = None
+        self._identidad = None
+        self._cantidad = 0
+        self._generacion = 0
+        self._proxima_revision = 0.0
+        self._proximo_intento_build = 0.0
+        self._reconstruccion_pendiente = False
+        self._stats = {"rebuilds": 0, "rebuild_errors": 0}
+        self._lock = threading.RLock()
+        self._al_cambiar_generacion = []
+
+    @classmethod
+    def desde_entorno(cls, proveedor: Optional[Callable[[], Iterable[tuple]]] = None) -> "IndiceQR":
+        """QR_INDEX_PATH archivo del índice; QR_INDEX_MAX_AGE segundos antes de reconstruirlo desde la BD"""
+        path = os.getenv('QR_INDEX_PATH', os.path.join(tempfile.gettempdir(), 'asistencia_qr_index.bin'))
+        return cls(path, proveedor, max_antiguedad=float(os.getenv('QR_INDEX_MAX_AGE', '60')))
+
+    @property
+    def generacion(self) -> int:
+        self._revisar()
+        return self._generacion
+
+    def antiguedad_segundos(self) -> Optional[float]:
+        """Segundos desde que se construyó la generación cargada (None si no hay índice)"""
+        self._revisar()
+        if self._mm is None:
+            return None
+        return max(0.0, (time.time_ns() - self._generacion) / 1e9)
+
+    @property
+    def reconstruccion_pendiente(self) -> bool:
+        """True si falló la última reconstrucción: al índice le pueden faltar cambios recientes"""
+        return self._reconstruccion_pendiente
+
+    @property
+    def disponible(self) -> bool:
+        self._revisar()
+        return self._mm is not None
+
+    def al_cambiar_generacion(self, callback: Callable[[int], None]):
+        """Registra una función que se llama cuando este proceso carga una generación nueva"""
+        self._al_cambiar_generacion.append(callback)
+
+    def buscar(self, codigo_qr: str) -> Optional[EntradaIndiceQR]:
+        """Busca por la clave exacta y, si no está, por EMP#<id>"""
+        for clave in claves_qr(codigo_qr):
+            entrada = self.buscar_clave(clave)
+            if entrada is not None:
+                return entrada
+        return None
+
+    def buscar_clave(self, clave: str) -> Optional[EntradaIndiceQR]:
+        """Busca solo la clave indicada (sin la regla EMP#<id>)"""
+        self._revisar()
+        with self._lock:
+            if self._mm is None:
+                return None
+            return self._buscar_hash(hash_clave(clave))
+
+    def iter_hashes(self, solo_activos: bool = False) -> Iterator[int]:
+        """Hashes de las claves de la generación cargada"""
+        self._revisar()
+        with self._lock:
+            if self._mm is None:
+                return iter(())
+            registros = [
+                _REGISTRO.unpack_from(self._mm, _CABECERA.size + i * _REGISTRO.size)
+                for i in range(self._cantidad)
+            ]
+        return (r[0] for r in registros if r[3] or not solo_activos)
+
+    def reconstruir(self) -> bool:
+        """
+        Reconstruye el índice desde el proveedor (normalmente tras crear/editar empleados).
+        Si falla, queda pendiente y se reintenta en una revisión posterior.
+        """
+        if self.proveedor is None:
+            return False
+        ok = self._construir()
+        with self._lock:
+            self._proxima_revision = 0.0
+        self._revisar()
+        return ok
+
+    def get_stats(self) -> dict:
+        self._revisar()
+        return {
+            "path": self.path,
+            "available": self._mm is not None,
+            "generation": self._generacion,
+            "age_seconds": round((time.time_ns() - self._generacion) / 1e9, 1) if self._mm is not None else None,
+            "entries": self._cantidad,
+            "bytes": _CABECERA.size + self._cantidad * _REGISTRO.size if self._mm is not None else 0,
+            "max_age_seconds": self.max_antiguedad,
+            "rebuild_pending": self._reconstruccion_pendiente,
+            **self._stats,
+        }
+
+    def _buscar_hash(self, h: int) -> Optional[EntradaIndiceQR]:
+        bajo, alto = 0, self._cantidad - 1
+        while bajo <= alto:
+            medio = (bajo + alto) // 2
+            registro = _REGISTRO.unpack_from(self._mm, _CABECERA.size + medio * _REGISTRO.size)
+            if registro[0] == h:
+                return EntradaIndiceQR(registro[1], registro[2], bool(registro[3]))
+            if registro[0] < h:
+                bajo = medio + 1
+            else:
+                alto = medio - 1
+        return None
+
+    def _revisar(self):
+        ahora = time.monotonic()
+        if ahora < self._proxima_revision:
+            return
+        cambio = None
+        with self._lock:
+            if ahora < self._proxima_revision:
+                return
+            self._proxima_revision = ahora + self.intervalo_revision
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                st = None
+
+            if st is not None:
+                identidad = (st.st_ino, st.st_mtime_ns, st.st_size)
+                if identidad != self._identidad:
+                    cambio = self._mapear(identidad) or cambio
+
+            # Primer arranque, archivo borrado o inválido, índice viejo o reconstrucción fallida:
+            # lo reconstruye quien llegue primero, fuera del lock para no frenar las búsquedas
+            vencido = st is None or self._mm is None or self._reconstruccion_pendiente or (
+                time.time_ns() - self._generacion > self.max_antiguedad * 1e9)
+            construir = vencido and self.proveedor is not None and ahora >= self._proximo_intento_build
+            if construir:
+                self._proximo_intento_build = ahora + self.reintento_segundos
+
+        if cambio:
+            for callback in self._al_cambiar_generacion:
+                try:
+                    callback(cambio)
+                except Exception as e:
+                    print(f"⚠️ Error notificando nueva generación del índice QR: {e}")
+
+        if construir and self._construir():
+            with self._lock:
+                self._proxima_revision = 0.0
+            self._revisar()
+
+    def _construir(self) -> bool:
+        """Escribe el índice desde el proveedor; si falla queda pendiente hasta el próximo intento"""
+        try:
+            construir_indice(self.path, self.proveedor())
+        except Exception as e:
+            with self._lock:
+                self._reconstruccion_pendiente = True
+                self._proximo_intento_build = time.monotonic() + self.reintento_segundos
+                self._stats["rebuild_errors"] += 1
+            print(f"❌ Error reconstruyendo índice QR (se reintenta en {self.reintento_segundos:.0f}s): {e}")
+            return False
+        with self._lock:
+            self._reconstruccion_pendiente = False
+            self._stats["rebuilds"] += 1
+        return True
+
+    def _mapear(self, identidad) -> Optional[int]:
+        try:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo mapear el índice QR: {e}")
+            return None
+        magic, version, cantidad, generacion = _CABECERA.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _VERSION or len(mm) < _CABECERA.size + cantidad * _REGISTRO.size:
+            mm.close()
+            print("⚠️ Índice QR con formato inválido, se ignora")
+            return None
+        anterior = self._mm
+        self._mm, self._identidad = mm, identidad
+        self._cantidad, self._generacion = cantidad, generacion
+        if anterior is not None:
+            anterior.close()
+        return generacion
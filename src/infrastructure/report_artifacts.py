@@ -0,0 +1,167 @@
+"""
+Caché local de artefactos de reportes (archivos ya generados, p. ej. el Excel mensual).
+
+Cada artefacto se guarda como <clave>--<version><extension> en un directorio local compartido por los
+workers de la máquina. La versión la da quien genera (derivada de los datos), así que no hay que
+invalidar nada: si los datos cambian cambia el nombre, y las versiones viejas de la misma clave se
+borran al guardar la nueva. El directorio está acotado en bytes; al pasarse se expulsan los
+artefactos usados hace más tiempo (se toca el mtime en cada acierto).
+"""
+import os
+import re
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+
+import pytz
+
+
+class CacheArtefactos:
+    def __init__(self, directorio: str, max_bytes: int = 200 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "aborted": 0, "evictions": 0,
+                       "replaced": 0}
+
+    @classmethod
+    def desde_entorno(cls) -> Optional["CacheArtefactos"]:
+        """REPORT_ARTIFACTS_DIR y REPORT_ARTIFACTS_MAX_MB (0 desactiva la caché)"""
+        max_mb = float(os.getenv('REPORT_ARTIFACTS_MAX_MB', '200'))
+        if max_mb <= 0:
+            return None
+        directorio = os.getenv('REPORT_ARTIFACTS_DIR',
+                               os.path.join(tempfile.gettempdir(), 'asistencia_artefactos'))
+        return cls(directorio, int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def _nombre(clave: str) -> str:
+        return re.sub(r'[^\w\-]', '_', clave)
+
+    def ruta(self, clave: str, version: str, extension: str) -> str:
+        return os.path.join(self.directorio, f"{self._nombre(clave)}--{self._nombre(version)}{extension}")
+
+    def buscar(self, clave: str, version: str, extension: str) -> Optional[str]:
+        """Ruta del artefacto si ya está generado para esa versión de los datos"""
+        ruta = self.ruta(clave, version, extension)
+        try:
+            os.utime(ruta)
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return ruta
+
+    def guardar_mientras(self, clave: str, version: str, extension: str,
+                         trozos: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Deja pasar los trozos (p. ej. hacia la respuesta HTTP) y los va copiando a un temporal;
+        solo si se consumen completos el temporal pasa a ser el artefacto (rename atómico).
+        """
+        destino = self.ruta(clave, version, extension)
+        fd, temporal = tempfile.mkstemp(prefix='.tmp-', dir=self.directorio)
+        completo = False
+        try:
+            with os.fdopen(fd, 'wb') as archivo:
+                for trozo in trozos:
+                    archivo.write(trozo)
+                    yield trozo
+            os.replace(temporal, destino)
+            completo = True
+        finally:
+            if not completo:
+                with self._lock:
+                    self._stats["aborted"] += 1
+                try:
+                    os.remove(temporal)
+                except OSError:
+                    pass
+        self._al_guardar(clave, destino)
+
+    def guardar(self, clave: str, version: str, extension: str, trozos: Iterable[bytes]) -> str:
+        for _ in self.guardar_mientras(clave, version, extension, trozos):
+            pass
+        return self.ruta(clave, version, extension)
+
+    def _al_guardar(self, clave: str, destino: str):
+        prefijo = f"{self._nombre(clave)}--"
+        reemplazados = 0
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre.startswith(prefijo) and ruta != destino:
+                try:
+                    os.remove(ruta)
+                    reemplazados += 1
+                except OSError:
+                    pass
+        with self._lock:
+            self._stats["stored"] += 1
+            self._stats["replaced"] += reemplazados
+        self._expulsar()
+
+    def _artefactos(self) -> list:
+        """[(mtime, tamaño, ruta)] de los artefactos terminados (sin temporales)"""
+        artefactos = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith('.tmp-'):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            artefactos.append((info.st_mtime, info.st_size, ruta))
+        return artefactos
+
+    def _expulsar(self):
+        artefactos = sorted(self._artefactos())
+        total = sum(tamano for _, tamano, _ in artefactos)
+        expulsados = 0
+        # El más reciente se conserva aunque por sí solo supere el límite
+        for _, tamano, ruta in artefactos[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamano
+            expulsados += 1
+        with self._lock:
+            self._stats["evictions"] += expulsados
+
+    def get_stats(self) -> dict:
+        artefactos = self._artefactos()
+        with self._lock:
+            stats = dict(self._stats)
+        consultas = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        stats["entries"] = len(artefactos)
+        stats["bytes"] = sum(tamano for _, tamano, _ in artefactos)
+        stats["max_bytes"] = self.max_bytes
+        stats["directory"] = self.directorio
+        return stats
+
+
+def programar_pregeneracion(tarea: Callable[[], None]):
+    """
+    Corre `tarea` una vez al mes con APScheduler (REPORT_PREGENERATE_DAY / _HOUR, hora de Lima),
+    pensado para dejar listo el mes anterior tras el cierre. REPORT_PREGENERATE=0 lo desactiva.
+    Con varios workers cada uno programa el suyo: el segundo encuentra el artefacto ya guardado.
+    """
+    if os.getenv('REPORT_PREGENERATE', '1') == '0':
+        return None
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    programador = BackgroundScheduler(timezone=pytz.timezone("America/Lima"), daemon=True)
+    programador.add_job(
+        tarea, 'cron',
+        day=int(os.getenv('REPORT_PREGENERATE_DAY', '1')),
+        hour=int(os.getenv('REPORT_PREGENERATE_HOUR', '3')),
+        id='pregenerar_reportes', coalesce=True, max_instances=1, misfire_grace_time=6 * 3600,
+    )
+    programador.start()
+    return programador
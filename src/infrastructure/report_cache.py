@@ -0,0 +1,220 @@
+"""
+Caché de resultados de reportes (la respuesta JSON ya serializada) con invalidación por alcance.
+
+Cada entrada tiene un alcance: una empresa (o todas) y un rango de fechas. Una escritura en
+ASISTENCIA invalida solo el alcance (empresa, mes de la fecha): toca archivos marca en un directorio
+local, y al leer una entrada se compara su hora de cálculo con el mtime de las marcas que la
+afectan (todas dependen además de una marca global, la de invalidar_todo). Así también se enteran
+los otros workers de la máquina sin coordinación extra.
+
+Periodos ya terminados no vencen (solo las marcas los invalidan); los que incluyen hoy vencen a los
+`ttl_abierto_segundos`, por escrituras que no pasan por esta app. Acotada en bytes con LRU.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+
+import pytz
+
+from .date_ranges import Fecha, a_date
+
+# Marcas por (empresa, mes), por empresa entera y para entradas de todas las empresas;
+# _GLOBAL la tienen todas las entradas
+_TODAS = 'todas'
+_GLOBAL = 'global'
+
+
+def _hoy_lima() -> date:
+    return datetime.now(pytz.timezone("America/Lima")).date()
+
+
+def _meses(inicio: date, fin: date) -> List[str]:
+    meses = []
+    anio, mes = inicio.year, inicio.month
+    while (anio, mes) <= (fin.year, fin.month):
+        meses.append(f"{anio}-{mes:02d}")
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+class _Entrada:
+    __slots__ = ("cuerpo", "marcas", "calculada_ns", "expira")
+
+    def __init__(self, cuerpo: bytes, marcas: Tuple[str, ...], calculada_ns: int, expira: Optional[float]):
+        self.cuerpo = cuerpo
+        self.marcas = marcas
+        self.calculada_ns = calculada_ns
+        self.expira = expira
+
+
+class CacheResultadosReportes:
+    def __init__(self, directorio: str, max_bytes: int = 32 * 1024 * 1024,
+                 ttl_abierto_segundos: float = 30.0,
+                 empresa_de_empleado: Optional[Callable[[int], Optional[int]]] = None,
+                 hoy: Callable[[], date] = _hoy_lima):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl_abierto_segundos = ttl_abierto_segundos
+        # Para invalidar cuando solo se conoce el empleado (endpoints de edición de asistencias)
+        self.empresa_de_empleado = empresa_de_empleado
+        self._hoy = hoy
+        os.makedirs(directorio, exist_ok=True)
+        self._entradas = OrderedDict()  # clave -> _Entrada
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "stale": 0, "expired": 0,
+                       "evictions": 0, "invalidations": 0, "too_large": 0}
+
+    @classmethod
+    def desde_entorno(cls, empresa_de_empleado=None) -> Optional["CacheResultadosReportes"]:
+        """REPORT_CACHE_MAX_MB (0 desactiva), REPORT_CACHE_OPEN_TTL y REPORT_CACHE_DIR (marcas)"""
+        max_mb = float(os.getenv('REPORT_CACHE_MAX_MB', '32'))
+        if max_mb <= 0:
+            return None
+        return cls(
+            os.getenv('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'asistencia_report_cache')),
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl_abierto_segundos=float(os.getenv('REPORT_CACHE_OPEN_TTL', '30')),
+            empresa_de_empleado=empresa_de_empleado,
+        )
+
+    # --- marcas ---
+
+    def _ruta_marca(self, nombre: str) -> str:
+        return os.path.join(self.directorio, nombre)
+
+    def _tocar(self, nombre: str, ahora_ns: int):
+        ruta = self._ruta_marca(nombre)
+        try:
+            os.utime(ruta, ns=(ahora_ns, ahora_ns))
+        except FileNotFoundError:
+            with open(ruta, 'a'):
+                pass
+            os.utime(ruta, ns=(ahora_ns, ahora_ns))
+
+    def _marca_ns(self, nombre: str) -> int:
+        try:
+            return os.stat(self._ruta_marca(nombre)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _marcas_de(empresa_id: Optional[int], inicio: date, fin: date) -> Tuple[str, ...]:
+        prefijo = f"e{int(empresa_id)}" if empresa_id else _TODAS
+        return tuple(f"{prefijo}-{mes}" for mes in _meses(inicio, fin)) + (prefijo, _GLOBAL)
+
+    # --- lectura ---
+
+    def obtener_o_calcular(self, clave: tuple, empresa_id: Optional[int], fecha_inicio: Fecha,
+                           fecha_fin: Fecha, calcular: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """
+        Cuerpo guardado para `clave` si sigue vigente; si no, el de `calcular()` (None = no
+        cachear, p. ej. una respuesta de error) guardado con el alcance empresa / fechas.
+        """
+        inicio, fin = a_date(fecha_inicio), a_date(fecha_fin)
+        cuerpo = self._leer(clave)
+        if cuerpo is not None:
+            return cuerpo
+        # Hora de inicio del cálculo: una escritura que llegue mientras se calcula lo deja vencido
+        calculada_ns = time.time_ns()
+        cuerpo = calcular()
+        if cuerpo is not None:
+            abierto = fin >= self._hoy()
+            expira = time.monotonic() + self.ttl_abierto_segundos if abierto else None
+            self._guardar(clave, _Entrada(cuerpo, self._marcas_de(empresa_id, inicio, fin), calculada_ns, expira))
+        return cuerpo
+
+    def _leer(self, clave: tuple) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._stats["misses"] += 1
+                return None
+        if entrada.expira is not None and time.monotonic() >= entrada.expira:
+            motivo = "expired"
+        elif any(self._marca_ns(marca) >= entrada.calculada_ns for marca in entrada.marcas):
+            motivo = "stale"
+        else:
+            with self._lock:
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                self._stats["hits"] += 1
+            return entrada.cuerpo
+        with self._lock:
+            if self._entradas.get(clave) is entrada:
+                del self._entradas[clave]
+                self._bytes -= len(entrada.cuerpo)
+            self._stats[motivo] += 1
+            self._stats["misses"] += 1
+        return None
+
+    def _guardar(self, clave: tuple, entrada: _Entrada):
+        tamano = len(entrada.cuerpo)
+        with self._lock:
+            if tamano > self.max_bytes:
+                self._stats["too_large"] += 1
+                return
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior.cuerpo)
+            self._entradas[clave] = entrada
+            self._bytes += tamano
+            self._stats["stored"] += 1
+            while self._bytes > self.max_bytes:
+                _, vieja = self._entradas.popitem(last=False)
+                self._bytes -= len(vieja.cuerpo)
+                self._stats["evictions"] += 1
+
+    # --- invalidación ---
+
+    def invalidar(self, empresa_id: Optional[int], fecha: Optional[Fecha] = None):
+        """
+        Cambió la asistencia de la empresa ese día (sin fecha: toda la empresa, p. ej. al editar un
+        empleado; sin empresa conocida: todas las empresas)
+        """
+        ahora_ns = time.time_ns()
+        mes = a_date(fecha).strftime('%Y-%m') if fecha is not None else None
+        if empresa_id:
+            self._tocar(f"e{int(empresa_id)}-{mes}" if mes else f"e{int(empresa_id)}", ahora_ns)
+            # Las entradas de "todas las empresas" también incluyen a esta
+            self._tocar(f"{_TODAS}-{mes}" if mes else _TODAS, ahora_ns)
+        else:
+            self.invalidar_todo()
+            return
+        with self._lock:
+            self._stats["invalidations"] += 1
+
+    def invalidar_empleado(self, empleado_id: int, fecha: Optional[Fecha] = None):
+        empresa_id = self.empresa_de_empleado(empleado_id) if self.empresa_de_empleado else None
+        self.invalidar(empresa_id, fecha)
+
+    def invalidar_todo(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entradas)
+            self._entradas.clear()
+            self._bytes = 0
+        # Para los otros workers: la marca global vence todas sus entradas
+        self._tocar(_GLOBAL, time.time_ns())
+
+    def al_registrar_asistencia(self, empleado, asistencia):
+        """Oyente para MarkAttendanceUseCase.agregar_oyente"""
+        empresa_id = getattr(empleado, 'empresa_id', None)
+        if empresa_id:
+            self.invalidar(empresa_id, asistencia.fecha)
+        else:
+            self.invalidar_empleado(empleado.id, asistencia.fecha)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entradas)
+            stats["bytes"] = self._bytes
+        consultas = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        stats["max_bytes"] = self.max_bytes
+        stats["open_ttl_seconds"] = self.ttl_abierto_segundos
+        return stats
@@ -0,0 +1,369 @@
+"""
+Implementaciones en memoria de los repositorios del dominio.
+Sirven para pruebas de carga y benchmarks sin MySQL: guardan copias de las entidades
+(como lo haría la BD) y cuentan cada operación como un viaje a la BD.
+"""
+import copy
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import pytz
+
+from src.domain.repositories import *
+from src.domain.entities import *
+
+
+def _ahora_lima() -> datetime:
+    return datetime.now(pytz.timezone("America/Lima"))
+
+
+class ContadorViajes:
+    """Cuenta las operaciones que en MySQL serían un viaje a la BD"""
+
+    def __init__(self):
+        self.viajes = 0
+        self._lock = threading.Lock()
+
+    def sumar(self, n: int = 1):
+        with self._lock:
+            self.viajes += n
+
+
+class _RepositorioMemoria:
+    def __init__(self, contador: Optional[ContadorViajes] = None):
+        self.contador = contador or ContadorViajes()
+        self._lock = threading.RLock()
+
+    def _viaje(self):
+        self.contador.sumar()
+
+
+class EmpresaRepositoryMemoria(_RepositorioMemoria, EmpresaRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None):
+        super().__init__(contador)
+        self._empresas = {}
+        self._siguiente_id = 1
+
+    def get_all(self) -> List[Empresa]:
+        self._viaje()
+        with self._lock:
+            return [copy.copy(e) for e in sorted(self._empresas.values(), key=lambda e: e.nombre)]
+
+    def get_by_id(self, id: int) -> Optional[Empresa]:
+        self._viaje()
+        with self._lock:
+            empresa = self._empresas.get(id)
+            return copy.copy(empresa) if empresa else None
+
+    def create(self, empresa: Empresa) -> Empresa:
+        self._viaje()
+        with self._lock:
+            empresa.id = self._siguiente_id
+            self._siguiente_id += 1
+            self._empresas[empresa.id] = copy.copy(empresa)
+        return empresa
+
+    def update(self, empresa: Empresa) -> Empresa:
+        self._viaje()
+        with self._lock:
+            self._empresas[empresa.id] = copy.copy(empresa)
+        return empresa
+
+    def delete(self, id: int) -> bool:
+        self._viaje()
+        with self._lock:
+            return self._empresas.pop(id, None) is not None
+
+
+class EmpleadoRepositoryMemoria(_RepositorioMemoria, EmpleadoRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None):
+        super().__init__(contador)
+        self._empleados = {}
+        self._id_por_codigo = {}
+        self._siguiente_id = 1
+
+    def listar_para_indice_qr(self) -> List[tuple]:
+        """Mismo contrato que EmpleadoRepositoryMySQL.listar_para_indice_qr (para IndiceQR)"""
+        self._viaje()
+        with self._lock:
+            return [(e.id, e.empresa_id, e.codigo_qr_unico, e.activo) for e in self._empleados.values()]
+
+    def get_all(self) -> List[Empleado]:
+        self._viaje()
+        with self._lock:
+            activos = [e for e in self._empleados.values() if e.activo]
+        return [copy.copy(e) for e in sorted(activos, key=lambda e: e.nombre)]
+
+    def get_by_id(self, id: int) -> Optional[Empleado]:
+        self._viaje()
+        with self._lock:
+            empleado = self._empleados.get(id)
+            return copy.copy(empleado) if empleado and empleado.activo else None
+
+    def get_by_empresa_id(self, empresa_id: int) -> List[Empleado]:
+        self._viaje()
+        with self._lock:
+            empleados = [e for e in self._empleados.values() if e.empresa_id == empresa_id and e.activo]
+        return [copy.copy(e) for e in sorted(empleados, key=lambda e: e.nombre)]
+
+    def get_empresa_id(self, id: int) -> Optional[int]:
+        self._viaje()
+        with self._lock:
+            empleado = self._empleados.get(id)
+            return empleado.empresa_id if empleado else None
+
+    def get_by_codigo_qr(self, codigo_qr: str) -> Optional[Empleado]:
+        self._viaje()
+        with self._lock:
+            empleado = self._empleados.get(self._id_por_codigo.get(codigo_qr))
+            return copy.copy(empleado) if empleado and empleado.activo else None
+
+    def create(self, empleado: Empleado) -> Empleado:
+        self._viaje()
+        with self._lock:
+            empleado.id = self._siguiente_id
+            self._siguiente_id += 1
+            self._empleados[empleado.id] = copy.copy(empleado)
+            self._id_por_codigo[empleado.codigo_qr_unico] = empleado.id
+        return empleado
+
+    def update(self, empleado: Empleado) -> Empleado:
+        self._viaje()
+        with self._lock:
+            anterior = self._empleados.get(empleado.id)
+            guardado = copy.copy(empleado)
+            if anterior is not None:
+                # Igual que el UPDATE de MySQL: el código QR no se modifica
+                guardado.codigo_qr_unico = anterior.codigo_qr_unico
+            self._empleados[empleado.id] = guardado
+        return empleado
+
+    def delete(self, id: int) -> bool:
+        self._viaje()
+        with self._lock:
+            empleado = self._empleados.pop(id, None)
+            if empleado is not None:
+                self._id_por_codigo.pop(empleado.codigo_qr_unico, None)
+            return True
+
+
+class AsistenciaRepositoryMemoria(_RepositorioMemoria, AsistenciaRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None,
+                 reloj: Callable[[], datetime] = _ahora_lima,
+                 empleado_repository: Optional[EmpleadoRepositoryMemoria] = None):
+        super().__init__(contador)
+        self.reloj = reloj
+        self.empleado_repository = empleado_repository
+        self._asistencias = {}  # (empleado_id, fecha) -> Asistencia
+        self._alertas = set()
+        self._siguiente_id = 1
+
+    def get_by_empleado_and_fecha(self, empleado_id: int, fecha: str) -> Optional[Asistencia]:
+        self._viaje()
+        with self._lock:
+            asistencia = self._asistencias.get((empleado_id, str(fecha)))
+            return copy.copy(asistencia) if asistencia else None
+
+    def get_by_fecha(self, fecha: str) -> List[Asistencia]:
+        self._viaje()
+        with self._lock:
+            asistencias = [a for (_, f), a in self._asistencias.items() if f == str(fecha)]
+        return [copy.copy(a) for a in sorted(asistencias, key=lambda a: a.empleado_id)]
+
+    def get_by_empleado_and_periodo(self, empleado_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
+        self._viaje()
+        with self._lock:
+            asistencias = [
+                a for (e, f), a in self._asistencias.items()
+                if e == empleado_id and str(fecha_inicio) <= f <= str(fecha_fin)
+            ]
+        return [copy.copy(a) for a in sorted(asistencias, key=lambda a: a.fecha)]
+
+    def get_by_empresa_and_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
+        """Sin JOIN en memoria: se inyecta el repositorio de empleados para filtrar por empresa"""
+        self._viaje()
+        if self.empleado_repository is None:
+            return []
+        with self.empleado_repository._lock:
+            ids = {e.id for e in self.empleado_repository._empleados.values()
+                   if e.empresa_id == empresa_id and e.activo}
+        with self._lock:
+            asistencias = [
+                a for (e, f), a in self._asistencias.items()
+                if e in ids and str(fecha_inicio) <= f <= str(fecha_fin)
+            ]
+        return [copy.copy(a) for a in sorted(asistencias, key=lambda a: (a.empleado_id, a.fecha))]
+
+    def get_filas_estadisticas(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        codigos = {estado: i + 1 for i, estado in enumerate(ESTADOS_DIA)}
+        return [
+            (a.empleado_id, codigos.get(a.estado_dia, 0),
+             round((8 if a.horas_normales is None else a.horas_normales) * 100), round((a.horas_extras or 0) * 100),
+             int(a.asistio_manana), int(a.asistio_tarde), int(a.tardanza_manana), int(a.tardanza_tarde))
+            for a in self.get_by_empresa_and_periodo(empresa_id, fecha_inicio, fecha_fin)
+        ]
+
+    def get_horas_reales(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        return [
+            (a.empleado_id, str(a.fecha), a.entrada_manana_real, a.salida_manana_real,
+             a.entrada_tarde_real, a.salida_tarde_real)
+            for a in self.get_by_empresa_and_periodo(empresa_id, fecha_inicio, fecha_fin)
+        ]
+
+    def get_version_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> Tuple[Optional[datetime], int]:
+        asistencias = self.get_by_empresa_and_periodo(empresa_id, fecha_inicio, fecha_fin)
+        return max((a.updated_at for a in asistencias if a.updated_at), default=None), len(asistencias)
+
+    def get_tablero_dia(self, fecha: str, empleado_id: Optional[int] = None) -> List[tuple]:
+        self._viaje()
+        if self.empleado_repository is None:
+            return []
+        with self.empleado_repository._lock:
+            empleados = [copy.copy(e) for e in self.empleado_repository._empleados.values()
+                         if e.activo and (empleado_id is None or e.id == empleado_id)]
+        filas = []
+        with self._lock:
+            for e in empleados:
+                a = self._asistencias.get((e.id, str(fecha)))
+                if a is None:
+                    filas.append((e.id, e.empresa_id, e.nombre, False, None, None, None, None, 0, 0))
+                else:
+                    filas.append((e.id, e.empresa_id, e.nombre, True, a.entrada_manana_real, a.salida_manana_real,
+                                  a.entrada_tarde_real, a.salida_tarde_real,
+                                  a.minutos_tardanza_manana or 0, a.minutos_tardanza_tarde or 0))
+        return filas
+
+    def create(self, asistencia: Asistencia) -> Asistencia:
+        self._viaje()
+        with self._lock:
+            asistencia.id = self._siguiente_id
+            self._siguiente_id += 1
+            asistencia.created_at = asistencia.updated_at = self.reloj().replace(tzinfo=None)
+            self._asistencias[(asistencia.empleado_id, str(asistencia.fecha))] = copy.copy(asistencia)
+        return asistencia
+
+    def update(self, asistencia: Asistencia) -> Asistencia:
+        self._viaje()
+        with self._lock:
+            asistencia.updated_at = self.reloj().replace(tzinfo=None)
+            self._asistencias[(asistencia.empleado_id, str(asistencia.fecha))] = copy.copy(asistencia)
+        return asistencia
+
+    def contar_faltas_empleado(self, empleado_id: int, dias: int = 30) -> int:
+        self._viaje()
+        desde = (self.reloj().date() - timedelta(days=dias)).strftime('%Y-%m-%d')
+        with self._lock:
+            return sum(
+                1 for (e, f), a in self._asistencias.items()
+                if e == empleado_id and f >= desde and a.estado_dia == 'FALTA'
+            )
+
+    def alerta_ya_enviada(self, empleado_id: int, numero_faltas: int) -> bool:
+        self._viaje()
+        with self._lock:
+            return (empleado_id, numero_faltas) in self._alertas
+
+    def registrar_alerta_enviada(self, empleado_id: int, numero_faltas: int) -> bool:
+        self._viaje()
+        with self._lock:
+            self._alertas.add((empleado_id, numero_faltas))
+        return True
+
+
+class CierreMensualRepositoryMemoria(_RepositorioMemoria, CierreMensualRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None,
+                 reloj: Callable[[], datetime] = _ahora_lima):
+        super().__init__(contador)
+        self.reloj = reloj
+        # (empresa_id, anio, mes) -> (cerrado_en, resumenes, minutos_diarios)
+        self._cierres = {}
+
+    def get_cierre(self, empresa_id: int, anio: int, mes: int) -> Optional[datetime]:
+        self._viaje()
+        with self._lock:
+            cierre = self._cierres.get((empresa_id, anio, mes))
+        return cierre[0] if cierre else None
+
+    def get_meses_cerrados(self, empresa_id: int) -> List[Tuple[int, int, datetime]]:
+        self._viaje()
+        with self._lock:
+            meses = [(anio, mes, cierre[0]) for (e, anio, mes), cierre in self._cierres.items() if e == empresa_id]
+        return sorted(meses, reverse=True)
+
+    def get_resumenes(self, empresa_id: int, anio: int, mes: int) -> List[dict]:
+        self._viaje()
+        with self._lock:
+            cierre = self._cierres.get((empresa_id, anio, mes))
+        return [dict(r) for r in sorted(cierre[1], key=lambda r: r["nombre"])] if cierre else []
+
+    def get_minutos_diarios(self, empresa_id: int, anio: int, mes: int) -> List[tuple]:
+        self._viaje()
+        with self._lock:
+            cierre = self._cierres.get((empresa_id, anio, mes))
+        return list(cierre[2]) if cierre else []
+
+    def guardar_cierre(self, empresa_id: int, anio: int, mes: int, resumenes: List[dict],
+                       minutos_diarios: List[tuple], cerrado_por: Optional[str] = None) -> bool:
+        self._viaje()
+        with self._lock:
+            self._cierres[(empresa_id, anio, mes)] = (
+                self.reloj().replace(tzinfo=None, microsecond=0),
+                [dict(r) for r in resumenes], [tuple(fila) for fila in minutos_diarios]
+            )
+        return True
+
+    def reabrir(self, empresa_id: int, anio: int, mes: int) -> bool:
+        self._viaje()
+        with self._lock:
+            self._cierres.pop((empresa_id, anio, mes), None)
+        return True
+
+
+class HorarioEstandarRepositoryMemoria(_RepositorioMemoria, HorarioEstandarRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None):
+        super().__init__(contador)
+        self._horarios = {}
+        self._siguiente_id = 1
+
+    def get_by_empresa_id(self, empresa_id: int) -> Optional[HorarioEstandar]:
+        self._viaje()
+        with self._lock:
+            horario = self._horarios.get(empresa_id)
+            return copy.copy(horario) if horario else None
+
+    def create(self, horario: HorarioEstandar) -> HorarioEstandar:
+        self._viaje()
+        with self._lock:
+            horario.id = self._siguiente_id
+            self._siguiente_id += 1
+            self._horarios[horario.empresa_id] = copy.copy(horario)
+        return horario
+
+    def update(self, horario: HorarioEstandar) -> HorarioEstandar:
+        self._viaje()
+        with self._lock:
+            self._horarios[horario.empresa_id] = copy.copy(horario)
+        return horario
+
+
+class EscaneoTrackingRepositoryMemoria(_RepositorioMemoria, EscaneoTrackingRepository):
+    def __init__(self, contador: Optional[ContadorViajes] = None,
+                 reloj: Callable[[], datetime] = _ahora_lima):
+        super().__init__(contador)
+        self.reloj = reloj
+        self._ultimo_por_codigo = {}
+        self.total = 0
+
+    def create(self, codigo_qr: str, ip_address: str = "") -> bool:
+        self._viaje()
+        with self._lock:
+            self._ultimo_por_codigo[codigo_qr] = self.reloj()
+            self.total += 1
+        return True
+
+    def existe_registro_reciente(self, codigo_qr: str, segundos: int = 10) -> bool:
+        self._viaje()
+        with self._lock:
+            ultimo = self._ultimo_por_codigo.get(codigo_qr)
+        return ultimo is not None and ultimo >= self.reloj() - timedelta(seconds=segundos)
@@ -1,37 +1,47 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta, time
 from .mysql_connection import MySQLConnection
+from .scan_dedup import VentanaDuplicados
+from .write_behind import EscrituraDiferidaTracking
+from .employee_cache import CacheEmpleados
+from .qr_index import IndiceQR
+from .daily_summary import ResumenDiarioEmpresa
+from .date_ranges import rango_semiabierto
+from .row_mapping import (
+    SELECT_EMPRESA, SELECT_EMPLEADO, SELECT_HORARIO, SELECT_ASISTENCIA, SELECT_ASISTENCIA_A,
+    decodificar_empresa, decodificar_empleado, decodificar_horario, decodificar_asistencia,
+    decodificar_marcacion, decodificar_horas_reales, decodificar_minutos_diarios, decodificar_resumen_mensual,
+    decodificar_fila_tablero,
+)
 from src.domain.repositories import *
 from src.domain.entities import *
 import hashlib
 
+# Minutos de retraso con el horario de la empresa (o el por defecto de HorarioEstandar);
+# misma fórmula que minutos_tardanza() y sp_registrar_escaneo
+_HORARIO_DEFECTO = HorarioEstandar()
+
+
+def _sql_minutos_tardanza(columna: str, esperada: str, defecto) -> str:
+    return (f"IF({columna} IS NULL, 0, GREATEST(0, FLOOR((TIME_TO_SEC({columna}) - "
+            f"TIME_TO_SEC(COALESCE({esperada}, '{defecto.strftime('%H:%M:%S')}'))) / 60)))")
 
-def convertir_a_time(valor) -> Optional[time]:
-    """
-    Convierte un valor de MySQL (puede ser time, timedelta, str o None) a datetime.time
-    """
-    if valor is None:
-        return None
-    if isinstance(valor, time):
-        return valor
-    if isinstance(valor, timedelta):
-        total_seconds = int(valor.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        hours = hours % 24
-        return time(hours, minutes, seconds)
-    if isinstance(valor, str):
-        try:
-            parts = valor.split(':')
-            if len(parts) >= 2:
-                h = int(parts[0])
-                m = int(parts[1])
-                s = int(parts[2]) if len(parts) > 2 else 0
-                return time(h % 24, m, s)
-        except:
-            return None
-    return None
+
+_MINUTOS_MANANA = _sql_minutos_tardanza('a.entrada_manana_real', 'h.entrada_manana', _HORARIO_DEFECTO.entrada_manana)
+_MINUTOS_TARDE = _sql_minutos_tardanza('a.entrada_tarde_real', 'h.entrada_tarde', _HORARIO_DEFECTO.entrada_tarde)
+
+# En un UPDATE de varias tablas MySQL no garantiza el orden de las asignaciones: los flags
+# repiten la expresión en lugar de leer la columna recién asignada
+RECALCULAR_TARDANZAS = f"""
+    UPDATE ASISTENCIA a
+    JOIN EMPLEADOS e ON e.id = a.empleado_id
+    LEFT JOIN HORARIOS_ESTANDAR h ON h.empresa_id = e.empresa_id
+    SET a.minutos_tardanza_manana = {_MINUTOS_MANANA},
+        a.minutos_tardanza_tarde = {_MINUTOS_TARDE},
+        a.tardanza_manana = ({_MINUTOS_MANANA}) > 0,
+        a.tardanza_tarde = ({_MINUTOS_TARDE}) > 0
+    WHERE a.id = %s
+"""
 
 
 class EmpresaRepositoryMySQL(EmpresaRepository):
@@ -39,38 +49,18 @@ class EmpresaRepositoryMySQL(EmpresaRepository):
         self.db = db_connection
     
     def get_all(self) -> List[Empresa]:
-        query = "SELECT * FROM EMPRESAS ORDER BY nombre"
-        results = self.db.execute_query(query)
+        query = f"{SELECT_EMPRESA} ORDER BY nombre"
+        results = self.db.execute_query_tuplas(query)
         if not results:
             return []
-        
-        empresas = []
-        for row in results:
-            empresa = Empresa(
-                id=row['id'],
-                nombre=row['nombre'],
-                codigo_empresa=row['codigo_empresa']
-            )
-            empresa.created_at = row.get('created_at')
-            empresa.updated_at = row.get('updated_at')
-            empresas.append(empresa)
-        return empresas
+        return [decodificar_empresa(row) for row in results]
     
     def get_by_id(self, id: int) -> Optional[Empresa]:
-        query = "SELECT * FROM EMPRESAS WHERE id = %s"
-        results = self.db.execute_query(query, (id,))
+        query = f"{SELECT_EMPRESA} WHERE id = %s"
+        results = self.db.execute_query_tuplas(query, (id,))
         if not results:
             return None
-        
-        row = results[0]
-        empresa = Empresa(
-            id=row['id'],
-            nombre=row['nombre'],
-            codigo_empresa=row['codigo_empresa']
-        )
-        empresa.created_at = row.get('created_at')
-        empresa.updated_at = row.get('updated_at')
-        return empresa
+        return decodificar_empresa(results[0])
     
     def create(self, empresa: Empresa) -> Empresa:
         query = """
@@ -97,91 +87,92 @@ class EmpresaRepositoryMySQL(EmpresaRepository):
 
 
 class EmpleadoRepositoryMySQL(EmpleadoRepository):
-    def __init__(self, db_connection: MySQLConnection):
+    def __init__(self, db_connection: MySQLConnection, cache: Optional[CacheEmpleados] = None,
+                 indice_qr: Optional[IndiceQR] = None):
         self.db = db_connection
+        # Caché read-through de empleados activos (por id y por código QR)
+        self.cache = cache
+        # Índice QR -> empleado compartido entre workers (archivo mapeado en memoria)
+        self.indice_qr = indice_qr
+        if indice_qr is not None:
+            if indice_qr.proveedor is None:
+                indice_qr.proveedor = self.listar_para_indice_qr
+            if cache is not None:
+                # Otro worker modificó empleados: lo cacheado aquí puede estar viejo
+                indice_qr.al_cambiar_generacion(lambda _generacion: cache.invalidar_todo())
+
+    def invalidar_cache(self, empleado_id: int = None, codigo_qr: str = None):
+        """Saca de la caché a un empleado tras modificarlo"""
+        if self.cache is not None:
+            self.cache.invalidar(empleado_id, codigo_qr)
+
+    def listar_para_indice_qr(self) -> List[tuple]:
+        """(id, empresa_id, codigo_qr_unico, activo) de todos los empleados, activos o no"""
+        query = "SELECT id, empresa_id, codigo_qr_unico, activo FROM EMPLEADOS"
+        results = self.db.execute_query_tuplas(query)
+        if results is None:
+            raise RuntimeError("No se pudo leer EMPLEADOS para el índice QR")
+        return results
+
+    def _reconstruir_indice_qr(self):
+        # Si falla, el índice queda pendiente y lo reintenta la próxima revisión (ver IndiceQR)
+        if self.indice_qr is not None:
+            self.indice_qr.reconstruir()
     
     def get_all(self) -> List[Empleado]:
-        query = "SELECT * FROM EMPLEADOS WHERE activo = TRUE ORDER BY nombre"
-        results = self.db.execute_query(query)
+        query = f"{SELECT_EMPLEADO} WHERE activo = TRUE ORDER BY nombre"
+        results = self.db.execute_query_tuplas(query)
         if not results:
             return []
-        
-        empleados = []
-        for row in results:
-            empleado = Empleado(
-                id=row['id'],
-                empresa_id=row['empresa_id'],
-                nombre=row['nombre'],
-                dni=row['dni'],
-                codigo_qr_unico=row['codigo_qr_unico'],
-                telefono=row['telefono'],
-                correo=row['correo'],
-                activo=row['activo']
-            )
-            empleado.fecha_registro = row.get('fecha_registro')
-            empleados.append(empleado)
-        return empleados
+        return [decodificar_empleado(row) for row in results]
     
     def get_by_id(self, id: int) -> Optional[Empleado]:
-        query = "SELECT * FROM EMPLEADOS WHERE id = %s AND activo = TRUE"
-        results = self.db.execute_query(query, (id,))
+        if self.cache is not None:
+            empleado = self.cache.get_por_id(id)
+            if empleado is not None:
+                return empleado
+
+        query = f"{SELECT_EMPLEADO} WHERE id = %s AND activo = TRUE"
+        results = self.db.execute_query_tuplas(query, (id,))
         if not results:
             return None
         
-        row = results[0]
-        empleado = Empleado(
-            id=row['id'],
-            empresa_id=row['empresa_id'],
-            nombre=row['nombre'],
-            dni=row['dni'],
-            codigo_qr_unico=row['codigo_qr_unico'],
-            telefono=row['telefono'],
-            correo=row['correo'],
-            activo=row['activo']
-        )
-        empleado.fecha_registro = row.get('fecha_registro')
+        empleado = decodificar_empleado(results[0])
+        if self.cache is not None:
+            self.cache.guardar(empleado)
         return empleado
     
     def get_by_empresa_id(self, empresa_id: int) -> List[Empleado]:
-        query = "SELECT * FROM EMPLEADOS WHERE empresa_id = %s AND activo = TRUE ORDER BY nombre"
-        results = self.db.execute_query(query, (empresa_id,))
+        query = f"{SELECT_EMPLEADO} WHERE empresa_id = %s AND activo = TRUE ORDER BY nombre"
+        results = self.db.execute_query_tuplas(query, (empresa_id,))
         if not results:
             return []
-        
-        empleados = []
-        for row in results:
-            empleado = Empleado(
-                id=row['id'],
-                empresa_id=row['empresa_id'],
-                nombre=row['nombre'],
-                dni=row['dni'],
-                codigo_qr_unico=row['codigo_qr_unico'],
-                telefono=row['telefono'],
-                correo=row['correo'],
-                activo=row['activo']
-            )
-            empleado.fecha_registro = row.get('fecha_registro')
-            empleados.append(empleado)
-        return empleados
+        return [decodificar_empleado(row) for row in results]
+    
+    def get_empresa_id(self, id: int) -> Optional[int]:
+        results = self.db.execute_query_tuplas("SELECT empresa_id FROM EMPLEADOS WHERE id = %s", (id,))
+        return results[0][0] if results else None
     
     def get_by_codigo_qr(self, codigo_qr: str) -> Optional[Empleado]:
-        query = "SELECT * FROM EMPLEADOS WHERE codigo_qr_unico = %s AND activo = TRUE"
-        results = self.db.execute_query(query, (codigo_qr,))
+        if self.cache is not None:
+            empleado = self.cache.get_por_codigo(codigo_qr)
+            if empleado is not None:
+                return empleado
+
+        if self.indice_qr is not None:
+            entrada = self.indice_qr.buscar_clave(codigo_qr)
+            if entrada is not None:
+                # El índice resuelve el código sin consultar la BD; el empleado sale por id (caché o PK)
+                return self.get_by_id(entrada.empleado_id) if entrada.activo else None
+
+        query = f"{SELECT_EMPLEADO} WHERE codigo_qr_unico = %s AND activo = TRUE"
+        results = self.db.execute_query_tuplas(query, (codigo_qr,))
         if not results:
             return None
         
-        row = results[0]
-        empleado = Empleado(
-            id=row['id'],
-            empresa_id=row['empresa_id'],
-            nombre=row['nombre'],
-            dni=row['dni'],
-            codigo_qr_unico=row['codigo_qr_unico'],
-            telefono=row['telefono'],
-            correo=row['correo'],
-            activo=row['activo']
-        )
-        empleado.fecha_registro = row.get('fecha_registro')
+        empleado = decodificar_empleado(results[0])
+        if self.cache is not None:
+            self.cache.guardar(empleado)
         return empleado
     
     def create(self, empleado: Empleado) -> Empleado:
@@ -195,6 +186,8 @@ class EmpleadoRepositoryMySQL(EmpleadoRepository):
         ))
         if empleado_id:
             empleado.id = empleado_id
+        self.invalidar_cache(empleado.id, empleado.codigo_qr_unico)
+        self._reconstruir_indice_qr()
         return empleado
     
     def update(self, empleado: Empleado) -> Empleado:
@@ -208,6 +201,8 @@ class EmpleadoRepositoryMySQL(EmpleadoRepository):
             empleado.empresa_id, empleado.nombre, empleado.dni,
             empleado.telefono, empleado.correo, empleado.activo, empleado.id
         ))
+        self.invalidar_cache(empleado.id)
+        self._reconstruir_indice_qr()
         return empleado
     
     def delete(self, id: int) -> bool:
@@ -223,6 +218,8 @@ class EmpleadoRepositoryMySQL(EmpleadoRepository):
             for query in queries:
                 self.db.execute_update(query, (id,))
             
+            self.invalidar_cache(id)
+            self._reconstruir_indice_qr()
             return True
         except Exception as e:
             print(f"Error eliminando empleado {id}: {e}")
@@ -234,106 +231,115 @@ class AsistenciaRepositoryMySQL(AsistenciaRepository):
         self.db = db_connection
     
     def get_by_empleado_and_fecha(self, empleado_id: int, fecha: str) -> Optional[Asistencia]:
-        query = """
-            SELECT * FROM ASISTENCIA 
-            WHERE empleado_id = %s AND fecha = %s
-        """
-        results = self.db.execute_query(query, (empleado_id, fecha))
+        query = f"{SELECT_ASISTENCIA} WHERE empleado_id = %s AND fecha = %s"
+        results = self.db.execute_query_tuplas(query, (empleado_id, fecha))
         if not results:
             return None
-        
-        row = results[0]
-        asistencia = Asistencia(
-            id=row['id'],
-            empleado_id=row['empleado_id'],
-            fecha=str(row['fecha']),
-            entrada_manana_real=convertir_a_time(row['entrada_manana_real']),
-            salida_manana_real=convertir_a_time(row['salida_manana_real']),
-            entrada_tarde_real=convertir_a_time(row['entrada_tarde_real']),
-            salida_tarde_real=convertir_a_time(row['salida_tarde_real']),
-            total_horas_trabajadas=float(row['total_horas_trabajadas'] or 0),
-            horas_normales=float(row['horas_normales'] or 8),
-            horas_extras=float(row['horas_extras'] or 0),
-            estado_dia=row['estado_dia']
-        )
-        # Cargar los campos booleanos
-        asistencia.asistio_manana = bool(row.get('asistio_manana', 0))
-        asistencia.asistio_tarde = bool(row.get('asistio_tarde', 0))
-        asistencia.tardanza_manana = bool(row.get('tardanza_manana', 0))
-        asistencia.tardanza_tarde = bool(row.get('tardanza_tarde', 0))
-        asistencia.created_at = row.get('created_at')
-        asistencia.updated_at = row.get('updated_at')
-        return asistencia
+        return decodificar_asistencia(results[0])
     
     def get_by_fecha(self, fecha: str) -> List[Asistencia]:
-        query = """
-            SELECT * FROM ASISTENCIA 
+        query = f"""
+            {SELECT_ASISTENCIA}
             WHERE fecha = %s
             ORDER BY empleado_id
         """
-        results = self.db.execute_query(query, (fecha,))
+        results = self.db.execute_query_tuplas(query, (fecha,), preparada=True)
         if not results:
             return []
-        
-        asistencias = []
-        for row in results:
-            asistencia = Asistencia(
-                id=row['id'],
-                empleado_id=row['empleado_id'],
-                fecha=str(row['fecha']),
-                entrada_manana_real=convertir_a_time(row['entrada_manana_real']),
-                salida_manana_real=convertir_a_time(row['salida_manana_real']),
-                entrada_tarde_real=convertir_a_time(row['entrada_tarde_real']),
-                salida_tarde_real=convertir_a_time(row['salida_tarde_real']),
-                total_horas_trabajadas=float(row['total_horas_trabajadas'] or 0),
-                horas_normales=float(row['horas_normales'] or 8),
-                horas_extras=float(row['horas_extras'] or 0),
-                estado_dia=row['estado_dia']
-            )
-            # Cargar los campos booleanos
-            asistencia.asistio_manana = bool(row.get('asistio_manana', 0))
-            asistencia.asistio_tarde = bool(row.get('asistio_tarde', 0))
-            asistencia.tardanza_manana = bool(row.get('tardanza_manana', 0))
-            asistencia.tardanza_tarde = bool(row.get('tardanza_tarde', 0))
-            asistencia.created_at = row.get('created_at')
-            asistencia.updated_at = row.get('updated_at')
-            asistencias.append(asistencia)
-        return asistencias
+        return [decodificar_asistencia(row) for row in results]
     
     def get_by_empleado_and_periodo(self, empleado_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
-        query = """
-            SELECT * FROM ASISTENCIA 
-            WHERE empleado_id = %s AND fecha BETWEEN %s AND %s
+        query = f"""
+            {SELECT_ASISTENCIA}
+            WHERE empleado_id = %s AND fecha >= %s AND fecha < %s
             ORDER BY fecha
         """
-        results = self.db.execute_query(query, (empleado_id, fecha_inicio, fecha_fin))
+        results = self.db.execute_query_tuplas(query, (empleado_id, *rango_semiabierto(fecha_inicio, fecha_fin)),
+                                                preparada=True)
         if not results:
             return []
-        
-        asistencias = []
-        for row in results:
-            asistencia = Asistencia(
-                id=row['id'],
-                empleado_id=row['empleado_id'],
-                fecha=str(row['fecha']),
-                entrada_manana_real=convertir_a_time(row['entrada_manana_real']),
-                salida_manana_real=convertir_a_time(row['salida_manana_real']),
-                entrada_tarde_real=convertir_a_time(row['entrada_tarde_real']),
-                salida_tarde_real=convertir_a_time(row['salida_tarde_real']),
-                total_horas_trabajadas=float(row['total_horas_trabajadas'] or 0),
-                horas_normales=float(row['horas_normales'] or 8),
-                horas_extras=float(row['horas_extras'] or 0),
-                estado_dia=row['estado_dia']
-            )
-            # Cargar los campos booleanos
-            asistencia.asistio_manana = bool(row.get('asistio_manana', 0))
-            asistencia.asistio_tarde = bool(row.get('asistio_tarde', 0))
-            asistencia.tardanza_manana = bool(row.get('tardanza_manana', 0))
-            asistencia.tardanza_tarde = bool(row.get('tardanza_tarde', 0))
-            asistencia.created_at = row.get('created_at')
-            asistencia.updated_at = row.get('updated_at')
-            asistencias.append(asistencia)
-        return asistencias
+        return [decodificar_asistencia(row) for row in results]
+    
+    def get_by_empresa_and_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[Asistencia]:
+        query = f"""
+            {SELECT_ASISTENCIA_A}
+            JOIN EMPLEADOS e ON e.id = a.empleado_id
+            WHERE e.empresa_id = %s AND e.activo = TRUE
+              AND a.fecha >= %s AND a.fecha < %s
+            ORDER BY a.empleado_id, a.fecha
+        """
+        results = self.db.execute_query_tuplas(query, (empresa_id, *rango_semiabierto(fecha_inicio, fecha_fin)),
+                                                preparada=True)
+        if not results:
+            return []
+        return [decodificar_asistencia(row) for row in results]
+    
+    def get_filas_estadisticas(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        # Sin entidades, fechas ni DECIMAL que decodificar: solo enteros (horas en centésimas).
+        # Sin NULL (np.int64 no los acepta): mismos valores por defecto que decodificar_asistencia
+        query = """
+            SELECT a.empleado_id,
+                   FIELD(a.estado_dia, 'FALTA', 'COMPLETO', 'INCOMPLETO'),
+                   CAST(ROUND(COALESCE(a.horas_normales, 8) * 100) AS SIGNED),
+                   CAST(ROUND(COALESCE(a.horas_extras, 0) * 100) AS SIGNED),
+                   COALESCE(a.asistio_manana, 0), COALESCE(a.asistio_tarde, 0),
+                   COALESCE(a.tardanza_manana, 0), COALESCE(a.tardanza_tarde, 0)
+            FROM ASISTENCIA a
+            JOIN EMPLEADOS e ON e.id = a.empleado_id
+            WHERE e.empresa_id = %s AND e.activo = TRUE
+              AND a.fecha >= %s AND a.fecha < %s
+        """
+        params = (empresa_id, *rango_semiabierto(fecha_inicio, fecha_fin))
+        return self.db.execute_query_tuplas(query, params, preparada=True) or []
+    
+    def get_horas_reales(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> List[tuple]:
+        # Sin filtrar por activo: el Excel lista a quien tenga marcaciones en el mes
+        query = """
+            SELECT a.empleado_id, a.fecha,
+                   a.entrada_manana_real, a.salida_manana_real,
+                   a.entrada_tarde_real, a.salida_tarde_real
+            FROM ASISTENCIA a
+            JOIN EMPLEADOS e ON a.empleado_id = e.id
+            WHERE e.empresa_id = %s
+              AND a.fecha >= %s AND a.fecha < %s
+        """
+        params = (empresa_id, *rango_semiabierto(fecha_inicio, fecha_fin))
+        filas = self.db.execute_query_tuplas(query, params, preparada=True) or []
+        return [decodificar_horas_reales(fila) for fila in filas]
+    
+    def get_version_periodo(self, empresa_id: int, fecha_inicio: str, fecha_fin: str) -> Tuple[Optional[datetime], int]:
+        # Mismo alcance que get_horas_reales; COUNT(*) detecta los borrados, que no mueven el MAX
+        query = """
+            SELECT MAX(a.updated_at), COUNT(*)
+            FROM ASISTENCIA a
+            JOIN EMPLEADOS e ON a.empleado_id = e.id
+            WHERE e.empresa_id = %s
+              AND a.fecha >= %s AND a.fecha < %s
+        """
+        params = (empresa_id, *rango_semiabierto(fecha_inicio, fecha_fin))
+        filas = self.db.execute_query_tuplas(query, params, preparada=True)
+        if not filas:
+            return None, 0
+        ultima, cantidad = filas[0]
+        return ultima, int(cantidad or 0)
+    
+    def get_tablero_dia(self, fecha: str, empleado_id: Optional[int] = None) -> List[tuple]:
+        # LEFT JOIN: también los que todavía no marcan (cuentan como ausentes del día)
+        query = """
+            SELECT e.id, e.empresa_id, e.nombre, a.id IS NOT NULL,
+                   a.entrada_manana_real, a.salida_manana_real,
+                   a.entrada_tarde_real, a.salida_tarde_real,
+                   COALESCE(a.minutos_tardanza_manana, 0), COALESCE(a.minutos_tardanza_tarde, 0)
+            FROM EMPLEADOS e
+            LEFT JOIN ASISTENCIA a ON a.empleado_id = e.id AND a.fecha = %s
+            WHERE e.activo = TRUE
+        """
+        params = [fecha]
+        if empleado_id is not None:
+            query += " AND e.id = %s"
+            params.append(empleado_id)
+        filas = self.db.execute_query_tuplas(query, tuple(params), preparada=True) or []
+        return [decodificar_fila_tablero(fila) for fila in filas]
     
     def create(self, asistencia: Asistencia) -> Asistencia:
         query = """
@@ -341,8 +347,9 @@ class AsistenciaRepositoryMySQL(AsistenciaRepository):
             (empleado_id, fecha, entrada_manana_real, salida_manana_real, 
              entrada_tarde_real, salida_tarde_real, total_horas_trabajadas, 
              horas_normales, horas_extras, estado_dia, 
-             asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+             asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde,
+             minutos_tardanza_manana, minutos_tardanza_tarde)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         asistencia_id = self.db.execute_insert(query, (
             asistencia.empleado_id, asistencia.fecha,
@@ -351,7 +358,8 @@ class AsistenciaRepositoryMySQL(AsistenciaRepository):
             asistencia.total_horas_trabajadas, asistencia.horas_normales,
             asistencia.horas_extras, asistencia.estado_dia,
             asistencia.asistio_manana, asistencia.asistio_tarde,
-            asistencia.tardanza_manana, asistencia.tardanza_tarde
+            asistencia.tardanza_manana, asistencia.tardanza_tarde,
+            asistencia.minutos_tardanza_manana, asistencia.minutos_tardanza_tarde
         ))
         if asistencia_id:
             asistencia.id = asistencia_id
@@ -365,7 +373,8 @@ class AsistenciaRepositoryMySQL(AsistenciaRepository):
                 total_horas_trabajadas = %s, horas_normales = %s,
                 horas_extras = %s, estado_dia = %s,
                 asistio_manana = %s, asistio_tarde = %s,
-                tardanza_manana = %s, tardanza_tarde = %s
+                tardanza_manana = %s, tardanza_tarde = %s,
+                minutos_tardanza_manana = %s, minutos_tardanza_tarde = %s
             WHERE id = %s
         """
         self.db.execute_update(query, (
@@ -375,9 +384,14 @@ class AsistenciaRepositoryMySQL(AsistenciaRepository):
             asistencia.horas_extras, asistencia.estado_dia,
             asistencia.asistio_manana, asistencia.asistio_tarde,
             asistencia.tardanza_manana, asistencia.tardanza_tarde,
+            asistencia.minutos_tardanza_manana, asistencia.minutos_tardanza_tarde,
             asistencia.id
         ))
         return asistencia
+
+    def recalcular_tardanzas(self, asistencia_id: int) -> bool:
+        """Recalcula en la BD los minutos y flags de tardanza tras editar las horas de entrada"""
+        return self.db.execute_update(RECALCULAR_TARDANZAS, (asistencia_id,))
     
     def contar_faltas_empleado(self, empleado_id: int, dias: int = 30) -> int:
         """Cuenta las faltas de un empleado en los últimos X días"""
@@ -430,21 +444,11 @@ class HorarioEstandarRepositoryMySQL(HorarioEstandarRepository):
         self.db = db_connection
     
     def get_by_empresa_id(self, empresa_id: int) -> Optional[HorarioEstandar]:
-        query = "SELECT * FROM HORARIOS_ESTANDAR WHERE empresa_id = %s"
-        results = self.db.execute_query(query, (empresa_id,))
+        query = f"{SELECT_HORARIO} WHERE empresa_id = %s"
+        results = self.db.execute_query_tuplas(query, (empresa_id,), preparada=True)
         if not results:
             return None
-        
-        row = results[0]
-        horario = HorarioEstandar(
-            id=row['id'],
-            empresa_id=row['empresa_id'],
-            entrada_manana=row['entrada_manana'],
-            salida_manana=row['salida_manana'],
-            entrada_tarde=row['entrada_tarde'],
-            salida_tarde=row['salida_tarde']
-        )
-        return horario
+        return decodificar_horario(results[0])
     
     def create(self, horario: HorarioEstandar) -> HorarioEstandar:
         query = """
@@ -475,10 +479,17 @@ class HorarioEstandarRepositoryMySQL(HorarioEstandarRepository):
 
 
 class EscaneoTrackingRepositoryMySQL(EscaneoTrackingRepository):
-    def __init__(self, db_connection: MySQLConnection):
+    def __init__(self, db_connection: MySQLConnection, ventana: Optional[VentanaDuplicados] = None,
+                 escritura_diferida: Optional[EscrituraDiferidaTracking] = None):
         self.db = db_connection
+        # Ventana anti-duplicado en memoria; la consulta a la BD queda como respaldo
+        self.ventana = ventana
+        # Buffer que inserta el tracking en lotes fuera del camino crítico del escaneo
+        self.escritura_diferida = escritura_diferida
     
     def create(self, codigo_qr: str, ip_address: str = "") -> bool:
+        if self.escritura_diferida is not None:
+            return self.escritura_diferida.encolar(codigo_qr, ip_address)
         query = """
             INSERT INTO ESCANEOS_TRACKING (codigo_qr, ip_address)
             VALUES (%s, %s)
@@ -486,6 +497,14 @@ class EscaneoTrackingRepositoryMySQL(EscaneoTrackingRepository):
         return self.db.execute_insert(query, (codigo_qr, ip_address)) is not None
     
     def existe_registro_reciente(self, codigo_qr: str, segundos: int = 10) -> bool:
+        if self.ventana is not None:
+            return self.ventana.es_duplicado(
+                codigo_qr, segundos,
+                lambda: self._existe_registro_reciente_bd(codigo_qr, segundos)
+            )
+        return self._existe_registro_reciente_bd(codigo_qr, segundos)
+
+    def _existe_registro_reciente_bd(self, codigo_qr: str, segundos: int) -> bool:
         query = """
             SELECT COUNT(*) as count FROM ESCANEOS_TRACKING 
             WHERE codigo_qr = %s 
@@ -501,6 +520,155 @@ class EscaneoTrackingRepositoryMySQL(EscaneoTrackingRepository):
         return self.create(codigo_qr, ip_address)
 
 
+class RegistroEscaneoRepositoryMySQL(RegistroEscaneoRepository):
+    """Escaneo en un solo viaje a la BD mediante el procedimiento sp_registrar_escaneo"""
+    # El procedimiento serializa por empleado; un deadlock residual se reintenta en vez de fallar el escaneo
+    REINTENTOS_DEADLOCK = 2
+
+    def __init__(self, db_connection: MySQLConnection, ventana: Optional[VentanaDuplicados] = None):
+        self.db = db_connection
+        self.ventana = ventana
+
+    def registrar_escaneo(self, codigo_qr: str, ip_address: str, fecha: str, hora_actual: time,
+                          segundos_duplicado: int, hora_limite_manana: time,
+                          minutos_minimos_estadia: int, entrada_manana_esperada: time,
+                          entrada_tarde_esperada: time) -> Optional[dict]:
+        # Las relecturas del kiosco se resuelven en memoria sin llamar al procedimiento,
+        # que igual revisa ESCANEOS_TRACKING por si otro worker vio el código
+        if self.ventana is not None and self.ventana.es_duplicado(codigo_qr, segundos_duplicado):
+            return {"resultado": "duplicado"}
+
+        results = self.db.execute_procedure("sp_registrar_escaneo", (
+            codigo_qr, ip_address, fecha, hora_actual, segundos_duplicado,
+            hora_limite_manana, minutos_minimos_estadia,
+            entrada_manana_esperada, entrada_tarde_esperada
+        ), reintentos_deadlock=self.REINTENTOS_DEADLOCK)
+        if not results:
+            return None
+        return results[0]
+
+
+class CierreMensualRepositoryMySQL(CierreMensualRepository):
+    # Filas por INSERT al guardar la foto (un mes de una empresa grande son miles de días)
+    FILAS_POR_INSERT = 500
+
+    def __init__(self, db_connection: MySQLConnection):
+        self.db = db_connection
+
+    def get_cierre(self, empresa_id: int, anio: int, mes: int) -> Optional[datetime]:
+        query = "SELECT cerrado_en FROM CIERRES_MENSUALES WHERE empresa_id = %s AND anio = %s AND mes = %s"
+        filas = self.db.execute_query_tuplas(query, (empresa_id, anio, mes), preparada=True)
+        return filas[0][0] if filas else None
+
+    def get_meses_cerrados(self, empresa_id: int) -> List[Tuple[int, int, datetime]]:
+        query = """
+            SELECT anio, mes, cerrado_en FROM CIERRES_MENSUALES
+            WHERE empresa_id = %s ORDER BY anio DESC, mes DESC
+        """
+        return [tuple(fila) for fila in self.db.execute_query_tuplas(query, (empresa_id,)) or []]
+
+    def get_resumenes(self, empresa_id: int, anio: int, mes: int) -> List[dict]:
+        query = f"""
+            SELECT empleado_id, nombre, dni, {', '.join(CAMPOS_ESTADISTICAS)}
+            FROM RESUMEN_MENSUAL_EMPLEADO
+            WHERE empresa_id = %s AND anio = %s AND mes = %s
+            ORDER BY nombre
+        """
+        filas = self.db.execute_query_tuplas(query, (empresa_id, anio, mes), preparada=True) or []
+        return [decodificar_resumen_mensual(fila) for fila in filas]
+
+    def get_minutos_diarios(self, empresa_id: int, anio: int, mes: int) -> List[tuple]:
+        query = """
+            SELECT empleado_id, fecha, entrada_manana, salida_manana, entrada_tarde, salida_tarde,
+                   minutos_manana, minutos_tarde
+            FROM MINUTOS_DIARIOS_EMPLEADO
+            WHERE empresa_id = %s AND anio = %s AND mes = %s
+        """
+        filas = self.db.execute_query_tuplas(query, (empresa_id, anio, mes), preparada=True) or []
+        return [decodificar_minutos_diarios(fila) for fila in filas]
+
+    def _inserts(self, tabla: str, columnas: tuple, filas: List[tuple]) -> List[tuple]:
+        """INSERT multi-fila de a FILAS_POR_INSERT filas, como sentencias de execute_transaction"""
+        marcador = f"({', '.join(['%s'] * len(columnas))})"
+        sentencias = []
+        for i in range(0, len(filas), self.FILAS_POR_INSERT):
+            lote = filas[i:i + self.FILAS_POR_INSERT]
+            sentencias.append((
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES {', '.join([marcador] * len(lote))}",
+                [valor for fila in lote for valor in fila]
+            ))
+        return sentencias
+
+    def _borrar(self, empresa_id: int, anio: int, mes: int) -> List[tuple]:
+        clave = (empresa_id, anio, mes)
+        return [
+            (f"DELETE FROM {tabla} WHERE empresa_id = %s AND anio = %s AND mes = %s", clave)
+            for tabla in ('CIERRES_MENSUALES', 'RESUMEN_MENSUAL_EMPLEADO', 'MINUTOS_DIARIOS_EMPLEADO')
+        ]
+
+    def guardar_cierre(self, empresa_id: int, anio: int, mes: int, resumenes: List[dict],
+                       minutos_diarios: List[tuple], cerrado_por: Optional[str] = None) -> bool:
+        clave = (empresa_id, anio, mes)
+        sentencias = self._borrar(empresa_id, anio, mes)
+        sentencias += self._inserts(
+            'RESUMEN_MENSUAL_EMPLEADO',
+            ('empresa_id', 'anio', 'mes', 'empleado_id', 'nombre', 'dni') + CAMPOS_ESTADISTICAS,
+            [clave + (r["empleado_id"], r["nombre"], r["dni"]) + tuple(r[c] for c in CAMPOS_ESTADISTICAS)
+             for r in resumenes]
+        )
+        sentencias += self._inserts(
+            'MINUTOS_DIARIOS_EMPLEADO',
+            ('empresa_id', 'anio', 'mes', 'empleado_id', 'fecha', 'entrada_manana', 'salida_manana',
+             'entrada_tarde', 'salida_tarde', 'minutos_manana', 'minutos_tarde'),
+            [clave + tuple(fila) for fila in minutos_diarios]
+        )
+        # Al final: mientras no se confirme, el mes sigue abierto para los lectores
+        sentencias.append((
+            "INSERT INTO CIERRES_MENSUALES (empresa_id, anio, mes, cerrado_por) VALUES (%s, %s, %s, %s)",
+            clave + (cerrado_por,)
+        ))
+        return self.db.execute_transaction(sentencias)
+
+    def reabrir(self, empresa_id: int, anio: int, mes: int) -> bool:
+        return self.db.execute_transaction(self._borrar(empresa_id, anio, mes))
+
+
+class ReporteSemanalRepositoryMySQL(ReporteSemanalRepository):
+    def __init__(self, db_connection: MySQLConnection, resumen_diario: ResumenDiarioEmpresa):
+        self.db = db_connection
+        self.resumen_diario = resumen_diario
+
+    def get_empleados_activos(self, empresa_id: Optional[int] = None) -> List[tuple]:
+        if empresa_id:
+            query = "SELECT id, nombre, empresa_id FROM EMPLEADOS WHERE empresa_id = %s AND activo = TRUE ORDER BY nombre"
+            return self.db.execute_query_tuplas(query, (empresa_id,), preparada=True) or []
+        query = "SELECT id, nombre, empresa_id FROM EMPLEADOS WHERE activo = TRUE ORDER BY nombre"
+        return self.db.execute_query_tuplas(query, preparada=True) or []
+
+    def get_marcaciones(self, fecha_inicio: str, fecha_fin: str, empresa_id: Optional[int] = None) -> List[tuple]:
+        empresa_filter = "AND e.empresa_id = %s" if empresa_id else ""
+        params = rango_semiabierto(fecha_inicio, fecha_fin) + ((empresa_id,) if empresa_id else ())
+        results = self.db.execute_query_tuplas(f"""
+            SELECT a.empleado_id, a.fecha, a.entrada_manana_real, a.entrada_tarde_real,
+                   a.minutos_tardanza_manana, a.minutos_tardanza_tarde
+            FROM ASISTENCIA a
+            JOIN EMPLEADOS e ON e.id = a.empleado_id
+            WHERE a.fecha >= %s AND a.fecha < %s
+              AND e.activo = TRUE
+              {empresa_filter}
+        """, params, preparada=True)
+        if results is None:
+            raise RuntimeError("no se pudieron leer las marcaciones del periodo")
+        return [decodificar_marcacion(row) for row in results]
+
+    def get_resumen_por_dia(self, fecha_inicio: str, fecha_fin: str, empresa_id: Optional[int] = None) -> dict:
+        return self.resumen_diario.por_dia(fecha_inicio, fecha_fin, empresa_id)
+
+    def get_presentes_por_empresa(self, fecha_inicio: str, fecha_fin: str,
+                                  empresa_id: Optional[int] = None) -> List[tuple]:
+        return self.resumen_diario.presentes_por_empresa(fecha_inicio, fecha_fin, empresa_id)
+
+
 class AdministradorRepository:
     def __init__(self, db_connection: MySQLConnection):
         self.db = db_connection
@@ -0,0 +1,140 @@
+"""
+Columnas explícitas y decodificadores posicionales por tabla.
+Los repositorios piden filas como tuplas (sin armar un dict por fila) en el orden de
+COLUMNAS_*, y cada decodificador desempaqueta la tupla directo en la entidad.
+"""
+from src.domain.entities import Empresa, Empleado, HorarioEstandar, Asistencia
+from src.domain.repositories import CAMPOS_ESTADISTICAS, convertir_a_time
+
+# Las columnas TIME se repiten muchísimo (a lo sumo 86400 valores por día):
+# se memoiza la conversión y las filas comparten el mismo objeto time (inmutable)
+_HORAS = {}
+_MAX_HORAS = 100000
+
+
+def _hora(valor):
+    if valor is None:
+        return None
+    hora = _HORAS.get(valor)
+    if hora is None:
+        hora = convertir_a_time(valor)
+        if len(_HORAS) < _MAX_HORAS:
+            _HORAS[valor] = hora
+    return hora
+
+
+def _select(tabla: str, columnas: tuple, alias: str = None) -> str:
+    if alias:
+        return f"SELECT {', '.join(f'{alias}.{c}' for c in columnas)} FROM {tabla} {alias}"
+    return f"SELECT {', '.join(columnas)} FROM {tabla}"
+
+
+COLUMNAS_EMPRESA = ('id', 'nombre', 'codigo_empresa', 'created_at', 'updated_at')
+SELECT_EMPRESA = _select('EMPRESAS', COLUMNAS_EMPRESA)
+
+COLUMNAS_EMPLEADO = ('id', 'empresa_id', 'nombre', 'dni', 'codigo_qr_unico', 'telefono',
+                     'correo', 'activo', 'fecha_registro')
+SELECT_EMPLEADO = _select('EMPLEADOS', COLUMNAS_EMPLEADO)
+
+COLUMNAS_HORARIO = ('id', 'empresa_id', 'entrada_manana', 'salida_manana', 'entrada_tarde', 'salida_tarde')
+SELECT_HORARIO = _select('HORARIOS_ESTANDAR', COLUMNAS_HORARIO)
+
+COLUMNAS_ASISTENCIA = ('id', 'empleado_id', 'fecha', 'entrada_manana_real', 'salida_manana_real',
+                       'entrada_tarde_real', 'salida_tarde_real', 'total_horas_trabajadas',
+                       'horas_normales', 'horas_extras', 'estado_dia', 'asistio_manana',
+                       'asistio_tarde', 'tardanza_manana', 'tardanza_tarde', 'minutos_tardanza_manana',
+                       'minutos_tardanza_tarde', 'created_at', 'updated_at')
+SELECT_ASISTENCIA = _select('ASISTENCIA', COLUMNAS_ASISTENCIA)
+# Con alias "a" para consultas con JOIN (id, created_at... se repiten en otras tablas)
+SELECT_ASISTENCIA_A = _select('ASISTENCIA', COLUMNAS_ASISTENCIA, 'a')
+
+
+def decodificar_empresa(fila: tuple) -> Empresa:
+    id, nombre, codigo_empresa, created_at, updated_at = fila
+    empresa = Empresa(id, nombre, codigo_empresa)
+    empresa.created_at = created_at
+    empresa.updated_at = updated_at
+    return empresa
+
+
+def decodificar_empleado(fila: tuple) -> Empleado:
+    id, empresa_id, nombre, dni, codigo_qr_unico, telefono, correo, activo, fecha_registro = fila
+    empleado = Empleado(id, empresa_id, nombre, dni, codigo_qr_unico, telefono, correo, activo)
+    empleado.fecha_registro = fecha_registro
+    return empleado
+
+
+def decodificar_horario(fila: tuple) -> HorarioEstandar:
+    id, empresa_id, entrada_manana, salida_manana, entrada_tarde, salida_tarde = fila
+    return HorarioEstandar(
+        id, empresa_id,
+        _hora(entrada_manana), _hora(salida_manana),
+        _hora(entrada_tarde), _hora(salida_tarde)
+    )
+
+
+def decodificar_asistencia(fila: tuple) -> Asistencia:
+    (id, empleado_id, fecha, entrada_manana_real, salida_manana_real, entrada_tarde_real,
+     salida_tarde_real, total_horas_trabajadas, horas_normales, horas_extras, estado_dia,
+     asistio_manana, asistio_tarde, tardanza_manana, tardanza_tarde, minutos_tardanza_manana,
+     minutos_tardanza_tarde, created_at, updated_at) = fila
+    asistencia = Asistencia(
+        id, empleado_id, str(fecha),
+        _hora(entrada_manana_real), _hora(salida_manana_real),
+        _hora(entrada_tarde_real), _hora(salida_tarde_real),
+        float(total_horas_trabajadas or 0), float(horas_normales or 8),
+        float(horas_extras or 0), estado_dia
+    )
+    asistencia.asistio_manana = bool(asistio_manana)
+    asistencia.asistio_tarde = bool(asistio_tarde)
+    asistencia.tardanza_manana = bool(tardanza_manana)
+    asistencia.tardanza_tarde = bool(tardanza_tarde)
+    asistencia.minutos_tardanza_manana = minutos_tardanza_manana or 0
+    asistencia.minutos_tardanza_tarde = minutos_tardanza_tarde or 0
+    asistencia.created_at = created_at
+    asistencia.updated_at = updated_at
+    return asistencia
+
+
+def decodificar_marcacion(fila: tuple) -> tuple:
+    """
+    (empleado_id, fecha, entrada_manana_real, entrada_tarde_real, minutos_tardanza_manana,
+    minutos_tardanza_tarde) -> fecha como str y horas como time
+    """
+    empleado_id, fecha, entrada_manana, entrada_tarde, minutos_manana, minutos_tarde = fila
+    return (empleado_id, str(fecha), _hora(entrada_manana), _hora(entrada_tarde),
+            minutos_manana or 0, minutos_tarde or 0)
+
+
+def decodificar_horas_reales(fila: tuple) -> tuple:
+    """(empleado_id, fecha, 4 horas reales) -> fecha como str y horas como time"""
+    empleado_id, fecha, entrada_manana, salida_manana, entrada_tarde, salida_tarde = fila
+    return (empleado_id, str(fecha), _hora(entrada_manana), _hora(salida_manana),
+            _hora(entrada_tarde), _hora(salida_tarde))
+
+
+def decodificar_fila_tablero(fila: tuple) -> tuple:
+    """Fila de get_tablero_dia -> tiene asistencia como bool, horas como time y minutos como int"""
+    (empleado_id, empresa_id, nombre, tiene_asistencia, entrada_manana, salida_manana, entrada_tarde,
+     salida_tarde, minutos_manana, minutos_tarde) = fila
+    return (empleado_id, empresa_id, nombre, bool(tiene_asistencia), _hora(entrada_manana),
+            _hora(salida_manana), _hora(entrada_tarde), _hora(salida_tarde),
+            int(minutos_manana or 0), int(minutos_tarde or 0))
+
+
+def decodificar_minutos_diarios(fila: tuple) -> tuple:
+    """(empleado_id, fecha, 4 horas reales, minutos_manana, minutos_tarde) -> fecha como str y horas como time"""
+    empleado_id, fecha, entrada_manana, salida_manana, entrada_tarde, salida_tarde, minutos_manana, minutos_tarde = fila
+    return (empleado_id, str(fecha), _hora(entrada_manana), _hora(salida_manana),
+            _hora(entrada_tarde), _hora(salida_tarde), minutos_manana, minutos_tarde)
+
+
+_CAMPOS_DECIMALES = {'horas_normales', 'horas_extras', 'porcentaje_asistencia'}
+
+
+def decodificar_resumen_mensual(fila: tuple) -> dict:
+    """(empleado_id, nombre, dni, CAMPOS_ESTADISTICAS...) -> dict; los DECIMAL vuelven como float"""
+    resumen = {"empleado_id": fila[0], "nombre": fila[1], "dni": fila[2]}
+    for campo, valor in zip(CAMPOS_ESTADISTICAS, fila[3:]):
+        resumen[campo] = float(valor) if campo in _CAMPOS_DECIMALES else int(valor)
+    return resumen
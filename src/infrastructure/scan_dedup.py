@@ -0,0 +1,178 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Callable, Optional
+
+
+def _hash_codigo(codigo_qr: str) -> int:
+    """Hash estable de 64 bits (no cero) para un código QR"""
+    h = int.from_bytes(hashlib.blake2b(codigo_qr.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h or 1
+
+
+class VentanaCompartida:
+    """
+    Tabla hash de tamaño fijo en un archivo mapeado en memoria, compartida por
+    todos los workers de gunicorn. Cada slot guarda (hash del código, expiración en ms).
+    Las operaciones se serializan con flock, así que check-and-set es atómico entre procesos.
+    """
+
+    _SLOT = struct.Struct('<QQ')
+    _SONDEOS = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        tamano = slots * self._SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size != tamano:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._fd).st_size != tamano:
+                    os.ftruncate(self._fd, tamano)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(self._fd, tamano)
+        self._lock = threading.Lock()
+
+    def verificar_y_marcar(self, codigo_qr: str, segundos: int) -> bool:
+        """True si el código ya estaba en la ventana; si no, lo marca y devuelve False"""
+        h = _hash_codigo(codigo_qr)
+        ahora_ms = int(time.time() * 1000)
+        expira_ms = ahora_ms + segundos * 1000
+        inicio = h % self.slots
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                destino = None
+                destino_expira = None
+                for i in range(self._SONDEOS):
+                    offset = ((inicio + i) % self.slots) * self._SLOT.size
+                    slot_hash, slot_expira = self._SLOT.unpack_from(self._mm, offset)
+                    if slot_hash == h and slot_expira > ahora_ms:
+                        return True
+                    if slot_hash == h or slot_expira <= ahora_ms:
+                        destino = offset
+                        break
+                    # Si todos los sondeos están ocupados se reemplaza el que vence antes
+                    if destino_expira is None or slot_expira < destino_expira:
+                        destino, destino_expira = offset, slot_expira
+                self._SLOT.pack_into(self._mm, destino, h, expira_ms)
+                return False
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class VentanaDuplicados:
+    """
+    Ventana anti-duplicado en memoria delante de ESCANEOS_TRACKING.
+    Indexada por codigo_qr con check-and-set O(1); la expiración se hace por buckets
+    de tiempo, así que limpiar cuesta O(1) amortizado por escaneo.
+    Con backend compartido la ventana es la misma para todos los workers y la BD no se consulta;
+    sin él, un fallo de la ventana local se confirma contra la BD (otro worker pudo verlo).
+    """
+
+    def __init__(self, bucket_segundos: float = 1.0,
+                 compartida: Optional[VentanaCompartida] = None,
+                 fallback_bd: bool = True,
+                 reloj: Callable[[], float] = time.monotonic):
+        self.bucket_segundos = bucket_segundos
+        self.compartida = compartida
+        self.fallback_bd = fallback_bd and compartida is None
+        self._reloj = reloj
+        self._expira = {}
+        self._buckets = {}
+        self._bucket_pendiente = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "db_fallbacks": 0, "db_duplicates": 0}
+
+    @classmethod
+    def desde_entorno(cls) -> "VentanaDuplicados":
+        """
+        SCAN_DEDUP_BACKEND=local|shared, SCAN_DEDUP_SHARED_PATH y SCAN_DEDUP_DB_FALLBACK=0|1
+        """
+        compartida = None
+        if os.getenv('SCAN_DEDUP_BACKEND', 'local').lower() == 'shared':
+            path = os.getenv('SCAN_DEDUP_SHARED_PATH', '/dev/shm/asistencia_scan_dedup.bin')
+            try:
+                compartida = VentanaCompartida(path)
+            except OSError as e:
+                print(f"⚠️ Ventana anti-duplicado compartida no disponible ({e}), se usa la local")
+        fallback_bd = os.getenv('SCAN_DEDUP_DB_FALLBACK', '1') != '0'
+        return cls(compartida=compartida, fallback_bd=fallback_bd)
+
+    def es_duplicado(self, codigo_qr: str, segundos: int,
+                     consulta_bd: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Check-and-set: devuelve True si el código se escaneó en los últimos `segundos`;
+        si no, lo registra en la ventana. consulta_bd solo se usa como respaldo.
+        """
+        if self.compartida is not None:
+            duplicado = self.compartida.verificar_y_marcar(codigo_qr, segundos)
+        else:
+            duplicado = self._verificar_y_marcar_local(codigo_qr, segundos)
+
+        if duplicado:
+            self._contar("hits")
+            return True
+        self._contar("misses")
+
+        if self.fallback_bd and consulta_bd is not None:
+            self._contar("db_fallbacks")
+            if consulta_bd():
+                self._contar("db_duplicates")
+                return True
+        return False
+
+    def _verificar_y_marcar_local(self, codigo_qr: str, segundos: int) -> bool:
+        ahora = self._reloj()
+        with self._lock:
+            self._purgar(ahora)
+            expira = self._expira.get(codigo_qr)
+            if expira is not None and expira > ahora:
+                return True
+            expira = ahora + segundos
+            self._expira[codigo_qr] = expira
+            bucket = int(expira // self.bucket_segundos)
+            self._buckets.setdefault(bucket, []).append(codigo_qr)
+            if self._bucket_pendiente is None or bucket < self._bucket_pendiente:
+                self._bucket_pendiente = bucket
+            return False
+
+    def _purgar(self, ahora: float):
+        """Elimina los buckets ya vencidos (cada código se revisa una sola vez)"""
+        if self._bucket_pendiente is None:
+            return
+        bucket_actual = int(ahora // self.bucket_segundos)
+        while self._buckets and self._bucket_pendiente < bucket_actual:
+            codigos = self._buckets.pop(self._bucket_pendiente, None)
+            if codigos is None:
+                # Saltamos los buckets vacíos (hay pocos: a lo sumo la ventana / bucket_segundos)
+                self._bucket_pendiente = min(self._buckets)
+                continue
+            for codigo in codigos:
+                expira = self._expira.get(codigo)
+                if expira is not None and expira <= ahora:
+                    del self._expira[codigo]
+            self._bucket_pendiente += 1
+        if not self._buckets:
+            self._bucket_pendiente = None
+
+    def _contar(self, clave: str):
+        with self._lock:
+            self._stats[clave] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._expira)
+        consultas = stats["hits"] + stats["misses"]
+        stats["backend"] = "shared" if self.compartida is not None else "local"
+        stats["hit_ratio"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+        # Lecturas a ESCANEOS_TRACKING evitadas frente a consultar la BD en cada escaneo
+        stats["db_reads_saved"] = consultas - stats["db_fallbacks"]
+        return stats
@@ -0,0 +1,169 @@
+"""
+Difusor en proceso de los escaneos recién registrados, para los paneles del admin (SSE o long-poll).
+
+MarkAttendanceUseCase publica cada marcación (oyente) como un evento con id correlativo, ya
+serializado a JSON una sola vez, en un búfer circular compartido. Los suscriptores no tienen cola
+propia: esperan en una sola Condition y al despertar leen del búfer los eventos posteriores a su
+último id (filtrando por empresa), así que publicar cuesta lo mismo con 1 o con 100 paneles.
+Quien se atrasa más que el búfer recibe `perdidos` y debe recargar su vista.
+
+Los escaneos atendidos por otro worker de gunicorn no pasan por este difusor.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+# Orden en que se llenan las marcaciones del día: la última con hora es la recién hecha
+_MARCACIONES = ('entrada_manana', 'salida_manana', 'entrada_tarde', 'salida_tarde')
+
+
+def ultima_marcacion(asistencia) -> Tuple[Optional[str], Optional[object]]:
+    """(tipo, hora) de la marcación más reciente de la asistencia, o (None, None)"""
+    for tipo in reversed(_MARCACIONES):
+        hora = getattr(asistencia, f"{tipo}_real", None)
+        if hora is not None:
+            return tipo, hora
+    return None, None
+
+
+def _hora(valor) -> Optional[str]:
+    return valor.strftime('%H:%M:%S') if valor is not None else None
+
+
+class DifusorEscaneos:
+    def __init__(self, capacidad: int = 1000, max_suscriptores: int = 8,
+                 empresa_de_empleado: Optional[Callable[[int], Optional[int]]] = None):
+        self.max_suscriptores = max_suscriptores
+        # Para escaneos que no traen la empresa del empleado
+        self.empresa_de_empleado = empresa_de_empleado
+        self._eventos = deque(maxlen=capacidad)  # (id, empresa_id, datos JSON)
+        self._ultimo_id = 0
+        self._condicion = threading.Condition()
+        self._suscriptores = 0
+        self._stats = {"published": 0, "delivered": 0, "rejected": 0, "lost": 0}
+
+    @classmethod
+    def desde_entorno(cls, empresa_de_empleado=None) -> Optional["DifusorEscaneos"]:
+        """
+        SCAN_FEED=0 lo desactiva; SCAN_FEED_BUFFER eventos guardados para reconectar y
+        SCAN_FEED_MAX_WAITERS conexiones en espera (cada una ocupa un hilo del worker)
+        """
+        if os.getenv('SCAN_FEED', '1') == '0':
+            return None
+        return cls(
+            capacidad=int(os.getenv('SCAN_FEED_BUFFER', '1000')),
+            max_suscriptores=int(os.getenv('SCAN_FEED_MAX_WAITERS', '8')),
+            empresa_de_empleado=empresa_de_empleado,
+        )
+
+    # --- publicación ---
+
+    def publicar(self, empresa_id: Optional[int], evento: dict) -> int:
+        with self._condicion:
+            self._ultimo_id += 1
+            evento = dict(evento, id=self._ultimo_id)
+            self._eventos.append((self._ultimo_id, empresa_id, json.dumps(evento, ensure_ascii=False)))
+            self._stats["published"] += 1
+            self._condicion.notify_all()
+            return self._ultimo_id
+
+    def al_registrar_asistencia(self, empleado, asistencia):
+        """Oyente para MarkAttendanceUseCase.agregar_oyente"""
+        empresa_id = getattr(empleado, 'empresa_id', None)
+        if empresa_id is None and self.empresa_de_empleado is not None:
+            empresa_id = self.empresa_de_empleado(empleado.id)
+        tipo, hora = ultima_marcacion(asistencia)
+        if tipo == 'entrada_manana':
+            minutos = int(asistencia.minutos_tardanza_manana or 0)
+        elif tipo == 'entrada_tarde':
+            minutos = int(asistencia.minutos_tardanza_tarde or 0)
+        else:
+            minutos = 0
+        self.publicar(empresa_id, {
+            "empleado_id": empleado.id,
+            "nombre": empleado.nombre,
+            "empresa_id": empresa_id,
+            "fecha": str(asistencia.fecha),
+            "tipo": tipo,
+            "hora": _hora(hora),
+            "tardanza": minutos > 0,
+            "minutos_tardanza": minutos,
+            "entrada_manana_real": _hora(asistencia.entrada_manana_real),
+            "salida_manana_real": _hora(asistencia.salida_manana_real),
+            "entrada_tarde_real": _hora(asistencia.entrada_tarde_real),
+            "salida_tarde_real": _hora(asistencia.salida_tarde_real),
+        })
+
+    # --- lectura ---
+
+    def ultimo_id(self) -> int:
+        with self._condicion:
+            return self._ultimo_id
+
+    def _posteriores(self, desde_id: int, empresa_id: Optional[int]) -> Tuple[List[Tuple[int, str]], bool]:
+        """Con self._condicion tomada: ([(id, datos)], perdidos) de los eventos con id > desde_id"""
+        nuevos = []
+        for id_evento, empresa_evento, datos in reversed(self._eventos):
+            if id_evento <= desde_id:
+                break
+            if empresa_id is None or empresa_evento == empresa_id:
+                nuevos.append((id_evento, datos))
+        nuevos.reverse()
+        primero = self._eventos[0][0] if self._eventos else self._ultimo_id + 1
+        return nuevos, desde_id < primero - 1
+
+    def esperar(self, desde_id: Optional[int], empresa_id: Optional[int] = None,
+                timeout: float = 25.0) -> Tuple[List[Tuple[int, str]], int, bool]:
+        """
+        ([(id, datos JSON)], último id visto, perdidos) de los eventos posteriores a `desde_id`
+        (None = desde ahora), esperando hasta `timeout` segundos a que llegue alguno de la empresa.
+        Un `desde_id` mayor que el último (el proceso se reinició) cuenta como perdidos.
+        """
+        limite = time.monotonic() + max(0.0, timeout)
+        with self._condicion:
+            if desde_id is None:
+                desde_id = self._ultimo_id
+            reiniciado = desde_id > self._ultimo_id
+            if reiniciado:
+                desde_id = 0
+            while True:
+                nuevos, perdidos = self._posteriores(desde_id, empresa_id)
+                perdidos = perdidos or reiniciado
+                # Los eventos de otras empresas ya quedan vistos aunque no se entreguen
+                desde_id = self._ultimo_id
+                restante = limite - time.monotonic()
+                if nuevos or perdidos or restante <= 0:
+                    break
+                self._condicion.wait(restante)
+            self._stats["delivered"] += len(nuevos)
+            if perdidos:
+                self._stats["lost"] += 1
+            return nuevos, desde_id, perdidos
+
+    # --- cupo de conexiones en espera ---
+
+    def reservar(self) -> bool:
+        """Ocupa un lugar de suscriptor en espera; False si ya están todos tomados"""
+        with self._condicion:
+            if self._suscriptores >= self.max_suscriptores:
+                self._stats["rejected"] += 1
+                return False
+            self._suscriptores += 1
+            return True
+
+    def liberar(self):
+        with self._condicion:
+            self._suscriptores = max(0, self._suscriptores - 1)
+
+    def get_stats(self) -> dict:
+        with self._condicion:
+            stats = dict(self._stats)
+            stats["last_id"] = self._ultimo_id
+            stats["buffered"] = len(self._eventos)
+            stats["buffer_size"] = self._eventos.maxlen
+            stats["waiters"] = self._suscriptores
+        stats["max_waiters"] = self.max_suscriptores
+        return stats
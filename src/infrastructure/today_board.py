@@ -0,0 +1,299 @@
+"""
+Tablero del día en memoria: las marcaciones de hoy de cada empleado activo, por empresa.
+
+Se siembra con una sola consulta (get_tablero_dia) al arrancar y de nuevo con la primera lectura
+después de medianoche (hora de Lima). Desde entonces lo mantienen al día MarkAttendanceUseCase
+(oyente) y las ediciones del admin (recargar_empleado), así que los conteos (O(1), se llevan por
+empresa al reemplazar cada fila) y las filas del día (O(n) de la empresa) no tocan la BD.
+
+Lo que escribe otro proceso (otro worker, SQL a mano) solo entra con la resiembra periódica de
+`resiembra_segundos`; verificar() compara el tablero con la tabla y puede repararlo.
+"""
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+import pytz
+
+from src.domain.repositories import AsistenciaRepository
+
+# Posiciones de cada fila (las de get_tablero_dia)
+(_EMPLEADO, _EMPRESA, _NOMBRE, _TIENE_ASISTENCIA, _ENTRADA_MANANA, _SALIDA_MANANA,
+ _ENTRADA_TARDE, _SALIDA_TARDE, _MINUTOS_MANANA, _MINUTOS_TARDE) = range(10)
+
+_CONTEOS = ("activos", "presentes", "tardanzas", "sin_salida")
+
+
+def _hoy_lima() -> date:
+    return datetime.now(pytz.timezone("America/Lima")).date()
+
+
+def _aportes(fila: tuple) -> tuple:
+    """Lo que suma la fila a cada conteo de _CONTEOS"""
+    presente = fila[_ENTRADA_MANANA] is not None or fila[_ENTRADA_TARDE] is not None
+    tarde = fila[_MINUTOS_MANANA] > 0 or fila[_MINUTOS_TARDE] > 0
+    # Igual que /api/incomplete-markings: un turno con entrada y sin salida
+    sin_salida = ((fila[_ENTRADA_MANANA] is not None and fila[_SALIDA_MANANA] is None) or
+                  (fila[_ENTRADA_TARDE] is not None and fila[_SALIDA_TARDE] is None))
+    return 1, int(presente), int(tarde), int(sin_salida)
+
+
+def _hora(valor) -> Optional[str]:
+    return str(valor) if valor is not None else None
+
+
+def fila_como_dict(fila: tuple) -> dict:
+    return {
+        "empleado_id": fila[_EMPLEADO],
+        "empresa_id": fila[_EMPRESA],
+        "nombre": fila[_NOMBRE],
+        "entrada_manana_real": _hora(fila[_ENTRADA_MANANA]),
+        "salida_manana_real": _hora(fila[_SALIDA_MANANA]),
+        "entrada_tarde_real": _hora(fila[_ENTRADA_TARDE]),
+        "salida_tarde_real": _hora(fila[_SALIDA_TARDE]),
+        "minutos_tardanza_manana": fila[_MINUTOS_MANANA],
+        "minutos_tardanza_tarde": fila[_MINUTOS_TARDE],
+    }
+
+
+class TableroHoy:
+    def __init__(self, asistencia_repository: AsistenciaRepository, resiembra_segundos: float = 300.0,
+                 hoy: Callable[[], date] = _hoy_lima):
+        self.asistencia_repository = asistencia_repository
+        self.resiembra_segundos = resiembra_segundos
+        self._hoy = hoy
+        self._lock = threading.Lock()
+        self._lock_siembra = threading.Lock()
+        self._fecha: Optional[date] = None  # None = todavía sin sembrar
+        self._sembrado_en = 0.0
+        self._filas: Dict[int, Dict[int, tuple]] = {}  # empresa_id -> empleado_id -> fila
+        self._empresa_de: Dict[int, int] = {}
+        self._conteos: Dict[int, List[int]] = {}  # empresa_id -> valores de _CONTEOS
+        self._total = [0] * len(_CONTEOS)
+        # Cambios que llegan mientras corre la consulta de siembra: se reaplican sobre el resultado
+        self._durante_siembra: Optional[list] = None
+        self._fecha_en_siembra: Optional[date] = None
+        self._stats = {"seeds": 0, "seed_errors": 0, "last_seed_ms": 0.0, "updates": 0,
+                       "reloads": 0, "ignored": 0, "reads": 0, "checks": 0, "repaired": 0}
+
+    @classmethod
+    def desde_entorno(cls, asistencia_repository: AsistenciaRepository) -> Optional["TableroHoy"]:
+        """TODAY_BOARD=0 lo desactiva; TODAY_BOARD_RESEED_SECONDS (0 = solo a medianoche)"""
+        if os.getenv('TODAY_BOARD', '1') == '0':
+            return None
+        return cls(asistencia_repository,
+                   resiembra_segundos=float(os.getenv('TODAY_BOARD_RESEED_SECONDS', '300')))
+
+    # --- siembra ---
+
+    def sembrar(self) -> bool:
+        """Recarga el día completo con una consulta; False si falló (se conserva lo que había)"""
+        with self._lock_siembra:
+            return self._sembrar()
+
+    def _sembrar(self) -> bool:
+        fecha = self._hoy()
+        with self._lock:
+            self._durante_siembra, self._fecha_en_siembra = [], fecha
+        inicio = time.perf_counter()
+        try:
+            filas = self.asistencia_repository.get_tablero_dia(fecha.strftime('%Y-%m-%d'))
+        except Exception as e:
+            print(f"❌ Error sembrando el tablero del día: {e}")
+            with self._lock:
+                self._durante_siembra = self._fecha_en_siembra = None
+                self._stats["seed_errors"] += 1
+            return False
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            cambios = self._durante_siembra
+            self._durante_siembra = self._fecha_en_siembra = None
+            self._fecha = fecha
+            self._sembrado_en = time.monotonic()
+            self._filas, self._empresa_de, self._conteos = {}, {}, {}
+            self._total = [0] * len(_CONTEOS)
+            for fila in filas:
+                self._poner(fila)
+            for empleado_id, fila in cambios:
+                self._reemplazar(empleado_id, fila)
+            self._stats["seeds"] += 1
+            self._stats["last_seed_ms"] = duracion_ms
+        return True
+
+    def _vigente(self):
+        """Antes de leer: siembra si es otro día, nunca se sembró o toca la resiembra periódica"""
+        with self._lock:
+            self._stats["reads"] += 1
+            fecha, sembrado_en = self._fecha, self._sembrado_en
+        vencido = self.resiembra_segundos > 0 and time.monotonic() - sembrado_en >= self.resiembra_segundos
+        if fecha == self._hoy() and not vencido:
+            return
+        with self._lock_siembra:
+            # Otro hilo pudo sembrar mientras se esperaba el lock
+            with self._lock:
+                fecha, sembrado_en = self._fecha, self._sembrado_en
+            vencido = self.resiembra_segundos > 0 and time.monotonic() - sembrado_en >= self.resiembra_segundos
+            if fecha == self._hoy() and not vencido:
+                return
+            if not self._sembrar() and fecha != self._hoy():
+                # Sin datos de hoy no hay nada que servir; con los de hoy se sirve lo último
+                raise RuntimeError("tablero del día no disponible")
+
+    # --- cambios en el lugar (con self._lock tomado) ---
+
+    def _poner(self, fila: tuple):
+        empleado_id, empresa_id = fila[_EMPLEADO], fila[_EMPRESA]
+        self._filas.setdefault(empresa_id, {})[empleado_id] = fila
+        self._empresa_de[empleado_id] = empresa_id
+        conteos = self._conteos.setdefault(empresa_id, [0] * len(_CONTEOS))
+        for i, valor in enumerate(_aportes(fila)):
+            conteos[i] += valor
+            self._total[i] += valor
+
+    def _quitar(self, empleado_id: int):
+        empresa_id = self._empresa_de.pop(empleado_id, None)
+        if empresa_id is None:
+            return
+        fila = self._filas[empresa_id].pop(empleado_id)
+        conteos = self._conteos[empresa_id]
+        for i, valor in enumerate(_aportes(fila)):
+            conteos[i] -= valor
+            self._total[i] -= valor
+
+    def _reemplazar(self, empleado_id: int, fila: Optional[tuple]):
+        """fila None = el empleado ya no está en el tablero (inactivo o eliminado)"""
+        self._quitar(empleado_id)
+        if fila is not None:
+            self._poner(fila)
+
+    def _fecha_actual(self) -> Optional[date]:
+        """Día al que van los cambios: el que se está sembrando, si hay una siembra en curso"""
+        return self._fecha_en_siembra or self._fecha
+
+    def _aplicar(self, empleado_id: int, fila: Optional[tuple], fecha: date):
+        with self._lock:
+            if self._durante_siembra is not None and fecha == self._fecha_en_siembra:
+                self._durante_siembra.append((empleado_id, fila))
+            if fecha == self._fecha:
+                self._reemplazar(empleado_id, fila)
+
+    # --- actualización ---
+
+    def al_registrar_asistencia(self, empleado, asistencia):
+        """Oyente para MarkAttendanceUseCase.agregar_oyente"""
+        with self._lock:
+            fecha = self._fecha_actual()
+            empresa_id = getattr(empleado, 'empresa_id', None) or self._empresa_de.get(empleado.id)
+        if fecha is None or str(asistencia.fecha) != fecha.strftime('%Y-%m-%d'):
+            # Sin sembrar o de otro día: la próxima siembra ya lo trae de la BD
+            with self._lock:
+                self._stats["ignored"] += 1
+            return
+        if empresa_id is None:
+            self.recargar_empleado(empleado.id)
+            return
+        self._aplicar(empleado.id, (
+            empleado.id, empresa_id, empleado.nombre, True,
+            asistencia.entrada_manana_real, asistencia.salida_manana_real,
+            asistencia.entrada_tarde_real, asistencia.salida_tarde_real,
+            int(asistencia.minutos_tardanza_manana or 0), int(asistencia.minutos_tardanza_tarde or 0),
+        ), fecha)
+        with self._lock:
+            self._stats["updates"] += 1
+
+    def recargar_empleado(self, empleado_id: int, fecha=None):
+        """
+        Relee la fila de un empleado (una edición del admin cambió su asistencia de `fecha`, o
+        cambió el empleado: alta, nombre, empresa, estado o baja). Otra fecha no toca el tablero.
+        """
+        with self._lock:
+            fecha_tablero = self._fecha_actual()
+        if fecha_tablero is None:
+            return
+        if fecha is not None and str(fecha)[:10] != fecha_tablero.strftime('%Y-%m-%d'):
+            return
+        filas = self.asistencia_repository.get_tablero_dia(fecha_tablero.strftime('%Y-%m-%d'), empleado_id)
+        self._aplicar(empleado_id, filas[0] if filas else None, fecha_tablero)
+        with self._lock:
+            self._stats["reloads"] += 1
+
+    # --- lectura ---
+
+    def fecha(self) -> date:
+        self._vigente()
+        with self._lock:
+            return self._fecha
+
+    def conteos(self, empresa_id: Optional[int] = None) -> dict:
+        """activos, presentes, ausentes, tardanzas y sin_salida de hoy (de una empresa o de todas)"""
+        self._vigente()
+        with self._lock:
+            valores = list(self._total if empresa_id is None else self._conteos.get(empresa_id, [0] * len(_CONTEOS)))
+        conteos = dict(zip(_CONTEOS, valores))
+        conteos["ausentes"] = conteos["activos"] - conteos["presentes"]
+        return conteos
+
+    def filas(self, empresa_id: Optional[int] = None, solo_con_asistencia: bool = False) -> List[tuple]:
+        """Filas de hoy ordenadas por nombre (en el orden de get_tablero_dia)"""
+        self._vigente()
+        with self._lock:
+            if empresa_id is None:
+                filas = [fila for por_empleado in self._filas.values() for fila in por_empleado.values()]
+            else:
+                filas = list(self._filas.get(empresa_id, {}).values())
+        if solo_con_asistencia:
+            filas = [fila for fila in filas if fila[_TIENE_ASISTENCIA]]
+        filas.sort(key=lambda fila: (fila[_NOMBRE], fila[_EMPLEADO]))
+        return filas
+
+    # --- consistencia ---
+
+    def verificar(self, reparar: bool = False) -> dict:
+        """
+        Compara el tablero con la tabla (una consulta). Un escaneo que llegue entre la consulta y
+        la comparación puede aparecer como diferencia; con reparar=True se adopta lo de la BD.
+        """
+        self._vigente()
+        with self._lock:
+            fecha = self._fecha
+        en_bd = {fila[_EMPLEADO]: fila
+                 for fila in self.asistencia_repository.get_tablero_dia(fecha.strftime('%Y-%m-%d'))}
+        diferencias = []
+        with self._lock:
+            en_tablero = {empleado_id: self._filas[empresa_id][empleado_id]
+                          for empleado_id, empresa_id in self._empresa_de.items()}
+            for empleado_id in sorted(set(en_bd) | set(en_tablero)):
+                fila_bd, fila_tablero = en_bd.get(empleado_id), en_tablero.get(empleado_id)
+                if fila_bd == fila_tablero:
+                    continue
+                diferencias.append({
+                    "empleado_id": empleado_id,
+                    "tablero": fila_como_dict(fila_tablero) if fila_tablero else None,
+                    "bd": fila_como_dict(fila_bd) if fila_bd else None,
+                })
+                if reparar:
+                    self._reemplazar(empleado_id, fila_bd)
+            self._stats["checks"] += 1
+            if reparar:
+                self._stats["repaired"] += len(diferencias)
+        return {
+            "fecha": fecha.strftime('%Y-%m-%d'),
+            "empleados_bd": len(en_bd),
+            "empleados_tablero": len(en_tablero),
+            "consistente": not diferencias,
+            "reparado": reparar and bool(diferencias),
+            "diferencias": diferencias,
+        }
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["date"] = self._fecha.strftime('%Y-%m-%d') if self._fecha else None
+            stats["employees"] = len(self._empresa_de)
+            stats["companies"] = len(self._filas)
+            stats["seed_age_s"] = round(time.monotonic() - self._sembrado_en, 1) if self._fecha else None
+        stats["reseed_seconds"] = self.resiembra_segundos
+        return stats
@@ -0,0 +1,161 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import pytz
+
+from .mysql_connection import MySQLConnection
+from .scan_dedup import VentanaDuplicados
+
+
+class EscrituraDiferidaTracking:
+    """
+    Buffer de escritura diferida para ESCANEOS_TRACKING.
+    El escaneo solo encola la fila; un hilo en segundo plano las inserta en lotes
+    con un único executemany cuando se llena el lote o pasa el intervalo máximo.
+    La cola es acotada: si se llena, se espera un poco (backpressure) y luego se descarta.
+    """
+
+    QUERY = """
+        INSERT INTO ESCANEOS_TRACKING (codigo_qr, ip_address, timestamp_escaneo)
+        VALUES (%s, %s, %s)
+    """
+
+    def __init__(self, db_connection: MySQLConnection, tamano_lote: int = 200,
+                 intervalo_segundos: float = 1.0, capacidad: int = 5000,
+                 espera_maxima_segundos: float = 0.05):
+        self.db = db_connection
+        self.tamano_lote = tamano_lote
+        self.intervalo_segundos = intervalo_segundos
+        self.espera_maxima_segundos = espera_maxima_segundos
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._zona = pytz.timezone("America/Lima")
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "flushed_rows": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "dropped": 0,
+            "backpressure_waits": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+        }
+        self._hilo = threading.Thread(target=self._ejecutar, name="tracking-write-behind", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    @classmethod
+    def desde_entorno(cls, db_connection: MySQLConnection,
+                      ventana: Optional[VentanaDuplicados] = None) -> Optional["EscrituraDiferidaTracking"]:
+        """
+        TRACKING_WRITE_BEHIND=0 desactiva el buffer (insert síncrono como antes).
+        También queda desactivado cuando el anti-duplicado depende de leer ESCANEOS_TRACKING:
+        sin ventana, o con ventana local (SCAN_DEDUP_BACKEND=local y respaldo en la BD) y más de un
+        worker (WEB_CONCURRENCY). Ahí una fila aún en la cola no la ve el otro worker y el mismo QR
+        marcaría dos veces; con SCAN_DEDUP_BACKEND=shared la ventana cubre a todos los workers.
+        """
+        if os.getenv('TRACKING_WRITE_BEHIND', '1') == '0':
+            return None
+        workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+        if ventana is None or (ventana.fallback_bd and workers > 1):
+            print("⚠️ Tracking diferido desactivado: el anti-duplicado consulta ESCANEOS_TRACKING entre "
+                  "workers; use SCAN_DEDUP_BACKEND=shared para activarlo")
+            return None
+        return cls(
+            db_connection,
+            tamano_lote=int(os.getenv('TRACKING_WB_BATCH_SIZE', '200')),
+            intervalo_segundos=float(os.getenv('TRACKING_WB_INTERVAL', '1.0')),
+            capacidad=int(os.getenv('TRACKING_WB_CAPACITY', '5000')),
+        )
+
+    def encolar(self, codigo_qr: str, ip_address: str = "") -> bool:
+        """Encola un escaneo; devuelve False si la cola estaba llena y se descartó"""
+        # La hora se toma al escanear, no al hacer el flush
+        timestamp = datetime.now(self._zona).replace(tzinfo=None, microsecond=0)
+        fila = (codigo_qr, ip_address, timestamp)
+        try:
+            self._cola.put_nowait(fila)
+        except queue.Full:
+            self._contar("backpressure_waits")
+            try:
+                self._cola.put(fila, timeout=self.espera_maxima_segundos)
+            except queue.Full:
+                self._contar("dropped")
+                return False
+        self._contar("enqueued")
+        return True
+
+    def flush(self):
+        """Inserta de inmediato todo lo pendiente"""
+        while True:
+            lote = self._tomar_lote(bloquear=False)
+            if not lote:
+                return
+            self._insertar(lote)
+
+    def cerrar(self):
+        """Detiene el hilo y vacía la cola (se llama también al apagar el proceso)"""
+        if self._detener.is_set():
+            return
+        self._detener.set()
+        self._hilo.join(timeout=max(5.0, self.intervalo_segundos * 2))
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._cola.qsize()
+        stats["queue_capacity"] = self._cola.maxsize
+        stats["last_flush_ms"] = round(stats["last_flush_ms"], 2)
+        return stats
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            lote = self._tomar_lote(bloquear=True)
+            if lote:
+                self._insertar(lote)
+
+    def _tomar_lote(self, bloquear: bool) -> list:
+        """Junta filas hasta completar el lote o hasta que venza el intervalo"""
+        lote = []
+        limite = time.monotonic() + self.intervalo_segundos
+        while len(lote) < self.tamano_lote:
+            try:
+                if bloquear:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    lote.append(self._cola.get(timeout=restante))
+                else:
+                    lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _insertar(self, lote: list):
+        inicio = time.perf_counter()
+        ok = self.db.execute_many(self.QUERY, lote)
+        if not ok:
+            # Un reintento; si vuelve a fallar el lote se pierde (el tracking es solo auditoría)
+            self._contar("flush_errors")
+            ok = self.db.execute_many(self.QUERY, lote)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._stats["last_flush_ms"] = duracion_ms
+            if ok:
+                self._stats["flushed_rows"] += len(lote)
+                self._stats["batches"] += 1
+                self._stats["max_batch"] = max(self._stats["max_batch"], len(lote))
+            else:
+                self._stats["dropped"] += len(lote)
+                print(f"❌ Se descartaron {len(lote)} escaneos de tracking tras reintentar el lote")
+
+    def _contar(self, clave: str):
+        with self._lock:
+            self._stats[clave] += 1
@@ -0,0 +1,169 @@
+"""
+Motor columnar de estadísticas de asistencia.
+Recibe las asistencias de un periodo para todos los empleados de una empresa como arreglos
+(una columna por campo) y calcula faltas, retardos, turnos, horas y porcentaje de todos los
+empleados en una sola pasada vectorizada con numpy (np.bincount agrupa por empleado).
+"""
+from datetime import date
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.domain.entities import Asistencia
+from src.domain.repositories import ESTADOS_DIA
+
+# Códigos de estado_dia (ENUM de ASISTENCIA); cualquier otro valor cuenta solo como día
+OTRO, FALTA, COMPLETO, INCOMPLETO = 0, 1, 2, 3
+_CODIGOS_ESTADO = {estado: i + 1 for i, estado in enumerate(ESTADOS_DIA)}
+
+# Lunes a sábado, como _contar_dias_laborables
+SEMANA_LABORAL = '1111110'
+
+_NUMERICOS = attrgetter('horas_normales', 'horas_extras', 'asistio_manana', 'asistio_tarde',
+                        'tardanza_manana', 'tardanza_tarde')
+
+
+class ColumnasAsistencia:
+    """Asistencias de un periodo en formato columnar (un arreglo numpy por campo)"""
+    __slots__ = ('empleado_id', 'estado', 'horas_normales', 'horas_extras',
+                 'asistio_manana', 'asistio_tarde', 'tardanza_manana', 'tardanza_tarde')
+
+    def __init__(self, empleado_id: np.ndarray, estado: np.ndarray,
+                 horas_normales: np.ndarray, horas_extras: np.ndarray,
+                 asistio_manana: np.ndarray, asistio_tarde: np.ndarray,
+                 tardanza_manana: np.ndarray, tardanza_tarde: np.ndarray):
+        self.empleado_id = empleado_id
+        self.estado = estado
+        self.horas_normales = horas_normales
+        self.horas_extras = horas_extras
+        self.asistio_manana = asistio_manana
+        self.asistio_tarde = asistio_tarde
+        self.tardanza_manana = tardanza_manana
+        self.tardanza_tarde = tardanza_tarde
+
+    def __len__(self) -> int:
+        return len(self.empleado_id)
+
+    @classmethod
+    def desde_asistencias(cls, asistencias: Sequence[Asistencia]) -> 'ColumnasAsistencia':
+        n = len(asistencias)
+        empleado_id = np.fromiter((a.empleado_id for a in asistencias), dtype=np.int64, count=n)
+        estado = np.fromiter((_CODIGOS_ESTADO.get(a.estado_dia, OTRO) for a in asistencias),
+                             dtype=np.int8, count=n)
+        # Una sola conversión a matriz para los campos numéricos y booleanos
+        numericos = np.array([_NUMERICOS(a) for a in asistencias], dtype=np.float64).reshape(n, 6)
+        return cls(
+            empleado_id, estado,
+            numericos[:, 0], numericos[:, 1],
+            numericos[:, 2].astype(bool), numericos[:, 3].astype(bool),
+            numericos[:, 4].astype(bool), numericos[:, 5].astype(bool),
+        )
+
+    @classmethod
+    def desde_filas(cls, filas: Sequence[tuple]) -> 'ColumnasAsistencia':
+        """Filas de AsistenciaRepository.get_filas_estadisticas (todo entero): una sola conversión"""
+        matriz = np.array(filas, dtype=np.int64).reshape(len(filas), 8)
+        return cls(
+            matriz[:, 0], matriz[:, 1].astype(np.int8),
+            matriz[:, 2] / 100.0, matriz[:, 3] / 100.0,
+            matriz[:, 4].astype(bool), matriz[:, 5].astype(bool),
+            matriz[:, 6].astype(bool), matriz[:, 7].astype(bool),
+        )
+
+def calcular_estadisticas(columnas: ColumnasAsistencia, empleado_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Estadísticas por empleado (mismo formato que GetReportUseCase._calcular_estadisticas_empleado).
+    Los empleados sin asistencias en el periodo también aparecen, con todo en cero.
+    """
+    ids = np.asarray(list(empleado_ids), dtype=np.int64)
+    n = len(ids)
+    if n == 0:
+        return {}
+
+    # Posición de cada fila en `ids`; las filas de empleados fuera de la lista se descartan
+    orden = np.argsort(ids, kind='stable')
+    ids_ordenados = ids[orden]
+    pos = np.searchsorted(ids_ordenados, columnas.empleado_id)
+    pos_valida = np.minimum(pos, n - 1)
+    dentro = (pos < n) & (ids_ordenados[pos_valida] == columnas.empleado_id)
+    grupo = orden[pos_valida[dentro]]
+
+    estado = columnas.estado[dentro]
+    normales = columnas.horas_normales[dentro]
+    extras = columnas.horas_extras[dentro]
+    asistio_m = columnas.asistio_manana[dentro]
+    asistio_t = columnas.asistio_tarde[dentro]
+    tarde_m = columnas.tardanza_manana[dentro]
+    tarde_t = columnas.tardanza_tarde[dentro]
+
+    falta = estado == FALTA
+    completo = estado == COMPLETO
+    incompleto = estado == INCOMPLETO
+    trabajado = completo | incompleto
+
+    turno_m = completo | (incompleto & asistio_m)
+    turno_t = completo | (incompleto & asistio_t)
+
+    def contar(mascara: np.ndarray) -> list:
+        return np.bincount(grupo, weights=mascara, minlength=n).astype(np.int64).tolist()
+
+    def sumar(valores: np.ndarray) -> list:
+        return np.bincount(grupo, weights=np.where(trabajado, valores, 0.0), minlength=n).tolist()
+
+    total_dias = np.bincount(grupo, minlength=n).tolist()
+    faltas = contar(falta)
+    completas = contar(completo)
+    incompletas = contar(incompleto)
+    turnos_manana = contar(turno_m)
+    turnos_tarde = contar(turno_t)
+    faltas_manana = contar(falta | (incompleto & ~asistio_m))
+    faltas_tarde = contar(falta | (incompleto & ~asistio_t))
+    retardos_manana = contar(turno_m & tarde_m)
+    retardos_tarde = contar(turno_t & tarde_t)
+    horas_normales = sumar(normales)
+    horas_extras = sumar(extras)
+
+    resultado = {}
+    for i, empleado_id in enumerate(ids.tolist()):
+        porcentaje_asistencia = 0
+        if total_dias[i] > 0:
+            porcentaje_asistencia = round(((completas[i] + incompletas[i]) / total_dias[i]) * 100, 2)
+        resultado[empleado_id] = {
+            "horas_normales": round(horas_normales[i], 2),
+            "horas_extras": round(horas_extras[i], 2),
+            "faltas": faltas[i],
+            "retardos_manana": retardos_manana[i],
+            "retardos_tarde": retardos_tarde[i],
+            "asistencias_completas": completas[i],
+            "asistencias_incompletas": incompletas[i],
+            "porcentaje_asistencia": porcentaje_asistencia,
+            "turnos_manana": turnos_manana[i],
+            "turnos_tarde": turnos_tarde[i],
+            "faltas_manana": faltas_manana[i],
+            "faltas_tarde": faltas_tarde[i]
+        }
+    return resultado
+
+
+def contar_dias_laborables(fecha_inicio: Union[str, date], fecha_fin: Union[str, date]) -> int:
+    """Días laborables (lunes a sábado) entre dos fechas, ambas incluidas"""
+    inicio = np.datetime64(str(fecha_inicio)[:10], 'D')
+    fin = np.datetime64(str(fecha_fin)[:10], 'D') + np.timedelta64(1, 'D')
+    return int(np.busday_count(inicio, fin, weekmask=SEMANA_LABORAL))
+
+
+def minutos_turno(entrada, salida) -> Optional[int]:
+    """Minutos entre dos marcaciones (sin segundos, nunca negativo); None si falta alguna"""
+    if not entrada or not salida:
+        return None
+    return max(0, (salida.hour * 60 + salida.minute) - (entrada.hour * 60 + entrada.minute))
+
+
+def minutos_por_dia(horas_reales: Iterable[tuple]) -> List[tuple]:
+    """
+    Filas de AsistenciaRepository.get_horas_reales con los minutos de la mañana y de la tarde al
+    final (formato de CierreMensualRepository.get_minutos_diarios)
+    """
+    return [tuple(fila) + (minutos_turno(fila[2], fila[3]), minutos_turno(fila[4], fila[5]))
+            for fila in horas_reales]
@@ -0,0 +1,84 @@
+"""
+Cierre de planilla de un mes por empresa.
+
+Cerrar congela en CierreMensualRepository el resumen de cada empleado (el mismo cálculo del reporte
+mensual) y los minutos por día del Excel. Desde entonces GetReportUseCase y el export leen esa foto
+en lugar de reagregar ASISTENCIA. Reabrir borra la foto (los reportes vuelven a los datos vivos) y
+cerrar de nuevo la reconstruye con lo que haya en ese momento.
+"""
+import calendar
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+import pytz
+
+from src.domain.repositories import AsistenciaRepository, CierreMensualRepository, EmpleadoRepository
+from src.use_cases.attendance_stats import ColumnasAsistencia, calcular_estadisticas, minutos_por_dia
+
+
+def _hoy_lima() -> date:
+    return datetime.now(pytz.timezone("America/Lima")).date()
+
+
+def _iso(valor: Optional[datetime]) -> Optional[str]:
+    return valor.isoformat() if valor else None
+
+
+class CloseMonthUseCase:
+    def __init__(self,
+                 empleado_repository: EmpleadoRepository,
+                 asistencia_repository: AsistenciaRepository,
+                 cierre_repository: CierreMensualRepository,
+                 hoy: Callable[[], date] = _hoy_lima):
+        self.empleado_repository = empleado_repository
+        self.asistencia_repository = asistencia_repository
+        self.cierre_repository = cierre_repository
+        self.hoy = hoy
+
+    def cerrar(self, empresa_id: int, anio: int, mes: int, cerrado_por: Optional[str] = None) -> dict:
+        """Congela el mes (o lo reconstruye si ya estaba cerrado); solo meses ya terminados"""
+        if not 1 <= mes <= 12:
+            raise ValueError(f"mes inválido: {mes}")
+        ultimo = calendar.monthrange(anio, mes)[1]
+        if date(anio, mes, ultimo) >= self.hoy():
+            raise ValueError(f"{mes:02d}/{anio} todavía no termina")
+        primer_dia, ultimo_dia = f"{anio}-{mes:02d}-01", f"{anio}-{mes:02d}-{ultimo:02d}"
+
+        empleados = self.empleado_repository.get_by_empresa_id(empresa_id)
+        filas = self.asistencia_repository.get_filas_estadisticas(empresa_id, primer_dia, ultimo_dia)
+        stats_por_empleado = calcular_estadisticas(
+            ColumnasAsistencia.desde_filas(filas), [empleado.id for empleado in empleados]
+        )
+        resumenes = [
+            dict(stats_por_empleado[empleado.id], empleado_id=empleado.id,
+                 nombre=empleado.nombre, dni=empleado.dni)
+            for empleado in empleados
+        ]
+        minutos_diarios = minutos_por_dia(
+            self.asistencia_repository.get_horas_reales(empresa_id, primer_dia, ultimo_dia)
+        )
+
+        if not self.cierre_repository.guardar_cierre(empresa_id, anio, mes, resumenes, minutos_diarios, cerrado_por):
+            raise RuntimeError(f"no se pudo guardar el cierre de {mes:02d}/{anio}")
+        return {
+            "empresa_id": empresa_id,
+            "anio": anio,
+            "mes": mes,
+            "empleados": len(resumenes),
+            "dias": len(minutos_diarios),
+            "cerrado_en": _iso(self.cierre_repository.get_cierre(empresa_id, anio, mes)),
+        }
+
+    def reabrir(self, empresa_id: int, anio: int, mes: int) -> bool:
+        """True si el mes estaba cerrado"""
+        if self.cierre_repository.get_cierre(empresa_id, anio, mes) is None:
+            return False
+        if not self.cierre_repository.reabrir(empresa_id, anio, mes):
+            raise RuntimeError(f"no se pudo reabrir {mes:02d}/{anio}")
+        return True
+
+    def meses_cerrados(self, empresa_id: int) -> List[dict]:
+        return [
+            {"anio": anio, "mes": mes, "cerrado_en": _iso(cerrado_en)}
+            for anio, mes, cerrado_en in self.cierre_repository.get_meses_cerrados(empresa_id)
+        ]
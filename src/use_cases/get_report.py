@@ -3,9 +3,16 @@ from src.domain.entities import Empleado, Asistencia
 from src.domain.repositories import (
     EmpleadoRepository, 
     AsistenciaRepository,
-    EmpresaRepository
+    EmpresaRepository,
+    CierreMensualRepository,
+    CAMPOS_ESTADISTICAS
 )
-from typing import List, Dict, Optional
+from src.use_cases.attendance_stats import (
+    ColumnasAsistencia,
+    calcular_estadisticas,
+    contar_dias_laborables
+)
+from typing import List, Dict, Optional, Tuple
 import calendar
 
 
@@ -25,20 +32,35 @@ class GetReportUseCase:
     def __init__(self, 
                  empleado_repository: EmpleadoRepository,
                  asistencia_repository: AsistenciaRepository,
-                 empresa_repository: EmpresaRepository):
+                 empresa_repository: EmpresaRepository,
+                 cierre_repository: Optional[CierreMensualRepository] = None):
         self.empleado_repository = empleado_repository
         self.asistencia_repository = asistencia_repository
         self.empresa_repository = empresa_repository
+        # Meses cerrados: se lee la foto del cierre en lugar de reagregar ASISTENCIA
+        self.cierre_repository = cierre_repository
     
     def execute_monthly_report(self, empresa_id: int, mes: int, anio: int) -> dict:
         """
         Genera reporte mensual de asistencia para una empresa
         """
-        empleados = self.empleado_repository.get_by_empresa_id(empresa_id)
-        
         primer_dia = f"{anio}-{mes:02d}-01"
         ultimo_dia = f"{anio}-{mes:02d}-{calendar.monthrange(anio, mes)[1]}"
         
+        cierre = self._get_cierre(empresa_id, mes, anio)
+        if cierre is not None:
+            empleados, stats_por_empleado = cierre
+        else:
+            empleados = self.empleado_repository.get_by_empresa_id(empresa_id)
+            # Una sola consulta por rango para toda la empresa y una pasada vectorizada
+            filas = self.asistencia_repository.get_filas_estadisticas(
+                empresa_id, primer_dia, ultimo_dia
+            )
+            stats_por_empleado = calcular_estadisticas(
+                ColumnasAsistencia.desde_filas(filas),
+                [empleado.id for empleado in empleados]
+            )
+        
         reporte_empleados = []
         totales = {
             "total_empleados": len(empleados),
@@ -54,12 +76,11 @@ class GetReportUseCase:
             "total_retardos_tarde": 0
         }
         
+        total_minutos_normales = 0
+        total_minutos_extras = 0
+        
         for empleado in empleados:
-            asistencias = self.asistencia_repository.get_by_empleado_and_periodo(
-                empleado.id, primer_dia, ultimo_dia
-            )
-            
-            stats = self._calcular_estadisticas_empleado(asistencias)
+            stats = stats_por_empleado[empleado.id]
             
             reporte_empleados.append({
                 "id": empleado.id,
@@ -104,7 +125,8 @@ class GetReportUseCase:
                 "mes": mes,
                 "anio": anio,
                 "primer_dia": primer_dia,
-                "ultimo_dia": ultimo_dia
+                "ultimo_dia": ultimo_dia,
+                "cerrado": cierre is not None
             },
             "totales": totales,
             "empleados": reporte_empleados,
@@ -142,7 +164,12 @@ class GetReportUseCase:
                 "estado": asistencia.estado_dia
             })
         
-        stats = self._calcular_estadisticas_empleado(asistencias)
+        stats = None
+        cierre = self._get_cierre(empleado.empresa_id, mes, anio)
+        if cierre is not None:
+            stats = cierre[1].get(empleado.id)
+        if stats is None:
+            stats = self._calcular_estadisticas_empleado(asistencias)
         
         return {
             "empleado": {
@@ -165,70 +192,23 @@ class GetReportUseCase:
         """
         Calcula estadísticas para un empleado basado en sus asistencias
         """
-        total_horas_normales = 0
-        total_horas_extras = 0
-        faltas = 0
-        asistencias_completas = 0
-        asistencias_incompletas = 0
-        turnos_manana = 0
-        turnos_tarde = 0
-        faltas_manana = 0
-        faltas_tarde = 0
-        retardos_manana = 0
-        retardos_tarde = 0
-
-        for asistencia in asistencias:
-            if asistencia.estado_dia == "FALTA":
-                faltas += 1
-                faltas_manana += 1
-                faltas_tarde += 1
-            elif asistencia.estado_dia == "COMPLETO":
-                asistencias_completas += 1
-                total_horas_normales += asistencia.horas_normales
-                total_horas_extras += asistencia.horas_extras
-                turnos_manana += 1
-                turnos_tarde += 1
-                if asistencia.tardanza_manana:
-                    retardos_manana += 1
-                if asistencia.tardanza_tarde:
-                    retardos_tarde += 1
-            elif asistencia.estado_dia == "INCOMPLETO":
-                asistencias_incompletas += 1
-                total_horas_normales += asistencia.horas_normales
-                total_horas_extras += asistencia.horas_extras
-                if asistencia.asistio_manana:
-                    turnos_manana += 1
-                    if asistencia.tardanza_manana:
-                        retardos_manana += 1
-                else:
-                    faltas_manana += 1
-                if asistencia.asistio_tarde:
-                    turnos_tarde += 1
-                    if asistencia.tardanza_tarde:
-                        retardos_tarde += 1
-                else:
-                    faltas_tarde += 1
-
-        total_dias = len(asistencias)
-        porcentaje_asistencia = 0
-        if total_dias > 0:
-            dias_con_asistencia = asistencias_completas + asistencias_incompletas
-            porcentaje_asistencia = round((dias_con_asistencia / total_dias) * 100, 2)
-
-        return {
-            "horas_normales": round(total_horas_normales, 2),
-            "horas_extras": round(total_horas_extras, 2),
-            "faltas": faltas,
-            "retardos_manana": retardos_manana,
-            "retardos_tarde": retardos_tarde,
-            "asistencias_completas": asistencias_completas,
-            "asistencias_incompletas": asistencias_incompletas,
-            "porcentaje_asistencia": porcentaje_asistencia,
-            "turnos_manana": turnos_manana,
-            "turnos_tarde": turnos_tarde,
-            "faltas_manana": faltas_manana,
-            "faltas_tarde": faltas_tarde
-        }
+        empleado_id = asistencias[0].empleado_id if asistencias else 0
+        return calcular_estadisticas(
+            ColumnasAsistencia.desde_asistencias(asistencias), [empleado_id]
+        )[empleado_id]
+    
+    def _get_cierre(self, empresa_id: int, mes: int, anio: int) -> Optional[Tuple[List[Empleado], Dict[int, dict]]]:
+        """
+        (empleados, estadísticas por empleado) congelados al cerrar el mes, o None si está abierto
+        """
+        if self.cierre_repository is None or self.cierre_repository.get_cierre(empresa_id, anio, mes) is None:
+            return None
+        empleados = []
+        stats_por_empleado = {}
+        for resumen in self.cierre_repository.get_resumenes(empresa_id, anio, mes):
+            empleados.append(Empleado(resumen["empleado_id"], empresa_id, resumen["nombre"], resumen["dni"]))
+            stats_por_empleado[resumen["empleado_id"]] = {campo: resumen[campo] for campo in CAMPOS_ESTADISTICAS}
+        return empleados, stats_por_empleado
     
     def _get_empresa_info(self, empresa_id: int) -> dict:
         """
@@ -245,20 +225,10 @@ class GetReportUseCase:
     
     def _contar_dias_laborables(self, mes: int, anio: int) -> int:
         """
-        Cuenta los días laborables en un mes (lunes a viernes)
+        Cuenta los días laborables en un mes (lunes a sábado)
         """
-        import calendar
-        from datetime import date
-        
-        dias_laborables = 0
         ultimo_dia = calendar.monthrange(anio, mes)[1]
-        
-        for dia in range(1, ultimo_dia + 1):
-            fecha = date(anio, mes, dia)
-            if fecha.weekday() < 6:
-                dias_laborables += 1
-        
-        return dias_laborables
+        return contar_dias_laborables(f"{anio}-{mes:02d}-01", f"{anio}-{mes:02d}-{ultimo_dia}")
 
 
 class GetReportRequest:
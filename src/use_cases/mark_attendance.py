@@ -1,32 +1,92 @@
 from datetime import datetime, time, timedelta
+from time import monotonic
+import os
 import pytz
-from src.domain.entities import Empleado, Asistencia
+from src.domain.entities import Empleado, Asistencia, HorarioEstandar
 from src.domain.repositories import (
     EmpleadoRepository, 
     AsistenciaRepository, 
     HorarioEstandarRepository,
     EscaneoTrackingRepository,
+    RegistroEscaneoRepository,
+    convertir_a_time,
+    minutos_tardanza,
 )
 from src.infrastructure.mysql_connection import get_connection
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 
 class MarkAttendanceUseCase:
+    # Modos de ejecución del escaneo (variable de entorno SCAN_MODE)
+    MODO_CLASICO = "classic"          # Una consulta por paso desde Python
+    MODO_PROCEDIMIENTO = "procedure"  # Todo en sp_registrar_escaneo (un solo viaje a la BD)
+
+    # Ventana anti-duplicado en segundos
+    SEGUNDOS_DUPLICADO = 10
+    # Límite entre turnos (2:00 PM = 14:00 hrs)
+    HORA_LIMITE_MANANA = time(14, 0)
+    # Tiempo mínimo en minutos para permitir marcar salida después de una entrada
+    # Esto evita que si dejas el QR puesto, te marque entrada y salida al instante.
+    TIEMPO_MINIMO_ESTADIA = 5
+    # HORARIOS ESPERADOS SIN TOLERANCIA (si la empresa no tiene fila en HORARIOS_ESTANDAR)
+    HORA_ENTRADA_MANANA_ESPERADA = time(6, 50)  # 6:50 AM
+    HORA_ENTRADA_TARDE_ESPERADA = time(14, 50)  # 2:50 PM
+    # Segundos que se reutiliza el horario de una empresa antes de releerlo
+    SEGUNDOS_CACHE_HORARIO = 300
+
     def __init__(self, 
                  empleado_repository: EmpleadoRepository,
                  asistencia_repository: AsistenciaRepository,
                  horario_repository: HorarioEstandarRepository,
-                 escaneo_repository: EscaneoTrackingRepository):
+                 escaneo_repository: EscaneoTrackingRepository,
+                 registro_escaneo_repository: Optional[RegistroEscaneoRepository] = None,
+                 modo_escaneo: Optional[str] = None,
+                 filtro_qr=None,
+                 reloj: Optional[Callable[[], datetime]] = None):
                  
         self.empleado_repository = empleado_repository
         self.asistencia_repository = asistencia_repository
         self.horario_repository = horario_repository
         self.escaneo_repository = escaneo_repository
+        self.registro_escaneo_repository = registro_escaneo_repository
+        self.modo_escaneo = (modo_escaneo or os.getenv('SCAN_MODE', self.MODO_CLASICO)).lower()
+        # Filtro de códigos válidos (FiltroQRValidos): rechaza basura sin ir a la BD
+        self.filtro_qr = filtro_qr
+        # Hora actual en America/Lima; inyectable para pruebas de carga con reloj simulado
+        self.reloj = reloj or self._ahora_lima
+        # Callbacks oyente(empleado, asistencia) tras guardar una marcación
+        self._oyentes = []
+        # empresa_id -> (expira_en, HorarioEstandar); evita un viaje a la BD por escaneo
+        self._horarios = {}
         
+    def agregar_oyente(self, oyente: Callable[[Empleado, Asistencia], None]):
+        """Registra un callback que se llama cada vez que una marcación cambia en la BD"""
+        self._oyentes.append(oyente)
+
+    def _notificar(self, empleado: Empleado, asistencia: Asistencia):
+        for oyente in self._oyentes:
+            try:
+                oyente(empleado, asistencia)
+            except Exception as e:
+                # Un oyente nunca debe tumbar el escaneo
+                print(f"⚠️ Error en oyente de marcación: {e}")
     
     def execute(self, codigo_qr: str, ip_address: str = "") -> dict:
+        if self.filtro_qr is not None and not self.filtro_qr.puede_existir(codigo_qr):
+            if self.filtro_qr.auditar_rechazos:
+                self.escaneo_repository.create(codigo_qr, ip_address)
+            return {
+                "status": "error",
+                "message": "Empleado no encontrado",
+                "data": None
+            }
+        if self.modo_escaneo == self.MODO_PROCEDIMIENTO and self.registro_escaneo_repository:
+            return self._execute_un_viaje(codigo_qr, ip_address)
+        return self._execute_clasico(codigo_qr, ip_address)
+
+    def _execute_clasico(self, codigo_qr: str, ip_address: str = "") -> dict:
         # Verificar si hay escaneo reciente
-        if self.escaneo_repository.existe_registro_reciente(codigo_qr, 10):
+        if self.escaneo_repository.existe_registro_reciente(codigo_qr, self.SEGUNDOS_DUPLICADO):
             return {
                 "status": "duplicado",
                 "message": "Código QR escaneado recientemente",
@@ -51,12 +111,7 @@ class MarkAttendanceUseCase:
                 "data": None
             }
 
-        # 🔹 CORRECCIÓN: hora exacta según zona horaria de Perú (America/Lima)
-        zona_lima = pytz.timezone("America/Lima")
-        ahora_lima = datetime.now(zona_lima)
-        fecha_actual = ahora_lima.date().strftime('%Y-%m-%d')
-        # Convierto la hora a naive para mantener compatibilidad con tus comparaciones
-        hora_actual = ahora_lima.time().replace(tzinfo=None)
+        fecha_actual, hora_actual = self._fecha_hora_lima()
         
         asistencia = self.asistencia_repository.get_by_empleado_and_fecha(
             empleado.id, fecha_actual
@@ -72,17 +127,90 @@ class MarkAttendanceUseCase:
 
         if resultado["actualizado"]:
             # Calcular las horas trabajadas y estado por turnos
-            self._calcular_horas_trabajadas(asistencia)
+            self._calcular_horas_trabajadas(asistencia, self._horario_de(empleado.empresa_id))
 
             # Guardar en BD con horas y estados calculados
             if asistencia.id:
                 self.asistencia_repository.update(asistencia)
             else:
                 self.asistencia_repository.create(asistencia)
+            self._notificar(empleado, asistencia)
         
+        return self._respuesta_exitosa(empleado, asistencia, resultado["mensaje"])
+
+    def _execute_un_viaje(self, codigo_qr: str, ip_address: str = "") -> dict:
+        """
+        Misma lógica que _execute_clasico, resuelta por sp_registrar_escaneo
+        en un único viaje a la BD (anti-duplicado, tracking, empleado y upsert)
+        """
+        fecha_actual, hora_actual = self._fecha_hora_lima()
+
+        fila = self.registro_escaneo_repository.registrar_escaneo(
+            codigo_qr, ip_address, fecha_actual, hora_actual,
+            self.SEGUNDOS_DUPLICADO, self.HORA_LIMITE_MANANA, self.TIEMPO_MINIMO_ESTADIA,
+            self.HORA_ENTRADA_MANANA_ESPERADA, self.HORA_ENTRADA_TARDE_ESPERADA
+        )
+        if fila is None:
+            raise RuntimeError("sp_registrar_escaneo no devolvió resultado")
+
+        if fila["resultado"] == "duplicado":
+            return {
+                "status": "duplicado",
+                "message": "Código QR escaneado recientemente",
+                "data": None
+            }
+        if fila["resultado"] == "no_encontrado":
+            return {
+                "status": "error",
+                "message": "Empleado no encontrado",
+                "data": None
+            }
+
+        empleado = Empleado(id=fila["empleado_id"], empresa_id=fila.get("empresa_id"), nombre=fila["nombre"])
+        asistencia = Asistencia(
+            empleado_id=fila["empleado_id"],
+            fecha=fecha_actual,
+            entrada_manana_real=convertir_a_time(fila["entrada_manana_real"]),
+            salida_manana_real=convertir_a_time(fila["salida_manana_real"]),
+            entrada_tarde_real=convertir_a_time(fila["entrada_tarde_real"]),
+            salida_tarde_real=convertir_a_time(fila["salida_tarde_real"]),
+            total_horas_trabajadas=float(fila["total_horas_trabajadas"] or 0),
+            horas_normales=float(fila["horas_normales"] or 0),
+            horas_extras=float(fila["horas_extras"] or 0),
+            estado_dia=fila["estado_dia"]
+        )
+        asistencia.asistio_manana = bool(fila["asistio_manana"])
+        asistencia.asistio_tarde = bool(fila["asistio_tarde"])
+        asistencia.tardanza_manana = bool(fila["tardanza_manana"])
+        asistencia.tardanza_tarde = bool(fila["tardanza_tarde"])
+        asistencia.minutos_tardanza_manana = int(fila.get("minutos_tardanza_manana") or 0)
+        asistencia.minutos_tardanza_tarde = int(fila.get("minutos_tardanza_tarde") or 0)
+
+        # La marcación recién hecha se devuelve con la hora exacta, igual que el modo clásico
+        accion = fila["accion"]
+        if accion in ("entrada_manana", "salida_manana", "entrada_tarde", "salida_tarde"):
+            setattr(asistencia, f"{accion}_real", hora_actual)
+            self._notificar(empleado, asistencia)
+
+        mensaje = self._mensaje_registro(accion, hora_actual, int(fila["minutos"] or 0))
+        return self._respuesta_exitosa(empleado, asistencia, mensaje)
+
+    @staticmethod
+    def _ahora_lima() -> datetime:
+        # 🔹 CORRECCIÓN: hora exacta según zona horaria de Perú (America/Lima)
+        return datetime.now(pytz.timezone("America/Lima"))
+
+    def _fecha_hora_lima(self) -> Tuple[str, time]:
+        ahora_lima = self.reloj()
+        fecha_actual = ahora_lima.date().strftime('%Y-%m-%d')
+        # Convierto la hora a naive para mantener compatibilidad con tus comparaciones
+        hora_actual = ahora_lima.time().replace(tzinfo=None)
+        return fecha_actual, hora_actual
+
+    def _respuesta_exitosa(self, empleado: Empleado, asistencia: Asistencia, mensaje: str) -> dict:
         return {
             "status": "success",
-            "message": resultado["mensaje"],
+            "message": mensaje,
             "data": {
                 "empleado": {
                     "id": empleado.id,
@@ -105,19 +233,26 @@ class MarkAttendanceUseCase:
                 }
             }
         }
+
+    def _mensaje_registro(self, accion: str, hora_actual: time, minutos_pasados: int = 0) -> str:
+        """Mensaje para el kiosco según la acción aplicada a la marcación"""
+        hora = hora_actual.strftime('%H:%M')
+        mensajes = {
+            "entrada_manana": f"✅ Entrada mañana registrada: {hora}",
+            "salida_manana": f"✅ Salida mañana registrada: {hora}",
+            "entrada_tarde": f"✅ Entrada tarde registrada: {hora}",
+            "salida_tarde": f"✅ Salida tarde registrada: {hora}",
+            "espera": f"⏳ Espera {self.TIEMPO_MINIMO_ESTADIA} min para marcar salida (pasaron {minutos_pasados} min)",
+            "manana_completo": "⚠️ Turno mañana completo. Regresa en la tarde.",
+            "registro_completo": "❌ Registro diario completo",
+        }
+        return mensajes[accion]
     
     def _procesar_registro_horario(self, asistencia: Asistencia, hora_actual: time) -> dict:
         """
         Procesa el registro con bloqueo de rebote (Cooldown).
         """
-        
-        # Límite entre turnos (2:00 PM = 14:00 hrs)
-        HORA_LIMITE_MANANA = time(14, 0)
-        es_horario_manana = hora_actual < HORA_LIMITE_MANANA
-        
-        # Tiempo mínimo en minutos para permitir marcar salida después de una entrada
-        # Esto evita que si dejas el QR puesto, te marque entrada y salida al instante.
-        TIEMPO_MINIMO_ESTADIA = 5 
+        es_horario_manana = hora_actual < self.HORA_LIMITE_MANANA
         
         # 🔹 TURNO MAÑANA
         if es_horario_manana:
@@ -126,7 +261,7 @@ class MarkAttendanceUseCase:
                 asistencia.entrada_manana_real = hora_actual
                 return {
                     "actualizado": True, 
-                    "mensaje": f"✅ Entrada mañana registrada: {hora_actual.strftime('%H:%M')}"
+                    "mensaje": self._mensaje_registro("entrada_manana", hora_actual)
                 }
             
             # 2. Salida de mañana
@@ -135,22 +270,22 @@ class MarkAttendanceUseCase:
                 # Calculamos cuánto tiempo pasó desde la entrada
                 minutos_pasados = self._calcular_minutos_entre_horas(asistencia.entrada_manana_real, hora_actual)
                 
-                if minutos_pasados < TIEMPO_MINIMO_ESTADIA:
+                if minutos_pasados < self.TIEMPO_MINIMO_ESTADIA:
                     return {
                         "actualizado": False,
-                        "mensaje": f"⏳ Espera {TIEMPO_MINIMO_ESTADIA} min para marcar salida (pasaron {minutos_pasados} min)"
+                        "mensaje": self._mensaje_registro("espera", hora_actual, minutos_pasados)
                     }
 
                 asistencia.salida_manana_real = hora_actual
                 return {
                     "actualizado": True, 
-                    "mensaje": f"✅ Salida mañana registrada: {hora_actual.strftime('%H:%M')}"
+                    "mensaje": self._mensaje_registro("salida_manana", hora_actual)
                 }
             
             else:
                 return {
                     "actualizado": False,
-                    "mensaje": "⚠️ Turno mañana completo. Regresa en la tarde."
+                    "mensaje": self._mensaje_registro("manana_completo", hora_actual)
                 }
         
         # 🔹 TURNO TARDE
@@ -160,7 +295,7 @@ class MarkAttendanceUseCase:
                 asistencia.entrada_tarde_real = hora_actual
                 return {
                     "actualizado": True, 
-                    "mensaje": f"✅ Entrada tarde registrada: {hora_actual.strftime('%H:%M')}"
+                    "mensaje": self._mensaje_registro("entrada_tarde", hora_actual)
                 }
             
             # 4. Salida de tarde
@@ -168,25 +303,46 @@ class MarkAttendanceUseCase:
                 # 🔥 VALIDACIÓN ANTI-REBOTE 🔥
                 minutos_pasados = self._calcular_minutos_entre_horas(asistencia.entrada_tarde_real, hora_actual)
                 
-                if minutos_pasados < TIEMPO_MINIMO_ESTADIA:
+                if minutos_pasados < self.TIEMPO_MINIMO_ESTADIA:
                     return {
                         "actualizado": False,
-                        "mensaje": f"⏳ Espera {TIEMPO_MINIMO_ESTADIA} min para marcar salida (pasaron {minutos_pasados} min)"
+                        "mensaje": self._mensaje_registro("espera", hora_actual, minutos_pasados)
                     }
 
                 asistencia.salida_tarde_real = hora_actual
                 return {
                     "actualizado": True, 
-                    "mensaje": f"✅ Salida tarde registrada: {hora_actual.strftime('%H:%M')}"
+                    "mensaje": self._mensaje_registro("salida_tarde", hora_actual)
                 }
             
             else:
                 return {
                     "actualizado": False,
-                    "mensaje": "❌ Registro diario completo"
+                    "mensaje": self._mensaje_registro("registro_completo", hora_actual)
                 }
     
-    def _calcular_horas_trabajadas(self, asistencia: Asistencia):
+    def _horario_por_defecto(self) -> HorarioEstandar:
+        return HorarioEstandar(entrada_manana=self.HORA_ENTRADA_MANANA_ESPERADA,
+                               entrada_tarde=self.HORA_ENTRADA_TARDE_ESPERADA)
+
+    def _horario_de(self, empresa_id: Optional[int]) -> HorarioEstandar:
+        """Horario de la empresa (HORARIOS_ESTANDAR) con caché; el por defecto si no tiene"""
+        if empresa_id is None:
+            return self._horario_por_defecto()
+        ahora = monotonic()
+        en_cache = self._horarios.get(empresa_id)
+        if en_cache is not None and en_cache[0] > ahora:
+            return en_cache[1]
+        try:
+            horario = self.horario_repository.get_by_empresa_id(empresa_id)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer el horario de la empresa {empresa_id}: {e}")
+            horario = None
+        horario = horario or self._horario_por_defecto()
+        self._horarios[empresa_id] = (ahora + self.SEGUNDOS_CACHE_HORARIO, horario)
+        return horario
+
+    def _calcular_horas_trabajadas(self, asistencia: Asistencia, horario: Optional[HorarioEstandar] = None):
         # Determinar si asistió a cada turno (marcó entrada Y salida)
         asistencia.asistio_manana = (
             bool(asistencia.entrada_manana_real) and 
@@ -233,23 +389,20 @@ class MarkAttendanceUseCase:
             asistencia.estado_dia = "FALTA"
 
         # Evaluar tardanzas
-        self._evaluar_tardanzas(asistencia)
+        self._evaluar_tardanzas(asistencia, horario or self._horario_por_defecto())
     
-    def _evaluar_tardanzas(self, asistencia: Asistencia):
-        # HORARIOS ESPERADOS SIN TOLERANCIA
-        hora_entrada_manana_esperada = time(6, 50)  # 6:50 AM
-        hora_entrada_tarde_esperada = time(14, 50)   # 1:00 PM
-
-        # Comparar directamente sin tolerancia
-        if asistencia.entrada_manana_real:
-            asistencia.tardanza_manana = asistencia.entrada_manana_real > hora_entrada_manana_esperada
-        else:
-            asistencia.tardanza_manana = False
-
-        if asistencia.entrada_tarde_real:
-            asistencia.tardanza_tarde = asistencia.entrada_tarde_real > hora_entrada_tarde_esperada
-        else:
-            asistencia.tardanza_tarde = False
+    def _evaluar_tardanzas(self, asistencia: Asistencia, horario: HorarioEstandar):
+        # Minutos completos de retraso sin tolerancia: 06:50:59 aún es puntual, 06:51:00 es 1 minuto
+        asistencia.minutos_tardanza_manana = minutos_tardanza(
+            convertir_a_time(asistencia.entrada_manana_real),
+            horario.entrada_manana or self.HORA_ENTRADA_MANANA_ESPERADA
+        )
+        asistencia.minutos_tardanza_tarde = minutos_tardanza(
+            convertir_a_time(asistencia.entrada_tarde_real),
+            horario.entrada_tarde or self.HORA_ENTRADA_TARDE_ESPERADA
+        )
+        asistencia.tardanza_manana = asistencia.minutos_tardanza_manana > 0
+        asistencia.tardanza_tarde = asistencia.minutos_tardanza_tarde > 0
 
     def _calcular_minutos_entre_horas(self, hora_inicio, hora_fin) -> int:
         try:
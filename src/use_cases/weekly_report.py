@@ -0,0 +1,309 @@
+"""
+Motor del dashboard semanal.
+
+Un ReporteSemanal representa un rango (y opcionalmente una empresa) y carga cada fuente una sola
+vez y solo si algún widget la necesita: empleados activos, marcaciones del rango y el agregado
+diario. Los widgets por empleado (detalles, horas frecuentes, tops) salen de un único recorrido
+de las marcaciones. bundle() arma todos los widgets; cada endpoint antiguo es una vista de uno.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from src.domain.repositories import ReporteSemanalRepository
+
+DIAS_CORTOS = {
+    'Monday': 'Lun', 'Tuesday': 'Mar', 'Wednesday': 'Mié',
+    'Thursday': 'Jue', 'Friday': 'Vie', 'Saturday': 'Sáb', 'Sunday': 'Dom'
+}
+DIAS_LARGOS = {
+    'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
+    'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
+}
+
+TOP_LIMITE = 5
+
+
+def rango_semana(semana_offset: int = 0, hoy: Optional[date] = None) -> tuple:
+    """Lunes y domingo de la semana actual desplazada semana_offset semanas"""
+    hoy = hoy or datetime.now().date()
+    inicio = hoy - timedelta(days=hoy.weekday()) + timedelta(weeks=semana_offset)
+    return inicio, inicio + timedelta(days=6)
+
+
+def etiqueta_dia(fecha: date) -> str:
+    """'Lun 3', 'Mar 4'... (claves del gráfico y de los tooltips)"""
+    nombre = fecha.strftime('%A')
+    return f"{DIAS_CORTOS.get(nombre, nombre[:3])} {fecha.day}"
+
+
+class ReporteSemanal:
+    def __init__(self, repositorio: ReporteSemanalRepository, fecha_inicio: date, fecha_fin: date,
+                 empresa_id: Optional[int] = None, hoy: Optional[date] = None):
+        self.repositorio = repositorio
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.empresa_id = empresa_id
+        self.hoy = hoy or datetime.now().date()
+        self._empleados = None
+        self._resumen_por_dia = None
+        self._analisis = None
+
+    @property
+    def _inicio_str(self) -> str:
+        return self.fecha_inicio.strftime('%Y-%m-%d')
+
+    @property
+    def _fin_str(self) -> str:
+        return self.fecha_fin.strftime('%Y-%m-%d')
+
+    def _dias_transcurridos(self) -> List[date]:
+        """Días del rango hasta hoy (los futuros no cuentan como faltas)"""
+        dias = []
+        dia = self.fecha_inicio
+        while dia <= self.fecha_fin and dia <= self.hoy:
+            dias.append(dia)
+            dia += timedelta(days=1)
+        return dias
+
+    # --- Fuentes (cada una se carga a lo sumo una vez) ---
+
+    def empleados(self) -> List[tuple]:
+        if self._empleados is None:
+            self._empleados = self.repositorio.get_empleados_activos(self.empresa_id)
+        return self._empleados
+
+    def resumen_por_dia(self) -> Dict[str, dict]:
+        if self._resumen_por_dia is None:
+            self._resumen_por_dia = self.repositorio.get_resumen_por_dia(
+                self._inicio_str, self._fin_str, self.empresa_id
+            )
+        return self._resumen_por_dia
+
+    def _analizar(self) -> dict:
+        """Un solo recorrido de las marcaciones para todos los widgets por empleado"""
+        if self._analisis is not None:
+            return self._analisis
+
+        nombres = {empleado_id: nombre for empleado_id, nombre, _ in self.empleados()}
+        por_dia = {}
+        horas_manana = Counter()
+        horas_tarde = Counter()
+        # empleado_id -> [turnos, puntuales, tardanzas]
+        turnos = {}
+
+        for (empleado_id, fecha, entrada_manana, entrada_tarde,
+             minutos_manana, minutos_tarde) in self.repositorio.get_marcaciones(
+                self._inicio_str, self._fin_str, self.empresa_id):
+            if empleado_id not in nombres:
+                continue
+            por_dia.setdefault(fecha, {})[empleado_id] = (entrada_manana, entrada_tarde, minutos_manana, minutos_tarde)
+            conteo = turnos.setdefault(empleado_id, [0, 0, 0])
+            # Tardanza = minutos de retraso guardados con el horario de la empresa
+            if entrada_manana is not None:
+                horas_manana[entrada_manana.strftime('%H:%M')] += 1
+                conteo[0] += 1
+                if minutos_manana > 0:
+                    conteo[2] += 1
+                else:
+                    conteo[1] += 1
+            if entrada_tarde is not None:
+                horas_tarde[entrada_tarde.strftime('%H:%M')] += 1
+                conteo[0] += 1
+                if minutos_tarde > 0:
+                    conteo[2] += 1
+                else:
+                    conteo[1] += 1
+
+        self._analisis = {
+            "nombres": nombres,
+            "por_dia": por_dia,
+            "horas_manana": horas_manana,
+            "horas_tarde": horas_tarde,
+            "turnos": turnos,
+        }
+        return self._analisis
+
+    # --- Widgets ---
+
+    def summary(self) -> dict:
+        total_empleados = len(self.empleados())
+        resumen = self.resumen_por_dia().values()
+        registros_totales = sum(d["marcas_manana"] + d["marcas_tarde"] for d in resumen)
+        tardanzas_manana = sum(d["tardanzas_manana"] for d in resumen)
+        tardanzas_tarde = sum(d["tardanzas_tarde"] for d in resumen)
+        total_tardanzas = tardanzas_manana + tardanzas_tarde
+        registros_puntuales = registros_totales - total_tardanzas
+        horas_extras = sum(d["horas_extras"] for d in resumen)
+
+        promedio_puntualidad = int((registros_puntuales / registros_totales * 100)) if registros_totales > 0 else 0
+
+        dias_periodo = (self.fecha_fin - self.fecha_inicio).days + 1
+        dias_transcurridos = min(dias_periodo, (self.hoy - self.fecha_inicio).days + 1)
+        if dias_transcurridos < 1:
+            dias_transcurridos = 1
+
+        turnos_esperados = total_empleados * dias_transcurridos * 2
+        porcentaje_asistencia = int((registros_totales / turnos_esperados * 100)) if turnos_esperados > 0 else 0
+
+        return {
+            "periodo": {
+                "inicio": self._inicio_str,
+                "fin": self._fin_str,
+                "inicio_formato": self.fecha_inicio.strftime('%d/%m/%Y'),
+                "fin_formato": self.fecha_fin.strftime('%d/%m/%Y')
+            },
+            "total_empleados": total_empleados,
+            "promedio_puntualidad": promedio_puntualidad,
+            "porcentaje_asistencia": porcentaje_asistencia,
+            "total_tardanzas": total_tardanzas,
+            "tardanzas_manana": tardanzas_manana,
+            "tardanzas_tarde": tardanzas_tarde,
+            "total_faltas": turnos_esperados - registros_totales,
+            "horas_extras": round(horas_extras, 2),
+            "dias_periodo": dias_periodo
+        }
+
+    def daily_attendance(self) -> dict:
+        total_empleados = len(self.empleados())
+        resumen = self.resumen_por_dia()
+        dias, asistencias, tardanzas, faltas = [], [], [], []
+        for dia in self._dias_transcurridos():
+            d = resumen.get(dia.strftime('%Y-%m-%d'), {})
+            presentes = d.get("empleados_presentes", 0)
+            dias.append(etiqueta_dia(dia))
+            asistencias.append(presentes)
+            tardanzas.append(d.get("tardanzas_manana", 0) + d.get("tardanzas_tarde", 0))
+            faltas.append(total_empleados - presentes)
+        return {"dias": dias, "asistencias": asistencias, "tardanzas": tardanzas, "faltas": faltas}
+
+    def daily_attendance_details(self) -> dict:
+        analisis = self._analizar()
+        empleados = self.empleados()
+        resultado = {}
+        for dia in self._dias_transcurridos():
+            marcaciones = analisis["por_dia"].get(dia.strftime('%Y-%m-%d'), {})
+            puntuales, tardes_manana, tardes_tarde, faltas = [], [], [], []
+            for empleado_id, nombre, _ in empleados:
+                entrada_manana, entrada_tarde, minutos_manana, minutos_tarde = marcaciones.get(
+                    empleado_id, (None, None, 0, 0))
+                if entrada_manana is None and entrada_tarde is None:
+                    faltas.append(nombre)
+                    continue
+                puntual_manana = False
+                if entrada_manana:
+                    if minutos_manana == 0:
+                        puntuales.append(f"{nombre} (M)")
+                        puntual_manana = True
+                    else:
+                        tardes_manana.append(f"{nombre} ({entrada_manana.strftime('%H:%M:%S')})")
+                if entrada_tarde:
+                    if minutos_tarde == 0:
+                        if not puntual_manana:
+                            puntuales.append(f"{nombre} (T)")
+                    else:
+                        tardes_tarde.append(f"{nombre} ({entrada_tarde.strftime('%H:%M:%S')})")
+
+            resultado[etiqueta_dia(dia)] = {
+                "puntuales": puntuales,
+                "tardes_manana": tardes_manana,
+                "tardes_tarde": tardes_tarde,
+                "faltas": faltas,
+                "total_asistencias": len(empleados) - len(faltas),
+                "total_tardanzas": len(tardes_manana) + len(tardes_tarde),
+                "total_faltas": len(faltas)
+            }
+        return resultado
+
+    def frequent_hours(self) -> dict:
+        analisis = self._analizar()
+        manana = analisis["horas_manana"].most_common(1)
+        tarde = analisis["horas_tarde"].most_common(1)
+        return {
+            "hora_frecuente_manana": manana[0][0] if manana else "N/A",
+            "frecuencia_manana": manana[0][1] if manana else 0,
+            "hora_frecuente_tarde": tarde[0][0] if tarde else "N/A",
+            "frecuencia_tarde": tarde[0][1] if tarde else 0
+        }
+
+    def worst_days(self) -> List[dict]:
+        dias = [(fecha, d["empleados_presentes"]) for fecha, d in self.resumen_por_dia().items()
+                if d["empleados_presentes"] > 0]
+        dias.sort(key=lambda dia: dia[1])
+        peores = []
+        for fecha_str, asistencias in dias[:3]:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d')
+            nombre = fecha.strftime('%A')
+            peores.append({
+                "fecha": fecha.strftime('%d/%m/%Y'),
+                "dia": DIAS_LARGOS.get(nombre, nombre),
+                "asistencias": asistencias
+            })
+        return peores
+
+    def companies_comparison(self) -> List[dict]:
+        dias_transcurridos = min((self.fecha_fin - self.fecha_inicio).days + 1,
+                                 (self.hoy - self.fecha_inicio).days + 1)
+        if dias_transcurridos < 1:
+            dias_transcurridos = 1
+        empresas = []
+        for _, nombre, total_empleados, asistencias in self.repositorio.get_presentes_por_empresa(
+                self._inicio_str, self._fin_str, self.empresa_id):
+            total_empleados = total_empleados or 0
+            asistencias = int(asistencias or 0)
+            esperadas = total_empleados * dias_transcurridos
+            if total_empleados > 0:
+                empresas.append({
+                    "nombre": nombre,
+                    "total_empleados": total_empleados,
+                    "porcentaje_asistencia": int((asistencias / esperadas * 100)) if esperadas > 0 else 0
+                })
+        return empresas
+
+    def top_punctual(self) -> List[dict]:
+        """Solo 100% puntuales (0 tardanzas)"""
+        analisis = self._analizar()
+        candidatos = [
+            (analisis["nombres"][empleado_id], total, puntuales)
+            for empleado_id, (total, puntuales, tardanzas) in analisis["turnos"].items()
+            if puntuales > 0 and tardanzas == 0 and total == puntuales
+        ]
+        candidatos.sort(key=lambda c: (-c[2], -c[1], c[0]))
+        return [
+            {"nombre": nombre, "turnos_puntuales": puntuales, "total_turnos": total, "perfecto": True}
+            for nombre, total, puntuales in candidatos[:TOP_LIMITE]
+        ]
+
+    def top_late(self) -> List[dict]:
+        """Empleados con al menos 1 tardanza"""
+        analisis = self._analizar()
+        candidatos = [
+            (analisis["nombres"][empleado_id], total, tardanzas)
+            for empleado_id, (total, _, tardanzas) in analisis["turnos"].items()
+            if tardanzas > 0
+        ]
+        candidatos.sort(key=lambda c: (-c[2], -c[1], c[0]))
+        return [
+            {"nombre": nombre, "tardanzas": tardanzas, "total_turnos": total}
+            for nombre, total, tardanzas in candidatos[:TOP_LIMITE]
+        ]
+
+    def bundle(self) -> dict:
+        return {
+            "summary": self.summary(),
+            "daily_attendance": self.daily_attendance(),
+            "daily_attendance_details": self.daily_attendance_details(),
+            "frequent_hours": self.frequent_hours(),
+            "worst_days": self.worst_days(),
+            "companies_comparison": self.companies_comparison(),
+            "top_punctual": self.top_punctual(),
+            "top_late": self.top_late(),
+        }
+
+
+class WeeklyReportUseCase:
+    def __init__(self, reporte_semanal_repository: ReporteSemanalRepository):
+        self.reporte_semanal_repository = reporte_semanal_repository
+
+    def execute(self, fecha_inicio: date, fecha_fin: date, empresa_id: Optional[int] = None) -> ReporteSemanal:
+        return ReporteSemanal(self.reporte_semanal_repository, fecha_inicio, fecha_fin, empresa_id)
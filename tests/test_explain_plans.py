@@ -0,0 +1,161 @@
+"""
+Chequeo de planes (EXPLAIN) de las consultas calientes de reportes contra un MySQL local.
+
+Para cada consulta corre EXPLAIN y falla si alguna de las tablas vigiladas se lee con un recorrido
+completo (type = ALL), p. ej. porque volvió un YEAR(a.fecha) = %s o falta un índice. Las consultas
+de los repositorios se capturan llamando a los métodos reales con una BD que solo registra el SQL,
+y las de las rutas de app.py salen de admin_queries, así el chequeo sigue al código.
+
+Con tablas casi vacías MySQL puede preferir un recorrido completo aunque exista el índice: correrlo
+sobre una copia con volumen real (o un dump de producción) y con las migraciones aplicadas.
+
+Se salta si DB_HOST no está definido (nunca contra el host por defecto de MySQLConnection) o si no
+hay conexión. Uso (credenciales en DB_HOST / DB_NAME / DB_USER / DB_PASSWORD):
+    DB_HOST=127.0.0.1 python -m pytest tests/test_explain_plans.py
+    DB_HOST=127.0.0.1 EXPLAIN_MIGRATE=1 EXPLAIN_EMPRESA=3 EXPLAIN_MES=2025-03 python -m pytest tests/test_explain_plans.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.infrastructure.mysql_connection import MySQLConnection
+from src.infrastructure.admin_queries import (
+    consulta_marcaciones_incompletas, consulta_registros_asistencia, consulta_top_turno
+)
+from src.infrastructure.daily_summary import ResumenDiarioEmpresa
+from src.infrastructure.date_ranges import rango_mes
+from src.infrastructure.migrations import EjecutorMigraciones
+from src.infrastructure.repositories_mysql import (
+    AsistenciaRepositoryMySQL,
+    CierreMensualRepositoryMySQL,
+    EmpleadoRepositoryMySQL,
+    ReporteSemanalRepositoryMySQL,
+)
+
+TABLAS_ANALIZAR = ("EMPLEADOS", "ASISTENCIA", "RESUMEN_DIARIO_EMPRESA")
+
+
+class BDRegistradora:
+    """Sustituto de MySQLConnection que guarda el último SQL en lugar de ejecutarlo"""
+
+    def __init__(self):
+        self.ultima = None
+
+    def _registrar(self, query, params=None, preparada=False):
+        self.ultima = (query, tuple(params or ()))
+        return []
+
+    execute_query = _registrar
+    execute_query_tuplas = _registrar
+
+
+def capturar(llamada) -> tuple:
+    bd = BDRegistradora()
+    llamada(bd)
+    return bd.ultima
+
+
+def consultas_calientes(empresa_id: int, anio: int, mes: int) -> list:
+    """[(nombre, sql, params, alias que no pueden recorrerse completos)]"""
+    inicio, fin_exclusivo = rango_mes(anio, mes)
+    fin = (datetime.strptime(fin_exclusivo, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+    semana = (datetime.strptime(inicio, '%Y-%m-%d') + timedelta(days=6)).strftime('%Y-%m-%d')
+
+    consultas = [
+        ("empleados_por_empresa",
+         *capturar(lambda bd: EmpleadoRepositoryMySQL(bd).get_by_empresa_id(empresa_id)), {"EMPLEADOS"}),
+        ("asistencia_empleado_periodo",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_by_empleado_and_periodo(1, inicio, fin)),
+         {"ASISTENCIA"}),
+        ("asistencia_empresa_periodo",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_by_empresa_and_periodo(empresa_id, inicio, fin)),
+         {"a", "e"}),
+        ("reporte_mensual_estadisticas",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_filas_estadisticas(empresa_id, inicio, fin)),
+         {"a", "e"}),
+        ("export_excel_mes",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_horas_reales(empresa_id, inicio, fin)),
+         {"a", "e"}),
+        ("version_excel_mes",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_version_periodo(empresa_id, inicio, fin)),
+         {"a", "e"}),
+        # Siembra del tablero del día: EMPLEADOS se recorre entero (todos los activos), ASISTENCIA no
+        ("tablero_dia",
+         *capturar(lambda bd: AsistenciaRepositoryMySQL(bd).get_tablero_dia(inicio)),
+         {"a"}),
+        ("cierre_resumenes_mes",
+         *capturar(lambda bd: CierreMensualRepositoryMySQL(bd).get_resumenes(empresa_id, anio, mes)),
+         {"RESUMEN_MENSUAL_EMPLEADO"}),
+        ("cierre_minutos_diarios_mes",
+         *capturar(lambda bd: CierreMensualRepositoryMySQL(bd).get_minutos_diarios(empresa_id, anio, mes)),
+         {"MINUTOS_DIARIOS_EMPLEADO"}),
+        ("semanal_marcaciones",
+         *capturar(lambda bd: ReporteSemanalRepositoryMySQL(bd, None).get_marcaciones(inicio, semana, empresa_id)),
+         {"a", "e"}),
+        ("semanal_resumen_por_dia",
+         *capturar(lambda bd: ResumenDiarioEmpresa(bd, 0).por_dia(inicio, semana, empresa_id)),
+         {"RESUMEN_DIARIO_EMPRESA"}),
+        ("semanal_presentes_por_empresa",
+         *capturar(lambda bd: ResumenDiarioEmpresa(bd, 0).presentes_por_empresa(inicio, semana)),
+         {"r"}),
+        # Rutas de app.py (mismo SQL que ejecutan, de admin_queries)
+        ("marcaciones_incompletas_mes",
+         *consulta_marcaciones_incompletas(anio, mes, empresa_id), {"a"}),
+        ("registros_asistencia_mes",
+         *consulta_registros_asistencia(empresa_id, anio, mes), {"a"}),
+        ("top_puntuales_manana",
+         *consulta_top_turno('manana', False, inicio, semana, empresa_id), {"a", "e"}),
+        ("top_puntuales_tarde",
+         *consulta_top_turno('tarde', False, inicio, semana, empresa_id), {"a", "e"}),
+        ("top_tardanzas_manana",
+         *consulta_top_turno('manana', True, inicio, semana, empresa_id), {"a", "e"}),
+        ("top_tardanzas_tarde",
+         *consulta_top_turno('tarde', True, inicio, semana, empresa_id), {"a", "e"}),
+    ]
+    return consultas
+
+
+EMPRESA_ID = int(os.getenv('EXPLAIN_EMPRESA', '1'))
+ANIO, MES = (int(parte) for parte in os.getenv('EXPLAIN_MES', datetime.now().strftime('%Y-%m')).split('-'))
+CONSULTAS = consultas_calientes(EMPRESA_ID, ANIO, MES)
+
+
+@pytest.fixture(scope="module")
+def db():
+    if not os.getenv('DB_HOST'):
+        pytest.skip("DB_HOST no definido: el chequeo de planes solo corre contra un MySQL local")
+    db = MySQLConnection()
+    conn = db.get_connection()
+    if conn is None:
+        pytest.skip(f"sin conexión a MySQL en {db.host}")
+    conn.close()
+    if os.getenv('EXPLAIN_MIGRATE') == '1':
+        EjecutorMigraciones(db).aplicar()
+    for tabla in TABLAS_ANALIZAR:
+        db.execute_query(f"ANALYZE TABLE {tabla}")
+    return db
+
+
+def explicar(db: MySQLConnection, sql: str, params) -> list:
+    conn = db.get_connection()
+    assert conn is not None, "sin conexión a MySQL"
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + sql, tuple(params))
+        filas = cursor.fetchall()
+        cursor.close()
+        return filas
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("nombre, sql, params, vigiladas", CONSULTAS, ids=[c[0] for c in CONSULTAS])
+def test_sin_recorrido_completo(db, nombre, sql, params, vigiladas):
+    plan = explicar(db, sql, params)
+    completos = [f["table"] for f in plan if f.get("type") == "ALL" and f.get("table") in vigiladas]
+    resumen = [(f.get("table"), f.get("type"), f.get("key"), f.get("rows")) for f in plan]
+    assert not completos, f"{nombre}: recorrido completo de {', '.join(completos)}; plan {resumen}"